@@ -1,8 +1,10 @@
 import 'dart:async';
 import 'dart:convert';
 import 'dart:math';
+import 'dart:typed_data';
 
 import 'package:logger/logger.dart';
+import 'package:msgpack_dart/msgpack_dart.dart' as msgpack;
 import 'package:web_socket_channel/web_socket_channel.dart';
 
 import '../../../core/config/timeout_config.dart';
@@ -12,6 +14,7 @@ enum WSMessageType {
   textChunk,
   toolUse,
   toolResult,
+  toolResultChunk, // 大工具结果的分片（客户端内部拼接，不回调）
   toolProgress, // 新增：工具执行进度
   taskStart,
   taskProgress,
@@ -19,6 +22,9 @@ enum WSMessageType {
   taskComplete,
   error,
   done,
+  cancelled, // 生成已取消（metadata.message_id 为保存的部分回复）
+  streamStart, // 回复流开始（metadata.stream_id 用于断线续传）
+  resumeFailed, // 续传失败（stream 已过期），需要重新加载历史消息
   ping,
   pong,
   connected,
@@ -59,6 +65,8 @@ class WSMessage {
         return WSMessageType.toolUse;
       case 'tool_result':
         return WSMessageType.toolResult;
+      case 'tool_result_chunk':
+        return WSMessageType.toolResultChunk;
       case 'tool_progress':
         return WSMessageType.toolProgress;
       case 'task_start':
@@ -73,6 +81,12 @@ class WSMessage {
         return WSMessageType.error;
       case 'done':
         return WSMessageType.done;
+      case 'cancelled':
+        return WSMessageType.cancelled;
+      case 'stream_start':
+        return WSMessageType.streamStart;
+      case 'resume_failed':
+        return WSMessageType.resumeFailed;
       case 'ping':
         return WSMessageType.ping;
       case 'pong':
@@ -85,6 +99,50 @@ class WSMessage {
   }
 }
 
+/// 请求的子协议（按优先级）：ee.msgpack 时回复事件为 msgpack 二进制帧，
+/// 服务端不支持时回退到 JSON 文本帧
+const wsSubprotocols = ['ee.msgpack', 'ee.json'];
+
+/// ee.msgpack 帧的整数事件类型（与服务端 services/ws_protocol.py 的 EVENT_CODES 一致）
+const _msgpackEventTypes = <int, String>{
+  1: 'text_chunk',
+  2: 'tool_use',
+  3: 'tool_result',
+  4: 'tool_result_chunk',
+  5: 'tool_progress',
+  6: 'task_start',
+  7: 'task_progress',
+  8: 'queued',
+  9: 'stream_start',
+  10: 'task_complete',
+  11: 'cancelled',
+  12: 'briefing_created',
+  13: 'error',
+  14: 'done',
+};
+
+/// msgpack 解码出的 Map 键类型为 dynamic，转换为与 jsonDecode 相同的 Map<String, dynamic>
+dynamic _jsonCompatible(dynamic value) {
+  if (value is Map) {
+    return value.map((key, v) => MapEntry(key.toString(), _jsonCompatible(v)));
+  }
+  if (value is List) return value.map(_jsonCompatible).toList();
+  return value;
+}
+
+/// 解码 msgpack 帧 [code, seq, content, extra] 为与 JSON 协议相同的字段
+Map<String, dynamic> decodeMsgpackFrame(List<int> bytes) {
+  final frame = msgpack.deserialize(Uint8List.fromList(bytes)) as List;
+  final json = <String, dynamic>{};
+  if (frame.length > 3 && frame[3] is Map) {
+    json.addAll(_jsonCompatible(frame[3]) as Map<String, dynamic>);
+  }
+  json['type'] = _msgpackEventTypes[frame[0]] ?? json['type'] ?? 'unknown';
+  if (frame[1] != null) json['seq'] = frame[1];
+  if (frame[2] != null) json['content'] = frame[2];
+  return json;
+}
+
 /// WebSocket连接状态
 enum ConnectionState {
   disconnected,
@@ -99,6 +157,7 @@ enum ConnectionState {
 /// - 自动重连（指数退避）
 /// - 心跳检测
 /// - 流式消息处理
+/// - 断线续传（重连后按 stream_id + 最后收到的 seq 补发未收到的事件）
 class ConversationWebSocketClient {
   final String baseUrl;
   final String conversationId;
@@ -120,6 +179,13 @@ class ConversationWebSocketClient {
   int _reconnectAttempts = 0;
   ConnectionState _connectionState = ConnectionState.disconnected;
 
+  // 进行中的回复流（断线续传）
+  String? _streamId;
+  int _lastSeq = 0;
+
+  // 分片发送的工具结果（tool_id -> 已收到的分片）
+  final Map<String, List<String>> _toolResultChunks = {};
+
   final _logger = Logger();
 
   ConversationWebSocketClient({
@@ -138,6 +204,9 @@ class ConversationWebSocketClient {
   /// 是否已连接
   bool get isConnected => _connectionState == ConnectionState.connected;
 
+  /// 是否有未结束的回复流（重连后可以续传）
+  bool get canResume => _streamId != null;
+
   /// 连接WebSocket
   Future<void> connect() async {
     if (_connectionState == ConnectionState.connecting ||
@@ -165,7 +234,7 @@ class ConversationWebSocketClient {
 
       _logger.i('Connecting to WebSocket: ${wsUrl.replace(queryParameters: {'token': '***'})}');
 
-      _channel = WebSocketChannel.connect(wsUrl);
+      _channel = WebSocketChannel.connect(wsUrl, protocols: wsSubprotocols);
 
       // 等待连接建立
       await _channel!.ready.timeout(
@@ -207,7 +276,10 @@ class ConversationWebSocketClient {
         return;
       }
 
-      final json = jsonDecode(data as String) as Map<String, dynamic>;
+      // 文本帧为 JSON；协商 ee.msgpack 后回复事件为二进制帧
+      final json = data is String
+          ? jsonDecode(data) as Map<String, dynamic>
+          : decodeMsgpackFrame(data as List<int>);
       final message = WSMessage.fromJson(json);
 
       // 更新ping时间
@@ -217,6 +289,17 @@ class ConversationWebSocketClient {
         return;
       }
 
+      _trackStream(message.type, json);
+
+      if (message.type == WSMessageType.toolResultChunk) {
+        final toolId = json['tool_id'] as String? ?? '';
+        _toolResultChunks.putIfAbsent(toolId, () => []).add(message.content ?? '');
+        return;
+      }
+      if (message.type == WSMessageType.toolResult && json['chunks'] != null) {
+        _assembleToolResult(json);
+      }
+
       onMessage?.call(message);
     } catch (e, stackTrace) {
       // 安全地记录错误，避免 null 值导致 logger 崩溃
@@ -269,6 +352,47 @@ class ConversationWebSocketClient {
     );
   }
 
+  /// 记录回复流进度；重连后发送 resume 补发断线期间的事件
+  void _trackStream(WSMessageType type, Map<String, dynamic> json) {
+    final seq = json['seq'];
+    switch (type) {
+      case WSMessageType.streamStart:
+        _streamId = json['stream_id'] as String?;
+        _lastSeq = seq is int ? seq : 0;
+        break;
+      case WSMessageType.connected:
+        if (_streamId != null) {
+          _send({'type': 'resume', 'stream_id': _streamId, 'last_seq': _lastSeq});
+        }
+        break;
+      case WSMessageType.done:
+      case WSMessageType.cancelled:
+      case WSMessageType.resumeFailed:
+        _streamId = null;
+        _lastSeq = 0;
+        _toolResultChunks.clear();
+        break;
+      default:
+        if (seq is int && seq > _lastSeq) _lastSeq = seq;
+    }
+  }
+
+  /// 拼接分片的工具结果，写回 json['result']
+  void _assembleToolResult(Map<String, dynamic> json) {
+    final parts = _toolResultChunks.remove(json['tool_id'] as String? ?? '');
+    if (parts == null) return;
+    final text = parts.join();
+    if (json['result_format'] == 'json') {
+      try {
+        json['result'] = jsonDecode(text);
+        return;
+      } catch (_) {
+        // 分片不完整时按文本处理
+      }
+    }
+    json['result'] = text;
+  }
+
   void _sendPong() {
     _send({'type': 'pong'});
   }
@@ -281,6 +405,11 @@ class ConversationWebSocketClient {
     });
   }
 
+  /// 停止当前生成（服务端保存已收到的部分回复并回复 cancelled）
+  void cancelGeneration() {
+    _send({'type': 'cancel'});
+  }
+
   /// 发送带附件的消息
   void sendMessageWithAttachments(String content, List<Map<String, dynamic>>? attachments) {
     final message = <String, dynamic>{
@@ -103,7 +103,8 @@ class ConversationNotifier extends StateNotifier<ConversationViewState> {
 
     // 如果之前在流式传输时断线，重新加载消息以获取完整内容
     // 因为后端可能已经保存了完整的回复
-    if (wasStreaming) {
+    // （可以续传时客户端会自动发送 resume，继续接收断线期间的内容）
+    if (wasStreaming && !(_wsClient?.canResume ?? false)) {
       _isStreaming = false;
       _streamingStartTime = null;
       _reloadMessagesAfterReconnect();
@@ -166,8 +167,8 @@ class ConversationNotifier extends StateNotifier<ConversationViewState> {
       connectionState: const WsConnectionState.disconnected(),
     );
 
-    // 如果正在流式传输时断线，标记为错误状态
-    if (_isStreaming) {
+    // 如果正在流式传输时断线，标记为错误状态（可以续传时保留已收到的内容）
+    if (_isStreaming && !(_wsClient?.canResume ?? false)) {
       state = state.copyWith(
         streamingState: const StreamingState.error('连接断开，正在重连...'),
       );
@@ -189,6 +190,18 @@ class ConversationNotifier extends StateNotifier<ConversationViewState> {
         _finalizeMessageAndResetTool();
         break;
 
+      case WSMessageType.cancelled:
+        // 生成已停止：保留已收到的部分回复（服务端已保存）
+        _finalizeMessageAndResetTool();
+        break;
+
+      case WSMessageType.resumeFailed:
+        // 续传失败：回退到重新加载历史消息
+        _isStreaming = false;
+        _streamingStartTime = null;
+        _reloadMessagesAfterReconnect();
+        break;
+
       case WSMessageType.error:
         state = state.copyWith(
           streamingState: StreamingState.error(message.content ?? '未知错误'),
@@ -528,6 +541,12 @@ class ConversationNotifier extends StateNotifier<ConversationViewState> {
     }
   }
 
+  /// 停止当前生成
+  void stopGeneration() {
+    if (!_isStreaming && state.streamingState is! StreamingStateWaiting) return;
+    _wsClient?.cancelGeneration();
+  }
+
   /// 使用SSE发送消息（fallback）
   Future<void> _sendViaSse(String content) async {
     try {
@@ -217,6 +217,19 @@ class AgentRegistry:
 
         return agent
 
+    def get_agent_config(self, agent_id_or_uuid: str) -> Optional[AgentYamlConfig]:
+        """获取 Agent 配置（内部使用，不做可见性检查）
+
+        Args:
+            agent_id_or_uuid: Agent ID 或 UUID
+
+        Returns:
+            AgentYamlConfig，如果不存在返回 None
+        """
+        agent_id = self._uuid_to_id.get(agent_id_or_uuid, agent_id_or_uuid)
+        agent = self._agents.get(agent_id)
+        return agent.config if agent else None
+
     def get_agent_uuid(self, agent_id: str) -> Optional[str]:
         """通过 Agent ID 获取 UUID
 
@@ -54,6 +54,23 @@ class AgentSecret:
     key: Optional[str] = None  # supabase_secrets 时的 key 名称
 
 
+@dataclass
+class AgentContext:
+    """对话上下文预算"""
+    max_tokens: int = 6000  # 对话历史的 token 预算（估算值）
+    summary_max_tokens: int = 600  # 滚动摘要的 token 上限
+    max_messages: int = 50  # 最多加载的历史消息条数
+
+    def __post_init__(self):
+        """验证规则"""
+        if self.max_tokens <= 0 or self.max_messages <= 0 or self.summary_max_tokens < 0:
+            raise ValueError("context budgets must be positive")
+
+    @property
+    def limits(self) -> tuple:
+        return (self.max_tokens, self.summary_max_tokens, self.max_messages)
+
+
 @dataclass
 class AgentYamlConfig:
     """Agent YAML 完整配置"""
@@ -65,6 +82,7 @@ class AgentYamlConfig:
         "Read", "Write", "Bash", "Grep", "Glob", "WebFetch"
     ])
     max_turns: int = 20
+    context: AgentContext = field(default_factory=AgentContext)
 
     @classmethod
     def from_yaml(cls, yaml_path: Path) -> "AgentYamlConfig":
@@ -78,7 +96,8 @@ class AgentYamlConfig:
             schedule=[AgentSchedule(**sched) for sched in data.get('schedule', [])],
             secrets=[AgentSecret(**secret) for secret in data.get('secrets', [])],
             allowed_tools=data.get('allowed_tools', cls.__dataclass_fields__['allowed_tools'].default_factory()),
-            max_turns=data.get('max_turns', 20)
+            max_turns=data.get('max_turns', 20),
+            context=AgentContext(**(data.get('context') or {})),
         )
 
     def to_dict(self) -> Dict:
@@ -119,7 +138,12 @@ class AgentYamlConfig:
                 for secret in self.secrets
             ],
             'allowed_tools': self.allowed_tools,
-            'max_turns': self.max_turns
+            'max_turns': self.max_turns,
+            'context': {
+                'max_tokens': self.context.max_tokens,
+                'summary_max_tokens': self.context.summary_max_tokens,
+                'max_messages': self.context.max_messages,
+            },
         }
 
 
@@ -197,6 +221,11 @@ allowed_tools:
   - WebFetch
 
 max_turns: 20
+
+context:
+  max_tokens: 6000         # 对话历史 token 预算
+  summary_max_tokens: 600  # 滚动摘要 token 上限
+  max_messages: 50         # 最多加载的历史消息条数
 ```
 
 ## 私有 Agent 示例
@@ -252,6 +281,13 @@ max_turns: 15
 
 ### max_turns (可选)
 默认：20
+
+### context (可选)
+对话上下文预算。按估算 token 从最新消息往前装入 `max_tokens`，
+更早的消息折叠为滚动摘要（每条一行，超出 `summary_max_tokens` 时丢弃最早的行）。
+- `max_tokens`: 对话历史 token 预算（默认：6000）
+- `summary_max_tokens`: 滚动摘要 token 上限（默认：600）
+- `max_messages`: 最多加载的历史消息条数（默认：50）
 """
 
 
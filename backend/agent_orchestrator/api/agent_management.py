@@ -10,15 +10,19 @@ from pathlib import Path
 from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
 from pydantic import BaseModel, Field
 
+from services.response_cache import get_response_cache
 from skill_templates import get_all_templates, generate_skill_script
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/agents", tags=["agent-management"])
 
+# 技能模板是代码中的常量，只随发布变化
+SKILL_TEMPLATES_CACHE_TTL = 3600
+
 
 # ============================================
 # Request/Response Models
@@ -195,6 +199,7 @@ async def create_agent(request: CreateAgentRequest):
         # }).execute()
 
         logger.info(f"Agent {request.agent_id} created successfully")
+        get_response_cache().invalidate("agents")
 
         # 7. 重新加载 AgentRegistry
         # TODO: 触发 AgentRegistry reload
@@ -274,6 +279,7 @@ async def deploy_agent(agent_id: str):
         # TODO: 触发 AgentRegistry reload
         # await agent_registry.reload()
 
+        get_response_cache().invalidate("agents")
         logger.info(f"Agent {agent_id} deployed successfully")
 
         return {
@@ -380,6 +386,7 @@ async def delete_agent(agent_id: str):
         # TODO: 重新加载 AgentRegistry
         # await agent_registry.reload()
 
+        get_response_cache().invalidate("agents")
         logger.info(f"Agent {agent_id} deleted successfully")
 
         return {
@@ -399,17 +406,24 @@ async def delete_agent(agent_id: str):
 # ============================================
 
 @router.get("/skill-templates")
-async def list_skill_templates():
+async def list_skill_templates(request: Request):
     """
     获取所有技能模板（技能市场）
+
+    模板随代码发布，响应体和 ETag 缓存一小时
     """
-    try:
+    async def load():
         templates = get_all_templates()
         return {
             "success": True,
             "templates": templates,
             "count": len(templates)
         }
+
+    try:
+        return await get_response_cache().respond(
+            request, "skill_templates", "all", load, ttl=SKILL_TEMPLATES_CACHE_TTL
+        )
     except Exception as e:
         logger.error(f"Failed to list skill templates: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
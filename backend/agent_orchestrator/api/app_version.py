@@ -3,14 +3,21 @@
 
 提供 APP 版本检查和更新功能
 """
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 import os
 
+from models.db_executor import get_db_executor
+from services.client_registry import get_client_registry
+from services.response_cache import get_response_cache, json_response, render_json
+
 router = APIRouter(prefix="/app", tags=["应用管理"])
 
+# 最新版本记录的缓存时间（秒）；版本由后台直接发布到数据库，按 TTL 生效
+LATEST_VERSION_CACHE_TTL = float(os.getenv("APP_VERSION_CACHE_TTL", "60"))
+
 
 class DownloadSource(BaseModel):
     """下载源"""
@@ -41,6 +48,7 @@ class CheckUpdateResponse(BaseModel):
 
 @router.get("/version/latest", response_model=CheckUpdateResponse, summary="检查更新")
 async def check_update(
+    request: Request,
     current_version: int = Query(..., description="当前版本号", ge=1),
     region: str = Query("cn", description="地区代码（cn/us/global）")
 ):
@@ -56,8 +64,6 @@ async def check_update(
     """
 
     try:
-        from supabase import create_client
-
         # Supabase 配置
         supabase_url = os.getenv("SUPABASE_URL", "https://dwesyojvzbltqtgtctpt.supabase.co")
         supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
@@ -70,35 +76,41 @@ async def check_update(
                 message="版本检查服务未配置"
             )
 
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_client_registry().supabase(supabase_url, supabase_key)
 
-        # 查询最新的激活版本
-        response = supabase.table("app_versions")\
-            .select("*")\
-            .eq("is_active", True)\
-            .order("version_code", desc=True)\
-            .limit(1)\
-            .execute()
+        async def load_latest():
+            # 查询最新的激活版本
+            response = await get_db_executor().execute(
+                supabase.table("app_versions")
+                .select("*")
+                .eq("is_active", True)
+                .order("version_code", desc=True)
+                .limit(1)
+            )
+            return response.data[0] if response.data else None
 
-        if not response.data:
+        # 所有客户端共享同一条最新版本记录；响应按 current_version 生成，带 ETag
+        latest = await get_response_cache().get_or_load(
+            "app_version", "latest", load_latest, ttl=LATEST_VERSION_CACHE_TTL
+        )
+        if not latest:
             return CheckUpdateResponse(
                 has_update=False,
                 latest_version=None,
                 message="暂无可用版本"
             )
 
-        latest = response.data[0]
         latest_version_code = latest["version_code"]
 
         # 检查是否有更新
         has_update = latest_version_code > current_version
 
         if not has_update:
-            return CheckUpdateResponse(
+            return json_response(request, *render_json(CheckUpdateResponse(
                 has_update=False,
                 latest_version=None,
                 message="已是最新版本"
-            )
+            )))
 
         # 构建下载源列表
         download_sources = []
@@ -144,11 +156,11 @@ async def check_update(
         if min_support_version and current_version < min_support_version:
             version_info.force_update = True
 
-        return CheckUpdateResponse(
+        return json_response(request, *render_json(CheckUpdateResponse(
             has_update=True,
             latest_version=version_info,
             message=f"发现新版本 {latest['version_name']}"
-        )
+        )))
 
     except Exception as e:
         raise HTTPException(
@@ -168,15 +180,13 @@ async def get_version_list(
     用于版本管理和历史查看
     """
     try:
-        from supabase import create_client
-
         supabase_url = os.getenv("SUPABASE_URL", "https://dwesyojvzbltqtgtctpt.supabase.co")
         supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 
         if not supabase_key:
             return []
 
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_client_registry().supabase(supabase_url, supabase_key)
 
         response = supabase.table("app_versions")\
             .select("*")\
@@ -213,15 +223,13 @@ async def get_version_by_code(version_code: int):
     获取指定版本的详细信息
     """
     try:
-        from supabase import create_client
-
         supabase_url = os.getenv("SUPABASE_URL", "https://dwesyojvzbltqtgtctpt.supabase.co")
         supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 
         if not supabase_key:
             raise HTTPException(status_code=503, detail="服务未配置")
 
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_client_registry().supabase(supabase_url, supabase_key)
 
         response = supabase.table("app_versions")\
             .select("*")\
@@ -149,7 +149,9 @@ async def get_briefing_report(
     if briefing.get("user_id") != user_id:
         raise HTTPException(status_code=403, detail="Access denied")
 
-    report = await briefing_service.get_briefing_report(briefing_id)
+    report = await briefing_service.get_briefing_report(
+        briefing_id, user_id=user_id, briefing=briefing
+    )
     if not report:
         raise HTTPException(status_code=404, detail="Report not found for this briefing")
 
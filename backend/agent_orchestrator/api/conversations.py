@@ -5,6 +5,7 @@
 - GET /conversations/{agent_id} - 获取或创建与Agent的对话
 - GET /conversations/{conversation_id}/messages - 获取对话消息
 - POST /conversations/{conversation_id}/messages - 发送消息（流式响应）
+- DELETE /conversations/{conversation_id}/messages/{message_id} - 删除消息
 """
 
 import logging
@@ -63,6 +64,7 @@ class MessageResponse(BaseModel):
     content_type: str  # 'text', 'briefing_card'
     content: str  # 对于briefing_card是JSON字符串
     briefing_id: Optional[str] = None
+    status: Optional[str] = None  # 'streaming' 表示仍在生成（content 为当前已生成内容）
     created_at: str
 
     class Config:
@@ -178,6 +180,8 @@ async def list_messages(
 
     **消息顺序**: 按created_at升序（时间线顺序）
 
+    **生成中的消息**: `status='streaming'` 的消息 content 为已拼接的增量片段（当前已生成内容）
+
     Returns:
         消息列表，包含文本消息和简报卡片
     """
@@ -292,6 +296,49 @@ async def send_message_stream(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.delete("/{conversation_id}/messages/{message_id}", status_code=204)
+async def delete_message(
+    conversation_id: str,
+    message_id: str,
+    user_id: str = Depends(get_current_user_id),
+):
+    """
+    删除对话中的一条消息
+
+    需要认证：需要在Header中提供有效的Bearer Token
+    会验证该对话是否属于当前用户
+
+    删除后该对话的上下文缓存失效，下一轮对话不再包含这条消息
+    """
+    if not conversation_service:
+        raise HTTPException(
+            status_code=500, detail="Conversation service not initialized"
+        )
+
+    try:
+        # 验证对话存在且用户有权访问
+        conversation = await conversation_service.conversation_model.get_by_id(
+            conversation_id
+        )
+
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+
+        if conversation["user_id"] != user_id:
+            raise HTTPException(
+                status_code=403, detail="Access denied to this conversation"
+            )
+
+        if not await conversation_service.delete_message(conversation_id, message_id):
+            raise HTTPException(status_code=500, detail="Failed to delete message")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting message {message_id} in {conversation_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("", response_model=List[ConversationResponse])
 async def list_user_conversations(
     user_id: str = Depends(get_current_user_id),
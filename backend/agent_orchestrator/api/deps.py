@@ -3,11 +3,17 @@
 为agent_orchestrator后端API提供认证保护
 """
 
+import logging
 import os
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from supabase import Client
+
+from api.token_verifier import TokenVerifier, get_token_verifier
+from services.client_registry import get_client_registry
+
+logger = logging.getLogger(__name__)
 
 # 安全方案：使用Bearer Token
 security = HTTPBearer()
@@ -20,14 +26,25 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 def get_supabase_admin() -> Client:
     """
     获取Supabase Admin Client
-    使用Service Role Key，拥有完全权限
+    使用Service Role Key，拥有完全权限；进程内共享同一个客户端（连接复用）
     """
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise RuntimeError(
             "Supabase配置未设置。请确保环境变量 SUPABASE_URL 和 SUPABASE_SERVICE_ROLE_KEY 已配置"
         )
 
-    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return get_client_registry().supabase(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
+
+def get_verifier() -> TokenVerifier:
+    """
+    获取Token验证器
+    未配置本地验签密钥时，使用Supabase Admin Client远程验证
+    """
+    verifier = get_token_verifier()
+    if verifier.supabase is None and SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY:
+        verifier.supabase = get_supabase_admin()
+    return verifier
 
 
 async def get_current_user_id(
@@ -53,31 +70,19 @@ async def get_current_user_id(
     Raises:
         HTTPException: 401 - Token无效或已过期
     """
-    token = credentials.credentials
-    supabase = get_supabase_admin()
-
-    try:
-        # 使用Supabase验证Token
-        user_response = supabase.auth.get_user(token)
+    # 本地验签（带缓存），不再每次请求都调用Supabase Auth
+    user_id = await get_verifier().verify(credentials.credentials)
 
-        if not user_response.user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="无效的认证凭证",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-
-        return str(user_response.user.id)
-
-    except Exception as e:
-        # 记录错误（生产环境应使用日志系统）
-        print(f"认证失败: {e}")
+    if not user_id:
+        logger.info("认证失败: Token无效或已过期")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证凭证或Token已过期",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    return user_id
+
 
 async def get_optional_user_id(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
@@ -97,15 +102,4 @@ async def get_optional_user_id(
     if not credentials:
         return None
 
-    try:
-        token = credentials.credentials
-        supabase = get_supabase_admin()
-        user_response = supabase.auth.get_user(token)
-
-        if user_response.user:
-            return str(user_response.user.id)
-
-    except Exception:
-        pass
-
-    return None
+    return await get_verifier().verify(credentials.credentials)
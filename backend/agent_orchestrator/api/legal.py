@@ -10,10 +10,17 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from api.token_verifier import get_token_verifier
+from models.db_executor import get_db_executor
+from services.response_cache import get_response_cache
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/legal", tags=["legal"])
 
+# 法律文档由后台直接发布到数据库，按 TTL 失效（客户端通过 ETag 重新验证）
+LEGAL_DOCUMENT_CACHE_TTL = 600
+
 # 全局supabase客户端引用，由main.py注入
 supabase_client = None
 
@@ -72,8 +79,8 @@ class ConsentResponse(BaseModel):
 # ============================================
 
 
-def get_current_user_id(request: Request) -> str:
-    """从JWT token中提取用户ID（简化实现）"""
+async def get_current_user_id(request: Request) -> str:
+    """从JWT token中提取用户ID（本地验签 + 缓存）"""
     # 从请求头获取Bearer token
     auth_header = request.headers.get("Authorization", "")
     if not auth_header.startswith("Bearer "):
@@ -81,15 +88,14 @@ def get_current_user_id(request: Request) -> str:
 
     token = auth_header.replace("Bearer ", "")
 
-    # 使用Supabase验证token并获取用户
-    try:
-        user = supabase_client.auth.get_user(token)
-        if not user or not user.user:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user.user.id
-    except Exception as e:
-        logger.error(f"Token validation failed: {e}")
+    verifier = get_token_verifier()
+    if verifier.supabase is None and supabase_client:
+        verifier.supabase = supabase_client
+
+    user_id = await verifier.verify(token)
+    if not user_id:
         raise HTTPException(status_code=401, detail="Token validation failed")
+    return user_id
 
 
 # ============================================
@@ -98,7 +104,7 @@ def get_current_user_id(request: Request) -> str:
 
 
 @router.get("/documents/{document_type}", response_model=LegalDocumentResponse)
-async def get_legal_document(document_type: str):
+async def get_legal_document(document_type: str, request: Request):
     """
     获取法律文档
 
@@ -106,7 +112,7 @@ async def get_legal_document(document_type: str):
     - privacy_policy: 隐私政策
     - terms_of_service: 用户协议
 
-    返回当前有效版本的文档（is_active=true）
+    返回当前有效版本的文档（is_active=true），带 ETag，未变化时返回 304
     """
     if not supabase_client:
         raise HTTPException(status_code=500, detail="Database not configured")
@@ -117,16 +123,15 @@ async def get_legal_document(document_type: str):
             detail="Invalid document type. Must be 'privacy_policy' or 'terms_of_service'",
         )
 
-    try:
+    async def load():
         # 查询当前有效版本的文档
-        result = (
+        result = await get_db_executor().execute(
             supabase_client.table("legal_documents")
             .select("*")
             .eq("document_type", document_type)
             .eq("is_active", True)
             .order("effective_date", desc=True)
             .limit(1)
-            .execute()
         )
 
         if not result.data or len(result.data) == 0:
@@ -138,6 +143,11 @@ async def get_legal_document(document_type: str):
 
         return LegalDocumentResponse(**document)
 
+    try:
+        return await get_response_cache().respond(
+            request, "legal_documents", document_type, load, ttl=LEGAL_DOCUMENT_CACHE_TTL
+        )
+
     except HTTPException:
         raise
     except Exception as e:
@@ -157,7 +167,7 @@ async def create_consent(consent_data: ConsentCreate, request: Request):
         raise HTTPException(status_code=500, detail="Database not configured")
 
     # 获取当前用户ID
-    user_id = get_current_user_id(request)
+    user_id = await get_current_user_id(request)
 
     try:
         # 1. 验证文档是否存在
@@ -234,7 +244,7 @@ async def get_my_consents(request: Request):
         raise HTTPException(status_code=500, detail="Database not configured")
 
     # 获取当前用户ID
-    user_id = get_current_user_id(request)
+    user_id = await get_current_user_id(request)
 
     try:
         result = (
@@ -272,7 +282,7 @@ async def check_consent_status(request: Request):
         raise HTTPException(status_code=500, detail="Database not configured")
 
     # 获取当前用户ID
-    user_id = get_current_user_id(request)
+    user_id = await get_current_user_id(request)
 
     try:
         # 获取用户的所有同意记录
@@ -6,17 +6,24 @@
 - GET /profile/subscribed-agents - 获取订阅的AI员工列表
 """
 
+import asyncio
 import logging
 from fastapi import APIRouter, HTTPException, Query, Depends
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
 from .deps import get_current_user_id
+from models.db_executor import get_db_executor
+from services.client_registry import get_client_registry
+from services.response_cache import get_response_cache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/profile", tags=["profile"])
 
+# 使用统计的按用户缓存时间（秒）：个人中心反复进入时不重复查询
+USAGE_STATS_CACHE_TTL = 30
+
 # 全局服务引用，由main.py注入
 conversation_service = None
 briefing_service = None
@@ -82,20 +89,10 @@ async def get_usage_stats(
         raise HTTPException(status_code=500, detail="Services not initialized")
 
     try:
-        # 获取简报统计
-        total_briefings = await _count_total_briefings(user_id)
-        weekly_briefings = await _count_weekly_briefings(user_id)
-
-        # 获取对话统计
-        active_conversations = await _count_active_conversations(user_id)
-        total_messages = await _count_total_messages(user_id)
-
-        return UsageStats(
-            total_briefings=total_briefings,
-            weekly_briefings=weekly_briefings,
-            active_conversations=active_conversations,
-            total_messages=total_messages,
+        stats = await get_response_cache().get_or_load(
+            "usage_stats", user_id, lambda: _load_usage_stats(user_id), ttl=USAGE_STATS_CACHE_TTL
         )
+        return UsageStats(**stats)
 
     except Exception as e:
         logger.error(f"Error getting usage stats for user {user_id}: {e}")
@@ -147,94 +144,94 @@ async def get_subscribed_agents(
 # ============================================
 
 
-async def _count_total_briefings(user_id: str) -> int:
-    """统计用户收到的简报总数"""
-    try:
-        from models import supabase_client
+def _week_start() -> str:
+    """本周一 00:00"""
+    today = datetime.now()
+    week_start = today - timedelta(days=today.weekday())
+    return week_start.strftime("%Y-%m-%d 00:00:00")
 
-        response = (
-            supabase_client.table("briefings")
-            .select("id", count="exact")
-            .eq("user_id", user_id)
-            .execute()
-        )
-        return response.count or 0
-    except Exception as e:
-        logger.error(f"Error counting total briefings: {e}")
-        return 0
 
+async def _load_usage_stats(user_id: str) -> Dict[str, int]:
+    """一次查询获取全部使用统计（数据库端按用户维护的计数器）
 
-async def _count_weekly_briefings(user_id: str) -> int:
-    """统计用户本周收到的简报数"""
+    数据库尚未应用 user_usage_counters 迁移时回退到并发计数查询。
+    """
+    supabase_client = get_client_registry().supabase()
     try:
-        from models import supabase_client
-        from datetime import datetime, timedelta
-
-        # 获取本周一的日期
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
-        week_start_str = week_start.strftime("%Y-%m-%d 00:00:00")
-
-        response = (
-            supabase_client.table("briefings")
-            .select("id", count="exact")
-            .eq("user_id", user_id)
-            .gte("created_at", week_start_str)
-            .execute()
+        response = await get_db_executor().execute(
+            supabase_client.rpc(
+                "get_user_usage_stats",
+                {"p_user_id": user_id, "p_week_start": _week_start()},
+            )
         )
-        return response.count or 0
+        row = response.data[0] if isinstance(response.data, list) else response.data
+        return {key: int(row.get(key) or 0) for key in UsageStats.model_fields}
     except Exception as e:
-        logger.error(f"Error counting weekly briefings: {e}")
-        return 0
-
-
-async def _count_active_conversations(user_id: str) -> int:
-    """统计用户进行中的对话数"""
+        logger.warning(f"get_user_usage_stats unavailable, falling back to count queries: {e}")
+
+    total_briefings, weekly_briefings, active_conversations, total_messages = await asyncio.gather(
+        _count_total_briefings(supabase_client, user_id),
+        _count_weekly_briefings(supabase_client, user_id),
+        _count_active_conversations(supabase_client, user_id),
+        _count_total_messages(supabase_client, user_id),
+    )
+    return {
+        "total_briefings": total_briefings,
+        "weekly_briefings": weekly_briefings,
+        "active_conversations": active_conversations,
+        "total_messages": total_messages,
+    }
+
+
+async def _count(query: Any, label: str) -> int:
     try:
-        from models import supabase_client
-
-        response = (
-            supabase_client.table("conversations")
-            .select("id", count="exact")
-            .eq("user_id", user_id)
-            .eq("status", "active")
-            .execute()
-        )
+        response = await get_db_executor().execute(query)
         return response.count or 0
     except Exception as e:
-        logger.error(f"Error counting active conversations: {e}")
+        logger.error(f"Error counting {label}: {e}")
         return 0
 
 
-async def _count_total_messages(user_id: str) -> int:
-    """统计用户累计对话轮次"""
-    try:
-        from models import supabase_client
+async def _count_total_briefings(supabase_client: Any, user_id: str) -> int:
+    """统计用户收到的简报总数"""
+    return await _count(
+        supabase_client.table("briefings")
+        .select("id", count="exact", head=True)
+        .eq("user_id", user_id),
+        "total briefings",
+    )
 
-        # 首先获取用户的所有对话ID
-        conversations_response = (
-            supabase_client.table("conversations")
-            .select("id")
-            .eq("user_id", user_id)
-            .execute()
-        )
 
-        if not conversations_response.data:
-            return 0
+async def _count_weekly_briefings(supabase_client: Any, user_id: str) -> int:
+    """统计用户本周收到的简报数"""
+    return await _count(
+        supabase_client.table("briefings")
+        .select("id", count="exact", head=True)
+        .eq("user_id", user_id)
+        .gte("created_at", _week_start()),
+        "weekly briefings",
+    )
 
-        conversation_ids = [conv["id"] for conv in conversations_response.data]
 
-        # 统计这些对话的消息总数
-        response = (
-            supabase_client.table("conversation_messages")
-            .select("id", count="exact")
-            .in_("conversation_id", conversation_ids)
-            .execute()
-        )
-        return response.count or 0
-    except Exception as e:
-        logger.error(f"Error counting total messages: {e}")
-        return 0
+async def _count_active_conversations(supabase_client: Any, user_id: str) -> int:
+    """统计用户进行中的对话数"""
+    return await _count(
+        supabase_client.table("conversations")
+        .select("id", count="exact", head=True)
+        .eq("user_id", user_id)
+        .eq("status", "active"),
+        "active conversations",
+    )
+
+
+async def _count_total_messages(supabase_client: Any, user_id: str) -> int:
+    """统计用户累计对话轮次（按对话所属用户 inner join 过滤，不再下载对话ID列表）"""
+    return await _count(
+        supabase_client.table("messages")
+        .select("id, conversations!inner(user_id)", count="exact", head=True)
+        .eq("conversations.user_id", user_id),
+        "total messages",
+    )
 
 
 async def _get_agent_info(agent_id: str) -> Optional[SubscribedAgent]:
@@ -0,0 +1,270 @@
+"""
+JWT Token 本地验证
+
+替代每次请求都调用 `supabase.auth.get_user(token)`（一次到 Supabase Auth 的网络往返）：
+1. HS256：使用 SUPABASE_JWT_SECRET 本地验签
+2. RS256/ES256：使用 Supabase JWKS 公钥本地验签（公钥集缓存）
+3. 两者都未配置时，回退到 Supabase Auth 远程验证
+
+验证通过的 Token 进入 LRU 缓存（key 为 Token 的 SHA-256），
+缓存条目在 Token 的 `exp` 到期时失效，因此签名和过期时间始终被强制检查。
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import jwt
+from jwt import PyJWKClient
+
+logger = logging.getLogger(__name__)
+
+# 支持的非对称算法（Supabase 新版签名密钥）
+ASYMMETRIC_ALGORITHMS = ["RS256", "ES256", "EdDSA"]
+
+
+class TokenVerifier:
+    """带缓存的 JWT 验证器
+
+    缓存命中时只需一次哈希 + 字典查找（微秒级），
+    未命中时本地验签，不再产生网络请求（JWKS 公钥集本身也会被缓存）。
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        audience: Optional[str] = "authenticated",
+        cache_size: int = 4096,
+        leeway_seconds: int = 10,
+        supabase_client: Any = None,
+    ):
+        """初始化验证器
+
+        Args:
+            jwt_secret: HS256 共享密钥（Supabase Dashboard > Settings > API > JWT Secret）
+            jwks_url: JWKS 地址（非对称签名密钥）
+            audience: 期望的 aud 声明（Supabase 用户 Token 为 authenticated），None 表示不校验
+            cache_size: 缓存的最大 Token 数
+            leeway_seconds: exp 校验允许的时钟偏差
+            supabase_client: 远程回退验证使用的 Supabase 客户端（可选）
+        """
+        self.jwt_secret = jwt_secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.cache_size = cache_size
+        self.leeway_seconds = leeway_seconds
+        self.supabase = supabase_client
+
+        self._jwks_client: Optional[PyJWKClient] = (
+            PyJWKClient(jwks_url, cache_keys=True) if jwks_url else None
+        )
+
+        # token_hash -> (user_id, exp)
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+
+    # ==================== 缓存 ====================
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            user_id, exp = entry
+            if exp <= time.time():
+                # Token 已过期，移除缓存并要求重新验证（会因 exp 失败）
+                del self._cache[key]
+                self._misses += 1
+                return None
+
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return user_id
+
+    def _cache_put(self, key: str, user_id: str, exp: float) -> None:
+        with self._lock:
+            self._cache[key] = (user_id, exp)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        """从缓存中移除 Token（例如用户登出）"""
+        with self._lock:
+            self._cache.pop(self._token_key(token), None)
+
+    # ==================== 验证 ====================
+
+    def _decode_options(self) -> dict:
+        return {
+            "require": ["exp", "sub"],
+            "verify_aud": self.audience is not None,
+        }
+
+    def _verify_hs256(self, token: str) -> Tuple[str, float]:
+        payload = jwt.decode(
+            token,
+            self.jwt_secret,
+            algorithms=["HS256"],
+            audience=self.audience,
+            leeway=self.leeway_seconds,
+            options=self._decode_options(),
+        )
+        return str(payload["sub"]), float(payload["exp"])
+
+    def _verify_jwks(self, token: str) -> Tuple[str, float]:
+        signing_key = self._jwks_client.get_signing_key_from_jwt(token)
+        payload = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=ASYMMETRIC_ALGORITHMS,
+            audience=self.audience,
+            leeway=self.leeway_seconds,
+            options=self._decode_options(),
+        )
+        return str(payload["sub"]), float(payload["exp"])
+
+    def _verify_remote(self, token: str) -> Optional[Tuple[str, float]]:
+        """回退：通过 Supabase Auth 远程验证
+
+        远程验证通过后，exp 仅用于决定缓存有效期。
+        """
+        if not self.supabase:
+            return None
+
+        user_response = self.supabase.auth.get_user(token)
+        if not user_response or not user_response.user:
+            return None
+
+        claims = jwt.decode(token, options={"verify_signature": False})
+        return str(user_response.user.id), float(claims.get("exp", 0))
+
+    def _verify_uncached(self, token: str) -> Optional[Tuple[str, float]]:
+        """验证 Token（不查缓存），失败返回 None"""
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+
+            if algorithm == "HS256" and self.jwt_secret:
+                return self._verify_hs256(token)
+            if algorithm in ASYMMETRIC_ALGORITHMS and self._jwks_client:
+                return self._verify_jwks(token)
+
+            return self._verify_remote(token)
+
+        except jwt.ExpiredSignatureError:
+            logger.info("JWT expired")
+        except jwt.InvalidTokenError as e:
+            logger.warning(f"JWT verification failed: {e}")
+        except Exception as e:
+            logger.warning(f"Token verification error: {e}")
+        return None
+
+    def verify_sync(self, token: str) -> Optional[str]:
+        """同步验证 Token，返回用户ID（失败返回 None）
+
+        注意：JWKS 首次拉取公钥或远程回退时会产生网络请求，
+        在事件循环中请优先使用 `verify()`。
+        """
+        if not token:
+            return None
+
+        key = self._token_key(token)
+        user_id = self._cache_get(key)
+        if user_id:
+            return user_id
+
+        return self._verify_and_cache(key, token)
+
+    def _verify_and_cache(self, key: str, token: str) -> Optional[str]:
+        verified = self._verify_uncached(token)
+        if not verified:
+            return None
+
+        user_id, exp = verified
+        self._cache_put(key, user_id, exp)
+        return user_id
+
+    async def verify(self, token: str) -> Optional[str]:
+        """异步验证 Token，返回用户ID（失败返回 None）
+
+        - 缓存命中 / HS256：直接在事件循环中完成（无 IO）
+        - JWKS / 远程回退：放到线程中执行，避免阻塞事件循环
+        """
+        if not token:
+            return None
+
+        key = self._token_key(token)
+        user_id = self._cache_get(key)
+        if user_id:
+            return user_id
+
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+        except jwt.InvalidTokenError as e:
+            logger.warning(f"Malformed JWT: {e}")
+            return None
+
+        if algorithm == "HS256" and self.jwt_secret:
+            return self._verify_and_cache(key, token)
+
+        return await asyncio.to_thread(self._verify_and_cache, key, token)
+
+    @property
+    def stats(self) -> dict:
+        """缓存统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "cache_size": len(self._cache),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 4) if total else 0.0,
+                "local_hs256": bool(self.jwt_secret),
+                "local_jwks": self._jwks_client is not None,
+            }
+
+
+# 全局验证器实例
+_token_verifier: Optional[TokenVerifier] = None
+
+
+def get_token_verifier() -> TokenVerifier:
+    """获取全局 Token 验证器（从环境变量初始化）"""
+    global _token_verifier
+    if _token_verifier is None:
+        supabase_url = os.getenv("SUPABASE_URL")
+        jwks_url = os.getenv("SUPABASE_JWKS_URL") or (
+            f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+            if supabase_url
+            else None
+        )
+        _token_verifier = TokenVerifier(
+            jwt_secret=os.getenv("SUPABASE_JWT_SECRET"),
+            jwks_url=jwks_url,
+            cache_size=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")),
+        )
+        if not _token_verifier.jwt_secret:
+            logger.warning(
+                "SUPABASE_JWT_SECRET not set: HS256 tokens will be verified remotely via Supabase Auth"
+            )
+    return _token_verifier
+
+
+def set_token_verifier_supabase(supabase_client: Any) -> None:
+    """设置远程回退验证使用的 Supabase 客户端"""
+    get_token_verifier().supabase = supabase_client
@@ -7,27 +7,43 @@ WebSocket Conversation API
 消息协议：
 - 客户端 -> 服务端:
   {"type": "message", "content": "用户消息"}
+  {"type": "cancel"}  # 停止当前生成（已发送的部分回复会保存）
+  {"type": "resume", "stream_id": "...", "last_seq": 12}  # 重连后续传未收到的事件
   {"type": "pong"}
 
 - 服务端 -> 客户端:
+  {"type": "connected", "conversation_id": "...", "active_stream": {"stream_id": "...", "last_seq": 40}}
+  {"type": "stream_start", "stream_id": "...", "seq": 1}  # 之后每条回复事件带递增 seq
   {"type": "text_chunk", "content": "...", "ts": 1234567890}
   {"type": "tool_use", "tool_name": "...", "tool_id": "...", "tool_input": {...}}
-  {"type": "tool_result", "tool_id": "...", "result": "...", "is_error": false}
+  {"type": "tool_result_chunk", "tool_id": "...", "index": 0, "total": 3, "content": "..."}  # 大结果分片
+  {"type": "tool_result", "tool_id": "...", "result": "...", "is_error": false}  # 分片时带 chunks / result_format
   {"type": "done", "message_id": "..."}
+  {"type": "cancelled", "message_id": "..."}  # message_id 为保存的部分回复，无内容时为 null
+  {"type": "resume_failed", "stream_id": "...", "reason": "expired"}  # 客户端应重新加载历史
   {"type": "ping", "ts": 1234567890}
   {"type": "error", "content": "..."}
+
+子协议（Sec-WebSocket-Protocol，见 services.ws_protocol）：
+- ee.msgpack：回复事件以 msgpack 二进制帧 [code, seq, content, extra] 发送
+- ee.json / 未请求：JSON 文本帧
+控制消息（connected / ping / error）和客户端消息始终是 JSON 文本。
 """
 
 import asyncio
 import json
 import logging
+import time
 from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
 
+from api.token_verifier import get_token_verifier
 from config import get_timeout_config
+from services.stream_buffer import StreamBuffer, get_stream_registry
 from services.websocket_manager import ConnectionManager, get_connection_manager
 from services.websocket_writer import MessageType, WebSocketWriter
+from services.ws_protocol import FrameCodec, negotiate_codec
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +61,131 @@ def set_websocket_services(conv_service, supabase):
     supabase_client = supabase
 
 
+class GenerationHandle:
+    """一次回复生成（worker 任务 + 写入器 + 可续传的 stream）
+
+    生成不属于某个连接：连接断开后继续运行，重连的连接通过 resume 接管。
+    """
+
+    __slots__ = ("task", "writer", "started_at")
+
+    def __init__(self, task: asyncio.Task, writer: WebSocketWriter):
+        self.task = task
+        self.writer = writer
+        self.started_at = time.monotonic()
+
+    @property
+    def active(self) -> bool:
+        return not self.task.done()
+
+    @property
+    def stream(self) -> Optional[StreamBuffer]:
+        return self.writer.stream
+
+    async def cancel(self) -> None:
+        """中断生成：停止写入器并取消 Agent 查询，等待部分回复保存完成"""
+        self.writer.cancel()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Generation finished with error after cancel: {e}")
+
+
+# stream_id -> 进行中的生成（跨连接，用于续传后的取消 / 忙碌判断）
+_generations: Dict[str, GenerationHandle] = {}
+
+
+def _find_generation(conversation_id: str, user_id: str) -> Optional[GenerationHandle]:
+    """查找对话中进行中的生成（可能属于已断开的旧连接）"""
+    for handle in _generations.values():
+        if (
+            handle.active
+            and handle.writer.conversation_id == conversation_id
+            and handle.writer.user_id == user_id
+        ):
+            return handle
+    return None
+
+
+def _start_generation(
+    websocket: WebSocket,
+    manager: ConnectionManager,
+    conversation_id: str,
+    user_id: str,
+    content: str,
+    attachments: Optional[list],
+) -> GenerationHandle:
+    """在 worker 任务中生成回复，事件写入新的 stream"""
+    registry = get_stream_registry()
+    stream = registry.create(conversation_id, user_id, subscriber=websocket)
+    writer = WebSocketWriter(
+        websocket=websocket,
+        connection_manager=manager,
+        conversation_id=conversation_id,
+        user_id=user_id,
+        stream=stream,
+    )
+    task = asyncio.create_task(
+        handle_user_message(
+            websocket=websocket,
+            manager=manager,
+            conversation_id=conversation_id,
+            user_id=user_id,
+            content=content,
+            attachments=attachments,
+            writer=writer,
+        ),
+        name=f"ws-generation-{conversation_id}-{user_id}",
+    )
+    handle = GenerationHandle(task, writer)
+    _generations[stream.stream_id] = handle
+
+    def _on_done(_: asyncio.Task) -> None:
+        _generations.pop(stream.stream_id, None)
+        registry.finish(stream)
+
+    task.add_done_callback(_on_done)
+    return handle
+
+
+async def _resume_stream(
+    websocket: WebSocket,
+    conversation_id: str,
+    user_id: str,
+    stream_id: Optional[str],
+    last_seq: Any,
+    codec: FrameCodec,
+) -> Optional[GenerationHandle]:
+    """补发 seq > last_seq 的事件，然后把 stream 绑定到当前连接
+
+    Returns:
+        stream 对应的进行中生成（已结束时为 None）
+    """
+    registry = get_stream_registry()
+    stream = registry.get(stream_id) if stream_id else None
+    if stream is None or stream.conversation_id != conversation_id or stream.user_id != user_id:
+        registry.record_resume_miss()
+        await websocket.send_json({"type": "resume_failed", "stream_id": stream_id, "reason": "expired"})
+        return None
+
+    try:
+        sent = max(0, int(last_seq or 0))
+    except (TypeError, ValueError):
+        sent = 0
+    # 补发期间生成仍在追加事件：循环到追平为止，追平与 attach 之间没有 await
+    while True:
+        for event in await stream.replay(sent):
+            await codec.send(websocket, event)
+            sent = event["seq"]
+        if sent >= stream.last_seq:
+            break
+    registry.attach(stream, websocket)
+    return _generations.get(stream.stream_id)
+
+
 async def _warmup_agent_async(agent_id: str) -> None:
     """异步预热 Agent 配置
     
@@ -70,49 +211,14 @@ async def _warmup_agent_async(agent_id: str) -> None:
 async def verify_token(token: str) -> Optional[str]:
     """验证JWT Token并返回用户ID
 
-    优先使用 Supabase 验证，如果 Supabase 不可用则直接解码 JWT。
+    本地验签（HS256 密钥 / JWKS 公钥）并缓存到 Token 过期，
+    未配置密钥时回退到 Supabase Auth 远程验证。
+    不再接受未验签的 JWT。
     """
-    # 方式1：使用 Supabase 验证
-    if supabase_client:
-        try:
-            user_response = supabase_client.auth.get_user(token)
-            if user_response.user:
-                return str(user_response.user.id)
-        except Exception as e:
-            logger.warning(f"Supabase token verification failed: {e}")
-
-    # 方式2：直接解码 JWT（用于 Supabase 不可用时）
-    try:
-        import base64
-        import json as json_module
-
-        # JWT 格式: header.payload.signature
-        parts = token.split('.')
-        if len(parts) != 3:
-            logger.warning("Invalid JWT format")
-            return None
-
-        # 解码 payload（第二部分）
-        payload = parts[1]
-        # 添加 padding
-        padding = 4 - len(payload) % 4
-        if padding != 4:
-            payload += '=' * padding
-
-        decoded = base64.urlsafe_b64decode(payload)
-        payload_data = json_module.loads(decoded)
-
-        # 从 sub 字段获取用户ID
-        user_id = payload_data.get('sub')
-        if user_id:
-            logger.info(f"JWT decoded, user_id: {user_id}")
-            return user_id
-
-        logger.warning("No 'sub' field in JWT payload")
-    except Exception as e:
-        logger.warning(f"JWT decode failed: {e}")
-
-    return None
+    verifier = get_token_verifier()
+    if verifier.supabase is None and supabase_client:
+        verifier.supabase = supabase_client
+    return await verifier.verify(token)
 
 
 @router.websocket("/api/v1/conversations/{conversation_id}/ws")
@@ -132,10 +238,18 @@ async def conversation_websocket(
 
     消息类型：
     - message: 用户发送消息
+    - cancel: 停止当前生成
     - pong: 客户端响应心跳
+
+    接收循环与回复生成分离：每条消息在独立的 worker 任务中生成，
+    接收循环在生成期间继续处理 pong / cancel。同一连接同时只有一个生成，
+    生成中收到新消息时返回 busy 错误。
+
+    连接断开不会中断生成：事件继续写入 stream，重连后发送 resume 补发并继续接收。
     """
-    # 先接受 WebSocket 连接（必须在发送任何消息之前）
-    await websocket.accept()
+    # 先接受 WebSocket 连接（必须在发送任何消息之前），同时协商回复事件的编码
+    codec = negotiate_codec(websocket.scope.get("subprotocols"))
+    await websocket.accept(subprotocol=codec.subprotocol)
 
     # 验证Token
     user_id = await verify_token(token)
@@ -190,25 +304,35 @@ async def conversation_websocket(
         )
 
     # 连接WebSocket
+    generation: Optional[GenerationHandle] = None
     try:
         connection_state = await manager.connect(
             websocket=websocket,
             conversation_id=conversation_id,
             user_id=user_id,
+            codec=codec,
         )
 
-        # 发送连接成功消息
-        await websocket.send_json({
+        # 发送连接成功消息（有未结束的回复流时提示客户端续传）
+        connected_message = {
             "type": "connected",
             "conversation_id": conversation_id,
+            "protocol": codec.name,
             "ts": asyncio.get_event_loop().time(),
-        })
+        }
+        active_stream = get_stream_registry().find_active(conversation_id, user_id)
+        if active_stream:
+            connected_message["active_stream"] = {
+                "stream_id": active_stream.stream_id,
+                "last_seq": active_stream.last_seq,
+            }
+        await websocket.send_json(connected_message)
 
         # 预热优化：异步预加载 Agent 配置（减少首次消息延迟）
         if agent_id_for_warmup and conversation_service:
             asyncio.create_task(_warmup_agent_async(agent_id_for_warmup))
 
-        # 消息处理循环
+        # 消息接收循环（回复生成在 worker 任务中进行，不阻塞接收）
         while True:
             try:
                 # 接收消息
@@ -227,19 +351,56 @@ async def conversation_websocket(
                     # 处理用户消息
                     content = message.get("content", "").strip()
                     attachments = message.get("attachments")  # 附件列表
-                    if content or attachments:
+                    if not (content or attachments):
+                        continue
+                    # 同一对话同时只有一个生成（包括断线前未结束、尚未续传的生成）
+                    active = generation if generation and generation.active else _find_generation(
+                        conversation_id, user_id
+                    )
+                    if active:
+                        await websocket.send_json({
+                            "type": "error",
+                            "code": "busy",
+                            "content": "上一条消息仍在生成中，请等待完成或先停止生成",
+                            "stream_id": active.stream.stream_id if active.stream else None,
+                        })
+                        continue
+                    logger.info(
+                        f"WS received user message: conversation={conversation_id}, user={user_id}, "
+                        f"len={len(content)}, attachments={len(attachments) if attachments else 0}"
+                    )
+                    generation = _start_generation(
+                        websocket, manager, conversation_id, user_id, content, attachments
+                    )
+
+                elif msg_type == "resume":
+                    # 断线重连：补发未收到的事件并继续接收实时输出
+                    resumed = await _resume_stream(
+                        websocket,
+                        conversation_id,
+                        user_id,
+                        message.get("stream_id"),
+                        message.get("last_seq"),
+                        codec,
+                    )
+                    if resumed:
+                        generation = resumed
+
+                elif msg_type == "cancel":
+                    # 停止当前生成
+                    if not (generation and generation.active):
+                        generation = _find_generation(conversation_id, user_id)
+                    if generation and generation.active:
+                        if generation.stream is not None:
+                            # 取消断线前的生成时，取消确认发送到当前连接
+                            generation.stream.subscriber = websocket
                         logger.info(
-                            f"WS received user message: conversation={conversation_id}, user={user_id}, "
-                            f"len={len(content)}, attachments={len(attachments) if attachments else 0}"
-                        )
-                        await handle_user_message(
-                            websocket=websocket,
-                            manager=manager,
-                            conversation_id=conversation_id,
-                            user_id=user_id,
-                            content=content,
-                            attachments=attachments,
+                            f"WS generation cancelled by client: conversation={conversation_id}, "
+                            f"user={user_id}, elapsed={time.monotonic() - generation.started_at:.1f}s"
                         )
+                        await generation.cancel()
+                        await generation.writer.write_cancelled()
+                    generation = None
 
                 else:
                     logger.warning(f"Unknown message type: {msg_type}")
@@ -258,7 +419,11 @@ async def conversation_websocket(
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
-        await manager.disconnect(conversation_id, user_id)
+        # 连接断开时未完成的生成继续运行，事件写入 stream 等待重连续传
+        # （未续传时完整回复仍会保存到历史消息）
+        if generation and generation.active and generation.stream is not None:
+            get_stream_registry().detach(generation.stream, websocket)
+        await manager.disconnect(conversation_id, user_id, websocket=websocket)
 
 
 async def handle_user_message(
@@ -268,6 +433,7 @@ async def handle_user_message(
     user_id: str,
     content: str,
     attachments: Optional[list] = None,
+    writer: Optional[WebSocketWriter] = None,
 ) -> None:
     """处理用户消息并流式返回响应
 
@@ -278,6 +444,7 @@ async def handle_user_message(
         user_id: 用户ID
         content: 消息内容
         attachments: 附件列表，格式 [{id, url, mime_type, filename}]
+        writer: WebSocket写入器（由接收循环创建，用于取消和续传）
     """
     if not conversation_service:
         await websocket.send_json({
@@ -287,14 +454,18 @@ async def handle_user_message(
         return
 
     # 创建WebSocket写入器
-    writer = WebSocketWriter(
-        websocket=websocket,
-        connection_manager=manager,
-        conversation_id=conversation_id,
-        user_id=user_id,
-    )
+    if writer is None:
+        writer = WebSocketWriter(
+            websocket=websocket,
+            connection_manager=manager,
+            conversation_id=conversation_id,
+            user_id=user_id,
+        )
 
     try:
+        # 回复流开始（客户端据此续传）
+        await writer.write_stream_start()
+
         # 调用对话服务的WebSocket版本
         await conversation_service.send_message_ws(
             conversation_id=conversation_id,
@@ -305,11 +476,11 @@ async def handle_user_message(
         )
 
         # 发送完成消息
-        await writer.write_done()
+        await writer.write_done(writer.message_id)
 
     except asyncio.CancelledError:
+        # 取消确认（cancelled）由接收循环在部分回复保存后发送
         logger.info(f"Message handling cancelled: {conversation_id}")
-        await writer.write_error("Request cancelled")
         raise
     except WebSocketDisconnect:
         # 连接已断开（例如心跳/客户端关闭）；不要再尝试写 error/done
@@ -333,4 +504,7 @@ async def websocket_health():
             "ping_timeout": config.WS_PING_TIMEOUT,
             "idle_timeout": config.WS_IDLE_TIMEOUT,
         },
+        "heartbeat": manager.stats(),
+        "outbound": manager.outbound_stats(),
+        "streams": get_stream_registry().stats(),
     }
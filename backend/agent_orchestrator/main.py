@@ -44,16 +44,22 @@ import traceback
 
 # 新的 Agent SDK
 from agent_sdk import AgentSDKService, AgentSDKConfig
-from agent_sdk.mcp_tools import create_dev_efficiency_server
+from agent_sdk.mcp_tools import close_gerrit_client, create_dev_efficiency_server
 from agent_sdk.exceptions import AgentNotFoundError, AgentSDKError
 
 # Agent Registry（新增）
 from agent_registry import AgentRegistry, init_global_registry
 
 # 调度器和服务模块
-from scheduler import SchedulerService, JobExecutor
+from scheduler import SchedulerService, JobExecutor, TaskQueue, WorkerPool
 from services import BriefingService, ImportanceEvaluator, ConversationService
 from services.task_execution_service import TaskExecutionService
+from models import get_db_executor
+from services.image_pipeline import get_image_pipeline
+from services.client_registry import get_client_registry
+from services.response_cache import get_response_cache
+from services.stream_buffer import get_stream_registry
+from services.websocket_manager import get_connection_manager
 from api import (
     briefings_router,
     scheduled_jobs_router,
@@ -72,7 +78,7 @@ from api.legal import set_supabase_client as set_legal_supabase
 
 # Supabase 客户端
 try:
-    from supabase import create_client, Client
+    from supabase import Client
     SUPABASE_AVAILABLE = True
 except ImportError:
     SUPABASE_AVAILABLE = False
@@ -101,7 +107,8 @@ supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SER
 
 if SUPABASE_AVAILABLE and supabase_url and supabase_key:
     try:
-        supabase_client = create_client(supabase_url, supabase_key)
+        # 进程内共享（带连接池的 httpx.Client），API 路由的依赖注入也复用同一个客户端
+        supabase_client = get_client_registry().supabase(supabase_url, supabase_key)
         logger.info("Supabase client initialized")
     except Exception as e:
         logger.warning(f"Failed to initialize Supabase client: {e}")
@@ -166,6 +173,26 @@ scheduler_service = SchedulerService(
     agent_registry=agent_registry  # 传递 AgentRegistry
 )
 
+# 运行模式：all（单进程，默认）/ api（只服务请求，任务入队）/ worker（调度器 + 任务执行）
+# api 与 worker 通过本地持久化任务队列（TASK_QUEUE_PATH）通信
+ORCHESTRATOR_MODE = os.getenv("ORCHESTRATOR_MODE", "all")
+if ORCHESTRATOR_MODE not in ("all", "api", "worker"):
+    raise ValueError(f"Invalid ORCHESTRATOR_MODE: {ORCHESTRATOR_MODE}. Must be all/api/worker")
+
+task_queue: Optional[TaskQueue] = None
+worker_pool: Optional[WorkerPool] = None
+if ORCHESTRATOR_MODE != "all":
+    task_queue = TaskQueue()
+    task_execution_service.set_task_queue(task_queue)
+    scheduler_service.task_queue = task_queue
+if ORCHESTRATOR_MODE == "worker":
+    worker_pool = WorkerPool(task_queue, handlers={
+        "scheduled_job": job_executor.execute,
+        "ad_hoc_task": task_execution_service.run_ad_hoc_task,
+        "agent_task": agent_service.execute_agent_task,
+    })
+logger.info(f"Orchestrator mode: {ORCHESTRATOR_MODE}")
+
 # 注入服务到API模块
 set_briefing_service(briefing_service)
 set_conversation_service(conversation_service)
@@ -234,19 +261,37 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Failed to adjust log levels: {e}")
 
-    # 初始化并启动调度器
+    # 初始化并启动调度器（api 模式只初始化，供手动执行 / 查询使用，触发由 worker 负责）
     try:
         scheduler_service.initialize(job_executor)
-        await scheduler_service.start()
-        logger.info("Scheduler started successfully")
+        if ORCHESTRATOR_MODE != "api":
+            await scheduler_service.start()
+            logger.info("Scheduler started successfully")
     except Exception as e:
         logger.error(f"Failed to start scheduler: {e}")
 
+    if worker_pool:
+        await worker_pool.start()
+
+    # 补写上次退出时未完成的简报 UI Schema / 封面图
+    await briefing_service.resume_pending_fills()
+
     yield
 
     # 关闭时
     logger.info("Shutting down application...")
     await scheduler_service.shutdown()
+    if worker_pool:
+        await worker_pool.shutdown()
+    await agent_service.shutdown()
+    await get_image_pipeline().close()
+    await briefing_service.shutdown()
+    await ui_schema_generator.close()
+    await get_connection_manager().shutdown()
+    get_stream_registry().close()
+    await get_client_registry().close()
+    await close_gerrit_client()
+    get_db_executor().shutdown(wait=False)
 
 
 app = FastAPI(
@@ -511,12 +556,27 @@ async def health_check():
     scheduler_jobs = scheduler_service.get_jobs() if scheduler_service.scheduler else []
     health_status["scheduler"] = {
         "status": "running" if scheduler_service.scheduler else "not_initialized",
-        "jobs_count": len(scheduler_jobs)
+        "jobs_count": len(scheduler_jobs),
+        "leases": scheduler_service.stats(),
     }
+    health_status["mode"] = ORCHESTRATOR_MODE
+    if task_queue:
+        health_status["task_queue"] = await task_queue.stats()
+    if worker_pool:
+        health_status["worker_pool"] = worker_pool.stats()
 
     # Agent Registry 检查
     health_status["agents_loaded"] = len(agent_registry.get_all_ids())
 
+    # Agent 客户端池（命中 / 冷启动）
+    health_status["agent_client_pool"] = agent_service.pool_stats()
+    health_status["agent_admission"] = agent_service.admission_stats()
+    health_status["http_clients"] = get_client_registry().stats()
+    health_status["response_cache"] = get_response_cache().stats()
+    health_status["websocket"] = get_connection_manager().stats()
+    health_status["websocket_outbound"] = get_connection_manager().outbound_stats()
+    health_status["websocket_streams"] = get_stream_registry().stats()
+
     # 错误统计
     error_health = error_tracker.get_health_status()
     health_status["errors"] = error_health
@@ -558,25 +618,28 @@ async def health_check():
 """,
     response_description="AI员工列表和总数"
 )
-async def list_agents():
-    """列出所有可用的AI员工"""
-    # 使用 AgentRegistry 获取最新的agent列表
-    agents = []
-    for agent_id in agent_registry.get_all_ids():
-        agent_info = agent_registry.get_agent(agent_id)
-        if agent_info:
-            agents.append({
-                "role": agent_info.id,
-                "name": agent_info.name,
-                "description": agent_info.config.metadata.description,
-                "model": agent_info.config.metadata.model,
-                "workdir": str(agent_info.agent_dir),
-                "available": agent_info.agent_dir.exists()
-            })
-    return {
-        "agents": agents,
-        "total": len(agents)
-    }
+async def list_agents(request: Request):
+    """列出所有可用的AI员工（响应缓存 + ETag，Agent 增删 / 重新加载时失效）"""
+    async def load():
+        # 使用 AgentRegistry 获取最新的agent列表
+        agents = []
+        for agent_id in agent_registry.get_all_ids():
+            agent_info = agent_registry.get_agent(agent_id)
+            if agent_info:
+                agents.append({
+                    "role": agent_info.id,
+                    "name": agent_info.name,
+                    "description": agent_info.config.metadata.description,
+                    "model": agent_info.config.metadata.model,
+                    "workdir": str(agent_info.agent_dir),
+                    "available": agent_info.agent_dir.exists()
+                })
+        return {
+            "agents": agents,
+            "total": len(agents)
+        }
+
+    return await get_response_cache().respond(request, "agents", "list", load)
 
 
 @app.get(
@@ -672,10 +735,18 @@ async def chat_websocket(websocket: WebSocket, agent_role: str):
 
             # 使用新的 Agent SDK 流式调用
             try:
+                async def send_queue_position(position: int, queue_depth: int) -> None:
+                    await websocket.send_json({
+                        "type": "queued",
+                        "position": position,
+                        "queue_depth": queue_depth,
+                    })
+
                 async for event in agent_service.execute_query(
                     prompt=message,
                     agent_role=agent_role,
                     mcp_servers=mcp_servers,
+                    on_queued=send_queue_position,
                 ):
                     if event["type"] == "text_chunk":
                         await websocket.send_json({
@@ -754,6 +825,9 @@ async def chat_stream_http(request: ChatRequest):
                 prompt=request.message,
                 agent_role=request.agent_role,
                 mcp_servers=mcp_servers,
+                on_queued=lambda position, depth: queue.put_nowait(
+                    {"type": "queued", "position": position, "queue_depth": depth}
+                ),
             ):
                 await queue.put(event)
             await queue.put({"type": "done"})
@@ -789,6 +863,9 @@ async def chat_stream_http(request: ChatRequest):
                 elif event["type"] == "error":
                     yield f"event: error\n"
                     yield f"data: {json.dumps({'error': event['error']})}\n\n"
+                elif event["type"] == "queued":
+                    yield "event: queued\n"
+                    yield f"data: {json.dumps({'position': event['position'], 'queue_depth': event['queue_depth']})}\n\n"
                 elif event["type"] == "done":
                     yield f"event: done\n"
                     yield f"data: {json.dumps({})}\n\n"
@@ -850,6 +927,7 @@ async def execute_task(request: ScheduledTaskRequest):
             prompt=request.task_description,
             agent_role=request.agent_role,
             mcp_servers=mcp_servers,
+            priority="ad_hoc",
         ):
             if event["type"] == "text_chunk":
                 result_content.append(event["content"])
@@ -878,8 +956,21 @@ async def execute_task(request: ScheduledTaskRequest):
 # ============================================
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
 
+    parser = argparse.ArgumentParser(description="AI Agent Orchestrator")
+    parser.add_argument(
+        "--mode",
+        choices=["all", "api", "worker"],
+        help="运行模式（默认读取 ORCHESTRATOR_MODE，worker 模式请使用 worker.py）",
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    if args.mode:
+        # uvicorn 会在子进程中重新导入 main，通过环境变量传递模式
+        os.environ["ORCHESTRATOR_MODE"] = args.mode
+
     # 检查环境变量
     auth_token = os.getenv("ANTHROPIC_AUTH_TOKEN")
     if not auth_token:
@@ -894,7 +985,8 @@ if __name__ == "__main__":
     print("\nStarting AI Agent Orchestrator v3.1...")
     print("Backend: Claude Agent SDK + APScheduler")
     print("Agent workspaces: backend/agents/")
-    print("API docs: http://localhost:8000/docs")
+    print(f"API docs: http://localhost:{args.port}/docs")
+    print(f"Mode: {os.environ.get('ORCHESTRATOR_MODE', 'all')}")
 
     # Supabase状态
     if supabase_client:
@@ -913,7 +1005,9 @@ if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
-        port=8000,
+        port=args.port,
         reload=True,
-        log_level="info"
+        log_level="info",
+        # permessage-deflate：客户端协商后压缩 WebSocket 帧（JSON / msgpack 都适用）
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "1") == "1",
     )
@@ -4,9 +4,11 @@ Data models for agent_orchestrator
 Provides data access layer for Supabase database:
 - ConversationModel: Conversation CRUD operations
 - MessageModel: Message CRUD operations with polymorphic content types
+- DBExecutor: Bounded executor that keeps sync supabase calls off the event loop
 """
 
 from .conversation import ConversationModel
+from .db_executor import DBExecutor, get_db_executor
 from .message import MessageModel
 
-__all__ = ["ConversationModel", "MessageModel"]
+__all__ = ["ConversationModel", "MessageModel", "DBExecutor", "get_db_executor"]
@@ -8,6 +8,8 @@ import logging
 from typing import Any, Dict, Optional
 from datetime import datetime
 
+from .db_executor import DBExecutor, get_db_executor
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,13 +21,21 @@ class ConversationModel:
     - 确保每个(user_id, agent_id)对只有一个对话
     """
 
-    def __init__(self, supabase_client: Any):
+    def __init__(
+        self, supabase_client: Any, db_executor: Optional[DBExecutor] = None
+    ):
         """初始化对话模型
 
         Args:
             supabase_client: Supabase客户端实例
+            db_executor: 数据库执行器（可选，默认使用全局有界线程池）
         """
         self.supabase = supabase_client
+        self.db_executor = db_executor or get_db_executor()
+
+    async def _execute(self, query: Any) -> Any:
+        """在执行器中运行查询，避免同步 `.execute()` 阻塞事件循环"""
+        return await self.db_executor.execute(query)
 
     async def get_or_create(
         self, user_id: str, agent_id: str
@@ -49,12 +59,11 @@ class ConversationModel:
         """
         try:
             # 1. 查找现有对话
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .select("*")
                 .eq("user_id", user_id)
                 .eq("agent_id", agent_id)
-                .execute()
             )
 
             if result.data and len(result.data) > 0:
@@ -68,11 +77,10 @@ class ConversationModel:
 
             # 2. 创建新对话
             # 获取agent名称用于生成标题
-            agent_result = (
+            agent_result = await self._execute(
                 self.supabase.table("agents")
                 .select("name")
                 .eq("id", agent_id)
-                .execute()
             )
             agent_name = (
                 agent_result.data[0]["name"] if agent_result.data else "AI员工"
@@ -87,10 +95,9 @@ class ConversationModel:
                 "last_message_at": datetime.utcnow().isoformat(),
             }
 
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .insert(conversation_data)
-                .execute()
             )
 
             if not result.data or len(result.data) == 0:
@@ -120,11 +127,10 @@ class ConversationModel:
             对话记录字典，如果不存在返回None
         """
         try:
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .select("*")
                 .eq("id", conversation_id)
-                .execute()
             )
 
             if result.data and len(result.data) > 0:
@@ -135,6 +141,36 @@ class ConversationModel:
             logger.error(f"Error getting conversation {conversation_id}: {e}")
             return None
 
+    async def get_by_user_and_agent(
+        self, user_id: str, agent_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """根据user_id和agent_id获取对话（不创建）
+
+        Args:
+            user_id: 用户UUID
+            agent_id: Agent UUID
+
+        Returns:
+            对话记录字典，如果不存在返回None
+        """
+        try:
+            result = await self._execute(
+                self.supabase.table("conversations")
+                .select("*")
+                .eq("user_id", user_id)
+                .eq("agent_id", agent_id)
+            )
+
+            if result.data and len(result.data) > 0:
+                return result.data[0]
+            return None
+
+        except Exception as e:
+            logger.error(
+                f"Error getting conversation for user={user_id}, agent={agent_id}: {e}"
+            )
+            return None
+
     async def update_last_message_time(self, conversation_id: str) -> None:
         """更新对话的最后消息时间戳
 
@@ -142,9 +178,11 @@ class ConversationModel:
             conversation_id: 对话UUID
         """
         try:
-            self.supabase.table("conversations").update(
-                {"last_message_at": datetime.utcnow().isoformat()}
-            ).eq("id", conversation_id).execute()
+            await self._execute(
+                self.supabase.table("conversations")
+                .update({"last_message_at": datetime.utcnow().isoformat()})
+                .eq("id", conversation_id)
+            )
 
             logger.debug(f"Updated last_message_at for conversation {conversation_id}")
 
@@ -167,13 +205,12 @@ class ConversationModel:
             对话列表，按last_message_at降序排列
         """
         try:
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .select("*")
                 .eq("user_id", user_id)
                 .order("last_message_at", desc=True)
                 .limit(limit)
-                .execute()
             )
 
             return result.data or []
@@ -203,11 +240,10 @@ class ConversationModel:
         try:
             # 获取agent名称用于生成默认标题
             if not title:
-                agent_result = (
+                agent_result = await self._execute(
                     self.supabase.table("agents")
                     .select("name")
                     .eq("id", agent_id)
-                    .execute()
                 )
                 agent_name = (
                     agent_result.data[0]["name"] if agent_result.data else "AI员工"
@@ -223,10 +259,9 @@ class ConversationModel:
                 "last_message_at": datetime.utcnow().isoformat(),
             }
 
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .insert(conversation_data)
-                .execute()
             )
 
             if not result.data or len(result.data) == 0:
@@ -270,7 +305,9 @@ class ConversationModel:
             if status:
                 query = query.eq("status", status)
 
-            result = query.order("last_message_at", desc=True).limit(limit).execute()
+            result = await self._execute(
+                query.order("last_message_at", desc=True).limit(limit)
+            )
 
             logger.info(
                 f"Found {len(result.data or [])} conversations for user={user_id}, agent={agent_id}"
@@ -296,11 +333,10 @@ class ConversationModel:
             更新后的会话记录，如果失败返回None
         """
         try:
-            result = (
+            result = await self._execute(
                 self.supabase.table("conversations")
                 .update({"title": title})
                 .eq("id", conversation_id)
-                .execute()
             )
 
             if result.data and len(result.data) > 0:
@@ -0,0 +1,96 @@
+"""
+DB Executor - 数据库访问执行器
+
+supabase-py 的同步客户端 `.execute()` 会阻塞事件循环，导致同一进程内
+所有 WebSocket 流在数据库读写期间卡顿。
+
+DBExecutor 将查询放到有界线程池中执行：
+- 共享同一个 Supabase 客户端（PostgREST 底层为 httpx.Client，HTTP/2 + 连接池，线程安全）
+- 线程数有上限，避免高并发时无限制创建线程
+- 对调用方保持 async 接口，模型层 API 不变
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 线程池大小（可用环境变量覆盖）
+DEFAULT_DB_MAX_WORKERS = int(os.getenv("DB_EXECUTOR_MAX_WORKERS", "16"))
+
+
+class DBExecutor:
+    """有界数据库执行器
+
+    用法：
+        result = await executor.execute(
+            supabase.table("messages").select("*").eq("id", message_id)
+        )
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_DB_MAX_WORKERS):
+        """初始化执行器
+
+        Args:
+            max_workers: 最大并发数据库请求数（线程数）
+        """
+        self.max_workers = max_workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """延迟创建线程池（shutdown 后可重新创建）"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="db-executor",
+            )
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在线程池中执行任意同步函数
+
+        Args:
+            func: 同步函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(), partial(func, *args, **kwargs)
+        )
+
+    async def execute(self, query: Any) -> Any:
+        """执行 PostgREST 查询构建器（调用其 `.execute()`）
+
+        Args:
+            query: supabase 查询构建器，例如 table(...).select(...).eq(...)
+
+        Returns:
+            APIResponse（包含 data / count）
+        """
+        return await self.run(query.execute)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+            logger.info("DB executor shutdown")
+
+
+# 全局执行器实例
+_db_executor: Optional[DBExecutor] = None
+
+
+def get_db_executor() -> DBExecutor:
+    """获取全局数据库执行器"""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = DBExecutor()
+    return _db_executor
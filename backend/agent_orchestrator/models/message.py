@@ -8,11 +8,19 @@ Message data model - 消息数据模型
 
 import logging
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from .db_executor import DBExecutor, get_db_executor
+
 logger = logging.getLogger(__name__)
 
+# 构建上下文所需字段（updated_at / status 用于上下文缓存校验）
+CONTEXT_FIELDS = "id, role, content_type, content, briefing_id, status, created_at, updated_at"
+
+# 生成中的消息状态（追加模式下内容在 message_chunks 中）
+STREAMING_STATUS = "streaming"
+
 
 class MessageModel:
     """消息数据模型
@@ -21,15 +29,24 @@ class MessageModel:
     - create_text_message: 创建文本消息
     - create_briefing_card: 创建简报卡片消息
     - list_by_conversation: 获取对话的所有消息
+    - merge_streaming_chunks: 拼接生成中消息的增量片段
     """
 
-    def __init__(self, supabase_client: Any):
+    def __init__(
+        self, supabase_client: Any, db_executor: Optional[DBExecutor] = None
+    ):
         """初始化消息模型
 
         Args:
             supabase_client: Supabase客户端实例
+            db_executor: 数据库执行器（可选，默认使用全局有界线程池）
         """
         self.supabase = supabase_client
+        self.db_executor = db_executor or get_db_executor()
+
+    async def _execute(self, query: Any) -> Any:
+        """在执行器中运行查询，避免同步 `.execute()` 阻塞事件循环"""
+        return await self.db_executor.execute(query)
 
     async def create_text_message(
         self, conversation_id: str, role: str, content: str,
@@ -69,8 +86,8 @@ class MessageModel:
             if attachments:
                 message_data["attachments"] = json.dumps(attachments, ensure_ascii=False)
 
-            result = (
-                self.supabase.table("messages").insert(message_data).execute()
+            result = await self._execute(
+                self.supabase.table("messages").insert(message_data)
             )
 
             if not result.data or len(result.data) == 0:
@@ -142,8 +159,8 @@ class MessageModel:
                 "created_at": datetime.utcnow().isoformat(),
             }
 
-            result = (
-                self.supabase.table("messages").insert(message_data).execute()
+            result = await self._execute(
+                self.supabase.table("messages").insert(message_data)
             )
 
             if not result.data or len(result.data) == 0:
@@ -182,16 +199,15 @@ class MessageModel:
             需要在使用时解析为字典。
         """
         try:
-            result = (
+            result = await self._execute(
                 self.supabase.table("messages")
                 .select("*")
                 .eq("conversation_id", conversation_id)
                 .order("created_at", desc=False)  # 时间线顺序
                 .range(offset, offset + limit - 1)
-                .execute()
             )
 
-            messages = result.data or []
+            messages = await self.merge_streaming_chunks(result.data or [])
 
             logger.debug(
                 f"Retrieved {len(messages)} messages "
@@ -206,6 +222,49 @@ class MessageModel:
             )
             return []
 
+    async def merge_streaming_chunks(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """拼接生成中消息的增量片段
+
+        追加模式下生成过程中只写入 message_chunks，messages.content 为空（或为已合并的前缀），
+        消息完成后才合并写回。读取 status="streaming" 的消息时按 seq 拼接片段，
+        得到与重写模式一致的当前内容。
+
+        Args:
+            messages: 消息列表（原地更新 content）
+
+        Returns:
+            同一消息列表
+        """
+        streaming = {
+            m["id"]: m for m in messages
+            if m.get("status") == STREAMING_STATUS and m.get("id")
+        }
+        if not streaming:
+            return messages
+
+        try:
+            result = await self._execute(
+                self.supabase.table("message_chunks")
+                .select("message_id, seq, content")
+                .in_("message_id", list(streaming))
+                .order("seq", desc=False)
+            )
+        except Exception as e:
+            # 片段读取失败时返回已持久化的内容，不影响消息列表
+            logger.warning(f"Error reading message chunks for {list(streaming)}: {e}")
+            return messages
+
+        chunks: Dict[str, List[str]] = {}
+        for chunk in result.data or []:
+            chunks.setdefault(chunk["message_id"], []).append(chunk.get("content") or "")
+        for message_id, parts in chunks.items():
+            message = streaming[message_id]
+            message["content"] = (message.get("content") or "") + "".join(parts)
+
+        return messages
+
     async def get_recent_messages(
         self, conversation_id: str, count: int = 20
     ) -> List[Dict[str, Any]]:
@@ -224,13 +283,12 @@ class MessageModel:
         """
         try:
             # 优化：只查询必要字段
-            result = (
+            result = await self._execute(
                 self.supabase.table("messages")
-                .select("id, role, content_type, content, briefing_id, created_at")
+                .select(CONTEXT_FIELDS)
                 .eq("conversation_id", conversation_id)
                 .order("created_at", desc=True)  # 先降序获取最新的
                 .limit(count)
-                .execute()
             )
 
             messages = result.data or []
@@ -251,24 +309,109 @@ class MessageModel:
             )
             return []
 
-    async def delete_message(self, message_id: str) -> bool:
+    async def get_message_versions(
+        self, conversation_id: str, count: int = 20
+    ) -> List[Dict[str, Any]]:
+        """获取对话最近N条消息的版本信息（不含内容）
+
+        用于校验上下文缓存：据此发现新消息、被原地更新的消息（updated_at 变化）
+        和被删除的消息，只为新消息或变化的消息再查询内容。
+
+        Args:
+            conversation_id: 对话UUID
+            count: 消息数量
+
+        Returns:
+            [{id, created_at, updated_at, status}]，按created_at升序排列
+        """
+        try:
+            result = await self._execute(
+                self.supabase.table("messages")
+                .select("id, created_at, updated_at, status")
+                .eq("conversation_id", conversation_id)
+                .order("created_at", desc=True)
+                .limit(count)
+            )
+
+            messages = result.data or []
+            messages.reverse()
+            return messages
+
+        except Exception as e:
+            logger.error(
+                f"Error getting message versions for conversation {conversation_id}: {e}"
+            )
+            raise
+
+    async def get_messages_by_ids(self, message_ids: List[str]) -> List[Dict[str, Any]]:
+        """按 id 批量获取消息（上下文所需字段）
+
+        Args:
+            message_ids: 消息UUID列表
+
+        Returns:
+            消息列表，按created_at升序排列
+        """
+        if not message_ids:
+            return []
+
+        try:
+            result = await self._execute(
+                self.supabase.table("messages")
+                .select(CONTEXT_FIELDS)
+                .in_("id", message_ids)
+                .order("created_at", desc=False)
+            )
+            return result.data or []
+
+        except Exception as e:
+            logger.error(f"Error getting messages {message_ids}: {e}")
+            raise
+
+    async def count_by_role(self, conversation_id: str, role: str) -> int:
+        """统计对话中指定角色的消息数量
+
+        Args:
+            conversation_id: 对话UUID
+            role: 消息角色 ('user', 'assistant', 'system')
+
+        Returns:
+            消息数量，查询失败返回0
+        """
+        try:
+            result = await self._execute(
+                self.supabase.table("messages")
+                .select("id", count="exact")
+                .eq("conversation_id", conversation_id)
+                .eq("role", role)
+            )
+            return result.count if result.count is not None else len(result.data or [])
+
+        except Exception as e:
+            logger.error(
+                f"Error counting {role} messages for conversation {conversation_id}: {e}"
+            )
+            return 0
+
+    async def delete_message(
+        self, message_id: str, conversation_id: Optional[str] = None
+    ) -> bool:
         """删除消息（软删除或硬删除）
 
         注意：当前实现为硬删除。未来可以改为软删除（标记deleted=true）。
 
         Args:
             message_id: 消息UUID
+            conversation_id: 对话UUID（可选，提供时只删除属于该对话的消息）
 
         Returns:
             删除成功返回True，失败返回False
         """
         try:
-            result = (
-                self.supabase.table("messages")
-                .delete()
-                .eq("id", message_id)
-                .execute()
-            )
+            query = self.supabase.table("messages").delete().eq("id", message_id)
+            if conversation_id:
+                query = query.eq("conversation_id", conversation_id)
+            result = await self._execute(query)
 
             logger.info(f"Deleted message: {message_id}")
             return True
@@ -4,5 +4,7 @@
 
 from .scheduler_service import SchedulerService
 from .job_executor import JobExecutor
+from .task_queue import TaskQueue, TaskQueueError
+from .worker_pool import WorkerPool
 
-__all__ = ["SchedulerService", "JobExecutor"]
+__all__ = ["SchedulerService", "JobExecutor", "TaskQueue", "TaskQueueError", "WorkerPool"]
@@ -4,12 +4,16 @@
 """
 
 import asyncio
+import hashlib
 import logging
 import os
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
-from uuid import uuid4
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+from uuid import NAMESPACE_URL, uuid5
+
+from models.db_executor import get_db_executor
 
 if TYPE_CHECKING:
     from agent_sdk import AgentSDKService
@@ -21,6 +25,26 @@ logger = logging.getLogger(__name__)
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_RETRY_DELAY_MINUTES = 30
 
+# 默认扇出配置（可在 briefing_config 中覆盖）
+DEFAULT_FANOUT_CHUNK_SIZE = 500
+DEFAULT_PUSH_CONCURRENCY = 20
+
+# 报告artifact的内容寻址命名空间
+ARTIFACT_NAMESPACE = uuid5(NAMESPACE_URL, "ee-app/artifacts/report")
+
+
+def content_artifact_id(agent_id: str, content: str) -> Tuple[str, str]:
+    """根据报告内容计算artifact ID（内容寻址）
+
+    相同Agent、相同内容总是得到相同的ID，因此同一次任务（包括重试）
+    只会写入一份artifact。
+
+    Returns:
+        (artifact_id, content_sha256)
+    """
+    content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid5(ARTIFACT_NAMESPACE, f"{agent_id}:{content_hash}")), content_hash
+
 
 class JobExecutor:
     """定时任务执行器"""
@@ -31,11 +55,13 @@ class JobExecutor:
         briefing_service: "BriefingService",
         supabase_client: Any = None,
         scheduler: Any = None,  # 用于安排重试任务
+        job_store: Any = None,  # 持久化重试（优先于 scheduler）
     ):
         self.agent_service = agent_service
         self.briefing_service = briefing_service
         self.supabase = supabase_client
         self.scheduler = scheduler  # APScheduler 实例
+        self.job_store = job_store  # scheduler.job_store.JobStore 实例
 
     async def execute(
         self,
@@ -74,14 +100,15 @@ class JobExecutor:
 
             # 3. 评估是否需要生成简报
             if briefing_config.get("enabled", True):
-                briefings_count = await self._process_briefing(
+                fanout = await self._process_briefing(
                     job_id=job_id,
                     agent_id=agent_id,
                     analysis_result=analysis_result,
                     briefing_config=briefing_config,
                     target_user_ids=target_user_ids,
                 )
-                result["briefings_created"] = briefings_count
+                result["briefings_created"] = fanout["created"]
+                result["fanout"] = fanout
 
             # 4. 更新任务执行记录
             await self._update_job_status(
@@ -106,15 +133,32 @@ class JobExecutor:
             # 检查是否需要重试
             if retry_count < max_retries:
                 next_retry = retry_count + 1
-                retry_time = datetime.now() + timedelta(minutes=retry_delay)
+                retry_time = datetime.now().astimezone() + timedelta(minutes=retry_delay)
 
                 logger.info(
                     f"Scheduling retry {next_retry}/{max_retries} for job {job_id} "
                     f"at {retry_time.strftime('%H:%M')}"
                 )
 
-                # 安排重试任务
-                if self.scheduler:
+                retry_kwargs = {
+                    "job_id": job_id,
+                    "agent_id": agent_id,
+                    "task_prompt": task_prompt,
+                    "briefing_config": briefing_config,
+                    "target_user_ids": target_user_ids,
+                    "retry_count": next_retry,
+                    "source": source,
+                }
+
+                # 安排重试任务（优先持久化，进程重启后不丢失）
+                if self.job_store:
+                    try:
+                        await self.job_store.add_retry(job_id, retry_time, retry_kwargs)
+                        result["next_retry_at"] = retry_time.isoformat()
+                        result["status"] = "retrying"
+                    except Exception as store_error:
+                        logger.error(f"Failed to persist retry for job {job_id}: {store_error}")
+                elif self.scheduler:
                     retry_job_id = f"{job_id}_retry_{next_retry}"
                     self.scheduler.add_job(
                         func=self.execute,
@@ -122,14 +166,7 @@ class JobExecutor:
                         run_date=retry_time,
                         id=retry_job_id,
                         name=f"Retry {next_retry} for {job_id}",
-                        kwargs={
-                            "job_id": job_id,
-                            "agent_id": agent_id,
-                            "task_prompt": task_prompt,
-                            "briefing_config": briefing_config,
-                            "target_user_ids": target_user_ids,
-                            "retry_count": next_retry,
-                        },
+                        kwargs=retry_kwargs,
                         replace_existing=True,
                     )
                     result["next_retry_at"] = retry_time.isoformat()
@@ -169,12 +206,13 @@ class JobExecutor:
     async def _run_agent_analysis(
         self, agent_role: str, task_prompt: str
     ) -> Dict[str, Any]:
-        """运行Agent分析任务"""
+        """运行Agent分析任务（通过 execute_query 复用客户端池中的长连接）"""
         result_chunks = []
 
         async for event in self.agent_service.execute_query(
             prompt=task_prompt,
             agent_role=agent_role,
+            priority="scheduled",  # 定时任务排在对话和即时任务之后
         ):
             if event["type"] == "text_chunk":
                 result_chunks.append(event["content"])
@@ -190,12 +228,37 @@ class JobExecutor:
         analysis_result: Dict[str, Any],
         briefing_config: Dict[str, Any],
         target_user_ids: Optional[List[str]],
-    ) -> int:
-        """处理简报生成，返回创建的简报数量"""
+    ) -> Dict[str, Any]:
+        """处理简报生成（批量扇出）
+
+        所有接收者内容相同，因此：
+        - artifact / UI Schema / 封面图只生成一次（artifact不归属任何接收者，删除某个用户不影响其他人）
+        - 简报按分块多行 insert
+        - 推送通过信号量限制并发
+
+        Returns:
+            扇出统计：created / recipients / pushed / skipped_reason / timings_ms
+        """
+        stats: Dict[str, Any] = {
+            "created": 0,
+            "recipients": 0,
+            "pushed": 0,
+            "timings_ms": {},
+        }
+        timings = stats["timings_ms"]
+
+        def mark(stage: str, started: float) -> float:
+            now = time.perf_counter()
+            timings[stage] = round((now - started) * 1000, 1)
+            return now
+
+        t = time.perf_counter()
+
         # 1. 评估重要性分数
         importance_score = await self.briefing_service.evaluate_importance(
             analysis_result
         )
+        t = mark("evaluate", t)
 
         min_score = briefing_config.get("min_importance_score", 0.6)
 
@@ -204,7 +267,8 @@ class JobExecutor:
             logger.info(
                 f"Skipping briefing: importance {importance_score:.2f} < {min_score}"
             )
-            return 0
+            stats["skipped_reason"] = "below_importance_threshold"
+            return stats
 
         # 3. 检查今日简报数量限制
         max_daily = briefing_config.get("max_daily_briefings", 3)
@@ -216,55 +280,84 @@ class JobExecutor:
             logger.info(
                 f"Skipping briefing: daily limit reached ({today_count}/{max_daily})"
             )
-            return 0
+            stats["skipped_reason"] = "daily_limit_reached"
+            return stats
 
         # 4. 获取目标用户
         users = await self._get_target_users(agent_id, target_user_ids)
+        t = mark("load_recipients", t)
 
         if not users:
             logger.warning("No target users found for briefing")
-            return 0
+            stats["skipped_reason"] = "no_recipients"
+            return stats
+        stats["recipients"] = len(users)
 
         # 5. 获取Agent角色用于查找reports目录
         agent_role = await self._get_agent_role(agent_id)
 
-        # 6. 为每个用户生成简报（包含artifact）
-        created_count = 0
-        for user_id in users:
-            try:
-                # 创建artifact存储完整报告
-                artifact_id = await self._create_artifact(
-                    agent_id=agent_id,
-                    user_id=user_id,
-                    agent_role=agent_role,
-                    analysis_result=analysis_result,
-                )
+        # 6. 创建一份共享的artifact存储完整报告（不归属单个用户）
+        artifact_id = await self._create_artifact(
+            agent_id=agent_id,
+            agent_role=agent_role,
+            analysis_result=analysis_result,
+            shared_with=len(users),
+        )
+        t = mark("artifact", t)
+
+        # 7. 生成简报模板（UI Schema / 封面图只生成一次）
+        template = await self.briefing_service.prepare_briefing(
+            agent_id=agent_id,
+            analysis_result=analysis_result,
+            importance_score=importance_score,
+            job_id=job_id,
+            report_artifact_id=artifact_id,
+            ui_schema_mode=briefing_config.get("ui_schema_mode"),
+        )
+        t = mark("prepare", t)
 
-                # 创建briefing并关联artifact
-                await self.briefing_service.create_briefing(
-                    agent_id=agent_id,
-                    user_id=user_id,
-                    analysis_result=analysis_result,
-                    importance_score=importance_score,
-                    job_id=job_id,
-                    report_artifact_id=artifact_id,
-                )
-                created_count += 1
-            except Exception as e:
-                logger.error(f"Failed to create briefing for user {user_id}: {e}")
+        # 8. 分块批量插入简报
+        created = await self.briefing_service.create_briefings_bulk(
+            template=template,
+            user_ids=users,
+            chunk_size=briefing_config.get("fanout_chunk_size", DEFAULT_FANOUT_CHUNK_SIZE),
+        )
+        stats["created"] = len(created)
+        t = mark("insert", t)
+
+        # 9. 并发推送
+        stats["pushed"] = await self.briefing_service.send_briefing_notifications(
+            briefings=created,
+            analysis_result=analysis_result,
+            concurrency=briefing_config.get("push_concurrency", DEFAULT_PUSH_CONCURRENCY),
+        )
+        mark("push", t)
 
-        return created_count
+        logger.info(
+            f"Briefing fan-out for job {job_id}: {stats['created']}/{len(users)} created, "
+            f"{stats['pushed']} pushed, timings={timings}"
+        )
+        return stats
 
     async def _create_artifact(
         self,
         agent_id: str,
-        user_id: str,
         agent_role: str,
         analysis_result: Dict[str, Any],
+        shared_with: int = 1,
+        user_id: Optional[str] = None,
     ) -> Optional[str]:
         """
         创建报告artifact，返回artifact_id
 
+        artifact按内容寻址（见 content_artifact_id）：同一次任务的所有接收者（以及生成相同内容的
+        其他运行）共享一份artifact，shared_with 为本次接收人数（只用于日志）。共享artifact不归属任何用户
+        （user_id 为 NULL），删除某个用户不会影响其他接收者；用户通过各自简报的
+        report_artifact_id 访问（见 BriefingService.get_briefing_report 和 RLS 策略）。
+
+        Args:
+            user_id: 仅在报告只属于单个用户时提供
+
         优先级：
         1. structured_data.full_report（技能返回的完整报告）
         2. Agent工作目录下的reports/目录中的最新md文件
@@ -313,7 +406,7 @@ class JobExecutor:
                     report_title = line.lstrip("#").strip()[:100]
                     break
 
-        artifact_id = str(uuid4())
+        artifact_id, content_hash = content_artifact_id(agent_id, report_content)
         artifact = {
             "id": artifact_id,
             "user_id": user_id,
@@ -321,16 +414,26 @@ class JobExecutor:
             "title": report_title,
             "content": report_content,
             "format": "markdown",
+            # 只保存由内容决定的字段：相同内容的后续运行不会覆盖这一行，
+            # 每次运行的信息（生成时间、接收人）在各自的简报中
             "metadata": {
                 "agent_id": agent_id,
-                "generated_at": datetime.utcnow().isoformat(),
+                "content_sha256": content_hash,
             },
             "created_at": datetime.utcnow().isoformat(),
         }
 
         try:
-            self.supabase.table("artifacts").insert(artifact).execute()
-            logger.info(f"Created artifact {artifact_id} for user {user_id}")
+            # 已存在相同内容的artifact时不重复写入
+            await get_db_executor().execute(
+                self.supabase.table("artifacts").upsert(
+                    artifact, on_conflict="id", ignore_duplicates=True
+                )
+            )
+            logger.info(
+                f"Stored artifact {artifact_id} (sha256={content_hash[:12]}) "
+                f"shared by {shared_with} recipient(s)"
+            )
             return artifact_id
         except Exception as e:
             logger.error(f"Failed to create artifact: {e}")
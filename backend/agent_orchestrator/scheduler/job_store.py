@@ -0,0 +1,365 @@
+"""
+调度持久化存储 - 触发租约与持久化重试
+
+多个 uvicorn worker / 副本各自运行 APScheduler 时，同一个触发时间会在每个实例上
+触发一次。JobStore 为每个 (job_key, fire_time) 提供一次性租约：
+只有抢到租约的实例执行该次触发，其余实例直接跳过。
+
+同时持久化保存重试任务（替代 APScheduler 内存中的 date 任务），
+进程重启后仍会执行；每条重试由轮询的实例按租约领取，超时未完成可被重新领取。
+
+后端：
+- SQLiteJobStore: 单机多进程（本地开发 / 单主机多 worker / 测试）
+- SupabaseJobStore: 多主机部署（表结构见 supabase/migrations/*_add_scheduler_leases.sql）
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from models.db_executor import get_db_executor
+
+logger = logging.getLogger(__name__)
+
+# 存储后端：auto（有 Supabase 时使用 Supabase，否则 SQLite）/ sqlite / supabase
+DEFAULT_JOB_STORE = os.getenv("SCHEDULER_JOB_STORE", "auto")
+DEFAULT_SQLITE_PATH = os.getenv(
+    "SCHEDULER_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "ee-scheduler.db")
+)
+# 重试领取后的租约时长（超过后视为执行实例已失联，可被重新领取）
+DEFAULT_RETRY_LEASE_SECONDS = int(os.getenv("SCHEDULER_RETRY_LEASE_SECONDS", "3600"))
+
+
+def make_owner_id() -> str:
+    """当前实例的唯一标识"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+
+def to_utc_iso(value: datetime, timespec: str = "seconds") -> str:
+    """统一为 UTC ISO 字符串（保证不同实例对同一触发时间得到相同的 key）
+
+    Args:
+        value: 时间（无时区时视为 UTC）
+        timespec: 精度（租约键使用秒；需要排序的时间戳使用 "microseconds"）
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat(timespec=timespec)
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class JobStore:
+    """调度持久化存储接口"""
+
+    async def claim_fire(self, job_key: str, fire_time: datetime, owner: str) -> bool:
+        """抢占一次触发的执行权
+
+        Returns:
+            True 表示当前实例获得执行权
+        """
+        raise NotImplementedError
+
+    async def last_fire(self, job_key: str) -> Optional[datetime]:
+        """任务最近一次被领取的触发时间（用于错过触发的补跑）"""
+        raise NotImplementedError
+
+    async def add_retry(self, job_key: str, run_at: datetime, payload: Dict[str, Any]) -> str:
+        """持久化一条重试任务
+
+        Args:
+            job_key: 任务ID
+            run_at: 执行时间
+            payload: JobExecutor.execute 的参数（需可 JSON 序列化）
+
+        Returns:
+            重试记录ID
+        """
+        raise NotImplementedError
+
+    async def claim_due_retries(
+        self,
+        owner: str,
+        limit: int = 10,
+        lease_seconds: int = DEFAULT_RETRY_LEASE_SECONDS,
+    ) -> List[Dict[str, Any]]:
+        """领取到期的重试任务（包括租约已过期的）
+
+        Returns:
+            [{id, job_key, payload}]
+        """
+        raise NotImplementedError
+
+    async def complete_retry(self, retry_id: str) -> None:
+        """标记重试任务已执行"""
+        raise NotImplementedError
+
+    async def prune(self, older_than: timedelta = timedelta(days=30)) -> None:
+        """清理过期的触发租约和已完成的重试"""
+
+
+class SQLiteJobStore(JobStore):
+    """基于 SQLite 的存储（同一主机上的多个进程共享一个数据库文件）"""
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS scheduler_fire_leases (
+                    job_key TEXT NOT NULL,
+                    fire_time TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    claimed_at TEXT NOT NULL,
+                    PRIMARY KEY (job_key, fire_time)
+                );
+                CREATE TABLE IF NOT EXISTS scheduler_retries (
+                    id TEXT PRIMARY KEY,
+                    job_key TEXT NOT NULL,
+                    run_at TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    owner TEXT,
+                    lease_expires TEXT,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_scheduler_retries_due
+                    ON scheduler_retries (status, run_at);
+                """
+            )
+            self._initialized = True
+        return conn
+
+    def _run(self, func, *args):
+        """在线程池中执行（每次操作独立连接）"""
+        def call():
+            conn = self._connect()
+            try:
+                return func(conn, *args)
+            finally:
+                conn.close()
+        return get_db_executor().run(call)
+
+    async def claim_fire(self, job_key: str, fire_time: datetime, owner: str) -> bool:
+        def claim(conn: sqlite3.Connection) -> bool:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO scheduler_fire_leases "
+                "(job_key, fire_time, owner, claimed_at) VALUES (?, ?, ?, ?)",
+                (job_key, to_utc_iso(fire_time), owner, to_utc_iso(datetime.now(timezone.utc))),
+            )
+            return cursor.rowcount == 1
+        return await self._run(claim)
+
+    async def last_fire(self, job_key: str) -> Optional[datetime]:
+        def query(conn: sqlite3.Connection) -> Optional[str]:
+            row = conn.execute(
+                "SELECT MAX(fire_time) AS fire_time FROM scheduler_fire_leases WHERE job_key = ?",
+                (job_key,),
+            ).fetchone()
+            return row["fire_time"] if row else None
+        return _parse(await self._run(query))
+
+    async def add_retry(self, job_key: str, run_at: datetime, payload: Dict[str, Any]) -> str:
+        retry_id = str(uuid4())
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT INTO scheduler_retries (id, job_key, run_at, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    retry_id, job_key, to_utc_iso(run_at),
+                    json.dumps(payload, ensure_ascii=False, default=str),
+                    to_utc_iso(datetime.now(timezone.utc)),
+                ),
+            )
+        await self._run(insert)
+        return retry_id
+
+    async def claim_due_retries(
+        self,
+        owner: str,
+        limit: int = 10,
+        lease_seconds: int = DEFAULT_RETRY_LEASE_SECONDS,
+    ) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+
+        def claim(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            # BEGIN IMMEDIATE 取得写锁，保证查询和领取之间没有其他实例插入
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, job_key, payload FROM scheduler_retries "
+                    "WHERE run_at <= ? AND (status = 'pending' "
+                    "OR (status = 'claimed' AND lease_expires < ?)) "
+                    "ORDER BY run_at LIMIT ?",
+                    (to_utc_iso(now), to_utc_iso(now), limit),
+                ).fetchall()
+                for row in rows:
+                    conn.execute(
+                        "UPDATE scheduler_retries SET status = 'claimed', owner = ?, "
+                        "lease_expires = ? WHERE id = ?",
+                        (owner, to_utc_iso(now + timedelta(seconds=lease_seconds)), row["id"]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return [
+                {"id": row["id"], "job_key": row["job_key"], "payload": json.loads(row["payload"])}
+                for row in rows
+            ]
+        return await self._run(claim)
+
+    async def complete_retry(self, retry_id: str) -> None:
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE scheduler_retries SET status = 'done', lease_expires = NULL WHERE id = ?",
+                (retry_id,),
+            )
+        await self._run(update)
+
+    async def prune(self, older_than: timedelta = timedelta(days=30)) -> None:
+        cutoff = to_utc_iso(datetime.now(timezone.utc) - older_than)
+
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM scheduler_fire_leases WHERE fire_time < ?", (cutoff,))
+            conn.execute(
+                "DELETE FROM scheduler_retries WHERE status = 'done' AND run_at < ?", (cutoff,)
+            )
+        await self._run(delete)
+
+
+class SupabaseJobStore(JobStore):
+    """基于 Supabase (Postgres) 的存储（多主机部署）"""
+
+    def __init__(self, supabase_client: Any):
+        self.supabase = supabase_client
+
+    async def _execute(self, query: Any) -> Any:
+        return await get_db_executor().execute(query)
+
+    async def claim_fire(self, job_key: str, fire_time: datetime, owner: str) -> bool:
+        # 主键冲突时 ON CONFLICT DO NOTHING，不返回行
+        result = await self._execute(
+            self.supabase.table("scheduler_fire_leases").upsert(
+                {
+                    "job_key": job_key,
+                    "fire_time": to_utc_iso(fire_time),
+                    "owner": owner,
+                },
+                on_conflict="job_key,fire_time",
+                ignore_duplicates=True,
+            )
+        )
+        return bool(result.data)
+
+    async def last_fire(self, job_key: str) -> Optional[datetime]:
+        result = await self._execute(
+            self.supabase.table("scheduler_fire_leases")
+            .select("fire_time")
+            .eq("job_key", job_key)
+            .order("fire_time", desc=True)
+            .limit(1)
+        )
+        return _parse(result.data[0]["fire_time"]) if result.data else None
+
+    async def add_retry(self, job_key: str, run_at: datetime, payload: Dict[str, Any]) -> str:
+        retry_id = str(uuid4())
+        await self._execute(
+            self.supabase.table("scheduler_retries").insert({
+                "id": retry_id,
+                "job_key": job_key,
+                "run_at": to_utc_iso(run_at),
+                "payload": json.loads(json.dumps(payload, default=str)),
+            })
+        )
+        return retry_id
+
+    async def claim_due_retries(
+        self,
+        owner: str,
+        limit: int = 10,
+        lease_seconds: int = DEFAULT_RETRY_LEASE_SECONDS,
+    ) -> List[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        result = await self._execute(
+            self.supabase.table("scheduler_retries")
+            .select("id, job_key, payload, status, lease_expires")
+            .lte("run_at", to_utc_iso(now))
+            .or_(f"status.eq.pending,and(status.eq.claimed,lease_expires.lt.{to_utc_iso(now)})")
+            .order("run_at")
+            .limit(limit)
+        )
+
+        claimed = []
+        for row in result.data or []:
+            # 条件更新（compare-and-set）：只有状态未被其他实例改动时才能领取成功
+            query = (
+                self.supabase.table("scheduler_retries")
+                .update({
+                    "status": "claimed",
+                    "owner": owner,
+                    "lease_expires": to_utc_iso(now + timedelta(seconds=lease_seconds)),
+                })
+                .eq("id", row["id"])
+                .eq("status", row["status"])
+            )
+            if row["status"] == "claimed":
+                query = query.eq("lease_expires", row["lease_expires"])
+            updated = await self._execute(query)
+            if updated.data:
+                claimed.append({"id": row["id"], "job_key": row["job_key"], "payload": row["payload"]})
+        return claimed
+
+    async def complete_retry(self, retry_id: str) -> None:
+        await self._execute(
+            self.supabase.table("scheduler_retries")
+            .update({"status": "done", "lease_expires": None})
+            .eq("id", retry_id)
+        )
+
+    async def prune(self, older_than: timedelta = timedelta(days=30)) -> None:
+        cutoff = to_utc_iso(datetime.now(timezone.utc) - older_than)
+        await self._execute(
+            self.supabase.table("scheduler_fire_leases").delete().lt("fire_time", cutoff)
+        )
+        await self._execute(
+            self.supabase.table("scheduler_retries")
+            .delete()
+            .eq("status", "done")
+            .lt("run_at", cutoff)
+        )
+
+
+def create_job_store(supabase_client: Any = None, backend: str = DEFAULT_JOB_STORE) -> JobStore:
+    """按配置创建存储后端
+
+    Args:
+        supabase_client: Supabase客户端（supabase / auto 后端使用）
+        backend: auto / sqlite / supabase
+    """
+    if backend == "supabase" or (backend == "auto" and supabase_client):
+        if not supabase_client:
+            raise ValueError("SCHEDULER_JOB_STORE=supabase requires a Supabase client")
+        logger.info("Scheduler job store: supabase")
+        return SupabaseJobStore(supabase_client)
+    if backend in ("sqlite", "auto"):
+        logger.info(f"Scheduler job store: sqlite ({DEFAULT_SQLITE_PATH})")
+        return SQLiteJobStore(DEFAULT_SQLITE_PATH)
+    raise ValueError(f"Invalid scheduler job store: {backend}. Must be auto/sqlite/supabase")
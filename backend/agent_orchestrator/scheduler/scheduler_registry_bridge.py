@@ -10,6 +10,8 @@ import hashlib
 
 from apscheduler.triggers.cron import CronTrigger
 
+from services.response_cache import get_response_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -100,14 +102,12 @@ class SchedulerRegistryBridge:
             "source": "agent_yaml"  # 标记来源
         }
 
-        # 添加到调度器
-        self.scheduler_service.scheduler.add_job(
-            func=self.scheduler_service._job_executor.execute,
+        # 添加到调度器（多实例下按触发租约只执行一次）
+        self.scheduler_service.register_job(
+            job_key=job_id,
             trigger=trigger,
-            id=job_id,
             name=f"{agent.name} - {schedule_config.task}",
             kwargs=job_kwargs,
-            replace_existing=True
         )
 
         # 记录已注册的任务
@@ -175,8 +175,9 @@ class SchedulerRegistryBridge:
 
         self.registered_jobs.clear()
 
-        # 重新加载 AgentRegistry
+        # 重新加载 AgentRegistry（Agent 列表响应缓存随之失效）
         self.agent_registry.reload()
+        get_response_cache().invalidate("agents")
 
         # 重新加载任务
         await self.load_jobs_from_yaml()
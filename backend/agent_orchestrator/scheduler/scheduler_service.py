@@ -1,47 +1,110 @@
 """
 调度器服务 - APScheduler初始化和任务管理
+
+多实例部署：
+- 每个实例都运行 APScheduler 计算触发时间，但每次触发先向 JobStore 抢占
+  (job_key, fire_time) 租约，只有抢到的实例执行
+- 重试任务持久化到 JobStore，由各实例轮询领取，重启后不丢失
+- 启动时按补跑策略（SCHEDULER_CATCHUP）执行停机期间错过的触发
+- 配置了任务队列时（worker 模式），抢到的触发和重试写入队列，由 WorkerPool 按角色并发执行
 """
 
+import asyncio
 import logging
-from typing import Any, Dict, Optional, TYPE_CHECKING
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
+from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from .job_store import JobStore, create_job_store, make_owner_id
+
 if TYPE_CHECKING:
     from .job_executor import JobExecutor
     from agent_registry import AgentRegistry
 
 logger = logging.getLogger(__name__)
 
+# 触发延迟超过该时间则视为错过（交给补跑策略处理）
+MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "300"))
+# 停机期间错过的触发：skip（跳过）/ once（只补跑最近一次）/ all（全部补跑，有上限）
+CATCHUP_POLICY = os.getenv("SCHEDULER_CATCHUP", "once")
+CATCHUP_MAX_AGE_HOURS = int(os.getenv("SCHEDULER_CATCHUP_MAX_AGE_HOURS", "24"))
+CATCHUP_MAX_RUNS = 10
+# 持久化重试的轮询间隔
+RETRY_POLL_SECONDS = int(os.getenv("SCHEDULER_RETRY_POLL_SECONDS", "30"))
+
+# 间隔任务的起点对齐到固定时刻，保证所有实例计算出相同的触发时间
+INTERVAL_ANCHOR = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
 
 class SchedulerService:
     """定时任务调度服务"""
 
-    def __init__(self, supabase_client: Any = None, agent_registry: Optional["AgentRegistry"] = None):
+    def __init__(
+        self,
+        supabase_client: Any = None,
+        agent_registry: Optional["AgentRegistry"] = None,
+        job_store: Optional[JobStore] = None,
+        catchup_policy: str = CATCHUP_POLICY,
+    ):
+        if catchup_policy not in ("skip", "once", "all"):
+            raise ValueError(f"Invalid catchup policy: {catchup_policy}. Must be skip/once/all")
+
         self.supabase = supabase_client
         self.agent_registry = agent_registry
         self.scheduler: Optional[AsyncIOScheduler] = None
         self._job_executor: Optional["JobExecutor"] = None
         self._yaml_bridge = None  # SchedulerRegistryBridge 实例
 
+        self.job_store = job_store
+        self.catchup_policy = catchup_policy
+        self.owner_id = make_owner_id()
+        self.task_queue = None  # scheduler.task_queue.TaskQueue（worker 模式下注入）
+        self._retry_task: Optional[asyncio.Task] = None
+        self._runs: set = set()  # 正在执行的补跑 / 重试任务
+        # job_key -> APScheduler 提交本次执行时的计划触发时间（租约键）
+        self._scheduled_fire_times: Dict[str, datetime] = {}
+
+        self._metrics: Dict[str, int] = {
+            "fires_claimed": 0,
+            "fires_skipped": 0,     # 其他实例已执行
+            "catchup_runs": 0,
+            "retries_run": 0,
+        }
+
     def initialize(self, job_executor: "JobExecutor"):
         """初始化调度器"""
         self._job_executor = job_executor
 
-        # 配置调度器
+        if self.job_store is None:
+            self.job_store = create_job_store(self.supabase)
+
+        # 配置调度器（触发器在每个实例的内存中计算，执行权由 JobStore 租约决定）
         jobstores = {"default": MemoryJobStore()}
 
         self.scheduler = AsyncIOScheduler(
-            jobstores=jobstores, timezone="Asia/Shanghai"
+            jobstores=jobstores,
+            timezone="Asia/Shanghai",
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": MISFIRE_GRACE_SECONDS,
+            },
         )
 
-        # 将 scheduler 实例传给 job_executor，用于安排重试任务
+        # 记录每次提交执行的计划触发时间，作为该次执行的租约键
+        self.scheduler.add_listener(self._on_job_submitted, EVENT_JOB_SUBMITTED)
+
+        # 将 scheduler / job_store 传给 job_executor，用于安排重试任务
         self._job_executor.scheduler = self.scheduler
+        self._job_executor.job_store = self.job_store
 
-        logger.info("Scheduler initialized")
+        logger.info(f"Scheduler initialized (owner={self.owner_id})")
 
     async def start(self):
         """启动调度器并加载任务"""
@@ -56,8 +119,173 @@ class SchedulerService:
 
         # 3. 启动调度器
         self.scheduler.start()
+
+        # 4. 补跑停机期间错过的触发，并开始轮询持久化重试
+        await self._catch_up_missed_runs()
+        self._retry_task = asyncio.create_task(self._retry_loop())
         logger.info("Scheduler started")
 
+    # ==================== 任务注册与租约 ====================
+
+    def register_job(
+        self,
+        job_key: str,
+        trigger: Any,
+        name: str,
+        kwargs: Dict[str, Any],
+    ) -> None:
+        """注册定时任务（每次触发先抢占租约再执行）
+
+        Args:
+            job_key: 任务ID（所有实例必须一致）
+            trigger: APScheduler 触发器
+            name: 任务名称
+            kwargs: JobExecutor.execute 的参数
+        """
+        self.scheduler.add_job(
+            func=self._run_scheduled,
+            trigger=trigger,
+            id=job_key,
+            name=name,
+            kwargs={"job_key": job_key, "job_kwargs": kwargs},
+            replace_existing=True,
+        )
+
+    def _on_job_submitted(self, event: JobSubmissionEvent) -> None:
+        """记录提交执行时的计划触发时间
+
+        监听器在 APScheduler 提交任务的同一轮事件循环中同步调用，早于任务协程开始执行；
+        coalesce 时 scheduled_run_times 只有实际执行的那一次。
+        """
+        if event.scheduled_run_times:
+            self._scheduled_fire_times[event.job_id] = event.scheduled_run_times[-1]
+
+    async def _run_scheduled(self, job_key: str, job_kwargs: Dict[str, Any]) -> None:
+        fire_time = self._scheduled_fire_times.pop(job_key, None)
+        if fire_time is None:
+            job = self.scheduler.get_job(job_key)
+            fire_time = self._latest_fire_time(job.trigger) if job else None
+        if fire_time is None:
+            fire_time = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        await self._run_fire(job_key, fire_time, job_kwargs)
+
+    @staticmethod
+    def _latest_fire_time(trigger: Any) -> Optional[datetime]:
+        """误差容忍窗口内最近一次（不晚于当前时间）的计划触发时间
+
+        没有提交事件时（如直接调用）的回退：取窗口内最后一次而不是最早一次，
+        触发间隔短于窗口时也不会落后实际触发若干个周期。
+        """
+        now = datetime.now(timezone.utc)
+        fire_time = trigger.get_next_fire_time(None, now - timedelta(seconds=MISFIRE_GRACE_SECONDS))
+        if fire_time is None or fire_time > now:
+            return None
+        while True:
+            next_time = trigger.get_next_fire_time(fire_time, fire_time + timedelta(microseconds=1))
+            if next_time is None or next_time > now or next_time <= fire_time:
+                return fire_time
+            fire_time = next_time
+
+    async def _run_fire(
+        self, job_key: str, fire_time: datetime, job_kwargs: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """抢占租约成功后执行一次触发"""
+        try:
+            claimed = await self.job_store.claim_fire(job_key, fire_time, self.owner_id)
+        except Exception as e:
+            logger.error(f"Failed to claim fire lease for {job_key} at {fire_time}: {e}")
+            return None
+
+        if not claimed:
+            self._metrics["fires_skipped"] += 1
+            logger.info(f"Job {job_key} at {fire_time.isoformat()} already claimed by another instance")
+            return None
+
+        self._metrics["fires_claimed"] += 1
+        return await self._dispatch(job_kwargs)
+
+    async def _dispatch(self, job_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """执行任务：有任务队列时入队（返回 None），否则在当前进程执行"""
+        if self.task_queue is None:
+            return await self._job_executor.execute(**job_kwargs)
+        await self.task_queue.enqueue("scheduled_job", self._job_role(job_kwargs), job_kwargs)
+        return None
+
+    def _job_role(self, job_kwargs: Dict[str, Any]) -> str:
+        """任务对应的 Agent 角色（用于按角色限制并发）"""
+        agent_id = str(job_kwargs.get("agent_id", ""))
+        if self.agent_registry:
+            return self.agent_registry.get_agent_id(agent_id) or agent_id
+        return agent_id
+
+    async def _catch_up_missed_runs(self) -> None:
+        """按补跑策略执行停机期间错过的触发（租约保证多实例只执行一次）"""
+        if self.catchup_policy == "skip":
+            return
+
+        now = datetime.now(timezone.utc)
+        horizon = now - timedelta(hours=CATCHUP_MAX_AGE_HOURS)
+        # 误差容忍窗口内的触发由 APScheduler 自己执行
+        cutoff = now - timedelta(seconds=MISFIRE_GRACE_SECONDS)
+
+        for job in self.scheduler.get_jobs():
+            if job.func != self._run_scheduled:
+                continue
+            job_key = job.kwargs["job_key"]
+            try:
+                last_fire = await self.job_store.last_fire(job_key)
+            except Exception as e:
+                logger.warning(f"Failed to load last fire time for {job_key}: {e}")
+                continue
+            if last_fire is None:
+                continue  # 从未执行过的新任务不补跑
+
+            missed: List[datetime] = []
+            previous = max(last_fire, horizon)
+            fire_time = job.trigger.get_next_fire_time(None, previous + timedelta(seconds=1))
+            while fire_time is not None and fire_time <= cutoff and len(missed) < CATCHUP_MAX_RUNS:
+                missed.append(fire_time)
+                fire_time = job.trigger.get_next_fire_time(fire_time, fire_time + timedelta(seconds=1))
+
+            if not missed:
+                continue
+            if self.catchup_policy == "once":
+                missed = missed[-1:]
+
+            logger.info(f"Catching up {len(missed)} missed run(s) of {job_key}")
+            for missed_time in missed:
+                self._metrics["catchup_runs"] += 1
+                self._spawn(self._run_fire(job_key, missed_time, job.kwargs["job_kwargs"]))
+
+    # ==================== 持久化重试 ====================
+
+    async def _retry_loop(self) -> None:
+        while True:
+            try:
+                for retry in await self.job_store.claim_due_retries(self.owner_id):
+                    self._spawn(self._run_retry(retry))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Retry poll failed: {e}")
+            try:
+                await asyncio.sleep(RETRY_POLL_SECONDS)
+            except asyncio.CancelledError:
+                break
+
+    async def _run_retry(self, retry: Dict[str, Any]) -> None:
+        self._metrics["retries_run"] += 1
+        try:
+            await self._dispatch(retry["payload"])
+        finally:
+            # execute 自身捕获错误并按需安排下一次重试，这里只标记本条已执行
+            await self.job_store.complete_retry(retry["id"])
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+
     async def _load_jobs_from_yaml(self):
         """从 agent.yaml 加载定时任务配置"""
         if not self.agent_registry:
@@ -79,7 +307,17 @@ class SchedulerService:
             logger.error(f"Failed to load scheduled jobs from YAML: {e}")
 
     async def shutdown(self):
-        """关闭调度器"""
+        """关闭调度器
+
+        正在执行的重试不等待：其租约过期后会被其他实例（或重启后的本实例）重新领取。
+        """
+        if self._retry_task:
+            self._retry_task.cancel()
+            try:
+                await self._retry_task
+            except asyncio.CancelledError:
+                pass
+            self._retry_task = None
         if self.scheduler:
             self.scheduler.shutdown(wait=False)
             logger.info("Scheduler shutdown")
@@ -116,13 +354,14 @@ class SchedulerService:
                 timezone=job_config.get("timezone", "Asia/Shanghai"),
             )
         else:
-            trigger = IntervalTrigger(seconds=job_config["interval_seconds"])
+            trigger = IntervalTrigger(
+                seconds=job_config["interval_seconds"], start_date=INTERVAL_ANCHOR
+            )
 
         # 添加任务
-        self.scheduler.add_job(
-            func=self._job_executor.execute,
+        self.register_job(
+            job_key=job_id,
             trigger=trigger,
-            id=job_id,
             name=job_config["job_name"],
             kwargs={
                 "job_id": job_id,
@@ -130,8 +369,8 @@ class SchedulerService:
                 "task_prompt": job_config["task_prompt"],
                 "briefing_config": job_config.get("briefing_config", {}),
                 "target_user_ids": job_config.get("target_user_ids"),
+                "source": "db",
             },
-            replace_existing=True,
         )
 
         logger.info(f"Added job: {job_config['job_name']} ({job_id})")
@@ -155,14 +394,22 @@ class SchedulerService:
 
         job_config = result.data
 
-        # 立即执行
-        return await self._job_executor.execute(
-            job_id=job_id,
-            agent_id=str(job_config["agent_id"]),
-            task_prompt=job_config["task_prompt"],
-            briefing_config=job_config.get("briefing_config", {}),
-            target_user_ids=job_config.get("target_user_ids"),
-        )
+        job_kwargs = {
+            "job_id": job_id,
+            "agent_id": str(job_config["agent_id"]),
+            "task_prompt": job_config["task_prompt"],
+            "briefing_config": job_config.get("briefing_config", {}),
+            "target_user_ids": job_config.get("target_user_ids"),
+            "source": "manual",
+        }
+
+        # 立即执行（有任务队列时交给 worker 并等待结果）
+        if self.task_queue is not None:
+            queued_id = await self.task_queue.enqueue(
+                "scheduled_job", self._job_role(job_kwargs), job_kwargs
+            )
+            return await self.task_queue.wait_result(queued_id)
+        return await self._job_executor.execute(**job_kwargs)
 
     def get_jobs(self):
         """获取所有调度中的任务"""
@@ -179,3 +426,12 @@ class SchedulerService:
             }
             for job in self.scheduler.get_jobs()
         ]
+
+    def stats(self) -> Dict[str, Any]:
+        """租约 / 补跑 / 重试指标"""
+        return {
+            **self._metrics,
+            "owner": self.owner_id,
+            "store": type(self.job_store).__name__ if self.job_store else None,
+            "catchup_policy": self.catchup_policy,
+        }
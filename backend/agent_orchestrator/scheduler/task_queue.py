@@ -0,0 +1,284 @@
+"""
+任务队列 - 本地持久化任务队列（SQLite）
+
+api / worker 分进程部署时，API 进程把定时任务和即时任务写入队列，
+worker 进程按 Agent 角色的并发上限领取执行；需要结果的调用方（对话中的即时任务）
+轮询等待结果。
+
+- 领取带租约：worker 崩溃后租约过期，任务可被重新领取（超过最大尝试次数则标记失败）
+- 同一数据库文件可被同一主机上的多个 API / worker 进程共享
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from models.db_executor import get_db_executor
+
+from .job_store import DEFAULT_SQLITE_PATH, to_utc_iso
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = os.getenv("TASK_QUEUE_PATH", DEFAULT_SQLITE_PATH)
+# 领取后的租约时长（需大于单个任务的最长执行时间）
+DEFAULT_TASK_LEASE_SECONDS = int(os.getenv("TASK_QUEUE_LEASE_SECONDS", "3600"))
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _now_iso(value: Optional[datetime] = None) -> str:
+    """队列时间戳（微秒精度，同一秒内入队的任务也能按先后顺序领取）"""
+    return to_utc_iso(value or datetime.now(timezone.utc), timespec="microseconds")
+
+
+class TaskQueueError(Exception):
+    """队列任务执行失败或等待超时"""
+
+
+class TaskQueue:
+    """基于 SQLite 的持久化任务队列"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_QUEUE_PATH,
+        lease_seconds: int = DEFAULT_TASK_LEASE_SECONDS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        """
+        Args:
+            path: SQLite 数据库文件
+            lease_seconds: 领取租约时长（秒）
+            max_attempts: 单个任务的最大领取次数
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS task_queue (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    agent_role TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    lease_expires TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_task_queue_status
+                    ON task_queue (status, created_at);
+                """
+            )
+            self._initialized = True
+        return conn
+
+    def _run(self, func, *args):
+        """在线程池中执行（每次操作独立连接）"""
+        def call():
+            conn = self._connect()
+            try:
+                return func(conn, *args)
+            finally:
+                conn.close()
+        return get_db_executor().run(call)
+
+    async def enqueue(self, kind: str, agent_role: str, payload: Dict[str, Any]) -> str:
+        """写入任务
+
+        Args:
+            kind: 任务类型（由 WorkerPool 的处理器注册表决定如何执行）
+            agent_role: Agent 角色（用于按角色限制并发）
+            payload: 处理器参数（需可 JSON 序列化）
+
+        Returns:
+            任务ID
+        """
+        task_id = str(uuid4())
+        now = _now_iso()
+
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "INSERT INTO task_queue (id, kind, agent_role, payload, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (task_id, kind, agent_role, json.dumps(payload, ensure_ascii=False, default=str), now, now),
+            )
+        await self._run(insert)
+        logger.info(f"Enqueued {kind} task {task_id} for {agent_role}")
+        return task_id
+
+    async def claim(
+        self,
+        owner: str,
+        free_slots: Dict[str, int],
+        default_slots: int,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """按角色剩余并发领取任务（先进先出，跳过已满的角色）
+
+        已满的角色在 SQL 中排除，某个角色积压大量任务时不会挤占其他角色；
+        领取过程中角色变满时重新查询（排除该角色）。
+
+        Args:
+            owner: worker 标识
+            free_slots: 每个角色当前剩余的并发数（未列出的角色使用 default_slots）
+            default_slots: 未列出角色的剩余并发数
+            limit: 最多领取的任务数
+
+        Returns:
+            [{id, kind, agent_role, payload, attempts}]
+        """
+        if limit <= 0:
+            return []
+        now = datetime.now(timezone.utc)
+        now_iso = _now_iso(now)
+        lease_expires = _now_iso(now + timedelta(seconds=self.lease_seconds))
+
+        def claim(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 超过最大尝试次数且租约已过期的任务直接标记失败
+                conn.execute(
+                    "UPDATE task_queue SET status = 'failed', error = 'lease expired too many times', "
+                    "updated_at = ? WHERE status = 'claimed' AND lease_expires < ? AND attempts >= ?",
+                    (now_iso, now_iso, self.max_attempts),
+                )
+
+                slots = dict(free_slots)
+                claimed = []
+                while len(claimed) < limit:
+                    # 已满的角色不参与查询；默认并发为 0 时只查询有剩余并发的角色
+                    if default_slots > 0:
+                        roles = [role for role, n in slots.items() if n <= 0]
+                        role_filter = "agent_role NOT IN ({})" if roles else ""
+                    else:
+                        roles = [role for role, n in slots.items() if n > 0]
+                        if not roles:
+                            break
+                        role_filter = "agent_role IN ({})"
+                    where = "(status = 'pending' OR (status = 'claimed' AND lease_expires < ?))"
+                    if role_filter:
+                        where += " AND " + role_filter.format(", ".join("?" * len(roles)))
+                    rows = conn.execute(
+                        "SELECT id, kind, agent_role, payload, attempts FROM task_queue "
+                        f"WHERE {where} ORDER BY created_at, rowid LIMIT ?",
+                        (now_iso, *roles, limit - len(claimed)),
+                    ).fetchall()
+                    if not rows:
+                        break
+
+                    for row in rows:
+                        role = row["agent_role"]
+                        available = slots.get(role, default_slots)
+                        if available <= 0:
+                            continue  # 本页中该角色已满，下一轮查询会排除它
+                        slots[role] = available - 1
+                        conn.execute(
+                            "UPDATE task_queue SET status = 'claimed', owner = ?, lease_expires = ?, "
+                            "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                            (owner, lease_expires, now_iso, row["id"]),
+                        )
+                        claimed.append({
+                            "id": row["id"],
+                            "kind": row["kind"],
+                            "agent_role": role,
+                            "payload": json.loads(row["payload"]),
+                            "attempts": row["attempts"] + 1,
+                        })
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return claimed
+        return await self._run(claim)
+
+    async def complete(self, task_id: str, result: Any) -> None:
+        """标记任务完成并保存结果"""
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE task_queue SET status = 'done', result = ?, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), _now_iso(), task_id),
+            )
+        await self._run(update)
+
+    async def fail(self, task_id: str, error: str) -> None:
+        """标记任务失败"""
+        def update(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "UPDATE task_queue SET status = 'failed', error = ?, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (error, _now_iso(), task_id),
+            )
+        await self._run(update)
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态"""
+        def query(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+            row = conn.execute(
+                "SELECT id, kind, agent_role, status, result, error, attempts FROM task_queue WHERE id = ?",
+                (task_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            task = dict(row)
+            task["result"] = json.loads(task["result"]) if task["result"] else None
+            return task
+        return await self._run(query)
+
+    async def wait_result(
+        self,
+        task_id: str,
+        timeout: float = DEFAULT_TASK_LEASE_SECONDS,
+        poll_interval: float = 0.5,
+    ) -> Any:
+        """等待任务完成并返回结果
+
+        Raises:
+            TaskQueueError: 任务失败或等待超时
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            task = await self.get(task_id)
+            if task and task["status"] == "done":
+                return task["result"]
+            if task and task["status"] == "failed":
+                raise TaskQueueError(f"Task {task_id} failed: {task['error']}")
+            if time.monotonic() >= deadline:
+                raise TaskQueueError(f"Timed out waiting for task {task_id}")
+            await asyncio.sleep(poll_interval)
+
+    async def stats(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        def query(conn: sqlite3.Connection) -> Dict[str, int]:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) AS n FROM task_queue GROUP BY status"
+            ).fetchall()
+            return {row["status"]: row["n"] for row in rows}
+        return await self._run(query)
+
+    async def prune(self, older_than: timedelta = timedelta(days=7)) -> None:
+        """清理已结束的任务"""
+        cutoff = _now_iso(datetime.now(timezone.utc) - older_than)
+
+        def delete(conn: sqlite3.Connection) -> None:
+            conn.execute(
+                "DELETE FROM task_queue WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (cutoff,),
+            )
+        await self._run(delete)
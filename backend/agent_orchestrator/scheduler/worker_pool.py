@@ -0,0 +1,175 @@
+"""
+Worker Pool - 消费任务队列
+
+worker 进程从 TaskQueue 领取任务，按 Agent 角色限制并发执行：
+- 处理器按任务类型注册（kind -> async handler(**payload)）
+- WORKER_CONCURRENCY 为每个角色的默认并发，WORKER_ROLE_CONCURRENCY 按角色覆盖，
+  例如 "dev_efficiency_analyst=1,ai_news_crawler=2"
+- WORKER_MAX_CONCURRENCY 为整个 worker 的并发上限
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .job_store import make_owner_id
+from .task_queue import TaskQueue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROLE_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("WORKER_MAX_CONCURRENCY", "8"))
+DEFAULT_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
+
+
+def parse_role_concurrency(value: Optional[str]) -> Dict[str, int]:
+    """解析 "role=n,role2=m" 形式的按角色并发配置"""
+    limits: Dict[str, int] = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        role, _, limit = item.partition("=")
+        try:
+            limits[role.strip()] = int(limit)
+        except ValueError:
+            logger.warning(f"Invalid worker concurrency entry: {item!r}")
+    return limits
+
+
+class WorkerPool:
+    """按角色限制并发的任务队列消费者"""
+
+    def __init__(
+        self,
+        task_queue: TaskQueue,
+        handlers: Optional[Dict[str, Callable[..., Awaitable[Any]]]] = None,
+        role_concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = DEFAULT_ROLE_CONCURRENCY,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """
+        Args:
+            task_queue: 任务队列
+            handlers: 任务类型 -> 处理器
+            role_concurrency: 按角色的并发上限（默认读取 WORKER_ROLE_CONCURRENCY）
+            default_concurrency: 未配置角色的并发上限
+            max_concurrency: 整个 worker 的并发上限
+            poll_interval: 队列为空时的轮询间隔（秒）
+        """
+        self.task_queue = task_queue
+        self.handlers: Dict[str, Callable[..., Awaitable[Any]]] = dict(handlers or {})
+        self.role_concurrency = (
+            role_concurrency
+            if role_concurrency is not None
+            else parse_role_concurrency(os.getenv("WORKER_ROLE_CONCURRENCY"))
+        )
+        self.default_concurrency = default_concurrency
+        self.max_concurrency = max_concurrency
+        self.poll_interval = poll_interval
+        self.owner_id = make_owner_id()
+
+        self._running: Dict[str, int] = {}  # agent_role -> 正在执行的任务数
+        self._tasks: set = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._metrics: Dict[str, int] = {"completed": 0, "failed": 0}
+
+    def register(self, kind: str, handler: Callable[..., Awaitable[Any]]) -> None:
+        """注册任务处理器"""
+        self.handlers[kind] = handler
+
+    def _free_slots(self) -> Dict[str, int]:
+        slots = {
+            role: limit - self._running.get(role, 0)
+            for role, limit in self.role_concurrency.items()
+        }
+        for role, running in self._running.items():
+            if role not in slots:
+                slots[role] = self.default_concurrency - running
+        return slots
+
+    async def start(self) -> None:
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run())
+            logger.info(
+                f"Worker pool started (owner={self.owner_id}, max={self.max_concurrency}, "
+                f"default_per_role={self.default_concurrency}, roles={self.role_concurrency})"
+            )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # 先清除再领取：领取期间完成的任务会重新置位，不会丢失唤醒
+                self._wakeup.clear()
+                capacity = self.max_concurrency - len(self._tasks)
+                claimed = await self.task_queue.claim(
+                    owner=self.owner_id,
+                    free_slots=self._free_slots(),
+                    default_slots=self.default_concurrency,
+                    limit=capacity,
+                )
+                for task in claimed:
+                    self._running[task["agent_role"]] = self._running.get(task["agent_role"], 0) + 1
+                    job = asyncio.create_task(self._execute(task))
+                    self._tasks.add(job)
+                    job.add_done_callback(self._tasks.discard)
+                # 队列已空或并发已满：等待任务完成或下一次轮询
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Worker pool poll failed: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _execute(self, task: Dict[str, Any]) -> None:
+        role = task["agent_role"]
+        try:
+            handler = self.handlers.get(task["kind"])
+            if handler is None:
+                raise ValueError(f"No handler registered for task kind: {task['kind']}")
+            result = await handler(**task["payload"])
+            await self.task_queue.complete(task["id"], result)
+            self._metrics["completed"] += 1
+        except asyncio.CancelledError:
+            # 关闭时被取消：保留 claimed 状态，租约过期后重新领取
+            raise
+        except Exception as e:
+            logger.error(f"Task {task['id']} ({task['kind']}) failed: {e}", exc_info=True)
+            self._metrics["failed"] += 1
+            try:
+                await self.task_queue.fail(task["id"], str(e))
+            except Exception as store_error:
+                logger.error(f"Failed to mark task {task['id']} as failed: {store_error}")
+        finally:
+            self._running[role] -= 1
+            self._wakeup.set()
+
+    async def shutdown(self, timeout: float = 30) -> None:
+        """停止领取新任务，等待执行中的任务完成（超时后取消）"""
+        if self._loop_task:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+
+        if self._tasks:
+            done, not_done = await asyncio.wait(list(self._tasks), timeout=timeout)
+            for task in not_done:
+                task.cancel()
+            if not_done:
+                logger.warning(f"Cancelled {len(not_done)} running task(s) on shutdown")
+        logger.info("Worker pool shutdown complete")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "owner": self.owner_id,
+            "running": {role: n for role, n in self._running.items() if n},
+        }
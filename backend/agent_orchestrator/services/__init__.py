@@ -5,20 +5,40 @@
 from .briefing_service import BriefingService
 from .importance_evaluator import ImportanceEvaluator
 from .conversation_service import ConversationService
+from .context_cache import ContextCache
+from .client_registry import ClientRegistry, get_client_registry
+from .response_cache import ResponseCache, get_response_cache
+from .image_pipeline import ImagePipeline, get_image_pipeline
 from .push_notification_service import PushNotificationService
 from .ui_schema_generator import UISchemaGenerator
+from .stream_buffer import StreamBuffer, StreamRegistry, get_stream_registry
+from .outbound_queue import OutboundQueue
 from .websocket_manager import ConnectionManager, get_connection_manager
 from .websocket_writer import WebSocketWriter, WSMessage, MessageType
+from .ws_protocol import FrameCodec, negotiate_codec
 
 __all__ = [
     "BriefingService",
     "ImportanceEvaluator",
     "ConversationService",
+    "ContextCache",
+    "ClientRegistry",
+    "get_client_registry",
+    "ResponseCache",
+    "get_response_cache",
+    "ImagePipeline",
+    "get_image_pipeline",
     "PushNotificationService",
     "UISchemaGenerator",
+    "StreamBuffer",
+    "StreamRegistry",
+    "get_stream_registry",
+    "OutboundQueue",
     "ConnectionManager",
     "get_connection_manager",
     "WebSocketWriter",
     "WSMessage",
     "MessageType",
+    "FrameCodec",
+    "negotiate_codec",
 ]
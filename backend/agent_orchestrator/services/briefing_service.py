@@ -4,20 +4,38 @@
 优化说明:
 - 优先使用 skills 返回的结构化数据(metrics, findings, key_data, full_report)
 - 支持确定性UI Schema生成（基于结构化数据，无需LLM调用）
-- 支持AI生成封面图片
+- 支持AI生成封面图片（按内容哈希缓存，简报入库后在后台补写）
+- LLM 生成的 UI Schema 可延迟到后台补写（ui_schema_mode="deferred"），
+  简报先以 "schema pending" 状态入库，不阻塞创建和推送
+- 进程重启时未完成的补写在启动后重新调度（resume_pending_fills）
 """
 
+import asyncio
 import json
 import logging
+import os
 import re
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
+from models.db_executor import get_db_executor
+
 from .importance_evaluator import ImportanceEvaluator
 
 logger = logging.getLogger(__name__)
 
+# UI Schema 生成方式：inline（创建前生成）/ deferred（先入库，后台补写）
+UI_SCHEMA_MODES = ("inline", "deferred")
+DEFAULT_UI_SCHEMA_MODE = os.getenv("UI_SCHEMA_MODE", "inline")
+# 后台补写（UI Schema / 封面图）的最大并发数
+DEFERRED_FILL_CONCURRENCY = 2
+# 后台补写时每次 update 的最大行数
+DEFERRED_FILL_CHUNK_SIZE = 500
+# 启动时补写遗留 pending 简报的回溯范围（小时）和最多行数
+DEFERRED_FILL_SWEEP_HOURS = int(os.getenv("DEFERRED_FILL_SWEEP_HOURS", "72"))
+DEFERRED_FILL_SWEEP_LIMIT = 1000
+
 
 class BriefingService:
     """简报生成和管理服务"""
@@ -30,13 +48,22 @@ class BriefingService:
         push_notification_service: Any = None,
         ui_schema_generator: Any = None,
         cover_image_service: Any = None,
+        ui_schema_mode: str = DEFAULT_UI_SCHEMA_MODE,
     ):
+        if ui_schema_mode not in UI_SCHEMA_MODES:
+            raise ValueError(f"Invalid ui_schema_mode: {ui_schema_mode}. Must be one of {UI_SCHEMA_MODES}")
+
         self.supabase = supabase_client
         self.evaluator = importance_evaluator or ImportanceEvaluator()
         self.conversation_service = conversation_service
         self.push_notification_service = push_notification_service
         self.ui_schema_generator = ui_schema_generator
         self.cover_image_service = cover_image_service
+        self.ui_schema_mode = ui_schema_mode
+
+        # 后台补写 UI Schema / 封面图的任务
+        self._fill_tasks: set = set()
+        self._fill_semaphore: Optional[asyncio.Semaphore] = None
 
     async def evaluate_importance(self, analysis_result: Dict[str, Any]) -> float:
         """评估分析结果的重要性分数"""
@@ -79,8 +106,179 @@ class BriefingService:
         # 构建简报记录
         briefing = {
             "id": str(uuid4()),
-            "agent_id": agent_id,
             "user_id": user_id,
+            **self._build_briefing_template(
+                agent_id=agent_id,
+                briefing_data=briefing_data,
+                analysis_result=analysis_result,
+                importance_score=importance_score,
+                job_id=job_id,
+                report_artifact_id=report_artifact_id,
+            ),
+        }
+
+        # Generate UI Schema - 优先使用确定性生成（基于结构化数据）
+        await self._attach_ui_schema(briefing, briefing_data, analysis_result, agent_id)
+
+        # 封面图在入库后由后台生成
+        self._mark_cover_pending(briefing)
+
+        if not self.supabase:
+            logger.warning("Supabase not configured, briefing not saved")
+            return briefing
+
+        try:
+            result = self.supabase.table("briefings").insert(briefing).execute()
+            created_briefing = result.data[0] if result.data else briefing
+            logger.info(f"Created briefing {briefing['id']} for user {user_id}")
+
+            if self._has_pending_fill(briefing):
+                self._schedule_deferred_fill(briefing, [briefing["id"]])
+
+            # Send push notification if push service is configured
+            if self._should_notify(briefing_data["priority"], importance_score):
+                await self._send_notification(created_briefing, analysis_result)
+
+            return created_briefing
+        except Exception as e:
+            logger.error(f"Failed to create briefing: {e}")
+            raise
+
+    # ============================================
+    # 批量扇出（一份内容 -> 多个订阅用户）
+    # ============================================
+
+    async def prepare_briefing(
+        self,
+        agent_id: str,
+        analysis_result: Dict[str, Any],
+        importance_score: float,
+        job_id: Optional[str] = None,
+        report_artifact_id: Optional[str] = None,
+        ui_schema_mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """生成简报模板（不含 id / user_id）
+
+        UI Schema 和封面图对所有接收者相同，只生成一次，
+        由 `create_briefings_bulk` 复制到每个用户的简报行中。
+        封面图（以及 deferred 模式下的 UI Schema）在入库后由后台补写。
+
+        Args:
+            ui_schema_mode: 覆盖服务默认的 UI Schema 生成方式（inline / deferred）
+        """
+        briefing_data = self._extract_briefing_data(analysis_result)
+        template = self._build_briefing_template(
+            agent_id=agent_id,
+            briefing_data=briefing_data,
+            analysis_result=analysis_result,
+            importance_score=importance_score,
+            job_id=job_id,
+            report_artifact_id=report_artifact_id,
+        )
+
+        await self._attach_ui_schema(
+            template, briefing_data, analysis_result, agent_id, mode=ui_schema_mode
+        )
+        self._mark_cover_pending(template)
+
+        return template
+
+    async def create_briefings_bulk(
+        self,
+        template: Dict[str, Any],
+        user_ids: List[str],
+        chunk_size: int = 500,
+    ) -> List[Dict[str, Any]]:
+        """按模板为多个用户批量创建简报
+
+        每个分块一次多行 insert，分块之间通过 DB 执行器并发执行。
+        单个分块失败只影响该分块的用户。
+
+        Args:
+            template: `prepare_briefing` 返回的简报模板
+            user_ids: 接收用户列表
+            chunk_size: 每次 insert 的最大行数
+
+        Returns:
+            成功创建的简报记录
+        """
+        rows = [
+            {"id": str(uuid4()), "user_id": user_id, **template}
+            for user_id in user_ids
+        ]
+
+        if not self.supabase:
+            logger.warning("Supabase not configured, briefings not saved")
+            return rows
+
+        db_executor = get_db_executor()
+        chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+
+        async def insert_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            try:
+                result = await db_executor.execute(
+                    self.supabase.table("briefings").insert(chunk)
+                )
+                return result.data or chunk
+            except Exception as e:
+                logger.error(f"Failed to insert briefing chunk ({len(chunk)} rows): {e}")
+                return []
+
+        results = await asyncio.gather(*(insert_chunk(chunk) for chunk in chunks))
+        created = [row for chunk_rows in results for row in chunk_rows]
+
+        if created and self._has_pending_fill(template):
+            self._schedule_deferred_fill(template, [row["id"] for row in created])
+
+        logger.info(
+            f"Created {len(created)}/{len(rows)} briefings in {len(chunks)} chunk(s) "
+            f"for agent {template.get('agent_id')}"
+        )
+        return created
+
+    async def send_briefing_notifications(
+        self,
+        briefings: List[Dict[str, Any]],
+        analysis_result: Dict[str, Any],
+        concurrency: int = 20,
+    ) -> int:
+        """并发推送简报通知（信号量限制并发数）
+
+        Returns:
+            成功发起推送的数量
+        """
+        if not briefings:
+            return 0
+
+        first = briefings[0]
+        if not self._should_notify(first.get("priority"), float(first.get("importance_score") or 0)):
+            return 0
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send_one(briefing: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await self._send_notification(briefing, analysis_result)
+
+        results = await asyncio.gather(*(send_one(b) for b in briefings))
+        return sum(1 for sent in results if sent)
+
+    # ============================================
+    # 简报构建辅助方法
+    # ============================================
+
+    def _build_briefing_template(
+        self,
+        agent_id: str,
+        briefing_data: Dict[str, Any],
+        analysis_result: Dict[str, Any],
+        importance_score: float,
+        job_id: Optional[str],
+        report_artifact_id: Optional[str],
+    ) -> Dict[str, Any]:
+        """构建与接收用户无关的简报字段"""
+        return {
+            "agent_id": agent_id,
             "briefing_type": briefing_data["type"],
             "priority": briefing_data["priority"],
             "title": briefing_data["title"],
@@ -101,101 +299,254 @@ class BriefingService:
             "created_at": datetime.utcnow().isoformat(),
         }
 
-        # Generate UI Schema - 优先使用确定性生成（基于结构化数据）
-        if self.ui_schema_generator:
-            try:
-                ui_schema = None
-                # 如果有结构化数据，使用确定性生成
-                if briefing_data.get("metrics") or briefing_data.get("findings"):
-                    ui_schema = self.ui_schema_generator.generate_from_structured_data({
-                        "metrics": briefing_data.get("metrics", {}),
-                        "findings": briefing_data.get("findings", []),
-                        "key_data": briefing_data.get("key_data", {}),
-                    })
-                    if ui_schema:
-                        logger.info(f"Generated deterministic UI schema for briefing {briefing['id']}")
-                    else:
-                        # Fallback to LLM-based generation
-                        ui_schema = self.ui_schema_generator.generate_from_analysis(
-                            analysis_result=analysis_result.get("response", ""),
-                            data_context={"agent_id": agent_id, "priority": briefing_data["priority"]},
-                            agent_role=agent_id
-                        )
-                else:
-                    # 没有结构化数据，使用LLM生成
-                    ui_schema = self.ui_schema_generator.generate_from_analysis(
-                        analysis_result=analysis_result.get("response", ""),
-                        data_context={"agent_id": agent_id, "priority": briefing_data["priority"]},
-                        agent_role=agent_id
-                    )
-                    if not ui_schema:
-                        # Fallback to markdown schema
-                        ui_schema = self.ui_schema_generator.create_fallback_markdown_schema(
-                            briefing_data["summary"]
-                        )
+    async def _attach_ui_schema(
+        self,
+        briefing: Dict[str, Any],
+        briefing_data: Dict[str, Any],
+        analysis_result: Dict[str, Any],
+        agent_id: str,
+        mode: Optional[str] = None,
+    ) -> None:
+        """生成 UI Schema 并写入 context_data
 
-                # Store ui_schema in context_data (not as separate column)
+        确定性生成总是立即执行；需要 LLM 时，deferred 模式下只写入占位 Schema
+        并标记 ui_schema_status="pending"，入库后由后台任务补写。
+        """
+        if not self.ui_schema_generator:
+            return
+
+        try:
+            ui_schema = None
+            has_structured = bool(briefing_data.get("metrics") or briefing_data.get("findings"))
+            # 如果有结构化数据，使用确定性生成
+            if has_structured:
+                ui_schema = self.ui_schema_generator.generate_from_structured_data({
+                    "metrics": briefing_data.get("metrics", {}),
+                    "findings": briefing_data.get("findings", []),
+                    "key_data": briefing_data.get("key_data", {}),
+                })
                 if ui_schema:
-                    briefing["context_data"]["ui_schema"] = ui_schema
-            except Exception as e:
-                logger.error(f"Error generating UI schema: {e}")
+                    logger.info(f"Generated deterministic UI schema for briefing {briefing.get('id', 'template')}")
 
-        # Generate cover image if service is available
-        if self.cover_image_service:
-            try:
-                cover_result = await self.cover_image_service.generate_cover_image(
-                    title=briefing_data["title"],
-                    summary=briefing_data["summary"],
-                )
-                if cover_result and cover_result.get("image_data"):
-                    cover_url = await self.cover_image_service.upload_to_storage(
-                        image_data=cover_result["image_data"],
-                        briefing_id=briefing["id"],
-                        supabase_client=self.supabase,
+            if not ui_schema:
+                if (mode or self.ui_schema_mode) == "deferred":
+                    # 先用 Markdown 占位，后台生成完成后替换
+                    briefing["context_data"]["ui_schema"] = (
+                        self.ui_schema_generator.create_fallback_markdown_schema(
+                            briefing_data["summary"]
+                        )
+                    )
+                    briefing["context_data"]["ui_schema_status"] = "pending"
+                    return
+
+                # 使用LLM生成（结果按分析内容缓存）
+                ui_schema = await self._generate_llm_ui_schema(briefing)
+                if not ui_schema and not has_structured:
+                    # Fallback to markdown schema
+                    ui_schema = self.ui_schema_generator.create_fallback_markdown_schema(
+                        briefing_data["summary"]
                     )
-                    if cover_url:
-                        # Store cover image info in context_data (not as separate columns)
-                        briefing["context_data"]["cover_image_url"] = cover_url
-                        briefing["context_data"]["cover_image_metadata"] = cover_result.get("metadata", {})
-                        logger.info(f"Generated cover image for briefing {briefing['id']}")
-            except Exception as e:
-                logger.warning(f"Cover image generation failed (non-critical): {e}")
 
+            # Store ui_schema in context_data (not as separate column)
+            if ui_schema:
+                briefing["context_data"]["ui_schema"] = ui_schema
+        except Exception as e:
+            logger.error(f"Error generating UI schema: {e}")
+
+    async def _generate_llm_ui_schema(self, briefing: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """基于简报记录中的分析结果调用 LLM 生成 UI Schema"""
+        analysis_result = briefing["context_data"].get("analysis_result") or {}
+        return await self.ui_schema_generator.generate_from_analysis(
+            analysis_result=analysis_result.get("response", ""),
+            data_context={"agent_id": briefing["agent_id"], "priority": briefing["priority"]},
+            agent_role=briefing["agent_id"],
+        )
+
+    def _mark_cover_pending(self, briefing: Dict[str, Any]) -> None:
+        if self.cover_image_service:
+            briefing["context_data"]["cover_image_status"] = "pending"
+
+    @staticmethod
+    def _has_pending_fill(briefing: Dict[str, Any]) -> bool:
+        context_data = briefing.get("context_data") or {}
+        return (
+            context_data.get("ui_schema_status") == "pending"
+            or context_data.get("cover_image_status") == "pending"
+        )
+
+    def _schedule_deferred_fill(self, template: Dict[str, Any], briefing_ids: List[str]) -> None:
+        """在后台生成 UI Schema / 封面图并补写到已创建的简报"""
         if not self.supabase:
-            logger.warning("Supabase not configured, briefing not saved")
-            return briefing
+            return
+        task = asyncio.create_task(self._fill_deferred(template, briefing_ids))
+        self._fill_tasks.add(task)
+        task.add_done_callback(self._fill_tasks.discard)
 
-        try:
-            result = self.supabase.table("briefings").insert(briefing).execute()
-            created_briefing = result.data[0] if result.data else briefing
-            logger.info(f"Created briefing {briefing['id']} for user {user_id}")
+    async def _fill_deferred(self, template: Dict[str, Any], briefing_ids: List[str]) -> None:
+        """后台补写（同一模板的所有简报共用一次生成结果，一次 update 写入）
 
-            # Send push notification if push service is configured
-            priority = briefing_data["priority"]
-            if self.push_notification_service and importance_score >= 0.7 and priority in ["P0", "P1"]:
+        生成失败时保留占位内容，状态标记为 "fallback"。
+        """
+        if self._fill_semaphore is None:
+            self._fill_semaphore = asyncio.Semaphore(DEFERRED_FILL_CONCURRENCY)
+
+        async with self._fill_semaphore:
+            context_data = dict(template["context_data"])
+            jobs = []
+            if context_data.get("ui_schema_status") == "pending":
+                jobs.append(self._fill_ui_schema(template, context_data))
+            if context_data.get("cover_image_status") == "pending":
+                jobs.append(self._fill_cover_image(template, context_data))
+            await asyncio.gather(*jobs)
+
+            db_executor = get_db_executor()
+            updated = 0
+            for i in range(0, len(briefing_ids), DEFERRED_FILL_CHUNK_SIZE):
+                chunk = briefing_ids[i:i + DEFERRED_FILL_CHUNK_SIZE]
                 try:
-                    # Get agent name from the registry or context
-                    agent_name = analysis_result.get("agent_name", "AI Employee")
-
-                    # Prepare briefing data for notification
-                    notification_briefing = {
-                        **created_briefing,
-                        "agent_name": agent_name
-                    }
-
-                    # Send notification asynchronously (don't wait for result)
-                    await self.push_notification_service.send_briefing_notification(
-                        user_id=user_id,
-                        briefing=notification_briefing
+                    await db_executor.execute(
+                        self.supabase.table("briefings")
+                        .update({"context_data": context_data})
+                        .in_("id", chunk)
                     )
+                    updated += len(chunk)
                 except Exception as e:
-                    # Log but don't fail briefing creation if notification fails
-                    logger.error(f"Failed to send push notification for briefing {briefing['id']}: {e}")
+                    logger.error(f"Failed to fill deferred fields for {len(chunk)} briefing(s): {e}")
 
-            return created_briefing
+            logger.info(
+                f"Filled deferred fields (ui_schema={context_data.get('ui_schema_status')}, "
+                f"cover={context_data.get('cover_image_status')}) "
+                f"for {updated}/{len(briefing_ids)} briefing(s)"
+            )
+
+    async def _fill_ui_schema(self, template: Dict[str, Any], context_data: Dict[str, Any]) -> None:
+        try:
+            ui_schema = await self._generate_llm_ui_schema(template)
         except Exception as e:
-            logger.error(f"Failed to create briefing: {e}")
-            raise
+            logger.error(f"Error generating deferred UI schema: {e}")
+            ui_schema = None
+
+        if ui_schema:
+            context_data["ui_schema"] = ui_schema
+            context_data["ui_schema_status"] = "ready"
+        else:
+            context_data["ui_schema_status"] = "fallback"
+
+    async def _fill_cover_image(self, template: Dict[str, Any], context_data: Dict[str, Any]) -> None:
+        """生成封面图（按内容哈希去重，失败不影响简报）"""
+        try:
+            cover = await self.cover_image_service.get_or_create_cover(
+                title=template["title"],
+                summary=template["summary"],
+                supabase_client=self.supabase,
+            )
+        except Exception as e:
+            logger.warning(f"Cover image generation failed (non-critical): {e}")
+            cover = None
+
+        if cover:
+            # Store cover image info in context_data (not as separate columns)
+            context_data["cover_image_url"] = cover["url"]
+            context_data["cover_image_metadata"] = cover.get("metadata", {})
+            context_data["cover_image_status"] = "ready"
+        else:
+            context_data["cover_image_status"] = "fallback"
+
+    async def shutdown(self, timeout: float = 30) -> None:
+        """等待后台补写任务完成（超时后取消，未完成的简报在下次启动时补写）"""
+        if not self._fill_tasks:
+            return
+        pending = list(self._fill_tasks)
+        logger.info(f"Waiting for {len(pending)} deferred briefing fill task(s)")
+        done, not_done = await asyncio.wait(pending, timeout=timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            await asyncio.gather(*not_done, return_exceptions=True)
+            logger.warning(
+                f"Cancelled {len(not_done)} deferred briefing fill task(s) on shutdown, "
+                f"they will be resumed on next startup"
+            )
+
+    async def resume_pending_fills(self) -> int:
+        """重新调度进程启动前遗留的后台补写
+
+        补写任务只在内存中，进程退出（重启 / 崩溃 / 关闭时超时取消）后简报会一直停留在
+        pending 状态。启动时查询最近 DEFERRED_FILL_SWEEP_HOURS 小时内创建、仍为 pending
+        的简报，按内容分组（同一次扇出的简报只生成一次）重新补写。
+        多进程部署时其他进程正在补写的简报可能被重复补写，结果相同。
+
+        Returns:
+            重新调度的简报数
+        """
+        if not self.supabase:
+            return 0
+
+        now = datetime.utcnow()
+        cutoff = now - timedelta(hours=DEFERRED_FILL_SWEEP_HOURS)
+        try:
+            result = await get_db_executor().execute(
+                self.supabase.table("briefings")
+                .select("id, agent_id, title, summary, priority, context_data")
+                .or_("context_data->>ui_schema_status.eq.pending,context_data->>cover_image_status.eq.pending")
+                .gte("created_at", cutoff.isoformat())
+                .lt("created_at", now.isoformat())
+                .limit(DEFERRED_FILL_SWEEP_LIMIT)
+            )
+        except Exception as e:
+            logger.error(f"Failed to load pending briefing fills: {e}")
+            return 0
+
+        groups: Dict[str, Dict[str, Any]] = {}
+        for row in result.data or []:
+            if not self._has_pending_fill(row):
+                continue
+            key = json.dumps(
+                [row.get("agent_id"), row.get("title"), row.get("summary"), row.get("context_data")],
+                sort_keys=True,
+                default=str,
+            )
+            group = groups.setdefault(key, {"template": row, "ids": []})
+            group["ids"].append(row["id"])
+
+        for group in groups.values():
+            self._schedule_deferred_fill(group["template"], group["ids"])
+
+        count = sum(len(group["ids"]) for group in groups.values())
+        if count:
+            logger.info(f"Resumed deferred fill for {count} pending briefing(s) in {len(groups)} group(s)")
+        return count
+
+    def _should_notify(self, priority: Optional[str], importance_score: float) -> bool:
+        """是否需要推送通知（高重要性的 P0/P1 简报）"""
+        return bool(
+            self.push_notification_service
+            and importance_score >= 0.7
+            and priority in ["P0", "P1"]
+        )
+
+    async def _send_notification(
+        self, briefing: Dict[str, Any], analysis_result: Dict[str, Any]
+    ) -> bool:
+        """发送单条简报推送，失败只记录日志"""
+        try:
+            # Get agent name from the registry or context
+            agent_name = analysis_result.get("agent_name", "AI Employee")
+
+            # Prepare briefing data for notification
+            notification_briefing = {
+                **briefing,
+                "agent_name": agent_name
+            }
+
+            return bool(await self.push_notification_service.send_briefing_notification(
+                user_id=briefing["user_id"],
+                briefing=notification_briefing
+            ))
+        except Exception as e:
+            # Log but don't fail briefing creation if notification fails
+            logger.error(f"Failed to send push notification for briefing {briefing.get('id')}: {e}")
+            return False
 
     def _extract_briefing_data(self, analysis_result: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -702,17 +1053,39 @@ class BriefingService:
             logger.error(f"Failed to delete briefing: {e}")
             return False
 
-    async def get_briefing_report(self, briefing_id: str) -> Optional[Dict[str, Any]]:
-        """获取简报关联的完整报告"""
+    async def get_briefing_report(
+        self,
+        briefing_id: str,
+        user_id: Optional[str] = None,
+        briefing: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """获取简报关联的完整报告
+
+        artifact按内容寻址，在同一次任务的所有接收者之间共享，
+        因此访问权限以简报为准：只有拥有引用该artifact的简报的用户才能读取。
+
+        Args:
+            briefing_id: 简报ID
+            user_id: 当前用户ID（提供时校验简报归属）
+            briefing: 已查询到的简报记录（可选，避免重复查询）
+
+        Returns:
+            报告内容；简报不存在或无权访问时返回None
+        """
         if not self.supabase:
             return None
 
         try:
             # 1. 获取briefing
-            briefing = await self.get_briefing(briefing_id)
+            if briefing is None or briefing.get("id") != briefing_id:
+                briefing = await self.get_briefing(briefing_id)
             if not briefing:
                 return None
 
+            if user_id is not None and briefing.get("user_id") != user_id:
+                logger.warning(f"User {user_id} denied access to report of briefing {briefing_id}")
+                return None
+
             artifact_id = briefing.get("report_artifact_id")
             if not artifact_id:
                 # 如果没有artifact_id，返回context_data中的响应
@@ -724,7 +1097,7 @@ class BriefingService:
                     "title": briefing.get("title", "分析报告"),
                 }
 
-            # 2. 获取artifact
+            # 2. 获取artifact（共享artifact不归属用户，访问权限由上面的简报归属决定）
             result = (
                 self.supabase.table("artifacts")
                 .select("*")
@@ -736,6 +1109,14 @@ class BriefingService:
             if not result.data:
                 return None
 
+            # 共享artifact必须来自同一个Agent
+            artifact_agent_id = (result.data.get("metadata") or {}).get("agent_id")
+            if artifact_agent_id and artifact_agent_id != briefing.get("agent_id"):
+                logger.warning(
+                    f"Artifact {artifact_id} agent mismatch for briefing {briefing_id}"
+                )
+                return None
+
             return {
                 "content": result.data.get("content", ""),
                 "format": result.data.get("format", "markdown"),
@@ -0,0 +1,207 @@
+"""
+Client Registry - 进程级共享客户端
+
+热点路径上每次请求新建客户端（create_client / httpx.AsyncClient / requests.post）
+都要重新做 DNS + TCP + TLS 握手。ClientRegistry 在进程内按上游维护长连接：
+
+- http(name)：按上游命名的 httpx.AsyncClient，保持连接复用，安装 h2 时启用 HTTP/2
+- supabase(url, key)：按 (url, key) 共享的 Supabase 客户端，底层使用同一个带连接池的
+  httpx.Client（PostgREST / Storage / Auth 共用；supabase-py 不支持 httpx_client 选项时
+  回退为普通 create_client）
+- 每个上游的连接池大小与超时独立配置，HTTP_POOL_SIZES 可覆盖，
+  例如 "jpush=40,gemini=8"
+- 由 main.lifespan 在退出时统一关闭
+"""
+
+import importlib.util
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+try:
+    from supabase import Client, create_client
+    SUPABASE_AVAILABLE = True
+except ImportError:
+    SUPABASE_AVAILABLE = False
+    Client = Any
+
+# 较早的 supabase-py 没有 SyncClientOptions / httpx_client 选项，此时每个客户端使用自己的连接
+try:
+    from supabase.lib.client_options import SyncClientOptions
+except ImportError:
+    SyncClientOptions = None
+
+# HTTP/2 需要 h2；未安装时使用 HTTP/1.1 keep-alive
+H2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    """单个上游的连接池配置"""
+
+    max_connections: int = 20
+    max_keepalive: int = 10
+    timeout: float = 30.0
+    connect_timeout: float = 10.0
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+    follow_redirects: bool = False
+
+
+# 按上游的默认配置
+DEFAULT_PROFILES: Dict[str, PoolProfile] = {
+    "default": PoolProfile(),
+    # 附件图片下载（存储 CDN 会重定向）
+    "attachments": PoolProfile(max_connections=20, max_keepalive=10, follow_redirects=True),
+    # 封面图生成：单次调用慢，并发低
+    "gemini": PoolProfile(max_connections=4, max_keepalive=4, timeout=60.0),
+    # 推送：简报扇出时并发高、单次请求短
+    "jpush": PoolProfile(max_connections=20, max_keepalive=20, timeout=10.0),
+    # Supabase（同步客户端，由 DB 执行器的线程池并发使用）
+    "supabase": PoolProfile(
+        max_connections=int(os.getenv("DB_EXECUTOR_MAX_WORKERS", "16")) + 4,
+        max_keepalive=int(os.getenv("DB_EXECUTOR_MAX_WORKERS", "16")),
+        follow_redirects=True,
+    ),
+}
+
+
+def parse_pool_sizes(value: Optional[str]) -> Dict[str, int]:
+    """解析 "name=n,name2=m" 形式的连接池大小配置"""
+    sizes: Dict[str, int] = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        name, _, size = item.partition("=")
+        try:
+            sizes[name.strip()] = int(size)
+        except ValueError:
+            logger.warning(f"Invalid HTTP pool size entry: {item!r}")
+    return sizes
+
+
+class ClientRegistry:
+    """进程级共享客户端注册表"""
+
+    def __init__(
+        self,
+        profiles: Optional[Dict[str, PoolProfile]] = None,
+        pool_sizes: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            profiles: 上游名 -> 连接池配置（未列出的上游使用 "default"）
+            pool_sizes: 按上游覆盖最大连接数（默认读取 HTTP_POOL_SIZES）
+        """
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        sizes = pool_sizes if pool_sizes is not None else parse_pool_sizes(os.getenv("HTTP_POOL_SIZES"))
+        for name, size in sizes.items():
+            base = self.profiles.get(name, self.profiles["default"])
+            self.profiles[name] = PoolProfile(
+                **{**base.__dict__, "max_connections": size, "max_keepalive": min(base.max_keepalive, size)}
+            )
+
+        self._http: Dict[str, httpx.AsyncClient] = {}
+        self._sync_http: Optional[httpx.Client] = None
+        self._supabase: Dict[Tuple[str, str], Client] = {}
+        self._created: Dict[str, int] = {}
+
+    def profile(self, name: str) -> PoolProfile:
+        return self.profiles.get(name, self.profiles["default"])
+
+    def _client_kwargs(self, profile: PoolProfile) -> Dict[str, Any]:
+        return {
+            "timeout": httpx.Timeout(profile.timeout, connect=profile.connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=profile.max_connections,
+                max_keepalive_connections=profile.max_keepalive,
+                keepalive_expiry=profile.keepalive_expiry,
+            ),
+            "http2": profile.http2 and H2_AVAILABLE,
+            "follow_redirects": profile.follow_redirects,
+        }
+
+    def http(self, name: str = "default") -> httpx.AsyncClient:
+        """获取上游共享的异步 HTTP 客户端（延迟创建，close 后可重新创建）
+
+        Args:
+            name: 上游名（决定连接池大小与超时）
+        """
+        client = self._http.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**self._client_kwargs(self.profile(name)))
+            self._http[name] = client
+            self._created[name] = self._created.get(name, 0) + 1
+        return client
+
+    def supabase(self, url: Optional[str] = None, key: Optional[str] = None) -> Optional[Client]:
+        """获取共享的 Supabase 客户端
+
+        Args:
+            url: Supabase URL（默认 SUPABASE_URL）
+            key: Service Key（默认 SUPABASE_SERVICE_ROLE_KEY / SUPABASE_SERVICE_KEY）
+
+        Returns:
+            Supabase 客户端，未配置或 supabase 未安装时返回 None
+        """
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_SERVICE_KEY")
+        if not SUPABASE_AVAILABLE or not url or not key:
+            return None
+
+        client = self._supabase.get((url, key))
+        if client is None:
+            client = self._create_supabase(url, key)
+            self._supabase[(url, key)] = client
+            self._created["supabase"] = self._created.get("supabase", 0) + 1
+        return client
+
+    def _create_supabase(self, url: str, key: str) -> Client:
+        """创建使用共享 httpx.Client 的 Supabase 客户端（不支持时回退为普通客户端）"""
+        if SyncClientOptions is not None:
+            if self._sync_http is None or self._sync_http.is_closed:
+                self._sync_http = httpx.Client(**self._client_kwargs(self.profile("supabase")))
+            try:
+                return create_client(url, key, options=SyncClientOptions(httpx_client=self._sync_http))
+            except TypeError as e:
+                logger.warning(f"supabase-py does not support a shared httpx client, using default: {e}")
+        return create_client(url, key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "http2": H2_AVAILABLE,
+            "http_clients": sorted(name for name, c in self._http.items() if not c.is_closed),
+            "supabase_clients": len(self._supabase),
+            "created": dict(self._created),
+        }
+
+    async def close(self) -> None:
+        """关闭所有共享连接"""
+        for name, client in list(self._http.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close HTTP client {name}: {e}")
+        self._http.clear()
+        if self._sync_http is not None:
+            self._sync_http.close()
+            self._sync_http = None
+        self._supabase.clear()
+        logger.info("Client registry closed")
+
+
+# 全局实例
+_client_registry: Optional[ClientRegistry] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    """获取全局客户端注册表"""
+    global _client_registry
+    if _client_registry is None:
+        _client_registry = ClientRegistry()
+    return _client_registry
@@ -0,0 +1,243 @@
+"""
+Context Cache - 对话上下文缓存
+
+按对话缓存已渲染的上下文片段（每条消息一段，按 message id 索引）：
+- 新一轮对话先查询最近消息的版本（id / created_at / updated_at），只查询并渲染新消息
+- 简报卡片的 JSON 只在首次进入窗口时解析一次
+- 窗口按 token 预算裁剪：超出预算的较早消息折叠为滚动摘要（每条一行）
+- 仍在生成中（status="streaming"）的消息不进入窗口，完成后作为新消息加入
+- 窗口内的消息被原地更新或删除（包括其他进程 / 客户端的修改）时整体失效，重新加载；
+  本进程内删除消息时也会直接失效
+"""
+
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 生成中的消息（内容尚未写完）不缓存
+STREAMING_STATUS = "streaming"
+
+
+def is_streaming(message: Dict[str, Any]) -> bool:
+    """消息是否仍在生成中"""
+    return message.get("status") == STREAMING_STATUS
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数
+
+    ASCII 约 4 字符 1 token，中日韩等宽字符约 1 字符 1 token。
+    利用 UTF-8 编码长度计算，避免逐字符遍历。
+    """
+    if not text:
+        return 0
+    chars = len(text)
+    wide = (len(text.encode("utf-8")) - chars) // 2
+    return wide + (chars - wide + 3) // 4
+
+
+class ContextSegment:
+    """单条消息的渲染结果"""
+
+    __slots__ = ("text", "digest", "tokens")
+
+    def __init__(self, text: str, digest: str):
+        self.text = text
+        self.digest = digest  # 移出窗口后写入滚动摘要的单行
+        self.tokens = estimate_tokens(text)
+
+
+class ContextEntry:
+    """单个对话的上下文窗口"""
+
+    __slots__ = (
+        "segments", "versions", "tokens", "cursor", "limits",
+        "summary", "summary_tokens", "omitted",
+    )
+
+    def __init__(self, limits: Tuple[int, int, int]):
+        # message_id -> 渲染结果（None 表示该消息不进入上下文，如解析失败的卡片）
+        self.segments: "OrderedDict[str, Optional[ContextSegment]]" = OrderedDict()
+        # message_id -> (created_at, updated_at)：已进入窗口的消息（含已折叠进摘要的），
+        # 用于校验消息是否被修改或删除
+        self.versions: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+        self.tokens = 0
+        # 窗口内最新消息的 created_at
+        self.cursor: Optional[str] = None
+        # (max_tokens, summary_max_tokens, max_messages)
+        self.limits = limits
+
+        # 滚动摘要：移出窗口的消息，每条一行
+        self.summary: Deque[Tuple[str, int]] = deque()
+        self.summary_tokens = 0
+        self.omitted = 0  # 超出摘要预算被丢弃的消息数
+
+    def render(self) -> str:
+        parts = []
+        if self.summary:
+            parts.append("**更早的对话摘要**：\n")
+            if self.omitted:
+                parts.append(f"- （更早的 {self.omitted} 条消息已省略）\n")
+            parts.extend(f"- {line}\n" for line, _ in self.summary)
+            parts.append("\n")
+        parts.extend(segment.text for segment in self.segments.values() if segment)
+        return "".join(parts)
+
+
+class ContextCache:
+    """对话上下文缓存（LRU）
+
+    窗口内容为最近 max_messages 条消息中、从最新往前装入 max_tokens 预算的部分；
+    每轮用最近 max_messages 条消息的版本校验窗口（见 diff），只追加新消息，
+    超出预算的较早消息按顺序折叠进滚动摘要（摘要同样有 token 上限）。
+    """
+
+    def __init__(self, max_conversations: int = 1000):
+        """
+        Args:
+            max_conversations: 最多缓存的对话数
+        """
+        self.max_conversations = max_conversations
+        self._entries: "OrderedDict[str, ContextEntry]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(
+        self, conversation_id: str, limits: Tuple[int, int, int]
+    ) -> Optional[ContextEntry]:
+        """获取对话的缓存窗口
+
+        没有缓存、窗口为空或预算配置已变化时返回 None。
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None or entry.cursor is None or entry.limits != limits:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(conversation_id)
+        self.hits += 1
+        return entry
+
+    def extend(
+        self,
+        conversation_id: str,
+        rendered: List[Tuple[Dict[str, Any], Optional[ContextSegment]]],
+        limits: Tuple[int, int, int],
+        reset: bool = False,
+    ) -> ContextEntry:
+        """将已渲染的消息追加到窗口，并按预算裁剪
+
+        Args:
+            conversation_id: 对话UUID
+            rendered: (消息, 渲染结果) 列表，按时间顺序；已在窗口中的消息和生成中的消息会被跳过
+            limits: (max_tokens, summary_max_tokens, max_messages)
+            reset: 是否丢弃现有窗口
+
+        Returns:
+            更新后的窗口
+        """
+        entry = None if reset else self._entries.get(conversation_id)
+        if entry is None or entry.limits != limits:
+            entry = ContextEntry(limits)
+            self._entries[conversation_id] = entry
+        self._entries.move_to_end(conversation_id)
+
+        for message, segment in rendered:
+            message_id = message["id"]
+            if message_id in entry.segments or is_streaming(message):
+                continue
+            entry.segments[message_id] = segment
+            created_at = message.get("created_at")
+            entry.versions[message_id] = (created_at, message.get("updated_at"))
+            if segment:
+                entry.tokens += segment.tokens
+            if created_at and (entry.cursor is None or created_at > entry.cursor):
+                entry.cursor = created_at
+
+        self._trim(entry)
+
+        while len(self._entries) > self.max_conversations:
+            self._entries.popitem(last=False)
+
+        return entry
+
+    @staticmethod
+    def diff(
+        entry: ContextEntry, versions: List[Dict[str, Any]], count: int
+    ) -> Optional[List[str]]:
+        """用最近消息的版本校验窗口
+
+        Args:
+            entry: 缓存窗口
+            versions: 最近 count 条消息的 {id, created_at, updated_at, status}，按时间顺序
+            count: 查询的消息条数
+
+        Returns:
+            需要查询并追加的新消息 id；窗口已失效（消息被修改 / 删除，或新完成的消息
+            早于窗口中最新的消息）时返回 None
+        """
+        seen = {v["id"]: v for v in versions}
+        # 查询结果不足 count 条时包含了对话的全部消息，否则只覆盖不早于 oldest 的消息
+        oldest = versions[0].get("created_at") if len(versions) >= count else None
+
+        expired = []
+        for message_id, (created_at, updated_at) in entry.versions.items():
+            current = seen.get(message_id)
+            if current is None:
+                if oldest is None or (created_at and created_at >= oldest):
+                    return None  # 已删除
+                expired.append(message_id)  # 已移出查询范围
+                continue
+            if current.get("updated_at") != updated_at:
+                return None  # 已原地更新
+
+        new_ids = []
+        for v in versions:
+            if v["id"] in entry.versions or is_streaming(v):
+                continue
+            created_at = v.get("created_at")
+            if entry.cursor and created_at and created_at < entry.cursor:
+                return None  # 较早创建、刚完成的消息（如生成中的占位消息），需要按顺序重建
+            new_ids.append(v["id"])
+
+        for message_id in expired:
+            del entry.versions[message_id]
+        return new_ids
+
+    @staticmethod
+    def _trim(entry: ContextEntry) -> None:
+        """裁剪窗口：超出条数或 token 预算的较早消息折叠进摘要（至少保留最新一条）"""
+        max_tokens, summary_max_tokens, max_messages = entry.limits
+
+        while len(entry.segments) > 1 and (
+            entry.tokens > max_tokens or len(entry.segments) > max_messages
+        ):
+            _, segment = entry.segments.popitem(last=False)
+            if not segment:
+                continue
+            entry.tokens -= segment.tokens
+            digest_tokens = estimate_tokens(segment.digest)
+            entry.summary.append((segment.digest, digest_tokens))
+            entry.summary_tokens += digest_tokens
+
+        while entry.summary and entry.summary_tokens > summary_max_tokens:
+            _, digest_tokens = entry.summary.popleft()
+            entry.summary_tokens -= digest_tokens
+            entry.omitted += 1
+
+    def invalidate(self, conversation_id: str) -> None:
+        """使对话的缓存失效"""
+        if self._entries.pop(conversation_id, None) is not None:
+            logger.debug(f"Context cache invalidated for conversation {conversation_id}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "conversations": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -11,20 +11,23 @@ Conversation Service - 对话服务
 - Agent role 缓存减少数据库查询
 - 并行化 IO 操作减少 TTFT
 - 增强超时控制（使用全局配置）
+- 上下文增量缓存（只渲染新消息，简报卡片 JSON 只解析一次）
+- 上下文按 agent.yaml 的 token 预算裁剪，较早消息折叠为滚动摘要
 """
 
 import asyncio
-import base64
 import logging
 import json
 import re
-import httpx
 from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 from datetime import datetime
 
 from models import ConversationModel, MessageModel
+from services.context_cache import ContextCache, ContextSegment, is_streaming
+from services.image_pipeline import get_image_pipeline
 from services.task_intent_recognizer import TaskIntentRecognizer
 from agent_registry import get_global_registry
+from agent_yaml_schema import AgentContext
 from config import get_timeout_config
 
 logger = logging.getLogger(__name__)
@@ -76,9 +79,6 @@ REVIEW_MODE_PROMPTS = {
 class ConversationService:
     """对话服务 - 支持共享对话模式（优化版）"""
 
-    # 上下文消息数量限制
-    MAX_CONTEXT_MESSAGES = 20
-
     def __init__(
         self,
         supabase_client: Any,
@@ -108,6 +108,12 @@ class ConversationService:
         # 优化：Agent role 缓存（减少数据库查询）
         self._agent_role_cache: Dict[str, str] = {}
 
+        # 优化：对话上下文增量缓存（已渲染的消息片段）
+        self._context_cache = ContextCache()
+
+        # 附件图片处理管线（共享连接池 + 编码缓存）
+        self.image_pipeline = get_image_pipeline()
+
     def _extract_mode_and_message(self, user_message: str) -> Tuple[Optional[str], str]:
         """从消息中提取模式标识和原始消息
 
@@ -143,47 +149,16 @@ class ConversationService:
     ) -> List[Dict[str, Any]]:
         """下载附件图片并转换为 base64
 
+        并发下载、限制大小、缩放到模型最大有效分辨率，结果按内容哈希缓存
+        （见 ImagePipeline）。
+
         Args:
             attachments: 附件列表 [{id, url, mime_type}]
 
         Returns:
             图片内容块列表，可直接用于 Claude 多模态
         """
-        image_blocks = []
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for attachment in attachments:
-                url = attachment.get("url")
-                mime_type = attachment.get("mime_type", "image/jpeg")
-
-                if not url:
-                    continue
-
-                # 只处理图片类型
-                if not mime_type.startswith("image/"):
-                    logger.info(f"Skipping non-image attachment: {mime_type}")
-                    continue
-
-                try:
-                    response = await client.get(url)
-                    response.raise_for_status()
-
-                    image_data = base64.standard_b64encode(response.content).decode("utf-8")
-
-                    image_blocks.append({
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": mime_type,
-                            "data": image_data,
-                        }
-                    })
-
-                    logger.info(f"Downloaded and encoded image: {url[:50]}...")
-                except Exception as e:
-                    logger.warning(f"Failed to download image {url}: {e}")
-
-        return image_blocks
+        return await self.image_pipeline.build_image_blocks(attachments)
 
     @property
     def conversation_timeout(self) -> int:
@@ -333,11 +308,10 @@ class ConversationService:
                 briefing = await self.briefing_service.get_briefing(briefing_id)
             else:
                 # Fallback: 直接从数据库查询
-                result = (
+                result = await self.conversation_model.db_executor.execute(
                     self.supabase.table("briefings")
                     .select("*")
                     .eq("id", briefing_id)
-                    .execute()
                 )
                 if not result.data or len(result.data) == 0:
                     raise ValueError(f"Briefing not found: {briefing_id}")
@@ -541,6 +515,7 @@ class ConversationService:
             async for event in self.agent_service.execute_query(
                 prompt=summary_prompt,
                 agent_role=agent_role,  # 使用 role string
+                user_id=user_id,
             ):
                 event_type = event.get("type")
                 # 支持细粒度流式输出 (text_delta) 和完整块 (text_chunk)
@@ -589,19 +564,11 @@ class ConversationService:
         agent_role_task = asyncio.create_task(
             asyncio.to_thread(self._get_agent_role, conversation["agent_id"])
         )
-        messages_task = asyncio.create_task(
-            self.message_model.get_recent_messages(
-                conversation["id"], count=self.MAX_CONTEXT_MESSAGES
-            )
-        )
+        # 3. 构建包含简报的上下文提示词（增量缓存，只渲染新消息）
+        context_task = asyncio.create_task(self._get_context_prompt(conversation))
 
         # 等待所有任务完成
-        agent_role, messages = await asyncio.gather(agent_role_task, messages_task)
-
-        # 3. 构建包含简报的上下文提示词（CPU 密集型，保持同步）
-        context_prompt = self._build_context_with_briefings(
-            conversation, messages
-        )
+        agent_role, context_prompt = await asyncio.gather(agent_role_task, context_task)
 
         # 组合用户消息
         full_prompt = (
@@ -617,6 +584,7 @@ class ConversationService:
         async for event in self.agent_service.execute_query(
             prompt=full_prompt,
             agent_role=agent_role,  # 使用 role string
+            user_id=conversation.get("user_id"),
         ):
             event_type = event.get("type")
             # 支持细粒度流式输出 (text_delta) 和完整块 (text_chunk)
@@ -640,6 +608,78 @@ class ConversationService:
             f"assistant response length: {len(assistant_content)}"
         )
 
+    # 滚动摘要中每条文本消息保留的字符数
+    SUMMARY_EXCERPT_CHARS = 80
+
+    CONTEXT_HEADER = (
+        "你是一个AI助手，正在与用户进行长期对话。\n\n"
+        "**对话历史**（包含简报和讨论）：\n\n"
+    )
+
+    def _get_context_config(self, agent_id: str) -> AgentContext:
+        """获取 Agent 的上下文预算（agent.yaml 的 context 配置，未配置时使用默认值）"""
+        config = get_global_registry().get_agent_config(agent_id)
+        return config.context if config else AgentContext()
+
+    async def _get_context_prompt(self, conversation: Dict[str, Any]) -> str:
+        """获取对话的上下文提示词（增量缓存 + token 预算）
+
+        命中缓存时先查询最近 max_messages 条消息的版本校验窗口，只查询并渲染新消息；
+        未命中、窗口内消息被修改 / 删除或增量查询失败时加载最近 max_messages 条消息重建窗口。
+        生成中（status="streaming"）的消息不进入上下文。
+        超出 token 预算的较早消息折叠为滚动摘要。
+
+        Args:
+            conversation: 对话记录
+
+        Returns:
+            格式化的上下文提示词
+        """
+        conversation_id = conversation["id"]
+        context_config = self._get_context_config(conversation["agent_id"])
+        limits = context_config.limits
+        entry = self._context_cache.get(conversation_id, limits)
+
+        if entry is not None:
+            try:
+                versions = await self.message_model.get_message_versions(
+                    conversation_id, count=context_config.max_messages
+                )
+                new_ids = self._context_cache.diff(entry, versions, context_config.max_messages)
+                if new_ids is not None:
+                    messages = await self.message_model.get_messages_by_ids(new_ids)
+                    entry = self._context_cache.extend(
+                        conversation_id,
+                        [(m, self._render_context_segment(m)) for m in messages if not is_streaming(m)],
+                        limits,
+                    )
+                    return self.CONTEXT_HEADER + entry.render()
+                logger.debug(
+                    f"Context cache stale for conversation {conversation_id} "
+                    f"(messages updated or deleted), rebuilding"
+                )
+            except Exception as e:
+                logger.warning(
+                    f"Incremental context load failed for conversation {conversation_id}, "
+                    f"rebuilding: {e}"
+                )
+
+        messages = await self.message_model.get_recent_messages(
+            conversation_id, count=context_config.max_messages
+        )
+        entry = self._context_cache.extend(
+            conversation_id,
+            [(m, self._render_context_segment(m)) for m in messages if not is_streaming(m)],
+            limits,
+            reset=True,
+        )
+        logger.debug(
+            f"Context rebuilt for conversation {conversation_id}: "
+            f"{len(entry.segments)} messages, ~{entry.tokens} tokens, "
+            f"{len(entry.summary)} summarized"
+        )
+        return self.CONTEXT_HEADER + entry.render()
+
     def _build_context_with_briefings(
         self, conversation: Dict[str, Any], messages: List[Dict[str, Any]]
     ) -> str:
@@ -655,80 +695,110 @@ class ConversationService:
         Returns:
             格式化的上下文提示词
         """
-        prompt = "你是一个AI助手，正在与用户进行长期对话。\n\n"
-        prompt += "**对话历史**（包含简报和讨论）：\n\n"
+        segments = (self._render_context_segment(msg) for msg in messages)
+        return self.CONTEXT_HEADER + "".join(s.text for s in segments if s)
 
-        for msg in messages:
-            if msg["content_type"] == "briefing_card":
-                # 简报卡片展示为结构化信息（增强版）
-                try:
-                    briefing = json.loads(msg["content"])
-                    prompt += f"[简报 {briefing.get('created_at', 'N/A')}]\n"
-                    prompt += f"标题：{briefing.get('title', 'N/A')}\n"
-                    prompt += f"摘要：{briefing.get('summary', 'N/A')}\n"
-                    prompt += f"优先级：{briefing.get('priority', 'N/A')}\n"
-                    if briefing.get("impact"):
-                        prompt += f"影响：{briefing['impact']}\n"
-
-                    # 增强：添加关键指标（如果有）
-                    metrics = briefing.get("metrics", {})
-                    if metrics:
-                        prompt += "关键指标：\n"
-                        for key, value in list(metrics.items())[:5]:
-                            # 格式化指标名称
-                            label = self._format_metric_label(key)
-                            prompt += f"  - {label}: {value}\n"
-
-                    # 增强：添加主要发现（如果有）
-                    findings = briefing.get("findings", [])
-                    if findings:
-                        prompt += "主要发现：\n"
-                        for finding in findings[:3]:
-                            if isinstance(finding, dict):
-                                title = finding.get("title", finding.get("finding", str(finding)))
-                                severity = finding.get("severity", "")
-                                severity_label = f"[{severity}] " if severity else ""
-                                prompt += f"  - {severity_label}{title}\n"
-                            else:
-                                prompt += f"  - {finding}\n"
-
-                    # 增强：添加关键数据摘要（如果有）
-                    key_data = briefing.get("key_data", {})
-                    if key_data:
-                        # 疑似借单Story
-                        suspicious = key_data.get("suspicious_stories", [])
-                        if suspicious:
-                            prompt += f"疑似借单Story: {len(suspicious)}个\n"
-                            for s in suspicious[:2]:
-                                issue_id = s.get("issue_id", "N/A")
-                                change_count = s.get("change_id_count", s.get("change_count", "N/A"))
-                                prompt += f"  - Story #{issue_id}: {change_count}个change\n"
-
-                        # 工作分散人员
-                        scattered = key_data.get("scattered_people", [])
-                        if scattered:
-                            prompt += f"工作分散人员: {len(scattered)}人\n"
-                            for p in scattered[:2]:
-                                name = p.get("name", "N/A")
-                                branch_count = p.get("branch_count", "N/A")
-                                prompt += f"  - {name}: {branch_count}个分支\n"
-
-                    prompt += "\n"
-                except json.JSONDecodeError:
-                    # 如果JSON解析失败，跳过这条简报
-                    logger.warning(
-                        f"Failed to parse briefing_card content: {msg['content']}"
-                    )
-                    continue
+    def _render_context_segment(self, msg: Dict[str, Any]) -> Optional[ContextSegment]:
+        """将单条消息渲染为上下文片段
 
-            elif msg["content_type"] == "text":
-                # 普通对话
-                role_label = {"user": "用户", "assistant": "助手", "system": "系统"}.get(
-                    msg["role"], msg["role"]
+        Args:
+            msg: 消息记录
+
+        Returns:
+            上下文片段（含移出窗口后使用的单行摘要）；不进入上下文的消息返回 None
+        """
+        if msg["content_type"] == "briefing_card":
+            # 简报卡片展示为结构化信息（增强版）
+            try:
+                briefing = json.loads(msg["content"])
+            except json.JSONDecodeError:
+                # 如果JSON解析失败，跳过这条简报
+                logger.warning(
+                    f"Failed to parse briefing_card content: {msg['content']}"
                 )
-                prompt += f"{role_label}: {msg['content']}\n\n"
+                return None
+
+            prompt = f"[简报 {briefing.get('created_at', 'N/A')}]\n"
+            prompt += f"标题：{briefing.get('title', 'N/A')}\n"
+            prompt += f"摘要：{briefing.get('summary', 'N/A')}\n"
+            prompt += f"优先级：{briefing.get('priority', 'N/A')}\n"
+            if briefing.get("impact"):
+                prompt += f"影响：{briefing['impact']}\n"
+
+            # 增强：添加关键指标（如果有）
+            metrics = briefing.get("metrics", {})
+            if metrics:
+                prompt += "关键指标：\n"
+                for key, value in list(metrics.items())[:5]:
+                    # 格式化指标名称
+                    label = self._format_metric_label(key)
+                    prompt += f"  - {label}: {value}\n"
+
+            # 增强：添加主要发现（如果有）
+            findings = briefing.get("findings", [])
+            if findings:
+                prompt += "主要发现：\n"
+                for finding in findings[:3]:
+                    if isinstance(finding, dict):
+                        title = finding.get("title", finding.get("finding", str(finding)))
+                        severity = finding.get("severity", "")
+                        severity_label = f"[{severity}] " if severity else ""
+                        prompt += f"  - {severity_label}{title}\n"
+                    else:
+                        prompt += f"  - {finding}\n"
+
+            # 增强：添加关键数据摘要（如果有）
+            key_data = briefing.get("key_data", {})
+            if key_data:
+                # 疑似借单Story
+                suspicious = key_data.get("suspicious_stories", [])
+                if suspicious:
+                    prompt += f"疑似借单Story: {len(suspicious)}个\n"
+                    for s in suspicious[:2]:
+                        issue_id = s.get("issue_id", "N/A")
+                        change_count = s.get("change_id_count", s.get("change_count", "N/A"))
+                        prompt += f"  - Story #{issue_id}: {change_count}个change\n"
+
+                # 工作分散人员
+                scattered = key_data.get("scattered_people", [])
+                if scattered:
+                    prompt += f"工作分散人员: {len(scattered)}人\n"
+                    for p in scattered[:2]:
+                        name = p.get("name", "N/A")
+                        branch_count = p.get("branch_count", "N/A")
+                        prompt += f"  - {name}: {branch_count}个分支\n"
+
+            digest = f"[简报] {briefing.get('title', 'N/A')}（优先级 {briefing.get('priority', 'N/A')}）"
+            return ContextSegment(prompt + "\n", digest)
+
+        if msg["content_type"] == "text":
+            # 普通对话
+            role_label = {"user": "用户", "assistant": "助手", "system": "系统"}.get(
+                msg["role"], msg["role"]
+            )
+            content = msg["content"] or ""
+            excerpt = " ".join(content.split())
+            if len(excerpt) > self.SUMMARY_EXCERPT_CHARS:
+                excerpt = excerpt[:self.SUMMARY_EXCERPT_CHARS] + "…"
+            return ContextSegment(f"{role_label}: {content}\n\n", f"{role_label}: {excerpt}")
+
+        return None
+
+    async def delete_message(self, conversation_id: str, message_id: str) -> bool:
+        """删除对话中的消息，并使本进程中该对话的上下文缓存失效
+
+        其他进程的缓存在下一轮校验消息版本时发现删除并重建。
 
-        return prompt
+        Args:
+            conversation_id: 对话UUID
+            message_id: 消息UUID
+
+        Returns:
+            删除成功返回True
+        """
+        success = await self.message_model.delete_message(message_id, conversation_id)
+        self._context_cache.invalidate(conversation_id)
+        return success
 
     def _format_metric_label(self, key: str) -> str:
         """格式化指标名称为中文标签
@@ -765,24 +835,7 @@ class ConversationService:
         Returns:
             对话记录，如果不存在返回None
         """
-        try:
-            result = (
-                self.supabase.table("conversations")
-                .select("*")
-                .eq("user_id", user_id)
-                .eq("agent_id", agent_id)
-                .execute()
-            )
-
-            if result.data and len(result.data) > 0:
-                return result.data[0]
-            return None
-
-        except Exception as e:
-            logger.error(
-                f"Error getting conversation for user={user_id}, agent={agent_id}: {e}"
-            )
-            return None
+        return await self.conversation_model.get_by_user_and_agent(user_id, agent_id)
 
     async def list_user_conversations(
         self, user_id: str, limit: int = 20
@@ -912,6 +965,14 @@ class ConversationService:
                         attachments=attachments,
                     )
 
+        except asyncio.CancelledError:
+            # 客户端取消 / 断开：保存已发送的部分回复（shield：保存过程中再次取消也要完成）
+            logger.info(
+                f"WS message generation cancelled in conversation {conversation_id}, "
+                f"partial response length: {len(ws_writer.accumulated_content)}"
+            )
+            await asyncio.shield(self._save_partial_reply_ws(conversation_id, ws_writer))
+            raise
         except asyncio.TimeoutError:
             logger.error(f"Conversation timeout after {timeout_seconds}s")
             # 超时时尝试刷新已缓冲的内容
@@ -926,6 +987,27 @@ class ConversationService:
             logger.error(f"Error in send_message_ws: {e}", exc_info=True)
             await ws_writer.write_error("消息处理失败，请稍后重试")
 
+    async def _save_partial_reply_ws(self, conversation_id: str, ws_writer: Any) -> None:
+        """保存被取消生成的部分回复（客户端已收到的内容）
+
+        Args:
+            conversation_id: 对话UUID
+            ws_writer: WebSocketWriter实例（保存后写入 message_id）
+        """
+        content = ws_writer.accumulated_content
+        if ws_writer.message_id or not content.strip():
+            return
+        try:
+            saved = await self.message_model.create_text_message(
+                conversation_id=conversation_id,
+                role="assistant",
+                content=content,
+            )
+            ws_writer.message_id = saved.get("id")
+            await self.conversation_model.update_last_message_time(conversation_id)
+        except Exception as e:
+            logger.error(f"Failed to save partial response: {e}")
+
     async def _execute_task_ws(
         self,
         conversation: Dict,
@@ -954,20 +1036,16 @@ class ConversationService:
             if result.get("briefing"):
                 briefing = result["briefing"]
                 # 通过metadata发送briefing_created事件
-                await ws_writer.websocket.send_json({
-                    "type": "briefing_created",
+                await ws_writer.write_event("briefing_created", {
                     "briefing_id": briefing["id"],
                     "title": briefing["title"],
                     "priority": briefing.get("priority", "P2"),
-                    "ts": asyncio.get_event_loop().time(),
                 })
                 briefing_title = briefing["title"]
             else:
-                await ws_writer.websocket.send_json({
-                    "type": "task_complete",
+                await ws_writer.write_event("task_complete", {
                     "briefing_created": False,
                     "reason": "importance_too_low",
-                    "ts": asyncio.get_event_loop().time(),
                 })
                 briefing_title = None
 
@@ -988,6 +1066,8 @@ class ConversationService:
             async for event in self.agent_service.execute_query(
                 prompt=summary_prompt,
                 agent_role=agent_role,
+                user_id=user_id,
+                on_queued=ws_writer.write_queue_position,
             ):
                 event_type = event.get("type")
                 # 支持细粒度流式输出 (text_delta) 和完整块 (text_chunk)
@@ -995,11 +1075,12 @@ class ConversationService:
                     await ws_writer.write_text_chunk(event.get("content", ""))
 
             # 4. 保存AI回复
-            await self.message_model.create_text_message(
+            saved = await self.message_model.create_text_message(
                 conversation_id=conversation["id"],
                 role="assistant",
                 content=ws_writer.accumulated_content,
             )
+            ws_writer.message_id = saved.get("id")
 
             # 5. 更新对话时间戳
             await self.conversation_model.update_last_message_time(conversation["id"])
@@ -1023,13 +1104,9 @@ class ConversationService:
         agent_role_task = asyncio.create_task(
             asyncio.to_thread(self._get_agent_role, conversation["agent_id"])
         )
-        messages_task = asyncio.create_task(
-            self.message_model.get_recent_messages(
-                conversation["id"], count=self.MAX_CONTEXT_MESSAGES
-            )
-        )
+        context_task = asyncio.create_task(self._get_context_prompt(conversation))
 
-        agent_role, messages = await asyncio.gather(agent_role_task, messages_task)
+        agent_role, context_prompt = await asyncio.gather(agent_role_task, context_task)
 
         # 处理附件图片（如果有）
         image_blocks = []
@@ -1038,9 +1115,6 @@ class ConversationService:
             if image_blocks:
                 logger.info(f"Downloaded and encoded {len(image_blocks)} images for multimodal analysis")
 
-        # 构建上下文
-        context_prompt = self._build_context_with_briefings(conversation, messages)
-
         # 如果有评审模式，添加对应的评审指令
         mode_prompt = self._get_mode_prompt(mode_id) if mode_id else ""
 
@@ -1083,86 +1157,90 @@ class ConversationService:
             except asyncio.CancelledError:
                 pass  # 正常取消
 
-        async for event in self.agent_service.execute_query(
-            prompt=full_prompt,
-            agent_role=agent_role,
-            image_blocks=image_blocks if image_blocks else None,
-        ):
-            event_type = event.get("type")
-            # 支持细粒度流式输出 (text_delta) 和完整块 (text_chunk)
-            if event_type in ("text_chunk", "text_delta"):
-                await ws_writer.write_text_chunk(event.get("content", ""))
-            elif event_type == "tool_use":
-                # 取消之前的进度任务（如果有）
-                if tool_progress_task:
-                    tool_progress_task.cancel()
-                    try:
-                        await tool_progress_task
-                    except asyncio.CancelledError:
-                        pass
-
-                tool_name = event.get("tool_name", "")
-                tool_id = event.get("tool_id", "")
-                tool_input = event.get("input", {})
-
-                # 提取状态信息
-                file_path = None
-                status_message = "正在执行..."
-                if tool_name == "Write":
-                    file_path = tool_input.get("file_path") if tool_input else None
-                    if file_path:
-                        status_message = f"正在生成: {file_path.split('/')[-1]}"
-                elif tool_name == "Bash":
-                    command = tool_input.get("command", "") if tool_input else ""
-                    if "skill" in command:
-                        status_message = "正在执行数据分析..."
-
-                current_tool_info = {
-                    "tool_name": tool_name,
-                    "tool_id": tool_id,
-                    "file_path": file_path,
-                    "status_message": status_message,
-                }
-
-                await ws_writer.write_tool_use(
-                    tool_name=tool_name,
-                    tool_id=tool_id,
-                    tool_input=tool_input,
-                )
-
-                # 启动进度心跳任务
-                tool_progress_task = asyncio.create_task(_send_tool_progress_heartbeat())
-
-            elif event_type == "tool_result":
-                # 取消进度心跳任务
-                if tool_progress_task:
-                    tool_progress_task.cancel()
-                    try:
-                        await tool_progress_task
-                    except asyncio.CancelledError:
-                        pass
-                    tool_progress_task = None
-
-                await ws_writer.write_tool_result(
-                    tool_id=event.get("tool_id", ""),
-                    result=event.get("result"),
-                    is_error=event.get("is_error", False),
-                )
+        try:
+            async for event in self.agent_service.execute_query(
+                prompt=full_prompt,
+                agent_role=agent_role,
+                image_blocks=image_blocks if image_blocks else None,
+                user_id=ws_writer.user_id,
+                on_queued=ws_writer.write_queue_position,
+            ):
+                event_type = event.get("type")
+                # 支持细粒度流式输出 (text_delta) 和完整块 (text_chunk)
+                if event_type in ("text_chunk", "text_delta"):
+                    await ws_writer.write_text_chunk(event.get("content", ""))
+                elif event_type == "tool_use":
+                    # 取消之前的进度任务（如果有）
+                    if tool_progress_task:
+                        tool_progress_task.cancel()
+                        try:
+                            await tool_progress_task
+                        except asyncio.CancelledError:
+                            pass
+
+                    tool_name = event.get("tool_name", "")
+                    tool_id = event.get("tool_id", "")
+                    tool_input = event.get("input", {})
+
+                    # 提取状态信息
+                    file_path = None
+                    status_message = "正在执行..."
+                    if tool_name == "Write":
+                        file_path = tool_input.get("file_path") if tool_input else None
+                        if file_path:
+                            status_message = f"正在生成: {file_path.split('/')[-1]}"
+                    elif tool_name == "Bash":
+                        command = tool_input.get("command", "") if tool_input else ""
+                        if "skill" in command:
+                            status_message = "正在执行数据分析..."
+
+                    current_tool_info = {
+                        "tool_name": tool_name,
+                        "tool_id": tool_id,
+                        "file_path": file_path,
+                        "status_message": status_message,
+                    }
+
+                    await ws_writer.write_tool_use(
+                        tool_name=tool_name,
+                        tool_id=tool_id,
+                        tool_input=tool_input,
+                    )
 
-        # 确保清理进度任务
-        if tool_progress_task:
-            tool_progress_task.cancel()
-            try:
-                await tool_progress_task
-            except asyncio.CancelledError:
-                pass
+                    # 启动进度心跳任务
+                    tool_progress_task = asyncio.create_task(_send_tool_progress_heartbeat())
+
+                elif event_type == "tool_result":
+                    # 取消进度心跳任务
+                    if tool_progress_task:
+                        tool_progress_task.cancel()
+                        try:
+                            await tool_progress_task
+                        except asyncio.CancelledError:
+                            pass
+                        tool_progress_task = None
+
+                    await ws_writer.write_tool_result(
+                        tool_id=event.get("tool_id", ""),
+                        result=event.get("result"),
+                        is_error=event.get("is_error", False),
+                    )
+        finally:
+            # 确保清理进度任务（包括生成被取消时）
+            if tool_progress_task:
+                tool_progress_task.cancel()
+                try:
+                    await tool_progress_task
+                except asyncio.CancelledError:
+                    pass
 
         # 保存AI回复
-        await self.message_model.create_text_message(
+        saved = await self.message_model.create_text_message(
             conversation_id=conversation["id"],
             role="assistant",
             content=ws_writer.accumulated_content,
         )
+        ws_writer.message_id = saved.get("id")
 
         # 更新对话时间戳
         await self.conversation_model.update_last_message_time(conversation["id"])
@@ -1185,28 +1263,20 @@ class ConversationService:
         """
         try:
             # 查询该对话的用户消息数量
-            result = (
-                self.supabase_client.table("messages")
-                .select("id", count="exact")
-                .eq("conversation_id", conversation_id)
-                .eq("role", "user")
-                .execute()
+            message_count = await self.message_model.count_by_role(
+                conversation_id, "user"
             )
-            
-            message_count = result.count if hasattr(result, 'count') else len(result.data)
-            
+
             # 只在第一条用户消息时自动生成标题
             if message_count == 1:
                 # 生成标题：取前30个字符
                 title = ' '.join(user_message.split())  # 去除多余空白
                 if len(title) > 30:
                     title = title[:30] + "..."
-                
+
                 # 更新对话标题
-                self.supabase_client.table("conversations").update(
-                    {"title": title}
-                ).eq("id", conversation_id).execute()
-                
+                await self.conversation_model.update_title(conversation_id, title)
+
                 logger.info(
                     f"Auto-generated conversation title: {title} "
                     f"(conversation_id={conversation_id})"
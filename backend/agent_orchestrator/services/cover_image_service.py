@@ -1,17 +1,37 @@
 """
 封面图片生成服务 - 为简报生成AI封面图片
+
+封面图按 (标题, 摘要, 风格) 的内容哈希寻址：
+- 同一内容只生成一次，跨用户、跨任务重跑复用
+- 三级缓存：进程内存 -> 本地磁盘 -> Supabase Storage（covers/<hash>.png）
+- 同一哈希的并发请求共享一次生成
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import tempfile
 import httpx
 import base64
-import random
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+from models.db_executor import get_db_executor
+
+from .client_registry import get_client_registry
+
 logger = logging.getLogger(__name__)
 
+# 本地磁盘缓存目录
+COVER_CACHE_DIR = os.getenv(
+    "COVER_IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "briefing-covers")
+)
+COVER_BUCKET = "briefing-covers"
+# 内容寻址封面在 bucket 中的目录
+COVER_STORAGE_PREFIX = "covers"
+
 
 class CoverImageService:
     """封面图片生成服务（使用 Gemini 3 Pro Image Preview）"""
@@ -36,29 +56,192 @@ class CoverImageService:
         "cosmic space scene with nebula clouds and distant planets, starfield background, deep purple and blue tones, epic and inspiring, 16:9 aspect ratio",
     ]
 
-    def __init__(self, gemini_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        gemini_api_key: Optional[str] = None,
+        cache_dir: Optional[str] = COVER_CACHE_DIR,
+    ):
         """
         初始化封面图片生成服务
 
         Args:
             gemini_api_key: Gemini API密钥（如未提供则从环境变量读取）
+            cache_dir: 本地磁盘缓存目录（None 表示不使用磁盘缓存）
         """
         self.api_key = gemini_api_key or os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             logger.warning("GEMINI_API_KEY not configured, cover image generation disabled")
 
+        self.cache_dir = cache_dir
+        # 内容哈希 -> {"url", "metadata"}
+        self._covers: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    # ==================== 内容寻址缓存 ====================
+
+    def select_style(self, title: str, summary: str) -> str:
+        """按内容确定性地选择风格模板（同一内容总是得到同一风格）"""
+        digest = hashlib.sha256(f"{title}\n{summary}".encode("utf-8")).digest()
+        return self.STYLE_TEMPLATES[int.from_bytes(digest[:4], "big") % len(self.STYLE_TEMPLATES)]
+
+    @staticmethod
+    def cover_key(title: str, summary: str, style_prompt: str) -> str:
+        """封面图的内容哈希"""
+        payload = json.dumps([title, summary, style_prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get_or_create_cover(
+        self,
+        title: str,
+        summary: str,
+        supabase_client: Any,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取内容对应的封面图（命中缓存时不调用 Gemini）
+
+        Args:
+            title: 简报标题
+            summary: 简报摘要
+            supabase_client: Supabase客户端
+
+        Returns:
+            {"url": 公开URL, "metadata": dict}，失败返回None
+        """
+        style_prompt = self.select_style(title, summary)
+        key = self.cover_key(title, summary, style_prompt)
+
+        cover = self._covers.get(key)
+        if cover is not None:
+            logger.debug(f"Cover image memory cache hit: {key[:12]}")
+            return cover
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(
+            self._load_or_generate(key, title, summary, style_prompt, supabase_client)
+        )
+        self._inflight[key] = future
+        try:
+            cover = await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+        if cover is not None:
+            self._covers[key] = cover
+        return cover
+
+    async def _load_or_generate(
+        self,
+        key: str,
+        title: str,
+        summary: str,
+        style_prompt: str,
+        supabase_client: Any,
+    ) -> Optional[Dict[str, Any]]:
+        db_executor = get_db_executor()
+        file_path = f"{COVER_STORAGE_PREFIX}/{key}.png"
+
+        # 1. 本地磁盘
+        cached = await db_executor.run(self._read_disk_cache, key)
+        if cached and cached.get("url"):
+            logger.info(f"Cover image disk cache hit: {key[:12]}")
+            return cached
+
+        # 2. Storage（其他实例或之前的运行已生成）
+        if supabase_client and await self._storage_exists(supabase_client, file_path):
+            url = supabase_client.storage.from_(COVER_BUCKET).get_public_url(file_path)
+            cover = {"url": url, "metadata": {"content_hash": key}}
+            await db_executor.run(self._write_disk_cache, key, cover, None)
+            logger.info(f"Cover image storage cache hit: {key[:12]}")
+            return cover
+
+        # 3. 生成（磁盘上已有图片但未上传成功时直接上传）
+        image_data = cached.get("image_data") if cached else None
+        metadata = cached.get("metadata") if cached else None
+        if image_data is None:
+            result = await self.generate_cover_image(title, summary, style_prompt=style_prompt)
+            if not result:
+                return None
+            image_data = result["image_data"]
+            metadata = {**result["metadata"], "content_hash": key}
+            await db_executor.run(self._write_disk_cache, key, {"metadata": metadata}, image_data)
+
+        url = await self._upload(image_data, file_path, supabase_client)
+        if not url:
+            return None
+
+        cover = {"url": url, "metadata": metadata}
+        await db_executor.run(self._write_disk_cache, key, cover, None)
+        return cover
+
+    async def _storage_exists(self, supabase_client: Any, file_path: str) -> bool:
+        folder, name = file_path.rsplit("/", 1)
+        try:
+            entries = await get_db_executor().run(
+                supabase_client.storage.from_(COVER_BUCKET).list,
+                folder,
+                {"search": name, "limit": 1},
+            )
+            return any(entry.get("name") == name for entry in entries or [])
+        except Exception as e:
+            logger.debug(f"Cover image storage lookup failed: {e}")
+            return False
+
+    def _read_disk_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取磁盘缓存（在线程池中执行）"""
+        if not self.cache_dir:
+            return None
+        meta_path = os.path.join(self.cache_dir, f"{key}.json")
+        image_path = os.path.join(self.cache_dir, f"{key}.png")
+        try:
+            cached: Dict[str, Any] = {}
+            if os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    cached = json.load(f)
+            if os.path.exists(image_path):
+                with open(image_path, "rb") as f:
+                    cached["image_data"] = f.read()
+            return cached or None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read cover image cache {key[:12]}: {e}")
+            return None
+
+    def _write_disk_cache(
+        self, key: str, cover: Dict[str, Any], image_data: Optional[bytes]
+    ) -> None:
+        """写入磁盘缓存（在线程池中执行，先写临时文件再替换）"""
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if image_data is not None:
+                image_path = os.path.join(self.cache_dir, f"{key}.png")
+                with open(image_path + ".tmp", "wb") as f:
+                    f.write(image_data)
+                os.replace(image_path + ".tmp", image_path)
+            meta_path = os.path.join(self.cache_dir, f"{key}.json")
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(cover, f, ensure_ascii=False)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            logger.warning(f"Failed to write cover image cache {key[:12]}: {e}")
+
     async def generate_cover_image(
         self,
         title: str,
         summary: str,
+        style_prompt: Optional[str] = None,
         **kwargs,  # 忽略其他参数（如 briefing_type, priority）
     ) -> Optional[Dict[str, Any]]:
         """
-        生成简报封面图片
+        生成简报封面图片（不经过缓存）
 
         Args:
             title: 简报标题
             summary: 简报摘要
+            style_prompt: 风格模板（默认按内容选择）
             **kwargs: 其他参数（忽略）
 
         Returns:
@@ -69,8 +252,8 @@ class CoverImageService:
             logger.warning("GEMINI_API_KEY not configured, skipping cover image generation")
             return None
 
-        # 随机选择一个风格模板
-        style_prompt = random.choice(self.STYLE_TEMPLATES)
+        # 按内容选择风格模板
+        style_prompt = style_prompt or self.select_style(title, summary)
 
         # 基于标题内容微调提示词
         enhanced_prompt = self._enhance_prompt(style_prompt, title, summary)
@@ -170,27 +353,27 @@ class CoverImageService:
         }
 
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
-                result = response.json()
-
-                # 解析返回的图片数据
-                # 响应格式：candidates[0].content.parts[].inlineData.data (base64)
-                candidates = result.get("candidates", [])
-                if candidates:
-                    parts = candidates[0].get("content", {}).get("parts", [])
-                    for part in parts:
-                        if "inlineData" in part:
-                            inline_data = part["inlineData"]
-                            image_base64 = inline_data.get("data")
-                            mime_type = inline_data.get("mimeType", "image/png")
-                            if image_base64:
-                                logger.info(f"Successfully generated image with mime type: {mime_type}")
-                                return base64.b64decode(image_base64)
-
-                logger.warning("No image data in Gemini response")
-                return None
+            client = get_client_registry().http("gemini")
+            response = await client.post(url, json=data, headers=headers)
+            response.raise_for_status()
+            result = response.json()
+
+            # 解析返回的图片数据
+            # 响应格式：candidates[0].content.parts[].inlineData.data (base64)
+            candidates = result.get("candidates", [])
+            if candidates:
+                parts = candidates[0].get("content", {}).get("parts", [])
+                for part in parts:
+                    if "inlineData" in part:
+                        inline_data = part["inlineData"]
+                        image_base64 = inline_data.get("data")
+                        mime_type = inline_data.get("mimeType", "image/png")
+                        if image_base64:
+                            logger.info(f"Successfully generated image with mime type: {mime_type}")
+                            return base64.b64decode(image_base64)
+
+            logger.warning("No image data in Gemini response")
+            return None
 
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error calling Gemini API: {e.response.status_code} - {e.response.text}")
@@ -219,28 +402,33 @@ class CoverImageService:
         Returns:
             图片的公开URL，失败返回None
         """
+        return await self._upload(image_data, f"{briefing_id}.png", supabase_client)
+
+    async def _upload(
+        self, image_data: bytes, file_path: str, supabase_client: Any
+    ) -> Optional[str]:
+        """上传图片（在线程池中执行，覆盖同名文件），返回公开URL"""
         if not supabase_client:
             logger.warning("Supabase client not provided, cannot upload image")
             return None
 
-        bucket_name = "briefing-covers"
-        file_path = f"{briefing_id}.png"
-
+        bucket = supabase_client.storage.from_(COVER_BUCKET)
         try:
             # 上传到Supabase Storage
-            result = supabase_client.storage.from_(bucket_name).upload(
+            result = await get_db_executor().run(
+                bucket.upload,
                 path=file_path,
                 file=image_data,
-                file_options={"content-type": "image/png"},
+                file_options={"content-type": "image/png", "upsert": "true"},
             )
 
             if result:
                 # 获取公开URL
-                public_url = supabase_client.storage.from_(bucket_name).get_public_url(file_path)
-                logger.info(f"Uploaded cover image for briefing {briefing_id}: {public_url}")
+                public_url = bucket.get_public_url(file_path)
+                logger.info(f"Uploaded cover image {file_path}: {public_url}")
                 return public_url
             else:
-                logger.error(f"Failed to upload cover image for briefing {briefing_id}")
+                logger.error(f"Failed to upload cover image {file_path}")
                 return None
 
         except Exception as e:
@@ -0,0 +1,310 @@
+"""
+Image Pipeline - 附件图片处理管线
+
+将用户上传的附件图片转换为 Claude 多模态图片块：
+- 使用进程级共享的 httpx.AsyncClient（ClientRegistry 的 attachments 连接池），多张图片并发下载
+- 流式下载并限制大小（超限立即中止，不读取剩余内容）
+- 在有界线程池中缩放 / 重新编码到模型的最大有效分辨率，不阻塞事件循环
+- 编码结果按内容哈希缓存；同一 URL 再次发送时直接命中，不重新下载
+
+Pillow 未安装时跳过缩放，原图在大小限制内直接编码。
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from .client_registry import get_client_registry
+
+logger = logging.getLogger(__name__)
+
+# 下载原图的大小上限
+MAX_DOWNLOAD_BYTES = int(os.getenv("IMAGE_MAX_DOWNLOAD_BYTES", str(20 * 1024 * 1024)))
+# 模型的最大有效边长（更大的图片会被服务端缩小，上传原图只增加延迟和 token）
+MAX_IMAGE_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1568"))
+# 单张图片编码后的大小上限（API 限制 5MB）
+MAX_ENCODED_BYTES = 5 * 1024 * 1024
+# 编码结果缓存的总大小
+CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# URL -> 内容哈希映射的最大条目数
+URL_CACHE_MAX_ENTRIES = 4096
+
+DOWNLOAD_CONCURRENCY = 4
+ENCODE_MAX_WORKERS = 2
+JPEG_QUALITY = 85
+
+SUPPORTED_MEDIA_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+
+class ImageTooLargeError(Exception):
+    """图片超过下载大小上限"""
+
+
+def _prepare_image(data: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """缩放并重新编码图片（在线程池中执行）
+
+    尺寸和大小都在限制内的图片原样返回；否则等比缩放到 MAX_IMAGE_EDGE，
+    有透明通道的保存为 PNG，其余保存为 JPEG。
+
+    Returns:
+        (图片数据, media_type)
+    """
+    if not PIL_AVAILABLE:
+        return data, mime_type
+
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        if (
+            max(width, height) <= MAX_IMAGE_EDGE
+            and len(data) <= MAX_ENCODED_BYTES
+            and mime_type in SUPPORTED_MEDIA_TYPES
+        ):
+            return data, mime_type
+
+        if getattr(image, "is_animated", False):
+            image.seek(0)
+        image.thumbnail((MAX_IMAGE_EDGE, MAX_IMAGE_EDGE), Image.LANCZOS)
+
+        has_alpha = image.mode in ("RGBA", "LA") or (
+            image.mode == "P" and "transparency" in image.info
+        )
+        output = io.BytesIO()
+        if has_alpha:
+            image.save(output, format="PNG", optimize=True)
+            if output.tell() <= MAX_ENCODED_BYTES:
+                return output.getvalue(), "image/png"
+            output = io.BytesIO()
+
+        image.convert("RGB").save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return output.getvalue(), "image/jpeg"
+
+
+class ImagePipeline:
+    """附件图片处理管线"""
+
+    def __init__(
+        self,
+        download_concurrency: int = DOWNLOAD_CONCURRENCY,
+        encode_workers: int = ENCODE_MAX_WORKERS,
+        max_download_bytes: int = MAX_DOWNLOAD_BYTES,
+        cache_max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        """
+        Args:
+            download_concurrency: 最大并发下载数
+            encode_workers: 缩放 / 编码线程数
+            max_download_bytes: 原图大小上限
+            cache_max_bytes: 编码结果缓存的总大小
+        """
+        self.download_concurrency = download_concurrency
+        self.encode_workers = encode_workers
+        self.max_download_bytes = max_download_bytes
+        self.cache_max_bytes = cache_max_bytes
+
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 内容哈希 -> 图片块；URL -> 内容哈希
+        self._blocks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._block_sizes: Dict[str, int] = {}
+        self._url_hashes: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_bytes = 0
+
+        # 同一 URL 的并发请求共享一次下载
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """共享客户端（生命周期由 ClientRegistry 管理）"""
+        return get_client_registry().http("attachments")
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.encode_workers,
+                thread_name_prefix="image-encode",
+            )
+        return self._pool
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.download_concurrency)
+        return self._semaphore
+
+    # ==================== 缓存 ====================
+
+    def _cache_get_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        content_hash = self._url_hashes.get(url)
+        if content_hash is None:
+            return None
+        block = self._blocks.get(content_hash)
+        if block is None:
+            del self._url_hashes[url]
+            return None
+        self._url_hashes.move_to_end(url)
+        self._blocks.move_to_end(content_hash)
+        return block
+
+    def _cache_put(self, url: str, content_hash: str, block: Dict[str, Any]) -> None:
+        self._url_hashes[url] = content_hash
+        self._url_hashes.move_to_end(url)
+        if content_hash not in self._blocks:
+            size = len(block["source"]["data"])
+            self._blocks[content_hash] = block
+            self._block_sizes[content_hash] = size
+            self._cache_bytes += size
+        self._blocks.move_to_end(content_hash)
+
+        while self._cache_bytes > self.cache_max_bytes and len(self._blocks) > 1:
+            evicted, _ = self._blocks.popitem(last=False)
+            self._cache_bytes -= self._block_sizes.pop(evicted)
+
+        while len(self._url_hashes) > URL_CACHE_MAX_ENTRIES:
+            self._url_hashes.popitem(last=False)
+
+    # ==================== 下载 / 编码 ====================
+
+    async def _download(self, url: str) -> bytes:
+        """流式下载，超过大小上限时立即中止"""
+        async with self._get_semaphore():
+            async with self._get_client().stream("GET", url) as response:
+                response.raise_for_status()
+
+                content_length = response.headers.get("Content-Length")
+                if content_length and int(content_length) > self.max_download_bytes:
+                    raise ImageTooLargeError(f"{content_length} bytes")
+
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    received += len(chunk)
+                    if received > self.max_download_bytes:
+                        raise ImageTooLargeError(f"> {self.max_download_bytes} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks)
+
+    def _encode(self, data: bytes, mime_type: str) -> Dict[str, Any]:
+        """缩放、编码为图片块（在线程池中执行）"""
+        image_data, media_type = _prepare_image(data, mime_type)
+        return {
+            "type": "image",
+            "source": {
+                "type": "base64",
+                "media_type": media_type,
+                "data": base64.standard_b64encode(image_data).decode("utf-8"),
+            },
+        }
+
+    async def _load(self, url: str, mime_type: str) -> Dict[str, Any]:
+        data = await self._download(url)
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        block = self._blocks.get(content_hash)
+        if block is None:
+            loop = asyncio.get_running_loop()
+            block = await loop.run_in_executor(self._get_pool(), self._encode, data, mime_type)
+        self._cache_put(url, content_hash, block)
+        return block
+
+    async def get_image_block(self, url: str, mime_type: str) -> Dict[str, Any]:
+        """获取单张图片的内容块（带缓存）
+
+        Args:
+            url: 图片地址
+            mime_type: 附件声明的 MIME 类型
+
+        Returns:
+            Claude 多模态图片块
+        """
+        block = self._cache_get_by_url(url)
+        if block is not None:
+            logger.debug(f"Image cache hit: {url[:50]}...")
+            return block
+
+        inflight = self._inflight.get(url)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.ensure_future(self._load(url, mime_type))
+        self._inflight[url] = future
+        future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def build_image_blocks(self, attachments: List[Dict]) -> List[Dict[str, Any]]:
+        """并发下载附件图片并转换为图片块（保持附件顺序，失败的图片跳过）
+
+        Args:
+            attachments: 附件列表 [{id, url, mime_type}]
+
+        Returns:
+            图片内容块列表，可直接用于 Claude 多模态
+        """
+        targets = []
+        for attachment in attachments:
+            url = attachment.get("url")
+            mime_type = attachment.get("mime_type", "image/jpeg")
+
+            if not url:
+                continue
+
+            # 只处理图片类型
+            if not mime_type.startswith("image/"):
+                logger.info(f"Skipping non-image attachment: {mime_type}")
+                continue
+
+            targets.append((url, mime_type))
+
+        results = await asyncio.gather(
+            *(self.get_image_block(url, mime_type) for url, mime_type in targets),
+            return_exceptions=True,
+        )
+
+        image_blocks = []
+        for (url, _), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Failed to download image {url}: {result}")
+                continue
+            image_blocks.append(result)
+            logger.info(f"Downloaded and encoded image: {url[:50]}...")
+
+        return image_blocks
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_images": len(self._blocks),
+            "cached_bytes": self._cache_bytes,
+            "cached_urls": len(self._url_hashes),
+        }
+
+    async def close(self) -> None:
+        """关闭线程池（共享 HTTP 客户端由 ClientRegistry 关闭）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        self._semaphore = None
+        logger.info("Image pipeline closed")
+
+
+# 全局实例
+_image_pipeline: Optional[ImagePipeline] = None
+
+
+def get_image_pipeline() -> ImagePipeline:
+    """获取全局图片处理管线"""
+    global _image_pipeline
+    if _image_pipeline is None:
+        _image_pipeline = ImagePipeline()
+    return _image_pipeline
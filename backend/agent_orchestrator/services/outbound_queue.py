@@ -0,0 +1,232 @@
+"""
+Outbound Queue - 每个 WebSocket 连接的有界发送队列
+
+移动端网络慢时 websocket.send 会阻塞在传输层缓冲上。WebSocketWriter 直接 await 发送
+会拖慢 Agent 事件迭代，因此写入器只把事件放入连接的发送队列，由独立的 sender 任务发送：
+
+- 队列有界（WS_OUTBOUND_QUEUE_SIZE 帧）
+- 相邻的 text_chunk 在队列中合并为一帧（seq 取最后一个），慢客户端收到更少、更大的帧，
+  文本不会占满队列
+- 进度事件（tool_progress / task_progress / queued）可降级：队列中已有同一来源未发送的
+  进度时移除旧的、只保留最新一条（追加到队尾，帧的 seq 保持递增）；队列已满时直接丢弃
+- 其他事件在队列满时等待空位，超过 WS_OUTBOUND_STALL_TIMEOUT 秒仍无空位视为客户端卡死，
+  put 返回 False，由调用方断开连接（绑定 stream 的回复可在重连后续传）
+- 指标：队列深度、合并 / 丢弃 / 降级计数、发送耗时（按 ConnectionManager 汇总）
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多排队的帧数
+OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "64"))
+# 队列满时等待空位的最长时间（秒）
+OUTBOUND_STALL_TIMEOUT = float(os.getenv("WS_OUTBOUND_STALL_TIMEOUT", "15"))
+
+# 保留的最近发送耗时样本数
+SEND_LATENCY_SAMPLE_SIZE = 512
+
+TEXT_EVENT = "text_chunk"
+# 可降级 / 丢弃的进度事件
+PROGRESS_EVENTS = frozenset({"tool_progress", "task_progress", "queued"})
+
+
+class OutboundMetrics:
+    """所有连接共享的发送队列指标"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = {
+            "enqueued": 0,
+            "sent": 0,
+            "coalesced": 0,
+            "degraded": 0,
+            "dropped": 0,
+            "stalled": 0,
+            "send_errors": 0,
+        }
+        self.max_depth = 0
+        self._latency: Deque[float] = deque(maxlen=SEND_LATENCY_SAMPLE_SIZE)
+
+    def record_send(self, latency: float) -> None:
+        self.counters["sent"] += 1
+        self._latency.append(latency)
+
+    def record_depth(self, depth: int) -> None:
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._latency)
+        return {
+            **self.counters,
+            "max_depth": self.max_depth,
+            "send_latency_ms": {
+                "avg": round(sum(samples) / len(samples) * 1000, 2) if samples else None,
+                "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2) if samples else None,
+                "max": round(samples[-1] * 1000, 2) if samples else None,
+            },
+        }
+
+
+def _progress_key(frame: Dict[str, Any]) -> Any:
+    """进度事件的来源（同一来源只保留最新一条）"""
+    return (frame.get("type"), frame.get("tool_id"))
+
+
+class OutboundQueue:
+    """单个连接的有界发送队列（独立 sender 任务发送）"""
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[None]],
+        metrics: Optional[OutboundMetrics] = None,
+        maxsize: int = OUTBOUND_QUEUE_SIZE,
+        stall_timeout: float = OUTBOUND_STALL_TIMEOUT,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ):
+        """
+        Args:
+            send: 实际发送一帧的协程函数
+            metrics: 共享指标
+            maxsize: 最多排队的帧数
+            stall_timeout: 队列满时等待空位的最长时间（秒）
+            on_error: 发送失败时的回调（用于断开连接）
+        """
+        self._send = send
+        self.metrics = metrics or OutboundMetrics()
+        self.maxsize = max(1, maxsize)
+        self.stall_timeout = stall_timeout
+        self._on_error = on_error
+
+        self._frames: Deque[Dict[str, Any]] = deque()
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._sender: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def _coalesce(self, frame: Dict[str, Any]) -> bool:
+        """合并到队尾未发送的文本帧"""
+        if frame.get("type") != TEXT_EVENT or not self._frames:
+            return False
+        last = self._frames[-1]
+        if last.get("type") != TEXT_EVENT:
+            return False
+        last["content"] = (last.get("content") or "") + (frame.get("content") or "")
+        if "seq" in frame:
+            last["seq"] = frame["seq"]
+        self.metrics.counters["coalesced"] += 1
+        return True
+
+    def _degrade(self, frame: Dict[str, Any]) -> bool:
+        """移除队列中同一来源未发送的进度（新进度追加到队尾，保持 seq 递增）
+
+        被移除进度两侧的文本帧随之合并。
+        """
+        key = _progress_key(frame)
+        for i in range(len(self._frames) - 1, -1, -1):
+            if self._frames[i].get("type") in PROGRESS_EVENTS and _progress_key(self._frames[i]) == key:
+                del self._frames[i]
+                if 0 < i < len(self._frames):
+                    prev, nxt = self._frames[i - 1], self._frames[i]
+                    if prev.get("type") == TEXT_EVENT and nxt.get("type") == TEXT_EVENT:
+                        prev["content"] = (prev.get("content") or "") + (nxt.get("content") or "")
+                        if "seq" in nxt:
+                            prev["seq"] = nxt["seq"]
+                        del self._frames[i]
+                        self.metrics.counters["coalesced"] += 1
+                self.metrics.counters["degraded"] += 1
+                return True
+        return False
+
+    def _push(self, frame: Dict[str, Any]) -> None:
+        self._frames.append(frame)
+        self.metrics.counters["enqueued"] += 1
+        self.metrics.record_depth(len(self._frames))
+        if len(self._frames) >= self.maxsize:
+            self._space.clear()
+        self._ready.set()
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+
+    async def put(self, payload: Dict[str, Any]) -> bool:
+        """放入一帧（payload 会被复制，合并不影响调用方持有的事件）
+
+        Returns:
+            是否已入队（进度事件被丢弃也返回 True）；连接已关闭或队列持续满时返回 False
+        """
+        if self.closed:
+            return False
+        frame = dict(payload)
+        if self._coalesce(frame):
+            return True
+
+        event_type = frame.get("type")
+        if event_type in PROGRESS_EVENTS:
+            if not self._degrade(frame) and len(self._frames) >= self.maxsize:
+                self.metrics.counters["dropped"] += 1
+                return True
+            self._push(frame)
+            return True
+
+        if len(self._frames) >= self.maxsize:
+            deadline = time.monotonic() + self.stall_timeout
+            while len(self._frames) >= self.maxsize and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics.counters["stalled"] += 1
+                    return False
+                try:
+                    await asyncio.wait_for(self._space.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    continue
+            if self.closed:
+                return False
+            # 等待期间队尾可能变成文本帧
+            if self._coalesce(frame):
+                return True
+        self._push(frame)
+        return True
+
+    async def _send_loop(self) -> None:
+        try:
+            while not self.closed:
+                if not self._frames:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                frame = self._frames.popleft()
+                if len(self._frames) < self.maxsize:
+                    self._space.set()
+                started = time.perf_counter()
+                await self._send(frame)
+                self.metrics.record_send(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.metrics.counters["send_errors"] += 1
+            logger.warning(f"Failed to send queued message: {e}")
+            self.close()
+            if self._on_error is not None:
+                self._on_error(e)
+
+    def close(self) -> None:
+        """关闭队列：丢弃未发送的帧并停止 sender 任务"""
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        self._space.set()
+        self._ready.set()
+        sender, self._sender = self._sender, None
+        if sender is not None and sender is not asyncio.current_task():
+            sender.cancel()
@@ -7,9 +7,10 @@ import base64
 import logging
 from typing import List, Dict, Optional
 from datetime import datetime, time
-import requests
 from supabase import Client
 
+from .client_registry import get_client_registry
+
 logger = logging.getLogger(__name__)
 
 
@@ -302,11 +303,11 @@ class PushNotificationService:
                 "Content-Type": "application/json"
             }
 
-            response = requests.post(
+            # 共享连接池异步发送（keep-alive，扇出时不重复握手）
+            response = await get_client_registry().http("jpush").post(
                 self.jpush_api_url,
                 json=payload,
                 headers=headers,
-                timeout=10
             )
 
             # Log result
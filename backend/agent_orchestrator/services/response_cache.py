@@ -0,0 +1,206 @@
+"""
+Response Cache - 读多写少接口的响应缓存
+
+APP 每次启动都会请求版本检查、法律文档、Agent 列表、技能模板等接口，
+这些数据很少变化，却每次都查询数据库或扫描磁盘。ResponseCache：
+
+- 按 (namespace, key) 缓存加载结果，TTL 过期后重新加载；写操作显式 invalidate
+- 同一 key 的并发加载共享一次（冷启动高峰只查询一次）
+- 响应体序列化一次并计算强 ETag（内容 sha256）；请求带 If-None-Match 且匹配时返回 304，
+  不传输响应体
+- 加载失败（异常）不缓存
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# 默认缓存时间（秒）
+DEFAULT_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+# 客户端可直接复用的时间（秒），过期后带 If-None-Match 重新验证
+DEFAULT_CLIENT_MAX_AGE = int(os.getenv("RESPONSE_CACHE_CLIENT_MAX_AGE", "60"))
+
+
+def render_json(payload: Any) -> Tuple[bytes, str]:
+    """序列化响应体并计算强 ETag
+
+    Returns:
+        (body, etag)
+    """
+    body = json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较，支持多个值和 *）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def json_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    max_age: int = DEFAULT_CLIENT_MAX_AGE,
+) -> Response:
+    """返回带 ETag 的 JSON 响应，If-None-Match 命中时返回 304"""
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={max_age}, must-revalidate"}
+    if etag_matches(request, etag):
+        get_response_cache().record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+class _Entry:
+    """单个缓存项（值 + 延迟序列化的响应体）"""
+
+    __slots__ = ("value", "expires_at", "rendered")
+
+    def __init__(self, value: Any, ttl: float):
+        self.value = value
+        self.expires_at = time.monotonic() + ttl
+        self.rendered: Optional[Tuple[bytes, str]] = None
+
+
+class ResponseCache:
+    """TTL + 显式失效的进程内响应缓存"""
+
+    def __init__(self, default_ttl: float = DEFAULT_CACHE_TTL):
+        """
+        Args:
+            default_ttl: 默认缓存时间（秒）
+        """
+        self.default_ttl = default_ttl
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._metrics: Dict[str, int] = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    async def _get_entry(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+    ) -> _Entry:
+        cache_key = (namespace, key)
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._metrics["hits"] += 1
+            return entry
+
+        inflight = self._inflight.get(cache_key)
+        if inflight is None:
+            self._metrics["misses"] += 1
+
+            async def load() -> _Entry:
+                try:
+                    loaded = _Entry(await loader(), self.default_ttl if ttl is None else ttl)
+                    self._entries[cache_key] = loaded
+                    return loaded
+                finally:
+                    self._inflight.pop(cache_key, None)
+
+            inflight = asyncio.ensure_future(load())
+            self._inflight[cache_key] = inflight
+        else:
+            self._metrics["hits"] += 1
+        # shield：单个请求被取消不影响其他等待同一次加载的请求
+        return await asyncio.shield(inflight)
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """读取缓存值，未命中或已过期时调用 loader 加载
+
+        Args:
+            namespace: 命名空间（用于整体失效）
+            key: 缓存键
+            loader: 异步加载函数（抛出异常时不缓存）
+            ttl: 缓存时间（秒），默认 default_ttl
+
+        Returns:
+            loader 的返回值
+        """
+        return (await self._get_entry(namespace, key, loader, ttl)).value
+
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        max_age: int = DEFAULT_CLIENT_MAX_AGE,
+    ) -> Response:
+        """返回缓存的 JSON 响应（响应体和 ETag 每个缓存项只计算一次）
+
+        Args:
+            request: 当前请求（读取 If-None-Match）
+            namespace: 命名空间
+            key: 缓存键
+            loader: 异步加载函数，返回可 JSON 序列化的响应数据
+            ttl: 服务端缓存时间（秒）
+            max_age: 客户端缓存时间（秒）
+        """
+        entry = await self._get_entry(namespace, key, loader, ttl)
+        if entry.rendered is None:
+            entry.rendered = render_json(entry.value)
+        body, etag = entry.rendered
+        return json_response(request, body, etag, max_age)
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> None:
+        """使缓存失效
+
+        Args:
+            namespace: 命名空间
+            key: 缓存键，None 表示整个命名空间
+        """
+        if key is not None:
+            removed = 1 if self._entries.pop((namespace, key), None) else 0
+        else:
+            keys = [k for k in self._entries if k[0] == namespace]
+            for k in keys:
+                del self._entries[k]
+            removed = len(keys)
+        self._metrics["invalidations"] += 1
+        logger.debug(f"Response cache invalidated: {namespace}/{key or '*'} ({removed} entries)")
+
+    def record_not_modified(self) -> None:
+        self._metrics["not_modified"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._metrics, "entries": len(self._entries)}
+
+
+# 全局实例
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -0,0 +1,279 @@
+"""
+Stream Buffer - 可续传的回复流
+
+移动端网络切换时 WebSocket 经常在回复中途断开。为避免重新发送消息导致重复运行 Agent，
+每次回复生成对应一个 stream：
+
+- 每个事件分配递增的 seq，保存在有界的内存环形缓冲中，溢出的旧事件追加写入磁盘（JSONL）
+- 连接断开时 stream 进入 detached 状态，生成继续进行并写入缓冲（不再发送）
+- 客户端重连后发送 {"type": "resume", "stream_id": ..., "last_seq": n}，
+  服务端补发 seq > n 的事件后重新 attach，继续实时推送
+- 生成结束后 stream 保留 WS_STREAM_RETENTION 秒供晚到的重连补发，随后删除
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, IO, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每个 stream 保留在内存中的事件数，超出部分写入磁盘
+STREAM_BUFFER_EVENTS = int(os.getenv("WS_STREAM_BUFFER_EVENTS", "512"))
+# 生成结束后保留 stream 的时间（秒）
+STREAM_RETENTION = float(os.getenv("WS_STREAM_RETENTION", "120"))
+# 溢出事件的磁盘目录
+STREAM_SPILL_DIR = os.getenv(
+    "WS_STREAM_SPILL_DIR", os.path.join(tempfile.gettempdir(), "ws-streams")
+)
+
+
+class StreamBuffer:
+    """单次回复生成的事件缓冲（内存环形缓冲 + 磁盘溢出）"""
+
+    def __init__(
+        self,
+        conversation_id: str,
+        user_id: str,
+        capacity: int = STREAM_BUFFER_EVENTS,
+        spill_dir: str = STREAM_SPILL_DIR,
+        stream_id: Optional[str] = None,
+    ):
+        """
+        Args:
+            conversation_id: 对话ID
+            user_id: 用户ID
+            capacity: 内存中保留的事件数
+            spill_dir: 溢出事件的磁盘目录
+            stream_id: 流ID（默认随机生成）
+        """
+        self.stream_id = stream_id or uuid.uuid4().hex
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.capacity = max(1, capacity)
+        self.spill_dir = spill_dir
+
+        self.last_seq = 0
+        self.finished = False
+        # 正在接收实时事件的连接（None 表示 detached）
+        self.subscriber: Optional[Any] = None
+
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._spill_file: Optional[IO[str]] = None
+        self._spilled = 0
+
+    @property
+    def attached(self) -> bool:
+        return self.subscriber is not None
+
+    @property
+    def spill_path(self) -> str:
+        return os.path.join(self.spill_dir, f"{self.stream_id}.jsonl")
+
+    @property
+    def first_buffered_seq(self) -> int:
+        """内存中最早事件的 seq（早于它的事件在磁盘上）"""
+        return self._events[0]["seq"] if self._events else self.last_seq + 1
+
+    @property
+    def spilled(self) -> int:
+        return self._spilled
+
+    def append(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """追加事件并分配 seq
+
+        Args:
+            event: 事件字典（会写入 seq 字段）
+
+        Returns:
+            带 seq 的事件
+        """
+        self.last_seq += 1
+        event["seq"] = self.last_seq
+        self._events.append(event)
+        if len(self._events) > self.capacity:
+            self._spill(self._events.popleft())
+        return event
+
+    def _spill(self, event: Dict[str, Any]) -> None:
+        try:
+            if self._spill_file is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+            self._spill_file.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._spilled += 1
+        except OSError as e:
+            # 磁盘不可用时丢弃最旧事件，续传时从内存中最早的事件开始
+            logger.warning(f"Failed to spill stream {self.stream_id}: {e}")
+
+    def _read_spilled(self, after_seq: int, before_seq: int) -> List[Dict[str, Any]]:
+        events = []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # 读取期间事件循环仍在追加（尾部未写完的行），之后的事件已在快照中
+                    break
+                if event["seq"] >= before_seq:
+                    break
+                if event["seq"] > after_seq:
+                    events.append(event)
+        return events
+
+    async def replay(self, after_seq: int) -> List[Dict[str, Any]]:
+        """返回 seq > after_seq 的事件（先磁盘后内存，按 seq 有序）"""
+        # 先同步快照内存中的事件，磁盘部分只读取快照之前的 seq
+        buffered = list(self._events)
+        boundary = buffered[0]["seq"] if buffered else self.last_seq + 1
+        events: List[Dict[str, Any]] = []
+        if after_seq + 1 < boundary and self._spill_file is not None:
+            self._spill_file.flush()
+            events = await asyncio.to_thread(self._read_spilled, after_seq, boundary)
+        events.extend(e for e in buffered if e["seq"] > after_seq)
+        return events
+
+    def close(self) -> None:
+        """释放缓冲并删除溢出文件"""
+        self._events.clear()
+        if self._spill_file is not None:
+            try:
+                self._spill_file.close()
+                os.remove(self.spill_path)
+            except OSError as e:
+                logger.debug(f"Failed to remove spill file {self.spill_path}: {e}")
+            self._spill_file = None
+
+
+class StreamRegistry:
+    """进程内的 stream 注册表"""
+
+    def __init__(
+        self,
+        capacity: int = STREAM_BUFFER_EVENTS,
+        retention: float = STREAM_RETENTION,
+        spill_dir: str = STREAM_SPILL_DIR,
+    ):
+        """
+        Args:
+            capacity: 每个 stream 在内存中保留的事件数
+            retention: 生成结束后保留 stream 的时间（秒）
+            spill_dir: 溢出事件的磁盘目录
+        """
+        self.capacity = capacity
+        self.retention = retention
+        self.spill_dir = spill_dir
+        self._streams: Dict[str, StreamBuffer] = {}
+        self._expiry: Dict[str, asyncio.TimerHandle] = {}
+        self._metrics: Dict[str, int] = {"created": 0, "resumed": 0, "resume_misses": 0, "detached": 0}
+
+    def create(self, conversation_id: str, user_id: str, subscriber: Optional[Any] = None) -> StreamBuffer:
+        """为一次回复生成创建 stream
+
+        Args:
+            conversation_id: 对话ID
+            user_id: 用户ID
+            subscriber: 接收实时事件的连接
+        """
+        stream = StreamBuffer(conversation_id, user_id, self.capacity, self.spill_dir)
+        stream.subscriber = subscriber
+        self._streams[stream.stream_id] = stream
+        self._metrics["created"] += 1
+        return stream
+
+    def get(self, stream_id: str) -> Optional[StreamBuffer]:
+        return self._streams.get(stream_id)
+
+    def find_active(self, conversation_id: str, user_id: str) -> Optional[StreamBuffer]:
+        """查找对话中尚未结束的 stream（用于重连时提示客户端续传）"""
+        for stream in self._streams.values():
+            if (
+                not stream.finished
+                and stream.conversation_id == conversation_id
+                and stream.user_id == user_id
+            ):
+                return stream
+        return None
+
+    def detach(self, stream: StreamBuffer, subscriber: Optional[Any] = None) -> None:
+        """连接断开：停止实时发送，继续缓冲
+
+        Args:
+            stream: 目标 stream
+            subscriber: 断开的连接；提供时仅当 stream 仍绑定该连接才 detach
+                （避免旧连接的清理把已续传到新连接的 stream 断开）
+        """
+        if subscriber is not None and stream.subscriber is not subscriber:
+            return
+        if stream.attached:
+            stream.subscriber = None
+            self._metrics["detached"] += 1
+            logger.info(
+                f"Stream detached: stream={stream.stream_id}, "
+                f"conversation={stream.conversation_id}, seq={stream.last_seq}"
+            )
+
+    def attach(self, stream: StreamBuffer, subscriber: Any) -> None:
+        """续传完成：新连接开始接收实时事件"""
+        stream.subscriber = subscriber
+        self._metrics["resumed"] += 1
+        logger.info(
+            f"Stream resumed: stream={stream.stream_id}, "
+            f"conversation={stream.conversation_id}, seq={stream.last_seq}"
+        )
+
+    def record_resume_miss(self) -> None:
+        self._metrics["resume_misses"] += 1
+
+    def finish(self, stream: StreamBuffer) -> None:
+        """生成结束：保留 retention 秒后删除"""
+        stream.finished = True
+        if stream.stream_id in self._expiry:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.remove(stream.stream_id)
+            return
+        self._expiry[stream.stream_id] = loop.call_later(
+            self.retention, self.remove, stream.stream_id
+        )
+
+    def remove(self, stream_id: str) -> None:
+        handle = self._expiry.pop(stream_id, None)
+        if handle is not None:
+            handle.cancel()
+        stream = self._streams.pop(stream_id, None)
+        if stream is not None:
+            stream.close()
+
+    def stats(self) -> Dict[str, Any]:
+        streams = list(self._streams.values())
+        return {
+            **self._metrics,
+            "streams": len(streams),
+            "live": sum(1 for s in streams if not s.finished),
+            "detached_live": sum(1 for s in streams if not s.finished and not s.attached),
+            "spilled_events": sum(s.spilled for s in streams),
+        }
+
+    def close(self) -> None:
+        """删除所有 stream（进程退出时）"""
+        for stream_id in list(self._streams):
+            self.remove(stream_id)
+
+
+# 全局实例
+_stream_registry: Optional[StreamRegistry] = None
+
+
+def get_stream_registry() -> StreamRegistry:
+    """获取全局 stream 注册表"""
+    global _stream_registry
+    if _stream_registry is None:
+        _stream_registry = StreamRegistry()
+    return _stream_registry
@@ -2,6 +2,9 @@
 任务执行服务 - Task Execution Service
 
 封装对话触发任务的执行逻辑，复用现有的简报生成系统。
+
+配置了任务队列时（api / worker 分进程部署），即时任务写入队列由 worker 执行，
+API 进程只等待结果，不在服务 WebSocket 的事件循环中运行 Agent 分析。
 """
 
 import logging
@@ -41,6 +44,7 @@ class TaskExecutionService:
         self.evaluator = importance_evaluator
         self.supabase = supabase_client
         self.conversation_service = None  # 延迟注入，避免循环依赖
+        self.task_queue = None  # scheduler.task_queue.TaskQueue（api 模式下注入）
 
     def set_conversation_service(self, conversation_service):
         """设置conversation服务（解决循环依赖）
@@ -50,6 +54,14 @@ class TaskExecutionService:
         """
         self.conversation_service = conversation_service
 
+    def set_task_queue(self, task_queue):
+        """设置任务队列（设置后即时任务交给 worker 进程执行）
+
+        Args:
+            task_queue: TaskQueue实例
+        """
+        self.task_queue = task_queue
+
     async def execute_ad_hoc_task(
         self,
         agent_role: str,
@@ -57,7 +69,46 @@ class TaskExecutionService:
         user_id: str,
         conversation_id: str,
     ) -> Dict[str, Any]:
-        """执行即时任务并生成简报
+        """执行即时任务并生成简报（有任务队列时交给 worker 执行并等待结果）
+
+        Args:
+            agent_role: Agent角色ID
+            task_prompt: 任务提示词
+            user_id: 用户ID
+            conversation_id: 对话ID
+
+        Returns:
+            执行结果字典，包含analysis_result、importance_score、briefing
+        """
+        payload = {
+            "agent_role": agent_role,
+            "task_prompt": task_prompt,
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+        }
+        if not self.task_queue:
+            return await self.run_ad_hoc_task(**payload)
+
+        try:
+            queued_id = await self.task_queue.enqueue("ad_hoc_task", agent_role, payload)
+            return await self.task_queue.wait_result(queued_id)
+        except Exception as e:
+            logger.error(f"Error dispatching ad-hoc task: {e}", exc_info=True)
+            return {
+                "analysis_result": "",
+                "importance_score": 0.0,
+                "briefing": None,
+                "error": str(e),
+            }
+
+    async def run_ad_hoc_task(
+        self,
+        agent_role: str,
+        task_prompt: str,
+        user_id: str,
+        conversation_id: str,
+    ) -> Dict[str, Any]:
+        """在当前进程中执行即时任务并生成简报（worker 处理器）
 
         Args:
             agent_role: Agent角色ID
@@ -78,7 +129,10 @@ class TaskExecutionService:
             logger.info("Step 1: Executing agent analysis...")
             analysis_text = ""
             async for event in self.agent_service.execute_query(
-                prompt=task_prompt, agent_role=agent_role
+                prompt=task_prompt,
+                agent_role=agent_role,
+                user_id=user_id,
+                priority="ad_hoc",
             ):
                 if event.get("type") == "text_chunk":
                     analysis_text += event.get("content", "")
@@ -1,12 +1,19 @@
 """
 UI Schema Generator Service
 Generates dynamic UI schemas from AI analysis results for adaptive rendering
+
+LLM generation uses the async client so it never blocks the event loop.
+Results are cached by a hash of (model, role, context, analysis text), and
+concurrent requests for the same analysis share a single LLM call.
 """
 import os
 import json
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +21,9 @@ logger = logging.getLogger(__name__)
 DEFAULT_BASE_URL = "https://llm-gateway.oppoer.me"
 DEFAULT_MODEL = "saas/claude-haiku-4.5"  # Use haiku for cost efficiency
 
+# Max number of cached LLM-generated schemas
+SCHEMA_CACHE_MAX_ENTRIES = int(os.getenv("UI_SCHEMA_CACHE_SIZE", "256"))
+
 
 class UISchemaGenerator:
     """Generate UI schemas from analysis results using Claude"""
@@ -23,6 +33,7 @@ class UISchemaGenerator:
         base_url: Optional[str] = None,
         api_key: Optional[str] = None,
         model: Optional[str] = None,
+        cache_size: int = SCHEMA_CACHE_MAX_ENTRIES,
     ):
         """
         Initialize UI Schema Generator
@@ -31,16 +42,24 @@ class UISchemaGenerator:
             base_url: LLM Gateway base URL (default: from env or DEFAULT_BASE_URL)
             api_key: API key/token (default: from ANTHROPIC_AUTH_TOKEN env)
             model: Model to use (default: saas/claude-haiku-4.5)
+            cache_size: Max number of cached LLM-generated schemas
         """
         self.anthropic_client = None
         self.model = model or os.getenv("UI_SCHEMA_MODEL", DEFAULT_MODEL)
+        self.cache_size = cache_size
+
+        # analysis hash -> schema (failures are not cached, so they can be retried)
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         # Get configuration from parameters or environment
         effective_base_url = base_url or os.getenv("ANTHROPIC_BASE_URL", DEFAULT_BASE_URL)
         effective_api_key = api_key or os.getenv("ANTHROPIC_AUTH_TOKEN")
 
         if effective_api_key:
-            self.anthropic_client = Anthropic(
+            self.anthropic_client = AsyncAnthropic(
                 base_url=effective_base_url,
                 api_key=effective_api_key,
             )
@@ -48,14 +67,29 @@ class UISchemaGenerator:
         else:
             logger.warning("ANTHROPIC_AUTH_TOKEN not set, UI schema generation will be disabled")
 
-    def generate_from_analysis(
+    def cache_key(
+        self,
+        analysis_result: str,
+        data_context: Dict[str, Any],
+        agent_role: str
+    ) -> str:
+        """Hash of everything that determines the generated schema"""
+        payload = json.dumps(
+            [self.model, agent_role, data_context, analysis_result],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def generate_from_analysis(
         self,
         analysis_result: str,
         data_context: Dict[str, Any],
         agent_role: str
     ) -> Optional[Dict[str, Any]]:
         """
-        Generate UI Schema from analysis result
+        Generate UI Schema from analysis result (cached by analysis hash)
 
         Args:
             analysis_result: Text analysis result from agent
@@ -69,12 +103,53 @@ class UISchemaGenerator:
             logger.warning("Anthropic client not initialized, skipping UI schema generation")
             return None
 
+        key = self.cache_key(analysis_result, data_context, agent_role)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            logger.debug(f"UI schema cache hit for agent {agent_role}")
+            return self._cache[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.cache_hits += 1
+            return await asyncio.shield(inflight)
+
+        self.cache_misses += 1
+        future = asyncio.ensure_future(
+            self._generate(analysis_result, data_context, agent_role)
+        )
+        self._inflight[key] = future
+        # Cache from the future itself: the LLM call keeps running (shielded)
+        # even if every awaiting caller is cancelled
+        future.add_done_callback(lambda f: self._store_result(key, f))
+        return await asyncio.shield(future)
+
+    def _store_result(self, key: str, future: "asyncio.Future") -> None:
+        """Done-callback of an in-flight generation: cache the schema and clear the entry"""
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        schema = future.result()
+        if schema is not None:
+            self._cache[key] = schema
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _generate(
+        self,
+        analysis_result: str,
+        data_context: Dict[str, Any],
+        agent_role: str
+    ) -> Optional[Dict[str, Any]]:
+        """Call the LLM and validate the returned schema"""
         try:
             # Build prompt for UI schema generation
             prompt = self._build_schema_prompt(analysis_result, data_context, agent_role)
 
             # Call Claude API via LLM Gateway
-            response = self.anthropic_client.messages.create(
+            response = await self.anthropic_client.messages.create(
                 model=self.model,
                 max_tokens=2048,
                 temperature=0.3,
@@ -104,6 +179,20 @@ class UISchemaGenerator:
             logger.error(f"Error generating UI schema: {e}")
             return None
 
+    def stats(self) -> Dict[str, int]:
+        """Schema cache statistics"""
+        return {
+            "cached": len(self._cache),
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "inflight": len(self._inflight),
+        }
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client"""
+        if self.anthropic_client is not None:
+            await self.anthropic_client.close()
+
     def _build_schema_prompt(
         self,
         analysis_result: str,
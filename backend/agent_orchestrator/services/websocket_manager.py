@@ -3,20 +3,49 @@ WebSocket Connection Manager
 
 管理WebSocket连接，包括心跳检测、重连支持和消息广播。
 参考 claudecodeui 的 WebSocket 实现模式。
+
+心跳使用单个共享的时间轮（hashed timer wheel）调度，而不是每个连接一个心跳任务：
+
+- 时间轮有 heartbeat_interval / HEARTBEAT_TICK 个槽位，连接注册时轮询分配到槽位
+- 单个 sweep 任务每个 tick 推进一格，对该槽位的连接批量回收空闲连接、发送 ping
+- sweep 从不等待 socket：每个 ping 在独立任务中发送（带 WS_PING_SEND_TIMEOUT 超时），
+  TCP 窗口已满的客户端只会让自己的 ping 超时断开，不会阻塞其他连接的心跳和空闲回收
+- ping 文本每批序列化一次；pong 只记录时间戳（RTT / 未响应计数），不再为每次 ping
+  创建 Event 和 wait_for 超时
+- 没有连接时 sweep 任务自动退出，有新连接时重新启动
+
+回复事件通过 enqueue 放入连接的有界发送队列（services.outbound_queue），由独立的 sender
+任务发送，慢客户端不会阻塞 Agent 生成；队列持续满的连接视为卡死并断开。
+队列中的事件按连接协商的编码（services.ws_protocol：JSON 或 msgpack）发送。
 """
 
 import asyncio
+import json
 import logging
+import os
 import time
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Any, Callable, Dict, Optional, Set
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 
 from fastapi import WebSocket, WebSocketDisconnect
 
 from config import get_timeout_config
 
+from .outbound_queue import OutboundMetrics, OutboundQueue
+from .ws_protocol import JSON_CODEC, FrameCodec
+
 logger = logging.getLogger(__name__)
 
+# 时间轮每格的时长（秒），决定心跳 / 空闲检测的精度
+HEARTBEAT_TICK = float(os.getenv("WS_HEARTBEAT_TICK", "0.5"))
+
+# 单个 ping 的发送超时（秒），超时视为发送失败并断开
+PING_SEND_TIMEOUT = float(os.getenv("WS_PING_SEND_TIMEOUT", "5"))
+
+# 保留的最近 RTT / sweep 耗时样本数
+HEARTBEAT_SAMPLE_SIZE = 256
+
 
 @dataclass
 class ConnectionState:
@@ -28,8 +57,22 @@ class ConnectionState:
     connected_at: float = field(default_factory=time.time)
     last_activity: float = field(default_factory=time.time)
     last_pong: float = field(default_factory=time.time)
-    heartbeat_task: Optional[asyncio.Task] = None
     is_alive: bool = True
+    # 时间轮槽位（-1 表示未调度）
+    slot: int = -1
+    # 未收到 pong 的 ping 发送时间
+    ping_sent_at: Optional[float] = None
+    missed_pongs: int = 0
+    # 正在发送的 ping（发送完成前不再发送新的 ping）
+    ping_task: Optional[asyncio.Task] = None
+    # 回复事件的发送队列（首次 enqueue 时创建）
+    outbound: Optional[OutboundQueue] = None
+    # 回复事件的编码（握手时协商）
+    codec: FrameCodec = JSON_CODEC
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.conversation_id, self.user_id)
 
 
 class ConnectionManager:
@@ -37,19 +80,44 @@ class ConnectionManager:
 
     功能：
     - 管理多个对话的WebSocket连接
-    - 心跳检测（3秒间隔）
+    - 心跳检测（3秒间隔，共享时间轮批量发送）
     - 自动断开空闲连接（5分钟）
     - 支持广播消息
     """
 
-    def __init__(self):
+    def __init__(self, tick: float = HEARTBEAT_TICK):
+        """
+        Args:
+            tick: 时间轮每格的时长（秒）
+        """
         self._config = get_timeout_config()
 
         # conversation_id -> {user_id -> ConnectionState}
         self._connections: Dict[str, Dict[str, ConnectionState]] = {}
 
-        # 等待中的pong响应
-        self._pending_pongs: Dict[str, asyncio.Event] = {}
+        # 时间轮：每个槽位保存 (conversation_id, user_id) -> ConnectionState
+        self.tick = tick
+        self._wheel: List[Dict[Tuple[str, str], ConnectionState]] = [
+            {} for _ in range(max(1, round(self.heartbeat_interval / tick)))
+        ]
+        self._cursor = 0
+        self._next_slot = 0
+        self._sweep_task: Optional[asyncio.Task] = None
+        # sweep 中断开连接的后台任务
+        self._reap_tasks: Set[asyncio.Task] = set()
+        self._ping_tasks: Set[asyncio.Task] = set()
+
+        self._metrics: Dict[str, int] = {
+            "pings_sent": 0,
+            "pongs": 0,
+            "missed_pongs": 0,
+            "ping_failures": 0,
+            "idle_reaped": 0,
+            "ticks": 0,
+        }
+        self._rtts: Deque[float] = deque(maxlen=HEARTBEAT_SAMPLE_SIZE)
+        self._sweep_durations: Deque[float] = deque(maxlen=HEARTBEAT_SAMPLE_SIZE)
+        self._outbound_metrics = OutboundMetrics()
 
     @property
     def heartbeat_interval(self) -> int:
@@ -68,13 +136,22 @@ class ConnectionManager:
         websocket: WebSocket,
         conversation_id: str,
         user_id: str,
+        codec: Optional[FrameCodec] = None,
     ) -> ConnectionState:
-        """注册新的WebSocket连接（websocket.accept() 应该在调用此方法前完成）"""
+        """注册新的WebSocket连接（websocket.accept() 应该在调用此方法前完成）
+
+        Args:
+            websocket: WebSocket连接
+            conversation_id: 对话ID
+            user_id: 用户ID
+            codec: 握手时协商的回复事件编码（默认 JSON）
+        """
         # 创建连接状态
         state = ConnectionState(
             websocket=websocket,
             user_id=user_id,
             conversation_id=conversation_id,
+            codec=codec or JSON_CODEC,
         )
 
         # 注册连接
@@ -88,11 +165,11 @@ class ConnectionManager:
 
         self._connections[conversation_id][user_id] = state
 
-        # 启动心跳任务
-        state.heartbeat_task = asyncio.create_task(
-            self._heartbeat_loop(state),
-            name=f"heartbeat-{conversation_id}-{user_id}",
-        )
+        # 加入时间轮（轮询分配槽位，使每个 tick 的批量大小均匀）
+        state.slot = self._next_slot
+        self._next_slot = (self._next_slot + 1) % len(self._wheel)
+        self._wheel[state.slot][state.key] = state
+        self._ensure_sweeper()
 
         logger.info(
             f"WebSocket connected: conversation={conversation_id}, user={user_id}"
@@ -100,8 +177,22 @@ class ConnectionManager:
 
         return state
 
-    async def disconnect(self, conversation_id: str, user_id: str) -> None:
-        """断开连接并清理资源"""
+    async def disconnect(
+        self,
+        conversation_id: str,
+        user_id: str,
+        reason: str = "client_disconnect",
+        websocket: Optional[WebSocket] = None,
+    ) -> None:
+        """断开连接并清理资源
+
+        Args:
+            conversation_id: 对话ID
+            user_id: 用户ID
+            reason: 关闭原因
+            websocket: 提供时仅当登记的连接是该 websocket 才断开
+                （旧连接的清理不影响已重连的新连接）
+        """
         if conversation_id not in self._connections:
             return
 
@@ -109,13 +200,16 @@ class ConnectionManager:
             return
 
         state = self._connections[conversation_id][user_id]
-        await self._close_connection(state, reason="client_disconnect")
+        if websocket is not None and state.websocket is not websocket:
+            return
 
-        # 清理连接记录
+        # 先移除连接记录，避免关闭期间的并发 disconnect 重复处理
         del self._connections[conversation_id][user_id]
         if not self._connections[conversation_id]:
             del self._connections[conversation_id]
 
+        await self._close_connection(state, reason=reason)
+
         logger.info(
             f"WebSocket disconnected: conversation={conversation_id}, user={user_id}"
         )
@@ -123,14 +217,20 @@ class ConnectionManager:
     async def _close_connection(self, state: ConnectionState, reason: str) -> None:
         """关闭单个连接"""
         state.is_alive = False
-
-        # 取消心跳任务
-        if state.heartbeat_task:
-            state.heartbeat_task.cancel()
-            try:
-                await state.heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        if state.outbound is not None:
+            state.outbound.close()
+        if (
+            state.ping_task is not None and not state.ping_task.done()
+            and state.ping_task is not asyncio.current_task()
+        ):
+            state.ping_task.cancel()
+
+        # 移出时间轮
+        if state.slot >= 0:
+            slot = self._wheel[state.slot]
+            if slot.get(state.key) is state:
+                del slot[state.key]
+            state.slot = -1
 
         # 关闭WebSocket
         try:
@@ -167,6 +267,50 @@ class ConnectionManager:
             await self.disconnect(conversation_id, user_id)
             return False
 
+    async def enqueue(
+        self,
+        conversation_id: str,
+        user_id: str,
+        data: Dict[str, Any],
+        websocket: Optional[WebSocket] = None,
+    ) -> bool:
+        """放入客户端的发送队列（不等待发送完成）
+
+        Args:
+            conversation_id: 对话ID
+            user_id: 用户ID
+            data: 消息
+            websocket: 提供时仅当登记的连接是该 websocket 才入队
+
+        Returns:
+            是否已入队；连接不存在或发送队列持续满（连接随后被断开）时返回 False
+        """
+        state = self._connections.get(conversation_id, {}).get(user_id)
+        if state is None or not state.is_alive:
+            return False
+        if websocket is not None and state.websocket is not websocket:
+            return False
+
+        if state.outbound is None:
+            state.outbound = OutboundQueue(
+                send=lambda frame: self._deliver(state, frame),
+                metrics=self._outbound_metrics,
+                on_error=lambda _: self._spawn_disconnect(state, "send_error"),
+            )
+        if await state.outbound.put(data):
+            return True
+        if not state.outbound.closed:
+            logger.warning(
+                f"Outbound queue stalled, closing slow client: conversation={conversation_id}, "
+                f"user={user_id}, depth={state.outbound.depth}"
+            )
+            self._spawn_disconnect(state, "slow_client")
+        return False
+
+    async def _deliver(self, state: ConnectionState, data: Dict[str, Any]) -> None:
+        await state.codec.send(state.websocket, data)
+        state.last_activity = time.time()
+
     async def send_text(
         self,
         conversation_id: str,
@@ -222,15 +366,17 @@ class ConnectionManager:
             return
 
         state = self._connections[conversation_id][user_id]
-        state.last_pong = time.time()
+        now = time.time()
+        state.last_pong = now
         # pong 也代表连接有活动（浏览器端不会自动回 websocket ping 帧，
         # 我们使用的是应用层 JSON ping/pong，因此收到 pong 时也应刷新 activity）
-        state.last_activity = time.time()
+        state.last_activity = now
 
-        # 通知等待中的ping
-        pong_key = f"{conversation_id}:{user_id}"
-        if pong_key in self._pending_pongs:
-            self._pending_pongs[pong_key].set()
+        # 记录 RTT（仅统计/诊断）
+        if state.ping_sent_at is not None:
+            self._rtts.append(now - state.ping_sent_at)
+            state.ping_sent_at = None
+        self._metrics["pongs"] += 1
 
     def handle_client_activity(self, conversation_id: str, user_id: str) -> None:
         """记录客户端活动（任何收到的消息都应刷新 last_activity）"""
@@ -241,63 +387,175 @@ class ConnectionManager:
         state = self._connections[conversation_id][user_id]
         state.last_activity = time.time()
 
-    async def _heartbeat_loop(self, state: ConnectionState) -> None:
-        """心跳循环：每3秒发送应用层 ping。
+    def _ensure_sweeper(self) -> None:
+        """确保共享的心跳 sweep 任务在运行"""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.create_task(self._sweep_loop(), name="ws-heartbeat-sweep")
 
-        注意：这是 JSON 消息（不是 WebSocket 协议层 ping 帧），浏览器不会自动回复。
-        因此 pong **可选**：不回 pong 不应立刻断开连接，真正断开由 idle_timeout 控制。
-        """
+    async def _sweep_loop(self) -> None:
+        """时间轮推进循环：每个 tick 处理一个槽位，没有连接时退出"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
         try:
-            while state.is_alive:
-                await asyncio.sleep(self.heartbeat_interval)
-
-                if not state.is_alive:
-                    break
-
-                # 检查空闲超时
-                idle_time = time.time() - state.last_activity
-                if idle_time > self.idle_timeout:
-                    logger.info(
-                        f"Connection idle timeout: "
-                        f"conversation={state.conversation_id}, "
-                        f"user={state.user_id}"
-                    )
-                    await self.disconnect(state.conversation_id, state.user_id)
-                    break
-
-                # 发送ping
+            while self._connections:
+                next_tick += self.tick
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # 落后超过一格（事件循环繁忙）：不补跑，从当前时间重新对齐
+                    next_tick = loop.time()
+
+                batch = self._wheel[self._cursor]
+                self._cursor = (self._cursor + 1) % len(self._wheel)
+                self._metrics["ticks"] += 1
+                if not batch:
+                    continue
+
+                started = time.perf_counter()
                 try:
-                    await state.websocket.send_json(
-                        {"type": "ping", "ts": time.time()}
-                    )
+                    await self._sweep_slot(list(batch.values()))
                 except Exception as e:
-                    logger.warning(f"Failed to send ping: {e}")
-                    await self.disconnect(state.conversation_id, state.user_id)
-                    break
+                    logger.error(f"Heartbeat sweep error: {e}")
+                self._sweep_durations.append(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            pass
 
-                # 等待 pong（可选）：仅用于统计/诊断，不作为强制断连条件
-                pong_key = f"{state.conversation_id}:{state.user_id}"
-                pong_event = asyncio.Event()
-                self._pending_pongs[pong_key] = pong_event
+    async def _sweep_slot(self, batch: List[ConnectionState]) -> None:
+        """处理一个槽位：回收空闲连接，向其余连接批量发送 ping
 
-                try:
-                    await asyncio.wait_for(
-                        pong_event.wait(),
-                        timeout=self.ping_timeout,
-                    )
-                except asyncio.TimeoutError:
-                    # 浏览器客户端可能不实现应用层 pong；不要因此断开。
-                    logger.debug(
-                        f"Ping timeout (pong not received): "
-                        f"conversation={state.conversation_id}, user={state.user_id}"
-                    )
-                finally:
-                    self._pending_pongs.pop(pong_key, None)
+        注意：ping 是 JSON 消息（不是 WebSocket 协议层 ping 帧），浏览器不会自动回复。
+        因此 pong **可选**：不回 pong 不应立刻断开连接，真正断开由 idle_timeout 控制。
+        """
+        now = time.time()
+        to_ping: List[ConnectionState] = []
+        for state in batch:
+            if not state.is_alive:
+                continue
+
+            # 检查空闲超时
+            if now - state.last_activity > self.idle_timeout:
+                logger.info(
+                    f"Connection idle timeout: "
+                    f"conversation={state.conversation_id}, "
+                    f"user={state.user_id}"
+                )
+                self._metrics["idle_reaped"] += 1
+                self._spawn_disconnect(state, "idle_timeout")
+                continue
 
+            # 上一次 ping 还没发出去（客户端接收慢）：由发送超时处理
+            if state.ping_task is not None and not state.ping_task.done():
+                continue
+
+            # 上一次 ping 仍在等待 pong：未超时则跳过本轮，超时记为未响应（不断开）
+            if state.ping_sent_at is not None:
+                if now - state.ping_sent_at < self.ping_timeout:
+                    continue
+                state.missed_pongs += 1
+                self._metrics["missed_pongs"] += 1
+                state.ping_sent_at = None
+                logger.debug(
+                    f"Ping timeout (pong not received): "
+                    f"conversation={state.conversation_id}, user={state.user_id}"
+                )
+
+            to_ping.append(state)
+
+        if not to_ping:
+            return
+
+        # 同一批次共用一份 ping 文本；每个连接独立发送，sweep 不等待
+        ping = json.dumps({"type": "ping", "ts": now}, separators=(",", ":"))
+        for state in to_ping:
+            task = asyncio.create_task(self._send_ping(state, ping, now))
+            state.ping_task = task
+            self._ping_tasks.add(task)
+            task.add_done_callback(self._ping_tasks.discard)
+
+    async def _send_ping(self, state: ConnectionState, ping: str, sent_at: float) -> None:
+        """发送单个 ping（超时或失败时断开该连接）"""
+        try:
+            await asyncio.wait_for(state.websocket.send_text(ping), timeout=PING_SEND_TIMEOUT)
         except asyncio.CancelledError:
-            pass
+            raise
         except Exception as e:
-            logger.error(f"Heartbeat loop error: {e}")
+            reason = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.warning(
+                f"Failed to send ping ({reason}): "
+                f"conversation={state.conversation_id}, user={state.user_id}"
+            )
+            self._metrics["ping_failures"] += 1
+            self._spawn_disconnect(state, "ping_failed")
+            return
+        state.ping_sent_at = sent_at
+        self._metrics["pings_sent"] += 1
+
+    def _spawn_disconnect(self, state: ConnectionState, reason: str) -> None:
+        """在后台断开连接（关闭握手可能较慢，不阻塞时间轮推进）"""
+        task = asyncio.create_task(
+            self.disconnect(
+                state.conversation_id, state.user_id, reason=reason, websocket=state.websocket
+            )
+        )
+        self._reap_tasks.add(task)
+        task.add_done_callback(self._reap_tasks.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接数、心跳计数、RTT 和 sweep 耗时（毫秒）"""
+        rtts = sorted(self._rtts)
+        sweeps = sorted(self._sweep_durations)
+        return {
+            "connections": self.get_connection_count(),
+            "tick": self.tick,
+            "slots": len(self._wheel),
+            "sweeper_running": self._sweep_task is not None and not self._sweep_task.done(),
+            **self._metrics,
+            "rtt_ms": {
+                "avg": round(sum(rtts) / len(rtts) * 1000, 1),
+                "p95": round(rtts[min(len(rtts) - 1, int(len(rtts) * 0.95))] * 1000, 1),
+            } if rtts else {},
+            "sweep_ms": {
+                "avg": round(sum(sweeps) / len(sweeps) * 1000, 2),
+                "max": round(sweeps[-1] * 1000, 2),
+            } if sweeps else {},
+        }
+
+    def outbound_stats(self) -> Dict[str, Any]:
+        """发送队列指标：当前排队帧数、合并 / 降级 / 丢弃计数、发送耗时和各协议连接数"""
+        states = [state for users in self._connections.values() for state in users.values()]
+        queues = [s.outbound for s in states if s.outbound is not None and not s.outbound.closed]
+        protocols: Dict[str, int] = {}
+        for state in states:
+            protocols[state.codec.name] = protocols.get(state.codec.name, 0) + 1
+        return {
+            "queues": len(queues),
+            "queued_frames": sum(q.depth for q in queues),
+            "protocols": protocols,
+            **self._outbound_metrics.stats(),
+        }
+
+    async def shutdown(self) -> None:
+        """停止心跳调度并关闭所有连接"""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+
+        for task in list(self._ping_tasks):
+            task.cancel()
+        if self._ping_tasks:
+            await asyncio.gather(*self._ping_tasks, return_exceptions=True)
+
+        for conversation_id, users in list(self._connections.items()):
+            for user_id in list(users):
+                await self.disconnect(conversation_id, user_id, reason="server_shutdown")
+
+        if self._reap_tasks:
+            await asyncio.gather(*self._reap_tasks, return_exceptions=True)
 
     def get_connection_count(self, conversation_id: Optional[str] = None) -> int:
         """获取连接数量"""
@@ -8,18 +8,23 @@ WebSocket Writer Adapter
 import asyncio
 import json
 import logging
+import os
 import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import WebSocket
 
+from .stream_buffer import StreamBuffer, get_stream_registry
 from .websocket_manager import ConnectionManager
 
 logger = logging.getLogger(__name__)
 _LOG_WS_PAYLOAD = bool(int(__import__("os").getenv("WS_LOG_PAYLOAD", "0")))
 _LOG_WS_SUMMARY = bool(int(__import__("os").getenv("WS_LOG_SUMMARY", "0")))
 
+# 工具结果超过该长度（字符）时拆分为多个 tool_result_chunk 发送，0 表示不拆分
+TOOL_RESULT_CHUNK_SIZE = int(os.getenv("WS_TOOL_RESULT_CHUNK_SIZE", "16384"))
+
 
 @dataclass
 class WSMessage:
@@ -45,9 +50,14 @@ class MessageType:
     TEXT_CHUNK = "text_chunk"  # 流式文本内容
     TOOL_USE = "tool_use"  # 工具调用开始
     TOOL_RESULT = "tool_result"  # 工具执行结果
+    TOOL_RESULT_CHUNK = "tool_result_chunk"  # 大工具结果的分片（随后的 tool_result 带 chunks 数）
     TOOL_PROGRESS = "tool_progress"  # 工具执行进度（新增：让用户看到长时间运行工具的进度）
     TASK_START = "task_start"  # 任务开始
     TASK_PROGRESS = "task_progress"  # 任务进度
+    QUEUED = "queued"  # 排队等待执行名额（含排队位置）
+    STREAM_START = "stream_start"  # 回复流开始（含 stream_id，用于断线续传）
+    TASK_COMPLETE = "task_complete"  # 任务完成（未生成简报）
+    CANCELLED = "cancelled"  # 生成被客户端取消（已发送的部分回复已保存）
     BRIEFING_CREATED = "briefing_created"  # 简报创建
     ERROR = "error"  # 错误
     DONE = "done"  # 完成
@@ -64,6 +74,11 @@ class WebSocketWriter:
     - 自适应刷新间隔（首次快，后续稳定）
     - 工具调用消息
     - 错误处理
+    - 取消：cancel() 后丢弃未发送的缓冲并停止后续输出
+    - 断线续传：绑定 StreamBuffer 时每个事件带 seq 写入缓冲，连接断开后继续缓冲，
+      由重连的客户端 resume 补发
+    - 背压：事件放入连接的有界发送队列（ConnectionManager.enqueue），不等待慢客户端；
+      大工具结果按 TOOL_RESULT_CHUNK_SIZE 分片
     """
 
     def __init__(
@@ -75,8 +90,10 @@ class WebSocketWriter:
         initial_flush_interval: float = 0.01,  # 10ms首次刷新 (优化: 从50ms减少)
         steady_flush_interval: float = 0.08,  # 80ms稳定刷新 (优化: 从100ms减少)
         max_buffer_size: int = 15,  # 15字符触发刷新 (优化: 从30减少)
+        stream: Optional[StreamBuffer] = None,
     ):
         self.websocket = websocket
+        self.stream = stream
         self.manager = connection_manager
         self.conversation_id = conversation_id
         self.user_id = user_id
@@ -97,16 +114,71 @@ class WebSocketWriter:
         # 是否是首次输出（用于TTFT优化）
         self._is_first_output = True
 
+        # 客户端取消生成后不再发送
+        self._cancelled = False
+
+        # 已保存的助手消息ID（完整回复或取消时的部分回复）
+        self.message_id: Optional[str] = None
+
     @property
     def accumulated_content(self) -> str:
         """获取累积的完整内容"""
         return self._accumulated_content
 
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    async def _send(self, message: WSMessage, force: bool = False) -> bool:
+        """放入连接的发送队列（已取消时丢弃）
+
+        绑定 stream 时事件先写入缓冲：连接已断开（detached）时只缓冲不发送，
+        入队失败（连接已断开或客户端卡死）时 detach 而不是中断生成，两种情况都视为成功。
+
+        Args:
+            message: 消息
+            force: 取消后仍然发送（取消确认）
+        """
+        if self._cancelled and not force:
+            return False
+        payload = message.to_dict()
+        if self.stream is None:
+            return await self.manager.enqueue(self.conversation_id, self.user_id, payload)
+
+        self.stream.append(payload)
+        subscriber = self.stream.subscriber
+        if subscriber is None:
+            return True
+        if not await self.manager.enqueue(
+            self.conversation_id, self.user_id, payload, websocket=subscriber
+        ):
+            get_stream_registry().detach(self.stream, subscriber)
+        return True
+
+    def cancel(self) -> None:
+        """停止输出：丢弃尚未发送的缓冲文本（累积内容只保留已发出的部分）
+
+        已进入发送队列的文本已写入 stream 缓冲并分配了 seq，不丢弃：它们照常发送，
+        也保留在累积内容中，保证 resume 补发的内容与保存的回复一致。
+        """
+        if self._cancelled:
+            return
+        self._cancelled = True
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        pending = sum(len(chunk) for chunk in self._buffer)
+        if pending:
+            self._accumulated_content = self._accumulated_content[:-pending]
+        self._buffer.clear()
+
     async def write_text_chunk(self, content: str) -> None:
         """写入文本chunk（带缓冲）
         
         TTFT优化：首次输出立即刷新，让用户尽快看到第一个字符
         """
+        if self._cancelled:
+            return
         async with self._lock:
             self._buffer.append(content)
             self._accumulated_content += content
@@ -173,9 +245,7 @@ class WebSocketWriter:
                     f" content={content!r}" if _LOG_WS_PAYLOAD else "",
                 )
             # 通过 ConnectionManager 发送，便于统一处理断连/状态
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
             self._flush_count += 1
@@ -233,9 +303,7 @@ class WebSocketWriter:
                     tool_name,
                     tool_id,
                 )
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
         except Exception as e:
@@ -248,16 +316,31 @@ class WebSocketWriter:
         result: Any,
         is_error: bool = False,
     ) -> None:
-        """写入工具结果消息"""
-        message = WSMessage(
-            type=MessageType.TOOL_RESULT,
-            metadata={
-                "tool_id": tool_id,
-                "result": result,
-                "is_error": is_error,
-            },
-        )
+        """写入工具结果消息
+
+        结果超过 TOOL_RESULT_CHUNK_SIZE 时先发送 tool_result_chunk 分片，
+        随后的 tool_result 不带 result，以 chunks / result_format 告知客户端拼接方式。
+        """
+        metadata: Dict[str, Any] = {
+            "tool_id": tool_id,
+            "result": result,
+            "is_error": is_error,
+        }
+        parts: List[str] = []
+        chunked = _split_tool_result(result, TOOL_RESULT_CHUNK_SIZE)
+        if chunked is not None:
+            result_format, parts = chunked
+            metadata.update(result=None, chunks=len(parts), result_format=result_format)
+        message = WSMessage(type=MessageType.TOOL_RESULT, metadata=metadata)
         try:
+            for index, part in enumerate(parts):
+                ok = await self._send(WSMessage(
+                    type=MessageType.TOOL_RESULT_CHUNK,
+                    content=part,
+                    metadata={"tool_id": tool_id, "index": index, "total": len(parts)},
+                ))
+                if not ok:
+                    raise RuntimeError("WebSocket not connected")
             if _LOG_WS_SUMMARY:
                 logger.info(
                     "WS send tool_result: conversation=%s user=%s tool_id=%s is_error=%s",
@@ -274,9 +357,7 @@ class WebSocketWriter:
                     tool_id,
                     is_error,
                 )
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
         except Exception as e:
@@ -324,9 +405,7 @@ class WebSocketWriter:
                     tool_name,
                     progress * 100,
                 )
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
         except Exception as e:
@@ -334,6 +413,34 @@ class WebSocketWriter:
             # 进度消息失败不应中断执行
             pass
 
+    async def write_queue_position(self, position: int, queue_depth: int) -> None:
+        """写入排队位置消息（Agent 执行名额已满时由准入控制回调）
+
+        Args:
+            position: 估算的排队位置（1 表示下一个执行）
+            queue_depth: 当前队列总长度
+        """
+        message = WSMessage(
+            type=MessageType.QUEUED,
+            metadata={"position": position, "queue_depth": queue_depth},
+        )
+        try:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "WS send queued: conversation=%s user=%s position=%s depth=%s",
+                    self.conversation_id,
+                    self.user_id,
+                    position,
+                    queue_depth,
+                )
+            ok = await self._send(message)
+            if not ok:
+                raise RuntimeError("WebSocket not connected")
+        except Exception as e:
+            logger.error(f"Failed to send queued: {e}")
+            # 排队消息失败不应中断执行
+            pass
+
     async def write_task_start(
         self,
         task_type: str,
@@ -356,9 +463,7 @@ class WebSocketWriter:
                     task_type,
                     task_id,
                 )
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
         except Exception as e:
@@ -385,9 +490,7 @@ class WebSocketWriter:
                     progress,
                     f" msg={message_text!r}" if (_LOG_WS_PAYLOAD and message_text) else "",
                 )
-            ok = await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            ok = await self._send(message)
             if not ok:
                 raise RuntimeError("WebSocket not connected")
         except Exception as e:
@@ -414,9 +517,7 @@ class WebSocketWriter:
                     f" error={error_message!r}" if _LOG_WS_PAYLOAD else "",
                 )
             # 错误消息尽力发送：如果连接已关闭，避免再次抛异常刷屏
-            await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            await self._send(message)
         except Exception as e:
             logger.error(f"Failed to send error: {e}")
             return
@@ -447,13 +548,60 @@ class WebSocketWriter:
                     message_id,
                 )
             # done 也是尽力发送：连接关闭时不应抛异常
-            await self.manager.send_json(
-                self.conversation_id, self.user_id, message.to_dict()
-            )
+            await self._send(message)
         except Exception as e:
             logger.error(f"Failed to send done: {e}")
             return
 
+    async def write_stream_start(self) -> None:
+        """写入回复流开始消息（客户端记录 stream_id 和之后收到的最大 seq，断线后用于续传）"""
+        if self.stream is None:
+            return
+        message = WSMessage(
+            type=MessageType.STREAM_START,
+            metadata={"stream_id": self.stream.stream_id},
+        )
+        try:
+            await self._send(message)
+        except Exception as e:
+            logger.error(f"Failed to send stream_start: {e}")
+
+    async def write_event(self, event_type: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """写入其他类型的事件（如 briefing_created / task_complete）
+
+        Args:
+            event_type: 事件类型
+            metadata: 事件字段
+        """
+        message = WSMessage(type=event_type, metadata=metadata)
+        try:
+            ok = await self._send(message)
+            if not ok:
+                raise RuntimeError("WebSocket not connected")
+        except Exception as e:
+            logger.error(f"Failed to send {event_type}: {e}")
+            raise
+
+    async def write_cancelled(self) -> None:
+        """写入取消确认消息（cancel() 之后调用，附带已保存的部分回复ID）"""
+        message = WSMessage(
+            type=MessageType.CANCELLED,
+            metadata={"message_id": self.message_id},
+        )
+        try:
+            if _LOG_WS_SUMMARY:
+                logger.info(
+                    "WS send cancelled: conversation=%s user=%s message_id=%s",
+                    self.conversation_id,
+                    self.user_id,
+                    self.message_id,
+                )
+            # 绕过取消检查；连接关闭时不应抛异常
+            await self._send(message, force=True)
+        except Exception as e:
+            logger.error(f"Failed to send cancelled: {e}")
+            return
+
     async def finalize(self) -> str:
         """最终化：刷新所有缓冲并返回累积内容"""
         async with self._lock:
@@ -469,3 +617,25 @@ class WebSocketWriter:
             except asyncio.CancelledError:
                 pass
             self._flush_task = None
+
+
+def _split_tool_result(result: Any, chunk_size: int) -> Optional[Tuple[str, List[str]]]:
+    """按长度拆分工具结果
+
+    Returns:
+        (result_format, 分片列表)；result_format 为 "text"（字符串结果）或 "json"
+        （拼接后需 JSON 解码）。结果未超过 chunk_size 时返回 None
+    """
+    if chunk_size <= 0 or result is None:
+        return None
+    if isinstance(result, str):
+        text, result_format = result, "text"
+    else:
+        # 小结果（常见情况）不必序列化
+        if isinstance(result, (int, float, bool)):
+            return None
+        text = json.dumps(result, ensure_ascii=False, default=str)
+        result_format = "json"
+    if len(text) <= chunk_size:
+        return None
+    return result_format, [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
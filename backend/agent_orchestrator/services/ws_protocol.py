@@ -0,0 +1,132 @@
+"""
+WebSocket Protocol - 可协商的回复事件编码
+
+客户端通过 Sec-WebSocket-Protocol 请求子协议，服务端按优先级选择：
+
+- ee.msgpack：回复事件（WebSocketWriter 经发送队列发出的事件、resume 补发的事件）以
+  msgpack 二进制帧发送，帧为数组 [code, seq, content, extra]：
+  code 为整数事件类型（EVENT_CODES），seq / content 不存在时为 nil，
+  extra 为其余字段（没有时省略），不包含 ts
+- ee.json / 未请求子协议：与之前相同的 JSON 文本帧
+
+控制消息（connected / ping / error 等）以及客户端发送的消息始终是 JSON 文本帧。
+压缩使用传输层的 permessage-deflate（uvicorn 默认启用，WS_PER_MESSAGE_DEFLATE 控制），
+对 JSON 和 msgpack 帧都生效。
+
+msgpack 为可选依赖，未安装时不接受 ee.msgpack，客户端回退到 JSON。
+"""
+
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOL_JSON = "ee.json"
+SUBPROTOCOL_MSGPACK = "ee.msgpack"
+
+# 事件类型 -> 整数编码（只能追加，不能修改已有编码）
+EVENT_CODES: Dict[str, int] = {
+    "text_chunk": 1,
+    "tool_use": 2,
+    "tool_result": 3,
+    "tool_result_chunk": 4,
+    "tool_progress": 5,
+    "task_start": 6,
+    "task_progress": 7,
+    "queued": 8,
+    "stream_start": 9,
+    "task_complete": 10,
+    "cancelled": 11,
+    "briefing_created": 12,
+    "error": 13,
+    "done": 14,
+}
+EVENT_TYPES: Dict[int, str] = {code: name for name, code in EVENT_CODES.items()}
+
+# 未登记的事件类型：code 为 0，类型名保留在 extra["type"]
+UNKNOWN_EVENT_CODE = 0
+
+_FRAME_FIELDS = ("type", "seq", "content", "ts")
+
+
+def encode_msgpack_frame(event: Dict[str, Any]) -> bytes:
+    """把事件编码为 msgpack 帧 [code, seq, content, extra]"""
+    event_type = event.get("type")
+    code = EVENT_CODES.get(event_type, UNKNOWN_EVENT_CODE)
+    extra = {k: v for k, v in event.items() if k not in _FRAME_FIELDS}
+    if code == UNKNOWN_EVENT_CODE:
+        extra["type"] = event_type
+    frame = [code, event.get("seq"), event.get("content")]
+    if extra:
+        frame.append(extra)
+    return msgpack.packb(frame, use_bin_type=True, default=str)
+
+
+def decode_msgpack_frame(data: bytes) -> Dict[str, Any]:
+    """解码 msgpack 帧为事件字典（与 JSON 协议的字段一致，不含 ts）"""
+    frame = msgpack.unpackb(data, raw=False)
+    code, seq, content = frame[0], frame[1], frame[2]
+    event: Dict[str, Any] = dict(frame[3]) if len(frame) > 3 and frame[3] else {}
+    event["type"] = EVENT_TYPES.get(code) or event.get("type") or "unknown"
+    if seq is not None:
+        event["seq"] = seq
+    if content is not None:
+        event["content"] = content
+    return event
+
+
+class FrameCodec:
+    """JSON 文本帧（默认协议）"""
+
+    name = "json"
+    subprotocol: Optional[str] = None
+
+    def __init__(self, subprotocol: Optional[str] = None):
+        """
+        Args:
+            subprotocol: 握手时接受的子协议（None 表示客户端未请求子协议）
+        """
+        self.subprotocol = subprotocol
+
+    async def send(self, websocket: Any, event: Dict[str, Any]) -> None:
+        await websocket.send_json(event)
+
+
+class MsgpackCodec(FrameCodec):
+    """msgpack 二进制帧"""
+
+    name = "msgpack"
+
+    def __init__(self):
+        super().__init__(SUBPROTOCOL_MSGPACK)
+
+    async def send(self, websocket: Any, event: Dict[str, Any]) -> None:
+        await websocket.send_bytes(encode_msgpack_frame(event))
+
+
+JSON_CODEC = FrameCodec()
+
+
+def negotiate_codec(requested: Optional[Iterable[str]]) -> FrameCodec:
+    """按客户端请求的子协议选择编码（优先 msgpack）
+
+    Args:
+        requested: 客户端 Sec-WebSocket-Protocol 中的子协议列表
+
+    Returns:
+        选中的编码；codec.subprotocol 为 websocket.accept 的 subprotocol 参数
+    """
+    requested = list(requested or [])
+    if SUBPROTOCOL_MSGPACK in requested:
+        if MSGPACK_AVAILABLE:
+            return MsgpackCodec()
+        logger.debug("Client requested msgpack but msgpack is not installed, falling back to JSON")
+    if SUBPROTOCOL_JSON in requested:
+        return FrameCodec(SUBPROTOCOL_JSON)
+    return JSON_CODEC
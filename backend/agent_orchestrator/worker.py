@@ -0,0 +1,40 @@
+"""
+Worker 进程入口 - 运行调度器和任务执行池（不提供 HTTP 服务）
+
+与 api 模式的进程配合使用：
+    ORCHESTRATOR_MODE=api python main.py     # 或 python main.py --mode api
+    python worker.py                          # 可启动多个，按租约 / 队列协调
+
+定时任务的触发、重试，以及 api 进程入队的即时任务都在这里执行，
+不与 WebSocket 对话争用事件循环和 CPU。
+"""
+
+import asyncio
+import logging
+import os
+import signal
+
+os.environ["ORCHESTRATOR_MODE"] = "worker"
+
+import main  # noqa: E402  (模块导入时按 worker 模式初始化服务)
+
+logger = logging.getLogger("worker")
+
+
+async def run_worker() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    # 复用 FastAPI 的生命周期管理（启动调度器 / 任务池，退出时依次关闭）
+    async with main.lifespan(main.app):
+        logger.info("Worker running, press Ctrl+C to stop")
+        await stop.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
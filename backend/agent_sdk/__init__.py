@@ -11,9 +11,17 @@ from .exceptions import (
     TaskExecutionError,
     ToolExecutionError,
     ConfigurationError,
+    AdmissionTimeoutError,
 )
 from .agent_sdk_service import AgentSDKService, MessageBuffer
 from .task_manager import TaskManager
+from .client_pool import ClientPool
+from .admission import (
+    AdmissionController,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_AD_HOC,
+    PRIORITY_SCHEDULED,
+)
 from .session import (
     MessageRecord,
     AgentSession,
@@ -27,10 +35,16 @@ __all__ = [
     "AgentSDKService",
     "MessageBuffer",
     "TaskManager",
+    "ClientPool",
+    "AdmissionController",
+    "PRIORITY_INTERACTIVE",
+    "PRIORITY_AD_HOC",
+    "PRIORITY_SCHEDULED",
     "AgentSDKError",
     "TaskExecutionError",
     "ToolExecutionError",
     "ConfigurationError",
+    "AdmissionTimeoutError",
     # Session management
     "MessageRecord",
     "AgentSession",
@@ -0,0 +1,306 @@
+"""
+Agent 执行准入控制
+
+每次 execute_query 都会占用一个 CLI 子进程（或长连接客户端）和网关配额。
+AdmissionController 在执行前做准入：
+
+- 全局并发上限、按角色并发上限、按用户并发上限，任一达到上限则排队
+- 排队按优先级类别加权公平调度（stride scheduling）：
+  interactive（对话）> ad_hoc（即时任务）> scheduled（定时任务），
+  低优先级按权重比例获得名额，不会被完全饿死
+- 同一类别内先进先出；队首受角色 / 用户上限阻塞时，后面可运行的请求不被卡住
+- 排队位置变化时回调 on_queued(position, queue_depth)，用于向前端推送排队状态
+- stats() 导出运行数、队列深度和排队等待时间
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+from .exceptions import AdmissionTimeoutError
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_AD_HOC = "ad_hoc"
+PRIORITY_SCHEDULED = "scheduled"
+
+DEFAULT_PRIORITY_WEIGHTS: Dict[str, float] = {
+    PRIORITY_INTERACTIVE: 8,
+    PRIORITY_AD_HOC: 4,
+    PRIORITY_SCHEDULED: 1,
+}
+
+# 每个优先级保留的最近等待时间样本数（用于计算 p95）
+WAIT_SAMPLE_SIZE = 256
+
+
+def parse_limits(value: Optional[str], cast: Callable[[str], Any] = int) -> Dict[str, Any]:
+    """解析 "key=n,key2=m" 形式的配置"""
+    limits: Dict[str, Any] = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        key, _, limit = item.partition("=")
+        try:
+            limits[key.strip()] = cast(limit)
+        except ValueError:
+            logger.warning(f"Invalid admission limit entry: {item!r}")
+    return limits
+
+
+class _Waiter:
+    """排队中的单个请求"""
+
+    __slots__ = ("agent_role", "user_id", "priority", "future", "enqueued_at", "on_queued", "position")
+
+    def __init__(
+        self,
+        agent_role: str,
+        user_id: Optional[str],
+        priority: str,
+        future: asyncio.Future,
+        on_queued: Optional[Callable[[int, int], Any]],
+    ):
+        self.agent_role = agent_role
+        self.user_id = user_id
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.on_queued = on_queued
+        self.position = 0
+
+
+class AdmissionController:
+    """按角色 / 用户限制并发、按优先级加权公平排队的准入控制器"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        role_concurrency: int = 4,
+        role_limits: Optional[Dict[str, int]] = None,
+        user_concurrency: int = 2,
+        weights: Optional[Dict[str, float]] = None,
+        queue_timeout: Optional[float] = 120,
+    ):
+        """
+        Args:
+            max_concurrency: 全局并发上限
+            role_concurrency: 每个 Agent 角色的默认并发上限
+            role_limits: 按角色覆盖并发上限
+            user_concurrency: 每个用户的并发上限（0 表示不限制；未提供 user_id 的请求不受限）
+            weights: 优先级类别 -> 权重
+            queue_timeout: 最长排队时间（秒），None 或 0 表示一直等待
+        """
+        self.max_concurrency = max_concurrency
+        self.role_concurrency = role_concurrency
+        self.role_limits = dict(role_limits or {})
+        self.user_concurrency = user_concurrency
+        self.weights = {**DEFAULT_PRIORITY_WEIGHTS, **(weights or {})}
+        self.queue_timeout = queue_timeout or None
+
+        self._running = 0
+        self._running_roles: Counter = Counter()
+        self._running_users: Counter = Counter()
+        self._queues: Dict[str, Deque[_Waiter]] = {p: deque() for p in self.weights}
+        # stride scheduling：每个类别的虚拟时间，每次放行增加 1 / weight，取最小者
+        self._pass: Dict[str, float] = {p: 0.0 for p in self.weights}
+        self._vtime = 0.0
+        self._notify_tasks: set = set()
+
+        self._admitted: Counter = Counter()
+        self._queued: Counter = Counter()
+        self._timeouts: Counter = Counter()
+        self._waits: Dict[str, Deque[float]] = {
+            p: deque(maxlen=WAIT_SAMPLE_SIZE) for p in self.weights
+        }
+        self._max_depth = 0
+
+    def _role_limit(self, agent_role: str) -> int:
+        return self.role_limits.get(agent_role, self.role_concurrency)
+
+    def _can_run(self, agent_role: str, user_id: Optional[str]) -> bool:
+        if self._running >= self.max_concurrency:
+            return False
+        if self._running_roles[agent_role] >= self._role_limit(agent_role):
+            return False
+        if user_id and self.user_concurrency and self._running_users[user_id] >= self.user_concurrency:
+            return False
+        return True
+
+    def _take(self, agent_role: str, user_id: Optional[str], priority: str, waited: float) -> None:
+        self._running += 1
+        self._running_roles[agent_role] += 1
+        if user_id:
+            self._running_users[user_id] += 1
+        self._admitted[priority] += 1
+        self._waits[priority].append(waited)
+
+    def _release(self, agent_role: str, user_id: Optional[str]) -> None:
+        self._running -= 1
+        self._running_roles[agent_role] -= 1
+        if self._running_roles[agent_role] <= 0:
+            del self._running_roles[agent_role]
+        if user_id:
+            self._running_users[user_id] -= 1
+            if self._running_users[user_id] <= 0:
+                del self._running_users[user_id]
+        self._dispatch()
+
+    def queue_depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _dispatch(self) -> None:
+        """按加权公平顺序放行可运行的排队请求"""
+        admitted = False
+        while self._running < self.max_concurrency:
+            # 每个类别中第一个未被角色 / 用户上限阻塞的请求
+            candidates = {}
+            for priority, queue in self._queues.items():
+                for waiter in queue:
+                    if self._can_run(waiter.agent_role, waiter.user_id):
+                        candidates[priority] = waiter
+                        break
+            if not candidates:
+                break
+
+            priority = min(candidates, key=lambda p: (self._pass[p], -self.weights[p]))
+            waiter = candidates[priority]
+            self._queues[priority].remove(waiter)
+            self._vtime = self._pass[priority]
+            self._pass[priority] += 1 / self.weights[priority]
+
+            self._take(
+                waiter.agent_role, waiter.user_id, priority,
+                time.monotonic() - waiter.enqueued_at,
+            )
+            waiter.future.set_result(None)
+            admitted = True
+
+        if admitted:
+            self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        """估算排队位置（同类别中的前序请求 + 更高权重类别的全部请求），变化时回调"""
+        depth = self.queue_depth()
+        for priority, queue in self._queues.items():
+            ahead = sum(
+                len(q) for p, q in self._queues.items()
+                if self.weights[p] > self.weights[priority]
+            )
+            for index, waiter in enumerate(queue):
+                position = ahead + index + 1
+                if waiter.on_queued is None or position == waiter.position:
+                    continue
+                waiter.position = position
+                self._call_on_queued(waiter, position, depth)
+
+    def _call_on_queued(self, waiter: _Waiter, position: int, depth: int) -> None:
+        try:
+            result = waiter.on_queued(position, depth)
+            if inspect.isawaitable(result):
+                task = asyncio.ensure_future(result)
+                self._notify_tasks.add(task)
+                task.add_done_callback(self._notify_tasks.discard)
+        except Exception as e:
+            logger.warning(f"Queue position callback failed: {e}")
+
+    async def _admit(
+        self,
+        agent_role: str,
+        user_id: Optional[str],
+        priority: str,
+        on_queued: Optional[Callable[[int, int], Any]],
+    ) -> None:
+        if priority not in self._queues:
+            raise ValueError(f"Unknown admission priority: {priority}")
+
+        # 可以立即运行：已排队的请求都被各自的上限阻塞，放行新请求不会插队
+        if self._can_run(agent_role, user_id):
+            self._take(agent_role, user_id, priority, 0.0)
+            return
+
+        queue = self._queues[priority]
+        if not queue:
+            # 类别从空闲变为活跃时对齐虚拟时间，避免积攒的额度一次性抢占
+            self._pass[priority] = max(self._pass[priority], self._vtime)
+        waiter = _Waiter(agent_role, user_id, priority, asyncio.get_running_loop().create_future(), on_queued)
+        queue.append(waiter)
+        self._queued[priority] += 1
+        self._max_depth = max(self._max_depth, self.queue_depth())
+        logger.info(
+            f"Agent execution queued: role={agent_role}, user={user_id}, "
+            f"priority={priority}, depth={self.queue_depth()}, running={self._running}"
+        )
+        self._notify_positions()
+
+        try:
+            await asyncio.wait_for(waiter.future, timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 超时 / 取消与放行同时发生：已占用名额
+                if isinstance(e, asyncio.CancelledError):
+                    self._release(agent_role, user_id)
+                    raise
+                return
+            if waiter in queue:
+                queue.remove(waiter)
+            self._notify_positions()
+            if isinstance(e, asyncio.TimeoutError):
+                self._timeouts[priority] += 1
+                raise AdmissionTimeoutError(agent_role, priority, self.queue_timeout) from None
+            raise
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        agent_role: str,
+        user_id: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        on_queued: Optional[Callable[[int, int], Any]] = None,
+    ) -> AsyncIterator[None]:
+        """占用一个执行名额（上下文退出时释放）
+
+        Args:
+            agent_role: Agent 角色
+            user_id: 用户ID（用于按用户限制并发）
+            priority: 优先级类别（interactive / ad_hoc / scheduled）
+            on_queued: 排队位置回调 (position, queue_depth)，可为协程函数
+
+        Raises:
+            AdmissionTimeoutError: 排队超时
+        """
+        await self._admit(agent_role, user_id, priority, on_queued)
+        try:
+            yield
+        finally:
+            self._release(agent_role, user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """运行数、队列深度和排队等待时间（毫秒）"""
+        wait_ms = {}
+        for priority, samples in self._waits.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            wait_ms[priority] = {
+                "avg": round(sum(ordered) / len(ordered) * 1000, 1),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+                "max": round(ordered[-1] * 1000, 1),
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "running_by_role": dict(self._running_roles),
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": {p: len(q) for p, q in self._queues.items() if q},
+            "max_queue_depth": self._max_depth,
+            "admitted": dict(self._admitted),
+            "queued": dict(self._queued),
+            "timeouts": dict(self._timeouts),
+            "wait_ms": wait_ms,
+        }
@@ -7,6 +7,9 @@ Agent SDK Service
 多模态支持：
 - 对于纯文本请求，使用 Claude Agent SDK（支持工具调用）
 - 对于带图片的多模态请求，使用 Anthropic API 直接调用（流式输出）
+
+纯文本请求优先从 ClientPool 租用长连接的 ClaudeSDKClient，
+池满或带 MCP 服务器时回退到一次性 query()。
 """
 
 import asyncio
@@ -30,6 +33,13 @@ from claude_agent_sdk import (
 )
 from claude_agent_sdk.types import StreamEvent  # 细粒度流式输出事件
 
+from .admission import (
+    PRIORITY_AD_HOC,
+    PRIORITY_INTERACTIVE,
+    AdmissionController,
+    parse_limits,
+)
+from .client_pool import ClientPool
 from .config import AgentSDKConfig, get_config
 from .exceptions import (
     AgentNotFoundError,
@@ -45,40 +55,75 @@ class MessageBuffer:
     """消息内容缓冲器，用于批量更新数据库
 
     优化：支持首次快速刷新，减少 TTFT（Time to First Token）
+
+    两种持久化模式：
+    - 重写模式（flush_callback）：每次刷新写入完整内容
+    - 追加模式（append_callback）：每次刷新只写入上次刷新后的增量 (delta, seq)，
+      刷新间隔按 interval_backoff 逐次增长（上限 max_flush_interval），
+      中间写入次数不超过 write_budget，完成时由调用方一次性合并完整内容
     """
 
     def __init__(
         self,
-        flush_callback: Callable[[str], Any],
+        flush_callback: Optional[Callable[[str], Any]] = None,
         initial_flush_interval: float = 0.01,  # 首次 10ms 快速刷新 (TTFT优化)
         steady_flush_interval: float = 0.08,   # 后续 80ms 稳定刷新
         max_buffer_size: int = 15,             # 15 字符触发刷新 (更快响应)
+        append_callback: Optional[Callable[[str, int], Any]] = None,
+        write_budget: Optional[int] = None,    # 追加模式：中间写入次数上限
+        interval_backoff: float = 1.5,         # 追加模式：刷新间隔增长因子
+        max_flush_interval: float = 2.0,       # 追加模式：刷新间隔上限
     ):
+        if flush_callback is None and append_callback is None:
+            raise ValueError("MessageBuffer requires flush_callback or append_callback")
+
         self.flush_callback = flush_callback
+        self.append_callback = append_callback
         self.initial_flush_interval = initial_flush_interval
         self.steady_flush_interval = steady_flush_interval
         self.max_buffer_size = max_buffer_size
+        self.write_budget = write_budget
+        self.interval_backoff = interval_backoff
+        self.max_flush_interval = max_flush_interval
         self.content = ""
         self.last_flush_time = time.time()
         self.last_flush_length = 0
         self.flush_count = 0
         self._pending_flush: Optional[asyncio.Task] = None
 
+    @property
+    def append_mode(self) -> bool:
+        return self.append_callback is not None
+
+    def _flush_interval(self) -> float:
+        """当前刷新间隔：第一次快速刷新，后续稳定刷新（追加模式下逐次增长）"""
+        if self.flush_count == 0:
+            return self.initial_flush_interval
+        if not self.append_mode:
+            return self.steady_flush_interval
+        return min(
+            self.steady_flush_interval * self.interval_backoff ** (self.flush_count - 1),
+            self.max_flush_interval,
+        )
+
+    def _budget_exhausted(self) -> bool:
+        return self.write_budget is not None and self.flush_count >= self.write_budget
+
     async def append(self, text: str) -> None:
         """追加文本到缓冲区（优化：首次快速响应）"""
         self.content += text
 
-        # 第一次刷新使用快速间隔，后续使用稳定间隔
-        flush_interval = (
-            self.initial_flush_interval
-            if self.flush_count == 0
-            else self.steady_flush_interval
-        )
+        if self._budget_exhausted():
+            # 写入预算已用完：剩余内容在 finalize 时一次性写入
+            return
+
+        flush_interval = self._flush_interval()
 
         current_time = time.time()
-        should_flush = (
-            current_time - self.last_flush_time >= flush_interval
-            or len(self.content) - self.last_flush_length >= self.max_buffer_size
+        should_flush = current_time - self.last_flush_time >= flush_interval or (
+            # 追加模式只按时间刷新（首次除外），避免快速流产生大量小写入
+            (not self.append_mode or self.flush_count == 0)
+            and len(self.content) - self.last_flush_length >= self.max_buffer_size
         )
 
         if should_flush:
@@ -93,28 +138,41 @@ class MessageBuffer:
             self._pending_flush.cancel()
             self._pending_flush = None
 
+        content_length = len(self.content)
+        if self.append_mode and content_length == self.last_flush_length:
+            return
+
         try:
-            await self.flush_callback(self.content)
+            if self.append_mode:
+                delta = self.content[self.last_flush_length:content_length]
+                await self.append_callback(delta, self.flush_count)
+            else:
+                await self.flush_callback(self.content)
             self.last_flush_time = time.time()
-            self.last_flush_length = len(self.content)
+            self.last_flush_length = content_length
             self.flush_count += 1  # Track flush count for adaptive intervals
         except Exception as e:
+            # 失败时不前移 last_flush_length，下次刷新会重新包含这部分增量
             logger.error(f"Failed to flush message buffer: {e}")
 
     async def _delayed_flush(self) -> None:
         """延迟刷新"""
-        # Use appropriate interval based on flush count
-        flush_interval = (
-            self.initial_flush_interval
-            if self.flush_count == 0
-            else self.steady_flush_interval
-        )
-        await asyncio.sleep(flush_interval)
-        await self._flush()
+        await asyncio.sleep(self._flush_interval())
         self._pending_flush = None
+        if not self._budget_exhausted():
+            await self._flush()
 
     async def finalize(self) -> str:
-        """最终刷新并返回完整内容"""
+        """最终刷新并返回完整内容
+
+        追加模式下不再写入增量（调用方会用完整内容合并），只取消待执行的刷新。
+        """
+        if self.append_mode:
+            if self._pending_flush:
+                self._pending_flush.cancel()
+                self._pending_flush = None
+            return self.content
+
         await self._flush()
         return self.content
 
@@ -141,6 +199,29 @@ class AgentSDKService:
         
         # 预热优化：Agent options 缓存
         self._agent_options_cache: Dict[str, ClaudeAgentOptions] = {}
+
+        # 预热优化：按角色复用的 ClaudeSDKClient 池
+        self._client_pool: Optional[ClientPool] = None
+        if self.config.client_pool_enabled:
+            self._client_pool = ClientPool(
+                options_factory=self._get_agent_options,
+                min_size=self.config.client_pool_min_size,
+                max_size=self.config.client_pool_max_size,
+                idle_timeout=self.config.client_pool_idle_timeout,
+                max_turns_per_client=self.config.client_pool_max_turns,
+            )
+
+        # 执行准入控制：限制同时运行的 Agent 查询，超出上限时按优先级公平排队
+        self._admission: Optional[AdmissionController] = None
+        if self.config.admission_enabled:
+            self._admission = AdmissionController(
+                max_concurrency=self.config.admission_max_concurrency,
+                role_concurrency=self.config.admission_role_concurrency,
+                role_limits=parse_limits(self.config.admission_role_limits),
+                user_concurrency=self.config.admission_user_concurrency,
+                weights=parse_limits(self.config.admission_priority_weights, cast=float),
+                queue_timeout=self.config.admission_queue_timeout,
+            )
         
         # 初始化 Anthropic 客户端（用于多模态请求）
         self._anthropic_client: Optional[AsyncAnthropic] = None
@@ -237,6 +318,7 @@ class AgentSDKService:
         在 WebSocket 连接时调用，预加载：
         1. System prompt（从文件）
         2. Agent options
+        3. 客户端池中的空闲客户端（后台连接，在事件循环中调用时）
         
         Args:
             agent_role: Agent 角色标识
@@ -247,6 +329,26 @@ class AgentSDKService:
             logger.info(f"Agent warmed up: {agent_role}")
         except Exception as e:
             logger.warning(f"Failed to warmup agent {agent_role}: {e}")
+            return
+
+        if self._client_pool:
+            try:
+                asyncio.get_running_loop().create_task(self._client_pool.warm(agent_role))
+            except RuntimeError:
+                pass  # 不在事件循环中，跳过客户端预热
+
+    def pool_stats(self) -> Optional[Dict[str, Any]]:
+        """客户端池指标（命中 / 冷启动 / 回收等），未启用时返回 None"""
+        return self._client_pool.stats() if self._client_pool else None
+
+    def admission_stats(self) -> Optional[Dict[str, Any]]:
+        """准入控制指标（运行数 / 队列深度 / 排队等待时间），未启用时返回 None"""
+        return self._admission.stats() if self._admission else None
+
+    async def shutdown(self) -> None:
+        """关闭客户端池中的所有长连接"""
+        if self._client_pool:
+            await self._client_pool.shutdown()
 
     async def _execute_multimodal_query(
         self,
@@ -439,10 +541,15 @@ class AgentSDKService:
         on_text_chunk: Optional[Callable[[str], Any]] = None,
         on_tool_use: Optional[Callable[[str, Dict], Any]] = None,
         on_tool_result: Optional[Callable[[str, Any], Any]] = None,
+        user_id: Optional[str] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        on_queued: Optional[Callable[[int, int], Any]] = None,
     ) -> AsyncIterator[Dict[str, Any]]:
         """
         执行 Agent 查询（流式输出）
 
+        执行前先经过准入控制：超过全局 / 角色 / 用户并发上限时排队等待。
+
         Args:
             prompt: 用户提示词
             agent_role: Agent 角色
@@ -452,10 +559,44 @@ class AgentSDKService:
             on_text_chunk: 文本块回调
             on_tool_use: 工具调用回调
             on_tool_result: 工具结果回调
+            user_id: 用户ID（按用户限制并发）
+            priority: 排队优先级（interactive / ad_hoc / scheduled）
+            on_queued: 排队位置回调 (position, queue_depth)，可为协程函数
 
         Yields:
             消息事件字典
+
+        Raises:
+            AdmissionTimeoutError: 排队超时
         """
+        if self._admission is None:
+            async for event in self._run_query(
+                prompt, agent_role, mcp_servers, image_blocks,
+                on_text_chunk, on_tool_use, on_tool_result,
+            ):
+                yield event
+            return
+
+        async with self._admission.acquire(
+            agent_role, user_id=user_id, priority=priority, on_queued=on_queued
+        ):
+            async for event in self._run_query(
+                prompt, agent_role, mcp_servers, image_blocks,
+                on_text_chunk, on_tool_use, on_tool_result,
+            ):
+                yield event
+
+    async def _run_query(
+        self,
+        prompt: str,
+        agent_role: str,
+        mcp_servers: Optional[List[Any]],
+        image_blocks: Optional[List[Dict[str, Any]]],
+        on_text_chunk: Optional[Callable[[str], Any]],
+        on_tool_use: Optional[Callable[[str, Dict], Any]],
+        on_tool_result: Optional[Callable[[str, Any], Any]],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """执行 Agent 查询（已获得执行名额）"""
         # 多模态请求：使用 Anthropic API 直接调用（Agent SDK 不支持列表格式的 prompt）
         if image_blocks:
             logger.info(f"Executing multimodal query with {len(image_blocks)} images using Anthropic API")
@@ -478,113 +619,27 @@ class AgentSDKService:
         logger.info(f"[DEBUG] ANTHROPIC_AUTH_TOKEN={'SET (' + str(len(env_dict.get('ANTHROPIC_AUTH_TOKEN', ''))) + ' chars)' if env_dict.get('ANTHROPIC_AUTH_TOKEN') else 'NOT SET'}")
         logger.info(f"[DEBUG] Model={options.model}, CWD={options.cwd}")
 
-        try:
-            async for message in query(prompt=prompt, options=options):
-                # 处理 StreamEvent：细粒度流式输出（token 级别）
-                if isinstance(message, StreamEvent):
-                    event = message.event
-                    event_type = event.get("type", "")
-                    
-                    # content_block_delta 包含 text_delta（文本增量）
-                    if event_type == "content_block_delta":
-                        delta = event.get("delta", {})
-                        delta_type = delta.get("type", "")
-                        
-                        if delta_type == "text_delta":
-                            text = delta.get("text", "")
-                            if text:
-                                if on_text_chunk:
-                                    await self._safe_callback(on_text_chunk, text)
-                                yield {
-                                    "type": "text_delta",  # 使用 text_delta 区分于完整 TextBlock
-                                    "content": text,
-                                }
-                        elif delta_type == "thinking_delta":
-                            # 思考过程增量（如果启用了 extended thinking）
-                            thinking = delta.get("thinking", "")
-                            if thinking:
-                                yield {
-                                    "type": "thinking_delta",
-                                    "content": thinking,
-                                }
-                        elif delta_type == "input_json_delta":
-                            # 工具调用输入的增量
-                            partial_json = delta.get("partial_json", "")
-                            if partial_json:
-                                yield {
-                                    "type": "tool_input_delta",
-                                    "content": partial_json,
-                                }
-                    
-                    # content_block_start: 内容块开始
-                    elif event_type == "content_block_start":
-                        content_block = event.get("content_block", {})
-                        block_type = content_block.get("type", "")
-                        if block_type == "tool_use":
-                            # 工具调用开始
-                            yield {
-                                "type": "tool_use_start",
-                                "tool_name": content_block.get("name", ""),
-                                "tool_id": content_block.get("id", ""),
-                            }
-                        elif block_type == "thinking":
-                            yield {
-                                "type": "thinking_start",
-                            }
-                    
-                    # content_block_stop: 内容块结束
-                    elif event_type == "content_block_stop":
-                        yield {
-                            "type": "content_block_stop",
-                            "index": event.get("index", 0),
-                        }
-                    
-                    # message_start / message_delta / message_stop 可以忽略或做元数据处理
-                    elif event_type in ("message_start", "message_delta", "message_stop"):
-                        # 可选：传递消息级别的元数据
-                        pass
-
-                # 处理 AssistantMessage：完整的消息块（作为补充/备用）
-                elif isinstance(message, AssistantMessage):
-                    for block in message.content:
-                        if isinstance(block, TextBlock):
-                            # 如果已经通过 StreamEvent 发送了 text_delta，这里可能是重复的
-                            # 但为了兼容性，仍然处理完整的 TextBlock
-                            if on_text_chunk:
-                                await self._safe_callback(on_text_chunk, block.text)
-                            yield {
-                                "type": "text_chunk",
-                                "content": block.text,
-                            }
-                        elif isinstance(block, ToolUseBlock):
-                            if on_tool_use:
-                                await self._safe_callback(
-                                    on_tool_use, block.name, block.input
-                                )
-                            yield {
-                                "type": "tool_use",
-                                "tool_name": block.name,
-                                "tool_id": block.id,
-                                "input": block.input,
-                            }
-                        elif isinstance(block, ToolResultBlock):
-                            if on_tool_result:
-                                await self._safe_callback(
-                                    on_tool_result, block.tool_use_id, block.content
-                                )
-                            yield {
-                                "type": "tool_result",
-                                "tool_id": block.tool_use_id,
-                                "content": block.content,
-                            }
+        # 优先租用池中的长连接客户端（MCP 服务器按请求变化，不使用池）
+        pooled = None
+        if self._client_pool and not mcp_servers:
+            try:
+                pooled = await self._client_pool.acquire(agent_role)
+            except Exception as e:
+                logger.warning(f"Client pool unavailable for {agent_role}, using one-shot query: {e}")
 
-                elif isinstance(message, ResultMessage):
-                    yield {
-                        "type": "result",
-                        "total_cost_usd": message.total_cost_usd,
-                        "total_input_tokens": getattr(message, "total_input_tokens", 0),
-                        "total_output_tokens": getattr(message, "total_output_tokens", 0),
-                    }
+        completed = False
+        try:
+            if pooled:
+                await pooled.client.query(prompt)
+                messages = pooled.client.receive_response()
+            else:
+                messages = query(prompt=prompt, options=options)
+
+            async for event in self._iter_events(
+                messages, on_text_chunk, on_tool_use, on_tool_result
+            ):
+                yield event
+            completed = True
 
         except Exception as e:
             logger.error(f"Agent query failed: {e}", exc_info=True)
@@ -598,6 +653,125 @@ class AgentSDKService:
                 phase="execution",
                 original_error=e,
             )
+        finally:
+            if pooled:
+                # 中途取消 / 出错的客户端状态未知，不再复用
+                self._client_pool.release(pooled, reusable=completed)
+
+    async def _iter_events(
+        self,
+        messages: AsyncIterator[Any],
+        on_text_chunk: Optional[Callable[[str], Any]] = None,
+        on_tool_use: Optional[Callable[[str, Dict], Any]] = None,
+        on_tool_result: Optional[Callable[[str, Any], Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """将 SDK 消息流转换为事件字典（一次性 query() 与池中客户端共用）"""
+        async for message in messages:
+            # 处理 StreamEvent：细粒度流式输出（token 级别）
+            if isinstance(message, StreamEvent):
+                event = message.event
+                event_type = event.get("type", "")
+                
+                # content_block_delta 包含 text_delta（文本增量）
+                if event_type == "content_block_delta":
+                    delta = event.get("delta", {})
+                    delta_type = delta.get("type", "")
+                    
+                    if delta_type == "text_delta":
+                        text = delta.get("text", "")
+                        if text:
+                            if on_text_chunk:
+                                await self._safe_callback(on_text_chunk, text)
+                            yield {
+                                "type": "text_delta",  # 使用 text_delta 区分于完整 TextBlock
+                                "content": text,
+                            }
+                    elif delta_type == "thinking_delta":
+                        # 思考过程增量（如果启用了 extended thinking）
+                        thinking = delta.get("thinking", "")
+                        if thinking:
+                            yield {
+                                "type": "thinking_delta",
+                                "content": thinking,
+                            }
+                    elif delta_type == "input_json_delta":
+                        # 工具调用输入的增量
+                        partial_json = delta.get("partial_json", "")
+                        if partial_json:
+                            yield {
+                                "type": "tool_input_delta",
+                                "content": partial_json,
+                            }
+                
+                # content_block_start: 内容块开始
+                elif event_type == "content_block_start":
+                    content_block = event.get("content_block", {})
+                    block_type = content_block.get("type", "")
+                    if block_type == "tool_use":
+                        # 工具调用开始
+                        yield {
+                            "type": "tool_use_start",
+                            "tool_name": content_block.get("name", ""),
+                            "tool_id": content_block.get("id", ""),
+                        }
+                    elif block_type == "thinking":
+                        yield {
+                            "type": "thinking_start",
+                        }
+                
+                # content_block_stop: 内容块结束
+                elif event_type == "content_block_stop":
+                    yield {
+                        "type": "content_block_stop",
+                        "index": event.get("index", 0),
+                    }
+                
+                # message_start / message_delta / message_stop 可以忽略或做元数据处理
+                elif event_type in ("message_start", "message_delta", "message_stop"):
+                    # 可选：传递消息级别的元数据
+                    pass
+
+            # 处理 AssistantMessage：完整的消息块（作为补充/备用）
+            elif isinstance(message, AssistantMessage):
+                for block in message.content:
+                    if isinstance(block, TextBlock):
+                        # 如果已经通过 StreamEvent 发送了 text_delta，这里可能是重复的
+                        # 但为了兼容性，仍然处理完整的 TextBlock
+                        if on_text_chunk:
+                            await self._safe_callback(on_text_chunk, block.text)
+                        yield {
+                            "type": "text_chunk",
+                            "content": block.text,
+                        }
+                    elif isinstance(block, ToolUseBlock):
+                        if on_tool_use:
+                            await self._safe_callback(
+                                on_tool_use, block.name, block.input
+                            )
+                        yield {
+                            "type": "tool_use",
+                            "tool_name": block.name,
+                            "tool_id": block.id,
+                            "input": block.input,
+                        }
+                    elif isinstance(block, ToolResultBlock):
+                        if on_tool_result:
+                            await self._safe_callback(
+                                on_tool_result, block.tool_use_id, block.content
+                            )
+                        yield {
+                            "type": "tool_result",
+                            "tool_id": block.tool_use_id,
+                            "content": block.content,
+                        }
+
+            elif isinstance(message, ResultMessage):
+                yield {
+                    "type": "result",
+                    "total_cost_usd": message.total_cost_usd,
+                    "total_input_tokens": getattr(message, "total_input_tokens", 0),
+                    "total_output_tokens": getattr(message, "total_output_tokens", 0),
+                }
 
     async def execute_agent_task(
         self,
@@ -625,6 +799,12 @@ class AgentSDKService:
 
         logger.info(f"Starting task {task_id} for agent {agent_role}")
 
+        message_id: Optional[str] = None
+        buffer: Optional[MessageBuffer] = None
+        tool_calls: List[Dict[str, Any]] = []
+        # 追加模式：流式过程中只写入增量片段，结束时（包括取消 / 失败）合并到消息行
+        chunked = self.config.message_persist_mode == "append"
+
         try:
             # 1. 更新任务状态为 running
             await self._update_task_status(task_id, "running")
@@ -641,19 +821,28 @@ class AgentSDKService:
             async def flush_content(content: str) -> None:
                 await self._update_message_content(message_id, content)
 
-            buffer = MessageBuffer(
-                flush_callback=flush_content,
-                flush_interval=self.config.message_update_interval,
-            )
+            async def append_chunk(delta: str, seq: int) -> None:
+                await self._append_message_chunk(message_id, seq, delta)
+
+            if chunked:
+                buffer = MessageBuffer(
+                    append_callback=append_chunk,
+                    write_budget=self.config.message_write_budget,
+                )
+            else:
+                buffer = MessageBuffer(
+                    flush_callback=flush_content,
+                    steady_flush_interval=self.config.message_update_interval,
+                )
 
             # 4. 流式执行
-            tool_calls = []
             total_cost = 0.0
 
             async for event in self.execute_query(
                 prompt=prompt,
                 agent_role=agent_role,
                 mcp_servers=mcp_servers,
+                priority=PRIORITY_AD_HOC,
             ):
                 # 检查是否被取消
                 if task_id in self._cancelled_tasks:
@@ -690,6 +879,10 @@ class AgentSDKService:
                 tool_calls=tool_calls,
             )
 
+            # 合并完成：增量片段不再需要
+            if chunked:
+                await self._delete_message_chunks(message_id)
+
             await self._update_task_status(
                 task_id=task_id,
                 status="completed",
@@ -708,12 +901,14 @@ class AgentSDKService:
             }
 
         except TaskCancelledError:
+            await self._save_partial_message(message_id, buffer, "cancelled", tool_calls, chunked)
             await self._update_task_status(task_id, "cancelled")
             logger.info(f"Task {task_id} was cancelled")
             raise
 
         except Exception as e:
             logger.error(f"Task {task_id} failed: {e}", exc_info=True)
+            await self._save_partial_message(message_id, buffer, "failed", tool_calls, chunked)
             await self._update_task_status(task_id, "failed", error=str(e))
             raise TaskExecutionError(
                 task_id=task_id,
@@ -722,6 +917,35 @@ class AgentSDKService:
                 original_error=e,
             )
 
+    async def _save_partial_message(
+        self,
+        message_id: Optional[str],
+        buffer: Optional[MessageBuffer],
+        status: str,
+        tool_calls: List[Dict[str, Any]],
+        chunked: bool,
+    ) -> None:
+        """任务取消 / 失败时保存已生成的部分内容
+
+        把缓冲中的完整内容写回消息行并标记状态；追加模式下随后删除增量片段
+        （合并失败时保留片段，避免丢失内容）。
+        """
+        if not message_id:
+            return
+        content = await buffer.finalize() if buffer else ""
+        try:
+            await self._update_message(
+                message_id=message_id,
+                content=content,
+                status=status,
+                tool_calls=tool_calls,
+            )
+        except Exception as e:
+            logger.error(f"Failed to save partial message {message_id}: {e}")
+            return
+        if chunked:
+            await self._delete_message_chunks(message_id)
+
     def cancel_task(self, task_id: str) -> None:
         """标记任务为取消"""
         self._cancelled_tasks.add(task_id)
@@ -791,6 +1015,30 @@ class AgentSDKService:
             "updated_at": datetime.utcnow().isoformat(),
         }).eq("id", message_id).execute()
 
+    async def _append_message_chunk(self, message_id: str, seq: int, content: str) -> None:
+        """追加消息增量片段（追加模式）"""
+        if not self.supabase:
+            return
+
+        await self.supabase.table("message_chunks").insert({
+            "message_id": message_id,
+            "seq": seq,
+            "content": content,
+        }).execute()
+
+    async def _delete_message_chunks(self, message_id: str) -> None:
+        """删除已合并的消息增量片段"""
+        if not self.supabase:
+            return
+
+        try:
+            await self.supabase.table("message_chunks").delete().eq(
+                "message_id", message_id
+            ).execute()
+        except Exception as e:
+            # 片段已合并到消息行，删除失败只影响存储，不影响结果
+            logger.warning(f"Failed to delete chunks for message {message_id}: {e}")
+
     async def _update_message(
         self,
         message_id: str,
@@ -0,0 +1,281 @@
+"""
+ClaudeSDKClient 预热池
+
+一次性 query() 每次都会启动新的 CLI 子进程、加载系统提示词和 MCP 服务器，
+是纯文本请求 TTFT 的主要来源。ClientPool 按 Agent 角色维护长连接的
+ClaudeSDKClient：
+
+- 每个角色 min_size ~ max_size 个客户端，请求时租用空闲客户端（命中）
+  或新建客户端（冷启动）；达到上限时返回 None，由调用方回退到一次性 query()
+- 归还后在后台执行 /clear 清空会话历史（同时作为健康检查），失败则丢弃
+- 服务 max_turns_per_client 次后回收，空闲超过 idle_timeout 后驱逐（保留 min_size）
+- 请求中途被取消或出错的客户端直接关闭，不再复用
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Set
+
+from claude_agent_sdk import ClaudeAgentOptions, ClaudeSDKClient, ResultMessage
+
+logger = logging.getLogger(__name__)
+
+# 归还时用于清空会话历史的命令
+RESET_COMMAND = "/clear"
+
+
+class PooledClient:
+    """池中的单个客户端"""
+
+    __slots__ = ("client", "agent_role", "created_at", "last_used", "turns")
+
+    def __init__(self, client: Any, agent_role: str):
+        self.client = client
+        self.agent_role = agent_role
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.turns = 0
+
+
+class ClientPool:
+    """按 Agent 角色划分的 ClaudeSDKClient 预热池"""
+
+    def __init__(
+        self,
+        options_factory: Callable[[str], ClaudeAgentOptions],
+        min_size: int = 0,
+        max_size: int = 2,
+        idle_timeout: float = 600,
+        max_turns_per_client: int = 50,
+        connect_timeout: float = 60,
+        reset_timeout: float = 30,
+        maintenance_interval: float = 30,
+        client_factory: Callable[[ClaudeAgentOptions], Any] = ClaudeSDKClient,
+    ):
+        """
+        Args:
+            options_factory: agent_role -> ClaudeAgentOptions
+            min_size: 每个已使用角色保持的最少空闲客户端数
+            max_size: 每个角色的最大客户端数（含使用中）
+            idle_timeout: 空闲客户端的最长保留时间（秒）
+            max_turns_per_client: 单个客户端服务的最大请求数，超过后回收
+            connect_timeout: 新建客户端的连接超时（秒）
+            reset_timeout: 归还时清空会话的超时（秒）
+            maintenance_interval: 后台维护（驱逐 / 补充）间隔（秒）
+            client_factory: 客户端构造函数（测试时可替换）
+        """
+        self.options_factory = options_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_turns_per_client = max_turns_per_client
+        self.connect_timeout = connect_timeout
+        self.reset_timeout = reset_timeout
+        self.maintenance_interval = maintenance_interval
+        self.client_factory = client_factory
+
+        self._idle: Dict[str, Deque[PooledClient]] = {}
+        self._sizes: Dict[str, int] = {}  # 每个角色的客户端总数（空闲 + 使用中 + 连接中）
+        self._background: Set[asyncio.Task] = set()
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self._metrics: Dict[str, int] = {
+            "hits": 0,          # 租用到空闲客户端
+            "cold_starts": 0,   # 新建客户端
+            "overflows": 0,     # 达到上限，回退到一次性 query()
+            "recycled": 0,      # 达到最大请求数后回收
+            "evicted": 0,       # 空闲超时驱逐
+            "discarded": 0,     # 出错 / 取消 / 清空失败后丢弃
+            "connect_failures": 0,
+        }
+
+    # ==================== 租用 / 归还 ====================
+
+    async def acquire(self, agent_role: str) -> Optional[PooledClient]:
+        """租用客户端
+
+        Returns:
+            PooledClient；达到上限时返回 None
+
+        Raises:
+            连接失败时抛出原异常
+        """
+        if self._closed:
+            return None
+        self._ensure_maintenance()
+
+        idle = self._idle.setdefault(agent_role, deque())
+        while idle:
+            pooled = idle.pop()  # LIFO：优先使用最近归还的客户端
+            if time.monotonic() - pooled.last_used > self.idle_timeout:
+                self._spawn(self._close(pooled, "evicted"))
+                continue
+            self._metrics["hits"] += 1
+            return pooled
+
+        if self._sizes.get(agent_role, 0) >= self.max_size:
+            self._metrics["overflows"] += 1
+            return None
+
+        self._metrics["cold_starts"] += 1
+        return await self._create(agent_role)
+
+    def release(self, pooled: PooledClient, reusable: bool = True) -> None:
+        """归还客户端
+
+        Args:
+            pooled: 租用的客户端
+            reusable: 请求是否完整结束（被取消或出错时为 False，客户端将被关闭）
+        """
+        pooled.turns += 1
+        pooled.last_used = time.monotonic()
+
+        if self._closed or not reusable:
+            self._spawn(self._close(pooled, "discarded"))
+        elif pooled.turns >= self.max_turns_per_client:
+            self._spawn(self._close(pooled, "recycled"))
+        else:
+            self._spawn(self._reset_and_return(pooled))
+
+    # ==================== 内部 ====================
+
+    async def _create(self, agent_role: str) -> PooledClient:
+        self._sizes[agent_role] = self._sizes.get(agent_role, 0) + 1
+        client = self.client_factory(self.options_factory(agent_role))
+        try:
+            await asyncio.wait_for(client.connect(), timeout=self.connect_timeout)
+        except BaseException:
+            self._sizes[agent_role] -= 1
+            self._metrics["connect_failures"] += 1
+            self._spawn(self._disconnect(client))
+            raise
+        logger.info(f"[ClientPool] Connected new client for {agent_role}")
+        return PooledClient(client, agent_role)
+
+    async def _reset_and_return(self, pooled: PooledClient) -> None:
+        """清空会话历史后放回空闲队列（失败则关闭）"""
+        try:
+            await asyncio.wait_for(self._reset(pooled.client), timeout=self.reset_timeout)
+        except Exception as e:
+            logger.warning(f"[ClientPool] Reset failed for {pooled.agent_role}, discarding: {e}")
+            await self._close(pooled, "discarded")
+            return
+
+        if self._closed:
+            await self._close(pooled, "discarded")
+            return
+        pooled.last_used = time.monotonic()
+        self._idle.setdefault(pooled.agent_role, deque()).append(pooled)
+
+    @staticmethod
+    async def _reset(client: Any) -> None:
+        await client.query(RESET_COMMAND)
+        async for message in client.receive_response():
+            if isinstance(message, ResultMessage) and getattr(message, "is_error", False):
+                raise RuntimeError(f"{RESET_COMMAND} returned error")
+
+    async def _close(self, pooled: PooledClient, reason: str) -> None:
+        self._sizes[pooled.agent_role] = max(0, self._sizes.get(pooled.agent_role, 0) - 1)
+        self._metrics[reason] += 1
+        await self._disconnect(pooled.client)
+        logger.info(
+            f"[ClientPool] Closed client for {pooled.agent_role} "
+            f"({reason}, served {pooled.turns} turns)"
+        )
+
+    @staticmethod
+    async def _disconnect(client: Any) -> None:
+        try:
+            await client.disconnect()
+        except Exception as e:
+            logger.debug(f"[ClientPool] Disconnect error: {e}")
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    # ==================== 预热 / 维护 ====================
+
+    async def warm(self, agent_role: str, count: Optional[int] = None) -> int:
+        """预先建立空闲客户端
+
+        Args:
+            agent_role: Agent 角色
+            count: 目标空闲数（默认 max(min_size, 1)）
+
+        Returns:
+            新建的客户端数
+        """
+        if self._closed:
+            return 0
+        self._ensure_maintenance()
+
+        target = count if count is not None else max(self.min_size, 1)
+        idle = self._idle.setdefault(agent_role, deque())
+        created = 0
+        while len(idle) < target and self._sizes.get(agent_role, 0) < self.max_size:
+            try:
+                pooled = await self._create(agent_role)
+            except Exception as e:
+                logger.warning(f"[ClientPool] Warmup failed for {agent_role}: {e}")
+                break
+            idle.append(pooled)
+            created += 1
+        return created
+
+    def _ensure_maintenance(self) -> None:
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def _maintenance_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.sleep(self.maintenance_interval)
+                await self._maintain()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[ClientPool] Maintenance error: {e}")
+
+    async def _maintain(self) -> None:
+        """驱逐超时的空闲客户端，并为已使用的角色补足 min_size"""
+        now = time.monotonic()
+        for agent_role, idle in self._idle.items():
+            while len(idle) > self.min_size and now - idle[0].last_used > self.idle_timeout:
+                await self._close(idle.popleft(), "evicted")
+            if self.min_size:
+                await self.warm(agent_role, self.min_size)
+
+    async def shutdown(self) -> None:
+        """关闭所有客户端"""
+        self._closed = True
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+
+        for idle in self._idle.values():
+            while idle:
+                await self._close(idle.popleft(), "evicted")
+
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        logger.info("[ClientPool] Shutdown complete")
+
+    def stats(self) -> Dict[str, Any]:
+        """池状态和命中指标"""
+        leases = self._metrics["hits"] + self._metrics["cold_starts"] + self._metrics["overflows"]
+        return {
+            **self._metrics,
+            "hit_rate": round(self._metrics["hits"] / leases, 3) if leases else None,
+            "roles": {
+                role: {"total": self._sizes.get(role, 0), "idle": len(idle)}
+                for role, idle in self._idle.items()
+            },
+        }
@@ -107,6 +107,18 @@ class AgentSDKConfig:
     # 消息更新频率（秒）
     message_update_interval: float = 0.5
 
+    # 流式消息持久化模式：append（只写增量片段，结束时合并）/ rewrite（每次重写完整内容）
+    # append 模式下生成过程中 messages.content 为空，读取 status="streaming" 的消息时
+    # 拼接 message_chunks（MessageModel.merge_streaming_chunks / TaskManager 读取消息）
+    message_persist_mode: str = field(
+        default_factory=lambda: os.getenv("MESSAGE_PERSIST_MODE", "append")
+    )
+
+    # 追加模式下每条流式消息的中间写入次数上限（完成时的合并写入不计入）
+    message_write_budget: int = field(
+        default_factory=lambda: int(os.getenv("MESSAGE_WRITE_BUDGET", "24"))
+    )
+
     # 最大轮数
     max_turns: int = 20
 
@@ -116,6 +128,48 @@ class AgentSDKConfig:
     # 任务超时时间（秒）
     task_timeout: int = 300  # 5 分钟
 
+    # ClaudeSDKClient 预热池（纯文本请求复用长连接，避免每次启动 CLI 子进程）
+    client_pool_enabled: bool = field(
+        default_factory=lambda: os.getenv("AGENT_CLIENT_POOL_ENABLED", "1") not in ("0", "false", "False")
+    )
+    client_pool_min_size: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_CLIENT_POOL_MIN_SIZE", "0"))
+    )
+    client_pool_max_size: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_CLIENT_POOL_MAX_SIZE", "2"))
+    )
+    client_pool_idle_timeout: float = field(
+        default_factory=lambda: float(os.getenv("AGENT_CLIENT_POOL_IDLE_TIMEOUT", "600"))
+    )
+    client_pool_max_turns: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_CLIENT_POOL_MAX_TURNS", "50"))
+    )
+
+    # 执行准入控制（全局 / 按角色 / 按用户并发上限，按优先级加权公平排队）
+    admission_enabled: bool = field(
+        default_factory=lambda: os.getenv("AGENT_ADMISSION_ENABLED", "1") not in ("0", "false", "False")
+    )
+    admission_max_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_ADMISSION_MAX_CONCURRENCY", "8"))
+    )
+    admission_role_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_ADMISSION_ROLE_CONCURRENCY", "4"))
+    )
+    # 按角色覆盖，如 "dev_efficiency_analyst=2,ai_news_crawler=1"
+    admission_role_limits: str = field(
+        default_factory=lambda: os.getenv("AGENT_ADMISSION_ROLE_LIMITS", "")
+    )
+    admission_user_concurrency: int = field(
+        default_factory=lambda: int(os.getenv("AGENT_ADMISSION_USER_CONCURRENCY", "2"))
+    )
+    # 优先级权重，如 "interactive=8,ad_hoc=4,scheduled=1"
+    admission_priority_weights: str = field(
+        default_factory=lambda: os.getenv("AGENT_ADMISSION_WEIGHTS", "")
+    )
+    admission_queue_timeout: float = field(
+        default_factory=lambda: float(os.getenv("AGENT_ADMISSION_QUEUE_TIMEOUT", "120"))
+    )
+
     # Agent 角色配置
     agent_roles: Dict[str, AgentRoleConfig] = field(default_factory=dict)
 
@@ -107,3 +107,15 @@ class TaskTimeoutError(AgentSDKError):
         )
         self.task_id = task_id
         self.timeout_seconds = timeout_seconds
+
+
+class AdmissionTimeoutError(AgentSDKError):
+    """排队等待执行名额超时"""
+
+    def __init__(self, agent_role: str, priority: str, timeout: Optional[float]):
+        super().__init__(
+            f"Agent '{agent_role}' is busy, queued longer than {timeout}s",
+            {"role": agent_role, "priority": priority, "timeout": timeout},
+        )
+        self.agent_role = agent_role
+        self.priority = priority
@@ -9,6 +9,7 @@ from .dev_efficiency import (
     gerrit_query_tool,
     efficiency_trend_tool,
     generate_report_tool,
+    close_gerrit_client,
 )
 
 __all__ = [
@@ -16,4 +17,5 @@ __all__ = [
     "gerrit_query_tool",
     "efficiency_trend_tool",
     "generate_report_tool",
+    "close_gerrit_client",
 ]
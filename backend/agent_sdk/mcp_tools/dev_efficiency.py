@@ -14,6 +14,28 @@ from claude_agent_sdk import create_sdk_mcp_server, tool
 
 logger = logging.getLogger(__name__)
 
+# Gerrit API 共享客户端（保持连接复用，避免每次查询重新握手）
+_gerrit_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_gerrit_client() -> httpx.AsyncClient:
+    """延迟创建共享客户端（close 后可重新创建）"""
+    global _gerrit_client
+    if _gerrit_client is None or _gerrit_client.is_closed:
+        _gerrit_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+    return _gerrit_client
+
+
+async def close_gerrit_client() -> None:
+    """关闭 Gerrit API 共享客户端（进程退出时调用）"""
+    global _gerrit_client
+    if _gerrit_client is not None:
+        await _gerrit_client.aclose()
+        _gerrit_client = None
+
 
 # ==================== 工具定义 ====================
 
@@ -137,19 +159,18 @@ async def _fetch_gerrit_data(
         query += f" project:{project}"
     query += f" after:{since_date}"
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(
-            f"{gerrit_url}/changes/",
-            params={"q": query, "o": ["DETAILED_ACCOUNTS", "CURRENT_REVISION"]},
-        )
-        response.raise_for_status()
+    response = await _get_gerrit_client().get(
+        f"{gerrit_url}/changes/",
+        params={"q": query, "o": ["DETAILED_ACCOUNTS", "CURRENT_REVISION"]},
+    )
+    response.raise_for_status()
 
-        # Gerrit API 返回 )]}' 前缀
-        text = response.text
-        if text.startswith(")]}'"):
-            text = text[4:]
+    # Gerrit API 返回 )]}' 前缀
+    text = response.text
+    if text.startswith(")]}'"):
+        text = text[4:]
 
-        changes = json.loads(text)
+    changes = json.loads(text)
 
     # 处理数据
     return _process_gerrit_changes(changes, project, days, status)
@@ -29,8 +29,18 @@ class TaskManager:
         agent_service: Optional[AgentSDKService] = None,
         supabase_client: Optional[Any] = None,
         config: Optional[AgentSDKConfig] = None,
+        task_queue: Optional[Any] = None,
     ):
+        """
+        Args:
+            agent_service: Agent SDK 服务
+            supabase_client: Supabase 客户端
+            config: SDK 配置
+            task_queue: 任务队列（需提供 async enqueue(kind, agent_role, payload)）；
+                设置后任务交给 worker 进程执行（kind="agent_task"）
+        """
         self.config = config or get_config()
+        self.task_queue = task_queue
         self.supabase = supabase_client
         self.agent_service = agent_service or AgentSDKService(
             config=self.config,
@@ -85,7 +95,23 @@ class TaskManager:
 
         logger.info(f"Created task {task_id} for agent {agent_role}")
 
-        # 3. 异步执行任务（不阻塞）
+        # 3a. 交给 worker 进程执行（MCP 服务器实例无法序列化，仍在本进程执行）
+        if self.task_queue is not None and not mcp_servers:
+            await self.task_queue.enqueue("agent_task", agent_role, {
+                "task_id": task_id,
+                "agent_role": agent_role,
+                "prompt": user_message,
+                "conversation_id": conversation_id,
+            })
+            return {
+                "task_id": task_id,
+                "conversation_id": conversation_id,
+                "agent_role": agent_role,
+                "status": "pending",
+                "created_at": task_data.get("created_at"),
+            }
+
+        # 3b. 异步执行任务（不阻塞）
         async_task = asyncio.create_task(
             self._execute_task_wrapper(
                 task_id=task_id,
@@ -260,7 +286,7 @@ class TaskManager:
                 query = query.lt("created_at", before_msg.data["created_at"])
 
         result = await query.execute()
-        messages = list(reversed(result.data))
+        messages = await self._merge_streaming_chunks(list(reversed(result.data)))
 
         return {
             "messages": messages,
@@ -277,4 +303,25 @@ class TaskManager:
             "task_id", task_id
         ).eq("role", "assistant").single().execute()
 
-        return result.data if result.data else None
+        if not result.data:
+            return None
+        messages = await self._merge_streaming_chunks([result.data])
+        return messages[0]
+
+    async def _merge_streaming_chunks(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """拼接生成中消息（status="streaming"）的增量片段（追加模式下内容在 message_chunks 中）"""
+        streaming = {m["id"]: m for m in messages if m.get("status") == "streaming"}
+        if not streaming:
+            return messages
+
+        result = await self.supabase.table("message_chunks").select(
+            "message_id, seq, content"
+        ).in_("message_id", list(streaming)).order("seq").execute()
+
+        for chunk in result.data or []:
+            message = streaming[chunk["message_id"]]
+            message["content"] = (message.get("content") or "") + (chunk.get("content") or "")
+
+        return messages
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+WebSocket 发送队列 / 续传缓冲单元测试（不需要真实连接）
+
+验证 services.outbound_queue.OutboundQueue 合并、降级后帧的 seq 仍然递增，队列卡死时
+put 返回 False，以及 services.stream_buffer.StreamBuffer.replay 跨越磁盘 / 内存边界补发。
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "agent_orchestrator"),
+)
+
+from services.outbound_queue import OutboundQueue
+from services.stream_buffer import StreamBuffer
+
+
+class GatedSender:
+    """在 gate 打开前阻塞发送，使后续帧留在队列中"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.sent = []
+
+    async def send(self, frame):
+        await self.gate.wait()
+        self.sent.append(frame)
+
+    async def drain(self, queue: OutboundQueue):
+        self.gate.set()
+        for _ in range(100):
+            if queue.depth == 0:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+
+
+def _text(seq, content):
+    return {"type": "text_chunk", "content": content, "seq": seq}
+
+
+def _progress(seq, tool_id, event_type="tool_progress"):
+    return {"type": event_type, "tool_id": tool_id, "seq": seq}
+
+
+def _seqs(frames):
+    return [f["seq"] for f in frames]
+
+
+def test_coalesce_and_degrade_keep_seq_order():
+    """测试相邻文本合并、同一来源进度降级后发送顺序的 seq 严格递增"""
+    print("=" * 50)
+    print("测试: 合并 / 降级后 seq 有序")
+    print("=" * 50)
+
+    async def run():
+        sender = GatedSender()
+        queue = OutboundQueue(sender.send, maxsize=16)
+
+        # 第一帧被 sender 取走并阻塞在发送上，其余帧留在队列中
+        assert await queue.put(_text(1, "a"))
+        await asyncio.sleep(0)
+        assert queue.depth == 0
+
+        assert await queue.put(_text(2, "b"))
+        assert await queue.put(_text(3, "c"))
+        assert queue.depth == 1
+
+        assert await queue.put(_progress(4, "t1"))
+        assert await queue.put(_text(5, "d"))
+        # 同一来源的新进度：移除 seq=4，两侧文本合并，新进度追加到队尾
+        assert await queue.put(_progress(6, "t1"))
+        assert await queue.put(_text(7, "e"))
+        assert queue.depth == 3
+
+        await sender.drain(queue)
+        queue.close()
+
+        assert _seqs(sender.sent) == [1, 5, 6, 7], _seqs(sender.sent)
+        assert [f["type"] for f in sender.sent] == ["text_chunk", "text_chunk", "tool_progress", "text_chunk"]
+        text = "".join(f["content"] for f in sender.sent if f["type"] == "text_chunk")
+        assert text == "abcde", text
+        counters = queue.metrics.counters
+        assert counters["coalesced"] == 2 and counters["degraded"] == 1, counters
+        print(f"✅ 合并 / 降级测试通过: seq={_seqs(sender.sent)}")
+
+    asyncio.run(run())
+    print()
+
+
+def test_put_copies_payload():
+    """测试合并不会修改调用方持有的事件"""
+    print("=" * 50)
+    print("测试: put 复制事件")
+    print("=" * 50)
+
+    async def run():
+        sender = GatedSender()
+        queue = OutboundQueue(sender.send, maxsize=16)
+        await queue.put(_text(1, "a"))
+        await asyncio.sleep(0)
+
+        first, second = _text(2, "b"), _text(3, "c")
+        await queue.put(first)
+        await queue.put(second)
+        assert first == _text(2, "b") and second == _text(3, "c")
+
+        await sender.drain(queue)
+        queue.close()
+        assert sender.sent[-1] == _text(3, "bc"), sender.sent
+        print("✅ put 复制事件测试通过")
+
+    asyncio.run(run())
+    print()
+
+
+def test_full_queue_drops_progress_and_stalls():
+    """测试队列满时丢弃新进度、降级同一来源进度，其他事件超时后 put 返回 False"""
+    print("=" * 50)
+    print("测试: 队列满 / 卡死")
+    print("=" * 50)
+
+    async def run():
+        sender = GatedSender()
+        queue = OutboundQueue(sender.send, maxsize=2, stall_timeout=0.05)
+
+        assert await queue.put(_text(1, "a"))
+        await asyncio.sleep(0)
+        assert await queue.put(_text(2, "b"))
+        assert await queue.put(_progress(3, "t1"))
+        assert queue.depth == 2
+
+        # 队列已满：其他来源的进度直接丢弃（仍返回 True）
+        assert await queue.put(_progress(4, "task", "task_progress")) is True
+        # 同一来源的进度替换旧的一条
+        assert await queue.put(_progress(5, "t1")) is True
+        assert queue.depth == 2
+
+        # 队尾不是文本，无法合并：等待 stall_timeout 后返回 False
+        assert await queue.put(_text(6, "c")) is False
+        counters = queue.metrics.counters
+        assert counters["dropped"] == 1 and counters["degraded"] == 1 and counters["stalled"] == 1, counters
+
+        await sender.drain(queue)
+        assert _seqs(sender.sent) == [1, 2, 5], _seqs(sender.sent)
+
+        queue.close()
+        assert await queue.put(_text(7, "d")) is False
+        print(f"✅ 队列满 / 卡死测试通过: {counters}")
+
+    asyncio.run(run())
+    print()
+
+
+def test_stream_replay_across_spill_boundary():
+    """测试 replay 先读磁盘溢出部分再读内存部分，按 seq 有序且不重复"""
+    print("=" * 50)
+    print("测试: 跨磁盘 / 内存边界续传")
+    print("=" * 50)
+
+    spill_dir = tempfile.mkdtemp()
+
+    async def run():
+        stream = StreamBuffer("conv-1", "user-1", capacity=3, spill_dir=spill_dir)
+        for i in range(10):
+            stream.append({"type": "text_chunk", "content": str(i)})
+
+        assert stream.spilled == 7 and stream.first_buffered_seq == 8
+        assert os.path.exists(stream.spill_path)
+
+        # 全部在磁盘 + 内存
+        assert _seqs(await stream.replay(0)) == list(range(1, 11))
+        # 起点在磁盘中
+        assert _seqs(await stream.replay(5)) == list(range(6, 11))
+        # 紧贴边界：最后一个磁盘事件 + 全部内存事件
+        assert _seqs(await stream.replay(6)) == list(range(7, 11))
+        # 起点在内存中
+        assert _seqs(await stream.replay(7)) == [8, 9, 10]
+        assert await stream.replay(10) == []
+
+        # 回放期间继续追加，边界前移后仍然连续
+        stream.append({"type": "text_chunk", "content": "10"})
+        assert _seqs(await stream.replay(6)) == list(range(7, 12))
+        events = await stream.replay(0)
+        assert "".join(e["content"] for e in events) == "".join(str(i) for i in range(11))
+
+        path = stream.spill_path
+        stream.close()
+        assert not os.path.exists(path)
+        print("✅ 跨边界续传测试通过")
+
+    try:
+        asyncio.run(run())
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+    print()
+
+
+def main():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("WebSocket 发送队列 / 续传缓冲单元测试")
+    print("=" * 60 + "\n")
+
+    tests = [
+        test_coalesce_and_degrade_keep_seq_order,
+        test_put_copies_payload,
+        test_full_queue_drops_progress_and_stalls,
+        test_stream_replay_across_spill_boundary,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+            import traceback
+            traceback.print_exc()
+            failed += 1
+            print()
+
+    print("=" * 60)
+    print(f"测试结果: {passed} 通过, {failed} 失败")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+任务队列 / 调度租约单元测试（临时 SQLite 文件，不需要 Supabase）
+
+验证 scheduler.task_queue.TaskQueue 的按角色领取、租约过期重领和最大尝试次数，
+scheduler.worker_pool.WorkerPool 的按角色并发，以及 SQLiteJobStore.claim_fire 的一次性租约。
+"""
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "agent_orchestrator"),
+)
+
+from scheduler.job_store import SQLiteJobStore
+from scheduler.task_queue import TaskQueue
+from scheduler.worker_pool import WorkerPool
+
+
+def _db_path(tmp_dir: str) -> str:
+    return os.path.join(tmp_dir, "queue.db")
+
+
+def _with_tmp(test):
+    """在临时目录中运行异步测试"""
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        asyncio.run(test(tmp_dir))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_claim_respects_role_limits():
+    """测试按角色剩余并发领取：积压的已满角色不挤占其他角色，同一角色先进先出"""
+    print("=" * 50)
+    print("测试: 按角色并发领取")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        queue = TaskQueue(path=_db_path(tmp_dir))
+        for i in range(30):
+            await queue.enqueue("job", "A", {"i": i})
+        for i in range(3):
+            await queue.enqueue("job", "B", {"i": i})
+        await queue.enqueue("job", "C", {"i": 0})
+
+        claimed = await queue.claim("w1", {"A": 1}, default_slots=2, limit=10)
+        got = [(t["agent_role"], t["payload"]["i"]) for t in claimed]
+        assert got == [("A", 0), ("B", 0), ("B", 1), ("C", 0)], got
+        assert all(t["attempts"] == 1 for t in claimed)
+
+        # A 已满（0 个剩余）：只领取 B 剩下的任务
+        claimed = await queue.claim("w1", {"A": 0}, default_slots=2, limit=10)
+        assert [(t["agent_role"], t["payload"]["i"]) for t in claimed] == [("B", 2)]
+
+        stats = await queue.stats()
+        assert stats == {"claimed": 5, "pending": 29}, stats
+        print(f"✅ 按角色并发领取测试通过: {stats}")
+
+    _with_tmp(run)
+    print()
+
+
+def test_claim_default_slots_zero():
+    """测试 default_slots=0 时只领取显式配置了剩余并发的角色"""
+    print("=" * 50)
+    print("测试: default_slots=0")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        queue = TaskQueue(path=_db_path(tmp_dir))
+        await queue.enqueue("job", "A", {"i": 0})
+        await queue.enqueue("job", "B", {"i": 0})
+        await queue.enqueue("job", "B", {"i": 1})
+
+        assert await queue.claim("w1", {}, default_slots=0, limit=10) == []
+        assert await queue.claim("w1", {"A": 0}, default_slots=0, limit=10) == []
+
+        claimed = await queue.claim("w1", {"A": 0, "B": 1}, default_slots=0, limit=10)
+        assert [(t["agent_role"], t["payload"]["i"]) for t in claimed] == [("B", 0)]
+        print("✅ default_slots=0 测试通过")
+
+    _with_tmp(run)
+    print()
+
+
+def test_claim_fifo_within_same_second():
+    """测试同一秒内入队的任务按入队顺序领取"""
+    print("=" * 50)
+    print("测试: 同一秒内先进先出")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        queue = TaskQueue(path=_db_path(tmp_dir))
+        for i in range(20):
+            await queue.enqueue("job", "A", {"i": i})
+
+        claimed = await queue.claim("w1", {}, default_slots=20, limit=20)
+        assert [t["payload"]["i"] for t in claimed] == list(range(20))
+        print("✅ 先进先出测试通过")
+
+    _with_tmp(run)
+    print()
+
+
+def test_lease_expiry_and_max_attempts():
+    """测试租约过期后可被重新领取，超过最大尝试次数后标记失败"""
+    print("=" * 50)
+    print("测试: 租约过期重领 / 最大尝试次数")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        queue = TaskQueue(path=_db_path(tmp_dir), lease_seconds=0, max_attempts=2)
+        task_id = await queue.enqueue("job", "A", {"i": 0})
+
+        first = await queue.claim("w1", {}, default_slots=1, limit=1)
+        assert [t["id"] for t in first] == [task_id] and first[0]["attempts"] == 1
+
+        # 租约（0 秒）已过期：另一个 worker 可以重新领取
+        await asyncio.sleep(0.01)
+        second = await queue.claim("w2", {}, default_slots=1, limit=1)
+        assert [t["id"] for t in second] == [task_id] and second[0]["attempts"] == 2
+
+        # 第二次租约也过期：已达到最大尝试次数，标记失败而不是再次领取
+        await asyncio.sleep(0.01)
+        assert await queue.claim("w3", {}, default_slots=1, limit=1) == []
+        task = await queue.get(task_id)
+        assert task["status"] == "failed" and task["attempts"] == 2, task
+        print(f"✅ 租约测试通过: {task['error']}")
+
+    _with_tmp(run)
+    print()
+
+
+def test_worker_pool_role_concurrency():
+    """测试 WorkerPool 按角色限制并发，处理器失败时任务标记为 failed"""
+    print("=" * 50)
+    print("测试: WorkerPool 按角色并发")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        queue = TaskQueue(path=_db_path(tmp_dir))
+        running = {"A": 0, "B": 0}
+        peak = {"A": 0, "B": 0}
+
+        async def handler(role, i):
+            running[role] += 1
+            peak[role] = max(peak[role], running[role])
+            await asyncio.sleep(0.05)
+            running[role] -= 1
+            return {"role": role, "i": i}
+
+        async def failing(**_):
+            raise RuntimeError("boom")
+
+        ids = [await queue.enqueue("job", "A", {"role": "A", "i": i}) for i in range(3)]
+        ids += [await queue.enqueue("job", "B", {"role": "B", "i": i}) for i in range(4)]
+        failed_id = await queue.enqueue("bad", "B", {})
+
+        pool = WorkerPool(
+            queue,
+            handlers={"job": handler, "bad": failing},
+            role_concurrency={"A": 1},
+            default_concurrency=2,
+            max_concurrency=8,
+            poll_interval=0.02,
+        )
+        await pool.start()
+        try:
+            for _ in range(200):
+                stats = await queue.stats()
+                if stats.get("done", 0) + stats.get("failed", 0) == len(ids) + 1:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await pool.shutdown()
+
+        assert peak == {"A": 1, "B": 2}, peak
+        for task_id in ids:
+            task = await queue.get(task_id)
+            assert task["status"] == "done", task
+        assert (await queue.get(ids[0]))["result"] == {"role": "A", "i": 0}
+        failed = await queue.get(failed_id)
+        assert failed["status"] == "failed" and "boom" in failed["error"], failed
+        print(f"✅ WorkerPool 测试通过: peak={peak}, {pool.stats()}")
+
+    _with_tmp(run)
+    print()
+
+
+def test_claim_fire_once():
+    """测试 (job_key, fire_time) 租约只能被领取一次（不同时区表示同一时刻视为同一次触发）"""
+    print("=" * 50)
+    print("测试: claim_fire 一次性租约")
+    print("=" * 50)
+
+    async def run(tmp_dir):
+        store = SQLiteJobStore(path=os.path.join(tmp_dir, "scheduler.db"))
+        fire_time = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+        same_instant = fire_time.astimezone(timezone(timedelta(hours=8)))
+
+        assert await store.claim_fire("job-1", fire_time, "owner-a") is True
+        assert await store.claim_fire("job-1", fire_time, "owner-b") is False
+        assert await store.claim_fire("job-1", same_instant, "owner-b") is False
+
+        # 不同的触发时间 / 不同的任务各自有租约
+        next_fire = fire_time + timedelta(minutes=1)
+        assert await store.claim_fire("job-1", next_fire, "owner-b") is True
+        assert await store.claim_fire("job-2", fire_time, "owner-b") is True
+
+        assert await store.last_fire("job-1") == next_fire
+        assert await store.last_fire("job-3") is None
+        print("✅ claim_fire 测试通过")
+
+    _with_tmp(run)
+    print()
+
+
+def main():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("任务队列 / 调度租约单元测试")
+    print("=" * 60 + "\n")
+
+    tests = [
+        test_claim_respects_role_limits,
+        test_claim_default_slots_zero,
+        test_claim_fifo_within_same_second,
+        test_lease_expiry_and_max_attempts,
+        test_worker_pool_role_concurrency,
+        test_claim_fire_once,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+            import traceback
+            traceback.print_exc()
+            failed += 1
+            print()
+
+    print("=" * 60)
+    print(f"测试结果: {passed} 通过, {failed} 失败")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Token 本地验证单元测试（不需要 Supabase）
+
+验证 api/token_verifier.TokenVerifier 的 HS256 验签、拒绝规则和缓存有效期。
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import jwt
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "agent_orchestrator"),
+)
+
+from api.token_verifier import TokenVerifier
+
+SECRET = "test-jwt-secret-with-enough-length-for-hs256"
+
+
+def _token(secret=SECRET, exp_in=3600, sub="user-1", algorithm="HS256", **claims):
+    payload = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + exp_in, **claims}
+    return jwt.encode(payload, secret, algorithm=algorithm)
+
+
+def test_valid_token_cached():
+    """测试有效 Token 验证通过并进入缓存"""
+    print("=" * 50)
+    print("测试: 有效 Token + 缓存")
+    print("=" * 50)
+
+    verifier = TokenVerifier(jwt_secret=SECRET)
+    token = _token()
+
+    assert verifier.verify_sync(token) == "user-1"
+    assert asyncio.run(verifier.verify(token)) == "user-1"
+    stats = verifier.stats
+    assert stats["cache_size"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1, stats
+
+    verifier.invalidate(token)
+    assert verifier.stats["cache_size"] == 0
+
+    print(f"✅ 有效 Token 测试通过: {verifier.stats}")
+    print()
+
+
+def test_wrong_key_rejected():
+    """测试错误密钥签名的 Token 被拒绝"""
+    print("=" * 50)
+    print("测试: 错误密钥")
+    print("=" * 50)
+
+    verifier = TokenVerifier(jwt_secret=SECRET)
+    token = _token(secret="another-secret-with-enough-length-for-hs256")
+
+    assert verifier.verify_sync(token) is None
+    assert asyncio.run(verifier.verify(token)) is None
+    assert verifier.stats["cache_size"] == 0
+
+    print("✅ 错误密钥测试通过")
+    print()
+
+
+def test_expired_token_rejected():
+    """测试过期 Token 被拒绝（超出 leeway）"""
+    print("=" * 50)
+    print("测试: 过期 Token")
+    print("=" * 50)
+
+    verifier = TokenVerifier(jwt_secret=SECRET, leeway_seconds=10)
+    assert verifier.verify_sync(_token(exp_in=-60)) is None
+    assert verifier.stats["cache_size"] == 0
+
+    print("✅ 过期 Token 测试通过")
+    print()
+
+
+def test_alg_none_rejected():
+    """测试 alg=none 的未签名 Token 被拒绝（不会回退为信任）"""
+    print("=" * 50)
+    print("测试: alg=none")
+    print("=" * 50)
+
+    verifier = TokenVerifier(jwt_secret=SECRET)
+    token = jwt.encode(
+        {"sub": "attacker", "aud": "authenticated", "exp": int(time.time()) + 3600},
+        None,
+        algorithm="none",
+    )
+
+    assert verifier.verify_sync(token) is None
+    assert asyncio.run(verifier.verify(token)) is None
+    assert verifier.stats["cache_size"] == 0
+
+    print("✅ alg=none 测试通过")
+    print()
+
+
+def test_cache_expires_at_exp():
+    """测试缓存条目在 Token 的 exp 到期后失效（重新验证并因过期被拒绝）"""
+    print("=" * 50)
+    print("测试: 缓存在 exp 失效")
+    print("=" * 50)
+
+    verifier = TokenVerifier(jwt_secret=SECRET, leeway_seconds=0)
+    token = _token(exp_in=1)
+
+    assert verifier.verify_sync(token) == "user-1"
+    assert verifier.verify_sync(token) == "user-1"
+    assert verifier.stats["hits"] == 1
+
+    time.sleep(1.2)
+    assert verifier.verify_sync(token) is None
+    stats = verifier.stats
+    assert stats["cache_size"] == 0
+    assert stats["hits"] == 1 and stats["misses"] == 2, stats
+
+    print(f"✅ 缓存过期测试通过: {stats}")
+    print()
+
+
+def main():
+    """运行所有测试"""
+    print("\n" + "=" * 60)
+    print("Token 本地验证单元测试")
+    print("=" * 60 + "\n")
+
+    tests = [
+        test_valid_token_cached,
+        test_wrong_key_rejected,
+        test_expired_token_rejected,
+        test_alg_none_rejected,
+        test_cache_expires_at_exp,
+    ]
+
+    passed = 0
+    failed = 0
+
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"❌ {test.__name__} 失败: {e}")
+            import traceback
+            traceback.print_exc()
+            failed += 1
+            print()
+
+    print("=" * 60)
+    print(f"测试结果: {passed} 通过, {failed} 失败")
+    print("=" * 60)
+
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -5,13 +5,21 @@ Agent SDK 模块单元测试（不需要 API 调用）
 验证配置、初始化、MCP 工具等功能。
 """
 
+import asyncio
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from agent_sdk import AgentSDKConfig, AgentSDKService, TaskManager
-from agent_sdk.exceptions import AgentNotFoundError, TaskExecutionError
+from agent_sdk import (
+    AdmissionController,
+    AgentSDKConfig,
+    AgentSDKService,
+    ClientPool,
+    MessageBuffer,
+    TaskManager,
+)
+from agent_sdk.exceptions import AdmissionTimeoutError, AgentNotFoundError, TaskExecutionError
 from agent_sdk.mcp_tools import create_dev_efficiency_server
 
 
@@ -192,6 +200,329 @@ def test_task_manager_init():
     print()
 
 
+def test_client_pool():
+    """测试客户端池（使用假客户端，不启动 CLI）"""
+    print("=" * 50)
+    print("测试: ClaudeSDKClient 预热池")
+    print("=" * 50)
+
+    from claude_agent_sdk import ResultMessage
+
+    class FakeClient:
+        connects = 0
+
+        def __init__(self, options):
+            self.queries = []
+
+        async def connect(self):
+            FakeClient.connects += 1
+
+        async def query(self, prompt):
+            self.queries.append(prompt)
+
+        async def receive_response(self):
+            yield ResultMessage(
+                subtype="success", duration_ms=1, duration_api_ms=1,
+                is_error=False, num_turns=1, session_id="default",
+            )
+
+        async def disconnect(self):
+            pass
+
+    async def run():
+        pool = ClientPool(
+            options_factory=lambda role: None,
+            max_size=1,
+            max_turns_per_client=2,
+            client_factory=FakeClient,
+        )
+
+        first = await pool.acquire("dev_efficiency_analyst")
+        assert first is not None
+        # 达到上限：回退到一次性 query()
+        assert await pool.acquire("dev_efficiency_analyst") is None
+
+        pool.release(first)
+        await asyncio.sleep(0.01)  # 等待后台清空完成
+        assert first.client.queries == ["/clear"]  # 归还后清空会话
+
+        second = await pool.acquire("dev_efficiency_analyst")
+        assert second is first  # 命中
+        pool.release(second)  # 第 2 次请求后回收
+        await asyncio.sleep(0.01)
+
+        stats = pool.stats()
+        assert stats["hits"] == 1
+        assert stats["cold_starts"] == 1
+        assert stats["overflows"] == 1
+        assert stats["recycled"] == 1
+        assert stats["roles"]["dev_efficiency_analyst"] == {"total": 0, "idle": 0}
+
+        await pool.shutdown()
+        return stats
+
+    stats = asyncio.run(run())
+    print(f"✅ 客户端池测试通过: {stats}")
+    print()
+
+
+def test_message_buffer_append_mode():
+    """测试 MessageBuffer 追加模式（只写增量，遵守写入预算）"""
+    print("=" * 50)
+    print("测试: MessageBuffer 追加模式")
+    print("=" * 50)
+
+    chunks = {}
+
+    async def append_chunk(delta, seq):
+        chunks[seq] = delta
+
+    async def run():
+        buffer = MessageBuffer(
+            append_callback=append_chunk,
+            steady_flush_interval=0.001,
+            write_budget=5,
+        )
+        for i in range(200):
+            await buffer.append(f"{i},")
+            await asyncio.sleep(0.001)
+        return await buffer.finalize()
+
+    final = asyncio.run(run())
+    persisted = "".join(chunks[seq] for seq in sorted(chunks))
+
+    assert len(chunks) <= 5
+    assert sorted(chunks) == list(range(len(chunks)))
+    assert final.startswith(persisted)
+    assert final == "".join(f"{i}," for i in range(200))
+
+    print(f"✅ {len(final)} 字符，{len(chunks)} 次增量写入")
+    print()
+
+
+def test_execute_agent_task_saves_partial_on_failure():
+    """测试任务失败时部分内容写回消息行（追加模式下合并后删除增量片段）"""
+    print("=" * 50)
+    print("测试: 任务失败保存部分回复")
+    print("=" * 50)
+
+    class FakeQuery:
+        def __init__(self, db, table):
+            self.db, self.table, self.op, self.data = db, table, None, None
+
+        def insert(self, data):
+            self.op, self.data = "insert", data
+            return self
+
+        def update(self, data):
+            self.op, self.data = "update", data
+            return self
+
+        def delete(self):
+            self.op = "delete"
+            return self
+
+        def eq(self, *_):
+            return self
+
+        async def execute(self):
+            self.db.calls.append((self.table, self.op, self.data))
+
+            class Result:
+                data = [{"id": "msg-1"}]
+            return Result()
+
+    class FakeSupabase:
+        def __init__(self):
+            self.calls = []
+
+        def table(self, name):
+            return FakeQuery(self, name)
+
+    async def failing_query(**_):
+        yield {"type": "text_chunk", "content": "部分"}
+        yield {"type": "text_chunk", "content": "回复"}
+        yield {"type": "error", "error": "boom"}
+
+    for mode in ("append", "rewrite"):
+        db = FakeSupabase()
+        service = AgentSDKService(supabase_client=db)
+        service.config.message_persist_mode = mode
+        service.execute_query = failing_query
+        try:
+            asyncio.run(service.execute_agent_task("task-1", "dev_efficiency_analyst", "hi", "conv-1"))
+            raise AssertionError("should fail")
+        except TaskExecutionError:
+            pass
+
+        final = [d for t, op, d in db.calls if t == "messages" and op == "update" and "status" in d]
+        assert final and final[-1]["content"] == "部分回复" and final[-1]["status"] == "failed", final
+        chunk_deletes = [c for c in db.calls if c[0] == "message_chunks" and c[1] == "delete"]
+        assert bool(chunk_deletes) == (mode == "append"), (mode, db.calls)
+
+    print("✅ 任务失败时部分回复已保存")
+    print()
+
+
+def test_streaming_message_reads_merge_chunks():
+    """测试读取生成中的消息时拼接 message_chunks（追加模式）"""
+    print("=" * 50)
+    print("测试: 生成中消息拼接增量片段")
+    print("=" * 50)
+
+    rows = {
+        "messages": [
+            {"id": "msg-1", "role": "user", "content": "你好", "status": "completed", "created_at": "1"},
+            {"id": "msg-2", "role": "assistant", "content": "", "status": "streaming", "created_at": "2"},
+        ],
+        "message_chunks": [
+            {"message_id": "msg-2", "seq": 0, "content": "部分"},
+            {"message_id": "msg-2", "seq": 1, "content": "回复"},
+        ],
+    }
+
+    class FakeQuery:
+        def __init__(self, db, table):
+            self.db, self.table, self.filters = db, table, []
+
+        def select(self, *_, **__):
+            return self
+
+        def eq(self, *_):
+            return self
+
+        def order(self, *_, **__):
+            return self
+
+        def limit(self, *_):
+            return self
+
+        def range(self, *_):
+            return self
+
+        def in_(self, column, values):
+            self.filters.append((column, list(values)))
+            return self
+
+        def _result(self):
+            self.db.calls.append((self.table, self.filters))
+            data = [dict(row) for row in rows[self.table]]
+            if self.table == "messages" and self.db.newest_first:
+                data.reverse()
+
+            class Result:
+                pass
+            result = Result()
+            result.data = data
+            return result
+
+    class AsyncQuery(FakeQuery):
+        async def execute(self):
+            return self._result()
+
+    class SyncQuery(FakeQuery):
+        def execute(self):
+            return self._result()
+
+    class FakeSupabase:
+        def __init__(self, query_cls, newest_first):
+            self.query_cls, self.newest_first, self.calls = query_cls, newest_first, []
+
+        def table(self, name):
+            return self.query_cls(self, name)
+
+    # agent_sdk 读取路径（TaskManager）
+    db = FakeSupabase(AsyncQuery, newest_first=True)
+    manager = TaskManager(supabase_client=db)
+    result = asyncio.run(manager.get_messages("conv-1"))
+    assert [m["content"] for m in result["messages"]] == ["你好", "部分回复"], result
+    assert ("message_chunks", [("message_id", ["msg-2"])]) in db.calls, db.calls
+
+    # orchestrator 读取路径（MessageModel，对话消息 API 使用）
+    sys.path.insert(
+        0,
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "agent_orchestrator"),
+    )
+    from models.db_executor import DBExecutor
+    from models.message import MessageModel
+
+    db = FakeSupabase(SyncQuery, newest_first=False)
+    executor = DBExecutor(max_workers=1)
+    model = MessageModel(db, db_executor=executor)
+    try:
+        messages = asyncio.run(model.list_by_conversation("conv-1"))
+    finally:
+        executor.shutdown()
+    assert [m["content"] for m in messages] == ["你好", "部分回复"], messages
+
+    # 没有生成中的消息时不查询片段
+    rows["messages"][1]["status"] = "completed"
+    db = FakeSupabase(AsyncQuery, newest_first=True)
+    asyncio.run(TaskManager(supabase_client=db).get_messages("conv-1"))
+    assert all(table == "messages" for table, _ in db.calls), db.calls
+
+    print("✅ 生成中消息已拼接增量片段")
+    print()
+
+
+def test_admission_controller():
+    """测试准入控制（按角色 / 用户限流，对话优先于定时任务）"""
+    print("=" * 50)
+    print("测试: 执行准入控制")
+    print("=" * 50)
+
+    async def run():
+        admission = AdmissionController(
+            max_concurrency=1, role_concurrency=1, user_concurrency=1, queue_timeout=1,
+        )
+        order = []
+        positions = {}
+
+        async def job(name, priority, user_id=None):
+            def on_queued(position, depth):
+                positions[name] = position
+            async with admission.acquire(
+                "analyst", user_id=user_id, priority=priority, on_queued=on_queued
+            ):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        # 第一个请求立即执行，其余排队；对话请求先于先到的定时任务执行
+        await asyncio.gather(
+            job("first", "scheduled"),
+            job("scheduled", "scheduled"),
+            job("chat", "interactive"),
+        )
+        assert order == ["first", "chat", "scheduled"], order
+        assert positions == {"scheduled": 1, "chat": 1}, positions
+
+        # 排队超时
+        admission.queue_timeout = 0.05
+        async with admission.acquire("analyst"):
+            try:
+                async with admission.acquire("analyst", priority="ad_hoc"):
+                    raise AssertionError("should not be admitted")
+            except AdmissionTimeoutError:
+                pass
+
+        # 按用户限流：同一用户的第二个请求排队，其他用户不受影响
+        admission = AdmissionController(max_concurrency=4, role_concurrency=4, user_concurrency=1)
+        async with admission.acquire("analyst", user_id="u1"):
+            other = asyncio.ensure_future(job("u2", "interactive", user_id="u2"))
+            same = asyncio.ensure_future(job("u1-again", "interactive", user_id="u1"))
+            await other
+            assert not same.done()
+            assert admission.stats()["queue_depth"] == 1
+        await same
+        return admission.stats()
+
+    stats = asyncio.run(run())
+    assert stats["running"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"]["interactive"] == 3
+    print(f"✅ 准入控制测试通过: {stats}")
+    print()
+
+
 def main():
     """运行所有测试"""
     print("\n" + "=" * 60)
@@ -206,6 +537,11 @@ def main():
         test_mcp_tools_mock_data,
         test_exceptions,
         test_task_manager_init,
+        test_client_pool,
+        test_message_buffer_append_mode,
+        test_execute_agent_task_saves_partial_on_failure,
+        test_streaming_message_reads_merge_chunks,
+        test_admission_controller,
     ]
 
     passed = 0
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+文章存储 - 基于 SQLite 的增量索引
+
+替代整体读写的 index.json / aibot_index.json：
+- 每篇文章一行，逐条写入（WAL 模式，崩溃不丢失已提交的记录）
+- url_hash 主键：判断 "是否新文章" 为索引查找
+- (site, published) / (site, category) 索引：按时间窗口 / 分类查询只读取需要的行
+- 首次打开时自动导入旧版 JSON 索引
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url_hash   TEXT PRIMARY KEY,
+    site       TEXT NOT NULL,
+    url        TEXT NOT NULL,
+    title      TEXT,
+    published  TEXT,          -- YYYY-MM-DD（无法解析时为抓取日期）
+    category   TEXT,
+    crawled_at TEXT,
+    data       TEXT NOT NULL  -- 完整记录（JSON）
+);
+CREATE INDEX IF NOT EXISTS idx_articles_site_published ON articles(site, published);
+CREATE INDEX IF NOT EXISTS idx_articles_site_category ON articles(site, category);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_ISO_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
+
+
+def hash_url(url: str) -> str:
+    """生成 URL 的短哈希值（与文章文件名中的哈希一致）"""
+    return hashlib.md5(url.encode()).hexdigest()[:12]
+
+
+def normalize_date(value: Optional[str], fallback: Optional[str] = None) -> str:
+    """提取 YYYY-MM-DD，无法解析时使用 fallback（默认今天）"""
+    if value:
+        match = _ISO_DATE.match(str(value).strip())
+        if match:
+            return match.group(1)
+    if fallback:
+        return normalize_date(fallback)
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+class ArticleStore:
+    """文章存储"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self) -> "ArticleStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ==================== 写入 ====================
+
+    def _row(self, site: str, url_hash: str, record: dict) -> tuple:
+        return (
+            url_hash,
+            site,
+            record.get("url", ""),
+            record.get("title", ""),
+            normalize_date(record.get("published") or record.get("date"), record.get("crawled_at")),
+            record.get("category", ""),
+            record.get("crawled_at") or datetime.now().isoformat(),
+            json.dumps(record, ensure_ascii=False),
+        )
+
+    def upsert(self, site: str, url_hash: str, record: dict):
+        """写入一篇文章（立即提交）"""
+        self.upsert_many(site, [(url_hash, record)])
+
+    def upsert_many(self, site: str, items: Iterable[tuple[str, dict]]):
+        """批量写入（单个事务）"""
+        rows = [self._row(site, url_hash, record) for url_hash, record in items]
+        if not rows:
+            return
+        with self.conn:
+            self.conn.executemany(
+                """
+                INSERT INTO articles (url_hash, site, url, title, published, category, crawled_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url_hash) DO UPDATE SET
+                    url = excluded.url,
+                    title = excluded.title,
+                    published = excluded.published,
+                    category = excluded.category,
+                    crawled_at = excluded.crawled_at,
+                    data = excluded.data
+                """,
+                rows,
+            )
+            self._set_meta("last_updated", datetime.now().isoformat())
+
+    # ==================== 查询 ====================
+
+    def get(self, url_hash: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT data FROM articles WHERE url_hash = ?", (url_hash,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def contains(self, url_hash: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM articles WHERE url_hash = ?", (url_hash,)
+        ).fetchone() is not None
+
+    def existing_hashes(self, url_hashes: Iterable[str]) -> set[str]:
+        """返回已存在的 url_hash 集合（分批查询）"""
+        hashes = list(url_hashes)
+        found: set[str] = set()
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(
+                row[0]
+                for row in self.conn.execute(
+                    f"SELECT url_hash FROM articles WHERE url_hash IN ({placeholders})", batch
+                )
+            )
+        return found
+
+    def iter_articles(
+        self,
+        site: str,
+        days: Optional[int] = None,
+        category: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """按发布日期倒序流式读取文章
+
+        Args:
+            site: 来源站点
+            days: 只返回最近 N 天的文章（None 表示全部）
+            category: 分类（包含匹配）
+        """
+        sql = "SELECT data FROM articles WHERE site = ?"
+        params: list = [site]
+        if days is not None:
+            sql += " AND published >= ?"
+            params.append((datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d"))
+        if category:
+            sql += " AND category LIKE ?"
+            params.append(f"%{category}%")
+        sql += " ORDER BY published DESC, crawled_at DESC"
+
+        for (data,) in self.conn.execute(sql, params):
+            yield json.loads(data)
+
+    def count(self, site: Optional[str] = None) -> int:
+        if site:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM articles WHERE site = ?", (site,)
+            ).fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    # ==================== 元数据 / 迁移 ====================
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def import_legacy(self, key: str, items: Iterable[tuple[str, str, dict]]) -> int:
+        """一次性导入旧版 JSON 索引
+
+        Args:
+            key: 迁移标识（已导入过则跳过）
+            items: (site, url_hash, record)
+
+        Returns:
+            导入的文章数
+        """
+        if self.get_meta(f"imported:{key}"):
+            return 0
+
+        imported = 0
+        by_site: dict[str, list[tuple[str, dict]]] = {}
+        for site, url_hash, record in items:
+            by_site.setdefault(site, []).append((url_hash, record))
+            imported += 1
+
+        with self.conn:
+            for site, rows in by_site.items():
+                self.conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO articles
+                        (url_hash, site, url, title, published, category, crawled_at, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    [self._row(site, url_hash, record) for url_hash, record in rows],
+                )
+            self._set_meta(f"imported:{key}", datetime.now().isoformat())
+
+        return imported
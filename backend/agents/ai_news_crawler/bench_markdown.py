@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+HTML 转 Markdown 基准测试
+
+对比 BeautifulSoup 版本（crawl_articles.html_to_markdown）与流式版本
+（markdown_stream.html_to_markdown_streaming）的吞吐量和峰值内存，并校验输出一致。
+
+data/articles/ 中保存的是转换后的 Markdown，这里将其还原为带导航、脚本、
+侧边栏的完整 HTML 页面作为输入（--scale 可放大正文模拟长文章）。
+
+Usage:
+    python bench_markdown.py
+    python bench_markdown.py --scale 20 --rounds 5
+"""
+
+import argparse
+import html
+import re
+import sys
+import time
+import tracemalloc
+
+from crawl_articles import ARTICLES_DIR, html_to_markdown
+from markdown_stream import html_to_markdown_streaming
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="zh">
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+  <style>body {{ font-family: sans-serif; }} .post-body {{ max-width: 720px; }}</style>
+  <script>window.__DATA__ = {{"articles": [1, 2, 3]}};</script>
+</head>
+<body>
+  <header><nav><a href="/">首页</a> <a href="/articles">文章</a></nav></header>
+  <div class="layout">
+    <aside><ul><li><a href="/tag/ai">AI</a></li><li><a href="/tag/llm">LLM</a></li></ul></aside>
+    <div class="post-body">
+{body}
+    </div>
+  </div>
+  <footer><p>© bestblogs.dev</p></footer>
+  <script src="/static/app.js"></script>
+</body>
+</html>
+"""
+
+# 一致性检查用的结构边界用例（不计入计时）
+EDGE_CASES = [
+    ("after-body", "<body><p>a</p></body><p>after body</p>"),
+    ("unclosed-in-body", "<body><div><p>a</p></body><p>b</p>"),
+    ("after-html", "<html><body><p>a</p></body></html><p>after html</p>"),
+    ("second-body", "<body><p>a</p></body><body><p>c</p></body>"),
+    ("main-after-body", "<body><p>a</p></body><article><p>x</p></article>"),
+    ("no-body", "<!DOCTYPE html><p>no body</p>"),
+]
+
+
+def _inline(text: str) -> str:
+    """Markdown 行内格式 -> HTML"""
+    text = html.escape(text, quote=False)
+    text = re.sub(r"!\[([^\]]*)\]\(([^)]+)\)", r'<img src="\2" alt="\1">', text)
+    text = re.sub(r"\[([^\]]+)\]\(([^)]+)\)", r'<a href="\2">\1</a>', text)
+    text = re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", text)
+    text = re.sub(r"\*([^*]+)\*", r"<em>\1</em>", text)
+    text = re.sub(r"`([^`]+)`", r"<code>\1</code>", text)
+    return text
+
+
+def markdown_to_html(markdown: str) -> str:
+    """将保存的文章 Markdown 还原为 HTML 正文（覆盖转换器处理的所有标签）"""
+    out = []
+    lines = markdown.split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if stripped.startswith("```"):
+            lang = stripped[3:].strip()
+            code = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith("```"):
+                code.append(lines[i])
+                i += 1
+            cls = f' class="language-{lang}"' if lang else ""
+            out.append(f"<pre{cls}><code>{html.escape(chr(10).join(code))}</code></pre>")
+        elif stripped.startswith("#"):
+            level = min(len(stripped) - len(stripped.lstrip("#")), 6)
+            out.append(f"<h{level}>{_inline(stripped.lstrip('#').strip())}</h{level}>")
+        elif re.match(r"^(\d+\.|[-*])\s", stripped):
+            ordered = stripped[0].isdigit()
+            items = []
+            while i < len(lines) and re.match(r"^(\d+\.|[-*])\s", lines[i].strip()):
+                items.append(re.sub(r"^(\d+\.|[-*])\s", "", lines[i].strip()))
+                i += 1
+            tag = "ol" if ordered else "ul"
+            out.append(f"<{tag}>" + "".join(f"<li>{_inline(item)}</li>" for item in items) + f"</{tag}>")
+            continue
+        elif stripped.startswith(">"):
+            out.append(f"<blockquote><p>{_inline(stripped.lstrip('>').strip())}</p></blockquote>")
+        elif stripped:
+            out.append(f"<p>{_inline(stripped)}</p>")
+        i += 1
+
+    return "\n".join(out)
+
+
+def load_pages(scale: int) -> list[tuple[str, str]]:
+    """读取 data/articles/*.md 并生成 HTML 页面"""
+    pages = []
+    for path in sorted(ARTICLES_DIR.glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        # 去掉 frontmatter
+        if text.startswith("---"):
+            parts = text.split("---", 2)
+            text = parts[2] if len(parts) == 3 else text
+        body = markdown_to_html(text)
+        body = "\n".join([body] * scale)
+        pages.append((path.name, PAGE_TEMPLATE.format(title=html.escape(path.stem), body=body)))
+    return pages
+
+
+def measure(convert, pages: list[tuple[str, str]], rounds: int) -> dict:
+    """测量吞吐量（多轮取最好）和单次转换的峰值内存"""
+    total_bytes = sum(len(page.encode("utf-8")) for _, page in pages)
+
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _, page in pages:
+            convert(page, "https://www.bestblogs.dev/article/x")
+        best = min(best, time.perf_counter() - started)
+
+    peak = 0
+    for _, page in pages:
+        tracemalloc.start()
+        convert(page, "https://www.bestblogs.dev/article/x")
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "docs_per_sec": len(pages) / best,
+        "mb_per_sec": total_bytes / best / 1e6,
+        "peak_kb": peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML 转 Markdown 基准测试")
+    parser.add_argument("--scale", type=int, default=10, help="正文重复次数（模拟长文章，默认10）")
+    parser.add_argument("--rounds", type=int, default=3, help="计时轮数（取最好，默认3）")
+    args = parser.parse_args()
+
+    pages = load_pages(args.scale)
+    if not pages:
+        print(f"❌ {ARTICLES_DIR} 中没有文章", file=sys.stderr)
+        sys.exit(1)
+
+    size_kb = sum(len(page.encode("utf-8")) for _, page in pages) / 1024
+    print(f"📄 {len(pages)} 篇文章，HTML 共 {size_kb:.0f} KB（scale={args.scale}）\n")
+
+    # 输出一致性
+    mismatched = [
+        name for name, page in pages + EDGE_CASES
+        if html_to_markdown(page, "https://www.bestblogs.dev/article/x")
+        != html_to_markdown_streaming(page, "https://www.bestblogs.dev/article/x")
+    ]
+
+    results = {
+        "soup": measure(html_to_markdown, pages, args.rounds),
+        "stream": measure(html_to_markdown_streaming, pages, args.rounds),
+    }
+
+    print(f"{'converter':<10} {'docs/s':>10} {'MB/s':>8} {'peak KB':>10}")
+    for name, r in results.items():
+        print(f"{name:<10} {r['docs_per_sec']:>10.1f} {r['mb_per_sec']:>8.2f} {r['peak_kb']:>10.0f}")
+
+    soup, stream = results["soup"], results["stream"]
+    print(
+        f"\n⚡ 吞吐量 {soup['seconds'] / stream['seconds']:.1f}x，"
+        f"峰值内存 {soup['peak_kb'] / max(stream['peak_kb'], 1):.1f}x 更低"
+    )
+    if mismatched:
+        print(f"⚠️ 输出不一致: {', '.join(mismatched)}")
+    else:
+        print("✅ 输出一致")
+
+
+if __name__ == "__main__":
+    main()
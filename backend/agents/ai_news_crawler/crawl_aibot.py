@@ -18,6 +18,8 @@ from typing import Optional
 import httpx
 from bs4 import BeautifulSoup
 
+from article_store import ArticleStore, hash_url
+
 # 配置
 BASE_URL = "https://ai-bot.cn"
 NEWS_URL = f"{BASE_URL}/daily-ai-news/"
@@ -27,7 +29,9 @@ USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36
 SCRIPT_DIR = Path(__file__).parent
 DATA_DIR = SCRIPT_DIR / "data"
 REPORTS_DIR = SCRIPT_DIR / "reports"
-AIBOT_INDEX = DATA_DIR / "aibot_index.json"
+AIBOT_INDEX = DATA_DIR / "aibot_index.json"  # 旧版索引（仅用于一次性导入）
+STORE_FILE = DATA_DIR / "articles.db"  # 与 crawl_articles.py 共用的文章存储
+SITE = "ai-bot.cn"
 
 # 分类映射（根据关键词自动分类）
 CATEGORY_KEYWORDS = {
@@ -63,24 +67,56 @@ def categorize_news(title: str, summary: str) -> tuple[str, str]:
     return "前沿技术", ""
 
 
-def load_index() -> dict:
-    """加载索引"""
-    if AIBOT_INDEX.exists():
-        with open(AIBOT_INDEX, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {
-        "last_updated": None,
-        "source": "ai-bot.cn",
-        "news_by_date": {}
-    }
+def parse_date_label(label: str, today: Optional[datetime] = None) -> Optional[str]:
+    """将 "1月6·周二" 解析为 YYYY-MM-DD（年份取最近的过去日期）"""
+    match = re.match(r'(\d{1,2})月(\d{1,2})', label or "")
+    if not match:
+        return None
+
+    today = today or datetime.now()
+    month, day = int(match.group(1)), int(match.group(2))
+    try:
+        date = datetime(today.year, month, day)
+        if date.date() > today.date():
+            date = datetime(today.year - 1, month, day)
+    except ValueError:
+        return None
+    return date.strftime("%Y-%m-%d")
+
+
+def news_records(news_by_date: dict) -> list[tuple[str, dict]]:
+    """将按日期分组的资讯展开为 (url_hash, record) 列表"""
+    records = []
+    crawled_at = datetime.now().isoformat()
+    for date_label, items in news_by_date.items():
+        published = parse_date_label(date_label)
+        for position, item in enumerate(items):
+            if not item.get("url"):
+                continue
+            records.append((hash_url(item["url"]), {
+                **item,
+                "date_label": date_label,
+                "published": published,
+                "position": position,
+                "crawled_at": item.get("crawled_at", crawled_at),
+            }))
+    return records
+
 
+def open_store() -> ArticleStore:
+    """打开文章存储（首次打开时导入旧版 aibot_index.json）"""
+    store = ArticleStore(STORE_FILE)
+
+    if AIBOT_INDEX.exists() and not store.get_meta(f"imported:{AIBOT_INDEX.name}"):
+        with open(AIBOT_INDEX, 'r', encoding='utf-8') as f:
+            legacy = json.load(f)
+        imported = store.import_legacy(
+            AIBOT_INDEX.name,
+            ((SITE, h, record) for h, record in news_records(legacy.get("news_by_date", {}))),
+        )
+        print(f"📦 已从 {AIBOT_INDEX.name} 导入 {imported} 条资讯")
 
-def save_index(index: dict):
-    """保存索引"""
-    DATA_DIR.mkdir(parents=True, exist_ok=True)
-    index["last_updated"] = datetime.now().isoformat()
-    with open(AIBOT_INDEX, 'w', encoding='utf-8') as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    return store
 
 
 def fetch_news(days: int = 3) -> dict[str, list[dict]]:
@@ -509,10 +545,12 @@ def main():
         print("❌ 未获取到任何资讯", file=sys.stderr)
         sys.exit(1)
     
-    # 保存索引
-    index = load_index()
-    index["news_by_date"].update(news_by_date)
-    save_index(index)
+    # 写入存储（逐条 upsert，不再重写整个索引文件）
+    with open_store() as store:
+        records = news_records(news_by_date)
+        new_count = len(records) - len(store.existing_hashes(h for h, _ in records))
+        store.upsert_many(SITE, records)
+        print(f"💾 新增 {new_count} 条资讯（存储共 {store.count(SITE)} 条）")
     
     # 列出新闻
     if args.list:
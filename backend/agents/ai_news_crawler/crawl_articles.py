@@ -7,6 +7,7 @@ AI资讯追踪官 - 文章爬虫脚本
 """
 
 import argparse
+import asyncio
 import hashlib
 import json
 import os
@@ -21,6 +22,10 @@ from urllib.parse import urljoin, urlparse
 import httpx
 from bs4 import BeautifulSoup
 
+from article_store import ArticleStore
+from crawl_engine import AsyncCrawler, run_all
+from markdown_stream import html_to_markdown_streaming
+
 # 代理配置（可通过环境变量设置）
 HTTP_PROXY = os.environ.get("HTTP_PROXY") or os.environ.get("http_proxy")
 HTTPS_PROXY = os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
@@ -31,6 +36,13 @@ ARTICLES_URL = f"{BASE_URL}/articles"
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 REQUEST_DELAY = 1.5  # 请求间隔（秒）
 
+# 并发抓取配置（文章详情）
+CRAWL_CONCURRENCY = 4  # 每个主机的最大并发数
+CRAWL_RATE = 4.0  # 每个主机每秒请求数（令牌桶）
+
+# HTML 转 Markdown 实现：stream（流式，默认）/ soup（BeautifulSoup，构建完整 DOM）
+MARKDOWN_CONVERTER = os.environ.get("CRAWLER_MARKDOWN_CONVERTER", "stream")
+
 # 重试配置
 MAX_RETRIES = 3  # 最大重试次数
 RETRY_DELAY = 5  # 重试间隔（秒）
@@ -41,7 +53,10 @@ SCRIPT_DIR = Path(__file__).parent
 DATA_DIR = SCRIPT_DIR / "data"
 ARTICLES_DIR = DATA_DIR / "articles"
 REPORTS_DIR = SCRIPT_DIR / "reports"
-INDEX_FILE = DATA_DIR / "index.json"
+INDEX_FILE = DATA_DIR / "index.json"  # 旧版索引（仅用于一次性导入）
+STORE_FILE = DATA_DIR / "articles.db"  # 文章存储（逐条写入，兼作断点续爬检查点）
+SITE = "bestblogs.dev"
+HTTP_CACHE_FILE = DATA_DIR / "http_cache.json"  # ETag / Last-Modified
 
 
 def get_url_hash(url: str) -> str:
@@ -59,24 +74,38 @@ def slugify(text: str, max_length: int = 50) -> str:
     return text[:max_length].strip('-')
 
 
-def load_index() -> dict:
-    """加载文章索引"""
-    if INDEX_FILE.exists():
+def open_store() -> ArticleStore:
+    """打开文章存储（首次打开时导入旧版 index.json）"""
+    store = ArticleStore(STORE_FILE)
+
+    if INDEX_FILE.exists() and not store.get_meta(f"imported:{INDEX_FILE.name}"):
         with open(INDEX_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {
-        "last_updated": None,
-        "source": "bestblogs.dev",
-        "articles": {}
-    }
+            legacy = json.load(f)
+        imported = store.import_legacy(
+            INDEX_FILE.name,
+            ((SITE, url_hash, record) for url_hash, record in legacy.get("articles", {}).items()),
+        )
+        print(f"📦 已从 {INDEX_FILE.name} 导入 {imported} 篇文章")
+
+    return store
 
 
-def save_index(index: dict):
-    """保存文章索引"""
+def load_http_cache() -> dict:
+    """加载 URL -> {etag, last_modified}"""
+    if HTTP_CACHE_FILE.exists():
+        try:
+            with open(HTTP_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def save_http_cache(cache: dict):
+    """保存条件请求校验信息"""
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    index["last_updated"] = datetime.now().isoformat()
-    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
-        json.dump(index, f, ensure_ascii=False, indent=2)
+    with open(HTTP_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
 
 
 def fetch_page(url: str, client: httpx.Client) -> Optional[str]:
@@ -390,13 +419,95 @@ def html_to_markdown(html_content: str, base_url: str = "") -> str:
     return result.strip()
 
 
+def get_markdown_converter(name: str = None):
+    """获取 HTML 转 Markdown 实现（两者输出一致）"""
+    name = name or MARKDOWN_CONVERTER
+    if name == "soup":
+        return html_to_markdown
+    return html_to_markdown_streaming
+
+
 def fetch_article_detail(url: str, client: httpx.Client) -> Optional[str]:
     """获取文章详情并转换为 Markdown"""
     html = fetch_page(url, client)
     if not html:
         return None
     
-    return html_to_markdown(html, url)
+    return get_markdown_converter()(html, url)
+
+
+async def crawl_article_details(
+    articles: list[dict],
+    store: ArticleStore,
+    proxy: Optional[str] = None,
+    concurrency: int = CRAWL_CONCURRENCY,
+    rate: float = CRAWL_RATE,
+    converter: str = None,
+) -> dict:
+    """并发抓取文章详情
+
+    - 每篇文章完成后立即写入存储，中断后重新运行只抓取剩余文章
+    - 已抓取过的文章使用条件请求，304 时保留原文件
+    - HTML 转 Markdown 在线程中执行，不阻塞其他下载
+
+    Returns:
+        统计信息 {"saved", "not_modified", "failed"}
+    """
+    stats = {"saved": 0, "not_modified": 0, "failed": 0}
+    total = len(articles)
+    to_markdown = get_markdown_converter(converter)
+    http_cache = load_http_cache()
+
+    async with httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=30.0,
+        follow_redirects=True,
+        proxy=proxy,
+    ) as client:
+        crawler = AsyncCrawler(
+            client,
+            per_host_concurrency=concurrency,
+            rate=rate,
+            max_retries=MAX_RETRIES,
+            retry_delay=RETRY_DELAY,
+            retry_backoff=RETRY_BACKOFF,
+            validators=http_cache,
+        )
+
+        async def process(article: dict):
+            url_hash = get_url_hash(article["url"])
+            result = await crawler.fetch(article["url"], conditional=store.contains(url_hash))
+            done = sum(stats.values()) + 1
+
+            if result is None:
+                stats["failed"] += 1
+                print(f"❌ [{done}/{total}] 抓取失败: {article['title'][:40]}")
+                return
+
+            if result.not_modified:
+                stats["not_modified"] += 1
+                print(f"⏭️  [{done}/{total}] 未变化: {article['title'][:40]}")
+                return
+
+            content = await asyncio.to_thread(to_markdown, result.text, article["url"])
+            file_path = save_article(article, content)
+
+            # 写入存储（立即提交）
+            store.upsert(SITE, url_hash, {
+                **article,
+                "crawled_at": datetime.now().isoformat(),
+                "file_path": file_path
+            })
+
+            stats["saved"] += 1
+            print(f"📥 [{done}/{total}] 已保存: {article['title'][:40]}")
+
+        try:
+            await run_all(articles, process)
+        finally:
+            save_http_cache(http_cache)
+
+    return stats
 
 
 def save_article(article: dict, content: str) -> str:
@@ -437,11 +548,11 @@ crawled_at: "{datetime.now().isoformat()}"
     return f"articles/{filename}"
 
 
-def generate_weekly_report(index: dict) -> str:
-    """生成周报"""
+def generate_weekly_report(store: ArticleStore, days: int = 7) -> str:
+    """生成周报（只读取最近 N 天的文章）"""
     REPORTS_DIR.mkdir(parents=True, exist_ok=True)
     
-    articles = list(index.get("articles", {}).values())
+    articles = list(store.iter_articles(SITE, days=days))
     
     # 按评分排序
     articles_by_score = sorted(articles, key=lambda x: x.get("score", 0), reverse=True)
@@ -715,7 +826,7 @@ def push_briefing_to_feed(briefing: dict, agent_name: str = "AI资讯追踪官")
         return False
 
 
-def generate_html_cards_report(articles: list[dict], index: dict) -> str:
+def generate_html_cards_report(articles: list[dict], store: ArticleStore) -> str:
     """
     生成 HTML 卡片式报告
     - 外层以卡片形式呈现文章列表
@@ -752,7 +863,7 @@ def generate_html_cards_report(articles: list[dict], index: dict) -> str:
     cards_html = ""
     for i, article in enumerate(articles_sorted):
         url_hash = get_url_hash(article["url"])
-        article_data = index.get("articles", {}).get(url_hash, {})
+        article_data = store.get(url_hash) or {}
         file_path = article_data.get("file_path", "")
         
         # 读取文章内容（如果已爬取）
@@ -1412,25 +1523,34 @@ def main():
                         help='生成报告类型')
     parser.add_argument('--push', action='store_true', help='推送简报到信息流（需配置 Supabase）')
     parser.add_argument('--list-only', action='store_true', help='只获取列表，不抓取详情')
+    parser.add_argument('--concurrency', type=int, default=CRAWL_CONCURRENCY,
+                        help=f'每个主机的并发请求数（默认{CRAWL_CONCURRENCY}）')
+    parser.add_argument('--rate', type=float, default=CRAWL_RATE,
+                        help=f'每个主机每秒请求数（默认{CRAWL_RATE}）')
+    parser.add_argument('--md-converter', choices=['stream', 'soup'], default=MARKDOWN_CONVERTER,
+                        help='HTML 转 Markdown 实现：stream（流式）/ soup（BeautifulSoup）')
     
     args = parser.parse_args()
     
-    # 加载索引
-    index = load_index()
-    
-    # 如果只是生成报告（从索引生成）
+    with open_store() as store:
+        run(args, store)
+
+
+def run(args: argparse.Namespace, store: ArticleStore):
+    """执行爬取 / 报告生成"""
+    # 如果只是生成报告（从存储生成）
     if args.report == 'weekly':
-        generate_weekly_report(index)
+        generate_weekly_report(store, args.days)
         return
     
-    # 从缓存生成报告
+    # 从缓存生成报告（只读取时间窗口内的文章）
     if args.report in ['html', 'cards', 'briefing', 'all']:
-        cached_articles = list(index.get("articles", {}).values())
+        cached_articles = list(store.iter_articles(SITE, days=args.days, category=args.category))
         if cached_articles:
             print(f"📊 使用缓存数据生成报告（{len(cached_articles)} 篇文章）")
             
             if args.report in ['html', 'cards']:
-                generate_html_cards_report(cached_articles, index)
+                generate_html_cards_report(cached_articles, store)
             elif args.report == 'briefing':
                 briefing = generate_briefing_for_feed(cached_articles)
                 if args.push and briefing.get('should_push'):
@@ -1439,7 +1559,7 @@ def main():
                     print("ℹ️ 简报价值不足，跳过推送")
             elif args.report == 'all':
                 generate_briefing_for_feed(cached_articles)
-                generate_html_cards_report(cached_articles, index)
+                generate_html_cards_report(cached_articles, store)
             
             return
         else:
@@ -1468,12 +1588,14 @@ def main():
             print("❌ 未获取到任何文章", file=sys.stderr)
             sys.exit(1)
         
-        # 筛选新文章
-        new_articles = []
-        for article in articles:
-            url_hash = get_url_hash(article["url"])
-            if args.force or url_hash not in index["articles"]:
-                new_articles.append(article)
+        # 筛选新文章（上次中断时已保存的文章也会被跳过）
+        known = set() if args.force else store.existing_hashes(
+            get_url_hash(article["url"]) for article in articles
+        )
+        new_articles = [
+            article for article in articles
+            if get_url_hash(article["url"]) not in known
+        ]
         
         print(f"📊 新文章: {len(new_articles)} / 总计: {len(articles)}")
         
@@ -1486,7 +1608,7 @@ def main():
         
         # 生成报告
         if args.report in ['html', 'cards']:
-            generate_html_cards_report(articles, index)
+            generate_html_cards_report(articles, store)
             return
         
         if args.report in ['briefing', 'all']:
@@ -1500,34 +1622,28 @@ def main():
             
             if args.report == 'all':
                 # 同时生成 HTML 报告
-                generate_html_cards_report(articles, index)
+                generate_html_cards_report(articles, store)
             
             return
         
-        # 抓取新文章详情
-        for i, article in enumerate(new_articles, 1):
-            print(f"📥 [{i}/{len(new_articles)}] 正在抓取: {article['title'][:40]}...")
-            
-            content = fetch_article_detail(article["url"], client)
-            if content:
-                file_path = save_article(article, content)
-                
-                # 更新索引
-                url_hash = get_url_hash(article["url"])
-                index["articles"][url_hash] = {
-                    **article,
-                    "crawled_at": datetime.now().isoformat(),
-                    "file_path": file_path
-                }
-            
-            time.sleep(REQUEST_DELAY)
-        
-        # 保存索引
-        save_index(index)
-        
-        print(f"\n✅ 完成! 已保存 {len(new_articles)} 篇新文章")
-        print(f"📁 文章目录: {ARTICLES_DIR}")
-        print(f"📋 索引文件: {INDEX_FILE}")
+    # 并发抓取新文章详情（列表抓取完成后不再需要同步客户端）
+    started = time.monotonic()
+    stats = asyncio.run(crawl_article_details(
+        new_articles,
+        store,
+        proxy=proxy_config,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        converter=args.md_converter,
+    ))
+
+    print(
+        f"\n✅ 完成! 已保存 {stats['saved']} 篇新文章"
+        f"（未变化 {stats['not_modified']}，失败 {stats['failed']}，"
+        f"耗时 {time.monotonic() - started:.1f}s）"
+    )
+    print(f"📁 文章目录: {ARTICLES_DIR}")
+    print(f"📋 文章存储: {STORE_FILE}（共 {store.count(SITE)} 篇）")
 
 
 if __name__ == "__main__":
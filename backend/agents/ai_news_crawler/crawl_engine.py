@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+异步爬取引擎
+
+为爬虫脚本提供并发抓取能力：
+- 按主机限制并发数（asyncio.Semaphore）
+- 令牌桶限速，保持礼貌的请求频率
+- 条件请求（ETag / Last-Modified），未变化的页面返回 304 不重复下载
+- 超时 / 连接失败 / 5xx 指数退避重试，4xx 不重试
+"""
+
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable, Optional, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    以 rate（个/秒）的速度补充令牌，最多累积 capacity 个；
+    每次请求消耗一个令牌，令牌不足时等待。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """获取一个令牌（必要时等待）"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class FetchResult:
+    """单次抓取结果"""
+
+    url: str
+    status_code: int
+    text: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+    @property
+    def validators(self) -> dict:
+        """用于下次条件请求的校验信息"""
+        return {
+            key: value
+            for key, value in (("etag", self.etag), ("last_modified", self.last_modified))
+            if value
+        }
+
+
+class AsyncCrawler:
+    """并发、礼貌的异步抓取器"""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        per_host_concurrency: int = 4,
+        rate: float = 4.0,
+        burst: Optional[float] = None,
+        max_retries: int = 3,
+        retry_delay: float = 5,
+        retry_backoff: float = 2,
+        validators: Optional[dict] = None,
+    ):
+        """
+        Args:
+            client: 共享的 httpx.AsyncClient（连接复用）
+            per_host_concurrency: 每个主机的最大并发请求数
+            rate: 每个主机每秒请求数（令牌桶补充速度）
+            burst: 令牌桶容量（允许的突发请求数），默认等于 rate
+            max_retries: 最大尝试次数
+            retry_delay: 首次重试间隔（秒）
+            retry_backoff: 退避因子
+            validators: URL -> {"etag", "last_modified"}，用于条件请求，抓取后原地更新
+        """
+        self.client = client
+        self.per_host_concurrency = per_host_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.retry_backoff = retry_backoff
+        self.validators = validators if validators is not None else {}
+
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._host_buckets: dict[str, TokenBucket] = {}
+
+    def _host_limits(self, url: str) -> tuple[asyncio.Semaphore, TokenBucket]:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            self._host_buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._host_semaphores[host], self._host_buckets[host]
+
+    def _conditional_headers(self, url: str) -> dict:
+        cached = self.validators.get(url) or {}
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    async def fetch(self, url: str, conditional: bool = True) -> Optional[FetchResult]:
+        """抓取页面（带重试）
+
+        Args:
+            url: 页面地址
+            conditional: 是否携带已知的 ETag / Last-Modified
+
+        Returns:
+            FetchResult（304 时 text 为 None）；失败返回 None
+        """
+        semaphore, bucket = self._host_limits(url)
+        headers = self._conditional_headers(url) if conditional else {}
+        last_error = None
+
+        for attempt in range(self.max_retries):
+            delay = self.retry_delay * (self.retry_backoff ** attempt)
+            try:
+                async with semaphore:
+                    await bucket.acquire()
+                    response = await self.client.get(url, headers=headers, follow_redirects=True)
+
+                if response.status_code == 304:
+                    return FetchResult(url=url, status_code=304)
+
+                response.raise_for_status()
+                result = FetchResult(
+                    url=url,
+                    status_code=response.status_code,
+                    text=response.text,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+                if result.validators:
+                    self.validators[url] = result.validators
+                return result
+
+            except httpx.TimeoutException as e:
+                last_error = e
+                print(f"⏳ 请求超时 (尝试 {attempt + 1}/{self.max_retries}): {url}", file=sys.stderr)
+            except httpx.ConnectError as e:
+                last_error = e
+                print(f"🔌 连接失败 (尝试 {attempt + 1}/{self.max_retries}): {url}", file=sys.stderr)
+            except httpx.HTTPStatusError as e:
+                # 4xx 错误不重试
+                if 400 <= e.response.status_code < 500:
+                    print(f"❌ 请求失败 (HTTP {e.response.status_code}): {url}", file=sys.stderr)
+                    return None
+                last_error = e
+                print(
+                    f"⚠️ 服务器错误 (尝试 {attempt + 1}/{self.max_retries}): HTTP {e.response.status_code}",
+                    file=sys.stderr,
+                )
+            except httpx.HTTPError as e:
+                last_error = e
+                print(f"⚠️ 网络错误 (尝试 {attempt + 1}/{self.max_retries}): {e}", file=sys.stderr)
+
+            if attempt < self.max_retries - 1:
+                print(f"   {delay}秒后重试...", file=sys.stderr)
+                await asyncio.sleep(delay)
+
+        print(f"❌ 请求失败，已达最大重试次数: {url}", file=sys.stderr)
+        print(f"   最后错误: {last_error}", file=sys.stderr)
+        return None
+
+
+async def run_all(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+) -> list[Optional[R]]:
+    """并发执行 worker，单个任务异常不影响其他任务（异常位置返回 None）"""
+
+    async def guarded(item: T) -> Optional[R]:
+        try:
+            return await worker(item)
+        except Exception as e:
+            print(f"⚠️ 任务失败: {e}", file=sys.stderr)
+            return None
+
+    return await asyncio.gather(*(guarded(item) for item in items))
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+流式 HTML 转 Markdown
+
+与 crawl_articles.html_to_markdown（BeautifulSoup 版本）输出一致，
+但不构建 DOM 树：基于 html.parser 的事件流（SAX 风格）逐个处理标签，
+内存占用只与当前打开的标签栈和输出有关。
+
+转换规则（与 BeautifulSoup 版本相同）：
+- script/style/nav/footer/header/aside 整个子树丢弃
+- 主体为文档中第一个匹配 article / main / [class*="content"] / [class*="post-body"] 的元素，
+  没有时使用 body（没有 body 时使用整个文档）
+- 标题、段落、代码、图片、链接、列表、引用、粗体、斜体作为整体输出（取子树文本），
+  其他标签透明处理（递归其子节点）
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Iterable, Optional, Union
+from urllib.parse import urljoin
+
+# 丢弃的子树
+SKIP_TAGS = {"script", "style", "nav", "footer", "header", "aside"}
+
+# 整体输出的标签（取子树文本，不再递归）
+CAPTURE_TAGS = {
+    "h1", "h2", "h3", "h4", "h5", "h6",
+    "p", "pre", "code", "a", "ul", "ol", "blockquote",
+    "strong", "b", "em", "i",
+}
+
+# 空元素（与 BeautifulSoup 的 HTML 树构建器一致）
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+}
+
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+def _is_main_content(tag: str, attrs: dict) -> bool:
+    """等价于 select_one('article, main, [class*="content"], [class*="post-body"]')"""
+    if tag in ("article", "main"):
+        return True
+    classes = " ".join((attrs.get("class") or "").split())
+    return "content" in classes or "post-body" in classes
+
+
+class _Capture:
+    """整体输出标签的收集状态"""
+
+    __slots__ = ("tag", "attrs", "depth", "texts", "items", "in_item")
+
+    def __init__(self, tag: str, attrs: dict):
+        self.tag = tag
+        self.attrs = attrs
+        self.depth = 0  # 相对于捕获标签的嵌套深度
+        self.texts: list[str] = []
+        self.items: list[list[str]] = []  # ul/ol 的直接 li 子节点
+        self.in_item = False
+
+
+class _Renderer:
+    """将标签事件渲染为 Markdown 行"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.lines: list[str] = []
+        self.capture: Optional[_Capture] = None
+
+    def _absolute(self, url: str) -> str:
+        return url if url.startswith("http") else urljoin(self.base_url, url)
+
+    def start(self, tag: str, attrs: dict, void: bool):
+        capture = self.capture
+        if capture:
+            if void:
+                return
+            capture.depth += 1
+            if capture.tag in ("ul", "ol") and capture.depth == 1 and tag == "li":
+                capture.items.append([])
+                capture.in_item = True
+            return
+
+        if tag == "img":
+            src = attrs.get("src", "")
+            alt = attrs.get("alt", "图片")
+            if src:
+                self.lines.append(f"\n![{alt}]({self._absolute(src)})\n")
+            return
+
+        if tag in CAPTURE_TAGS and not void:
+            self.capture = _Capture(tag, attrs)
+
+    def end(self):
+        capture = self.capture
+        if not capture:
+            return
+        if capture.depth:
+            if capture.tag in ("ul", "ol") and capture.depth == 1:
+                capture.in_item = False
+            capture.depth -= 1
+            return
+        self.capture = None
+        self._emit(capture)
+
+    def text(self, data: str):
+        capture = self.capture
+        if capture:
+            if capture.tag in ("ul", "ol"):
+                if capture.in_item:
+                    capture.items[-1].append(data)
+            else:
+                capture.texts.append(data)
+            return
+
+        data = data.strip()
+        if data:
+            self.lines.append(data)
+
+    def comment(self, data: str):
+        # 注释不计入 get_text()，但在透明遍历时与普通字符串一样输出
+        if not self.capture:
+            data = data.strip()
+            if data:
+                self.lines.append(data)
+
+    @staticmethod
+    def _stripped(texts: list[str]) -> str:
+        return "".join(t.strip() for t in texts)
+
+    def _emit(self, capture: _Capture):
+        tag = capture.tag
+        lines = self.lines
+
+        if tag[0] == "h" and tag[1:].isdigit():
+            text = self._stripped(capture.texts)
+            if text:
+                lines.append(f"\n{'#' * int(tag[1])} {text}\n")
+
+        elif tag == "p":
+            text = self._stripped(capture.texts)
+            if text:
+                lines.append(f"\n{text}\n")
+
+        elif tag in ("pre", "code"):
+            code = "".join(capture.texts)
+            lang = ""
+            for cls in (capture.attrs.get("class") or "").split():
+                if cls.startswith("language-"):
+                    lang = cls.replace("language-", "")
+                    break
+            if tag == "pre" or "\n" in code:
+                lines.append(f"\n```{lang}\n{code}\n```\n")
+            else:
+                lines.append(f"`{code}`")
+
+        elif tag == "a":
+            href = capture.attrs.get("href") or ""
+            text = self._stripped(capture.texts)
+            if href and text:
+                lines.append(f"[{text}]({self._absolute(href)})")
+
+        elif tag in ("ul", "ol"):
+            lines.append("")
+            for i, item in enumerate(capture.items):
+                prefix = f"{i+1}. " if tag == "ol" else "- "
+                text = self._stripped(item)
+                if text:
+                    lines.append(f"{prefix}{text}")
+            lines.append("")
+
+        elif tag == "blockquote":
+            text = self._stripped(capture.texts)
+            if text:
+                quoted = "\n".join(f"> {line}" for line in text.split("\n"))
+                lines.append(f"\n{quoted}\n")
+
+        elif tag in ("strong", "b"):
+            text = self._stripped(capture.texts)
+            if text:
+                lines.append(f"**{text}**")
+
+        elif tag in ("em", "i"):
+            text = self._stripped(capture.texts)
+            if text:
+                lines.append(f"*{text}*")
+
+
+class _StreamingParser(HTMLParser):
+    """维护与 BeautifulSoup 相同的标签栈语义，并将事件分发给渲染器
+
+    - 结束标签弹出到最近的同名开放标签；没有同名开放标签时忽略
+    - 找到主体元素前按整个文档渲染（用于 body / 文档回退），找到后只渲染主体
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.stack: list[str] = []
+        self.stack_popped: Optional[str] = None
+        self.pending: list[str] = []
+
+        self.skip_at: Optional[int] = None  # 被丢弃子树在栈中的位置
+
+        self.main: Optional[_Renderer] = None
+        self.main_at: Optional[int] = None
+        self.main_done = False
+
+        self.fallback: Optional[_Renderer] = _Renderer(base_url)
+        self.body_range: Optional[list[int]] = None
+        self.body_at: Optional[int] = None
+
+        self.base_url = base_url
+
+    # ---------- 分发 ----------
+
+    def _renderers(self) -> list[_Renderer]:
+        if self.main_done:
+            return []
+        renderers = []
+        if self.main is not None:
+            renderers.append(self.main)
+        if self.fallback is not None:
+            renderers.append(self.fallback)
+        return renderers
+
+    def _flush_text(self):
+        if not self.pending:
+            return
+        data = "".join(self.pending)
+        self.pending.clear()
+        if self.skip_at is not None:
+            return
+        for renderer in self._renderers():
+            renderer.text(data)
+
+    # ---------- HTMLParser 回调 ----------
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        void = tag in VOID_TAGS
+        # 与 BeautifulSoup 一致：无值属性为空字符串，重复属性后者覆盖前者
+        attrs_dict = {key: value if value is not None else "" for key, value in attrs}
+
+        if self.skip_at is None and not self.main_done:
+            if tag in SKIP_TAGS:
+                if not void:
+                    self.skip_at = len(self.stack)
+                    self.stack.append(tag)
+                return
+
+            if self.main is None and _is_main_content(tag, attrs_dict):
+                # 找到主体：不再需要文档回退
+                self.main = _Renderer(self.base_url)
+                self.fallback = None
+                if not void:
+                    self.main_at = len(self.stack)
+                self.main.start(tag, attrs_dict, void)
+                if void:
+                    self.main_done = True
+                else:
+                    self.stack.append(tag)
+                return
+
+            if tag == "body" and self.body_at is None and self.fallback is not None:
+                self.body_at = len(self.stack)
+                self.body_range = [len(self.fallback.lines), -1]
+
+            for renderer in self._renderers():
+                renderer.start(tag, attrs_dict, void)
+
+        if not void:
+            self.stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if tag not in self.stack:
+            return
+        while self.stack:
+            self._pop()
+            if self.stack_popped == tag:
+                break
+
+    def _pop(self):
+        popped = self.stack.pop()
+        self.stack_popped = popped
+        position = len(self.stack)
+
+        if self.skip_at is not None:
+            if position == self.skip_at:
+                self.skip_at = None
+            return
+
+        if self.main_done:
+            return
+
+        for renderer in self._renderers():
+            renderer.end()
+
+        if self.main_at is not None and position == self.main_at:
+            self.main_done = True
+        elif (
+            self.body_at is not None and position == self.body_at
+            and self.fallback is not None and self.body_range[1] < 0
+        ):
+            # 只记录 body 自身的结束位置：body 之后同层级的元素不属于 body
+            self.body_range[1] = len(self.fallback.lines)
+
+    def handle_data(self, data):
+        self.pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush_text()
+        if self.skip_at is None:
+            for renderer in self._renderers():
+                renderer.comment(data)
+
+    def handle_decl(self, decl):
+        # BeautifulSoup 将 <!DOCTYPE html> 保存为字符串 "html"（只在无 body 时可见）
+        if decl.startswith("DOCTYPE "):
+            decl = decl[len("DOCTYPE "):]
+        self.handle_comment(decl)
+
+    def finish(self) -> list[str]:
+        """结束解析，返回主体的 Markdown 行"""
+        self.close()
+        self._flush_text()
+        while self.stack:
+            self._pop()
+
+        if self.main is not None:
+            return self.main.lines
+
+        lines = self.fallback.lines
+        if self.body_range is not None:
+            start, end = self.body_range
+            return lines[start:end if end >= 0 else len(lines)]
+        return lines
+
+
+def html_to_markdown_streaming(
+    html: Union[str, Iterable[str]],
+    base_url: str = "",
+) -> str:
+    """流式将 HTML 转换为 Markdown
+
+    Args:
+        html: HTML 字符串，或按块产出的字符串迭代器（例如响应流）
+        base_url: 用于补全相对链接和图片地址
+
+    Returns:
+        Markdown 文本（与 BeautifulSoup 版本的 html_to_markdown 一致）
+    """
+    parser = _StreamingParser(base_url)
+
+    if isinstance(html, str):
+        for i in range(0, len(html), FEED_CHUNK_SIZE):
+            parser.feed(html[i:i + FEED_CHUNK_SIZE])
+    else:
+        for chunk in html:
+            parser.feed(chunk)
+
+    result = "\n".join(parser.finish())
+    result = re.sub(r"\n{3,}", "\n\n", result)  # 压缩多余空行
+    return result.strip()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+WebSocket 心跳调度基准测试
+
+对比每个连接一个心跳任务（旧实现：sleep + Event + wait_for）与共享时间轮
+（services.websocket_manager.ConnectionManager）在大量空闲连接下的 CPU 开销。
+
+使用内存中的假 WebSocket（send 立即完成，客户端不回 pong，与浏览器行为一致），
+只测量调度本身的开销。输出为测量窗口内的进程 CPU 时间和 CPU 占用率。
+
+Usage:
+    python scripts/bench_ws_heartbeat.py
+    python scripts/bench_ws_heartbeat.py --connections 10000 --seconds 20
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "agent_orchestrator"))
+
+from services.websocket_manager import ConnectionManager  # noqa: E402
+
+
+class FakeWebSocket:
+    """只计数的 WebSocket"""
+
+    __slots__ = ("sent",)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_json(self, data):
+        self.sent += 1
+
+    async def send_text(self, text):
+        self.sent += 1
+
+    async def close(self, code=1000, reason=None):
+        pass
+
+
+class LegacyHeartbeat:
+    """旧实现：每个连接一个心跳任务，每次 ping 创建 Event 并 wait_for 等待 pong"""
+
+    def __init__(self, interval: float, ping_timeout: float, idle_timeout: float):
+        self.interval = interval
+        self.ping_timeout = ping_timeout
+        self.idle_timeout = idle_timeout
+        self.tasks = []
+        self.pending = {}
+
+    def connect(self, key: str, websocket: FakeWebSocket) -> None:
+        self.tasks.append(asyncio.create_task(self._loop(key, websocket, time.time())))
+
+    async def _loop(self, key: str, websocket: FakeWebSocket, last_activity: float) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.time() - last_activity > self.idle_timeout:
+                return
+            await websocket.send_json({"type": "ping", "ts": time.time()})
+            event = asyncio.Event()
+            self.pending[key] = event
+            try:
+                await asyncio.wait_for(event.wait(), timeout=self.ping_timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self.pending.pop(key, None)
+
+    async def shutdown(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+async def _measure(seconds: float) -> float:
+    """测量窗口内的进程 CPU 时间（秒）"""
+    cpu = time.process_time()
+    await asyncio.sleep(seconds)
+    return time.process_time() - cpu
+
+
+async def bench_legacy(connections: int, seconds: float, warmup: float):
+    manager = LegacyHeartbeat(
+        interval=int(os.getenv("WS_HEARTBEAT_INTERVAL", "3")),
+        ping_timeout=int(os.getenv("WS_PING_TIMEOUT", "5")),
+        idle_timeout=int(os.getenv("WS_IDLE_TIMEOUT", "300")),
+    )
+    sockets = [FakeWebSocket() for _ in range(connections)]
+    for i, ws in enumerate(sockets):
+        manager.connect(f"conv-{i}:user", ws)
+    await asyncio.sleep(warmup)
+    before = sum(ws.sent for ws in sockets)
+    cpu = await _measure(seconds)
+    pings = sum(ws.sent for ws in sockets) - before
+    await manager.shutdown()
+    return cpu, pings
+
+
+async def bench_wheel(connections: int, seconds: float, warmup: float):
+    manager = ConnectionManager()
+    sockets = [FakeWebSocket() for _ in range(connections)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws, f"conv-{i}", "user")
+    await asyncio.sleep(warmup)
+    before = sum(ws.sent for ws in sockets)
+    cpu = await _measure(seconds)
+    pings = sum(ws.sent for ws in sockets) - before
+    await manager.shutdown()
+    return cpu, pings
+
+
+def _report(name: str, connections: int, seconds: float, cpu: float, pings: int) -> None:
+    per_10k = cpu / seconds * 100 * 10000 / connections
+    print(
+        f"{name:<8} cpu={cpu:7.3f}s  cpu%={cpu / seconds * 100:6.2f}  "
+        f"cpu% per 10k={per_10k:6.2f}  pings/s={pings / seconds:6.0f}  "
+        f"cpu/ping={cpu / max(pings, 1) * 1e6:6.1f}us"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="WebSocket 心跳调度基准测试")
+    parser.add_argument("--connections", type=int, default=10000, help="空闲连接数")
+    parser.add_argument("--seconds", type=float, default=15.0, help="测量时长（秒）")
+    parser.add_argument("--warmup", type=float, default=6.0, help="预热时长（秒），跳过建连后的首轮")
+    args = parser.parse_args()
+
+    print(f"connections={args.connections}, window={args.seconds}s, warmup={args.warmup}s")
+    for name, bench in (("legacy", bench_legacy), ("wheel", bench_wheel)):
+        gc.collect()
+        cpu, pings = asyncio.run(bench(args.connections, args.seconds, args.warmup))
+        _report(name, args.connections, args.seconds, cpu, pings)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+-- Migration: add_message_chunks
+-- Description: Append-only streaming persistence for assistant messages
+-- While a message is streaming, only new deltas are inserted here (one small row per flush)
+-- instead of rewriting messages.content on every flush. On completion the full content is
+-- written to messages.content once and the chunks are deleted.
+
+CREATE TABLE IF NOT EXISTS message_chunks (
+    message_id UUID NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (message_id, seq)
+);
+
+ALTER TABLE message_chunks ENABLE ROW LEVEL SECURITY;
+
+-- Users can read chunks of messages in their conversations (live view of a streaming message)
+CREATE POLICY "Users can read message chunks in own conversations" ON message_chunks
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM messages
+            JOIN conversations ON conversations.id = messages.conversation_id
+            WHERE messages.id = message_chunks.message_id
+            AND conversations.user_id = auth.uid()
+        )
+    );
+
+COMMENT ON TABLE message_chunks IS '流式消息的增量片段（按 seq 拼接；消息完成后合并到 messages.content 并删除）';
@@ -0,0 +1,33 @@
+-- Migration: add_scheduler_leases
+-- Description: Distributed-safe scheduling for the orchestrator
+-- Every API worker / replica runs APScheduler, but each fire time is executed by exactly one
+-- instance: the instance that inserts (job_key, fire_time) first. Retries are persisted here
+-- instead of in-memory APScheduler jobs and are claimed with an expiring lease.
+
+CREATE TABLE IF NOT EXISTS scheduler_fire_leases (
+    job_key TEXT NOT NULL,
+    fire_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    owner TEXT NOT NULL,
+    claimed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_key, fire_time)
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_retries (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    job_key TEXT NOT NULL,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    payload JSONB NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'claimed', 'done')),
+    owner TEXT,
+    lease_expires TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduler_retries_due ON scheduler_retries(status, run_at);
+
+-- Only the backend (service role) touches these tables
+ALTER TABLE scheduler_fire_leases ENABLE ROW LEVEL SECURITY;
+ALTER TABLE scheduler_retries ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE scheduler_fire_leases IS '定时任务触发租约（每个触发时间只有一个实例执行）';
+COMMENT ON TABLE scheduler_retries IS '持久化的任务重试（按租约领取，重启后不丢失）';
@@ -0,0 +1,161 @@
+-- Migration: add_user_usage_counters
+-- Description: O(1) usage stats for the profile screen
+-- Per-user counters are maintained by triggers on insert / delete (and conversation status
+-- changes), so /profile/usage-stats reads one row instead of counting the user's whole
+-- history. get_user_usage_stats() returns every counter in a single round-trip.
+
+CREATE TABLE IF NOT EXISTS user_usage_counters (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    total_briefings BIGINT NOT NULL DEFAULT 0,
+    total_messages BIGINT NOT NULL DEFAULT 0,
+    active_conversations BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Only the backend (service role) reads / writes counters
+ALTER TABLE user_usage_counters ENABLE ROW LEVEL SECURITY;
+
+-- ============================================
+-- Counter maintenance
+-- ============================================
+
+CREATE OR REPLACE FUNCTION bump_user_usage(
+    p_user_id UUID,
+    p_briefings BIGINT,
+    p_messages BIGINT,
+    p_active_conversations BIGINT
+) RETURNS VOID AS $$
+BEGIN
+    IF p_user_id IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO user_usage_counters AS c (user_id, total_briefings, total_messages, active_conversations)
+    VALUES (p_user_id, GREATEST(p_briefings, 0), GREATEST(p_messages, 0), GREATEST(p_active_conversations, 0))
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_briefings = GREATEST(c.total_briefings + p_briefings, 0),
+        total_messages = GREATEST(c.total_messages + p_messages, 0),
+        active_conversations = GREATEST(c.active_conversations + p_active_conversations, 0),
+        updated_at = CURRENT_TIMESTAMP;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_briefing_usage() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_usage(NEW.user_id, 1, 0, 0);
+    ELSE
+        PERFORM bump_user_usage(OLD.user_id, -1, 0, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_message_usage() RETURNS TRIGGER AS $$
+BEGIN
+    -- Cascaded deletes (conversation removed) find no parent row here; they are
+    -- accounted for by track_conversation_usage instead.
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_usage(
+            (SELECT user_id FROM conversations WHERE id = NEW.conversation_id), 0, 1, 0
+        );
+    ELSE
+        PERFORM bump_user_usage(
+            (SELECT user_id FROM conversations WHERE id = OLD.conversation_id), 0, -1, 0
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION track_conversation_usage() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_user_usage(NEW.user_id, 0, 0, CASE WHEN NEW.status = 'active' THEN 1 ELSE 0 END);
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.status IS DISTINCT FROM OLD.status THEN
+            PERFORM bump_user_usage(
+                NEW.user_id, 0, 0,
+                (CASE WHEN NEW.status = 'active' THEN 1 ELSE 0 END)
+                - (CASE WHEN OLD.status = 'active' THEN 1 ELSE 0 END)
+            );
+        END IF;
+        RETURN NEW;
+    ELSE
+        -- BEFORE DELETE: messages are still visible and about to be cascaded away
+        PERFORM bump_user_usage(
+            OLD.user_id, 0,
+            -(SELECT COUNT(*) FROM messages WHERE conversation_id = OLD.id),
+            CASE WHEN OLD.status = 'active' THEN -1 ELSE 0 END
+        );
+        RETURN OLD;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS trg_briefings_usage ON briefings;
+CREATE TRIGGER trg_briefings_usage
+    AFTER INSERT OR DELETE ON briefings
+    FOR EACH ROW EXECUTE FUNCTION track_briefing_usage();
+
+DROP TRIGGER IF EXISTS trg_messages_usage ON messages;
+CREATE TRIGGER trg_messages_usage
+    AFTER INSERT OR DELETE ON messages
+    FOR EACH ROW EXECUTE FUNCTION track_message_usage();
+
+DROP TRIGGER IF EXISTS trg_conversations_usage_write ON conversations;
+CREATE TRIGGER trg_conversations_usage_write
+    AFTER INSERT OR UPDATE OF status ON conversations
+    FOR EACH ROW EXECUTE FUNCTION track_conversation_usage();
+
+DROP TRIGGER IF EXISTS trg_conversations_usage_delete ON conversations;
+CREATE TRIGGER trg_conversations_usage_delete
+    BEFORE DELETE ON conversations
+    FOR EACH ROW EXECUTE FUNCTION track_conversation_usage();
+
+-- ============================================
+-- Backfill existing users
+-- ============================================
+
+INSERT INTO user_usage_counters (user_id, total_briefings, total_messages, active_conversations)
+SELECT
+    u.id,
+    (SELECT COUNT(*) FROM briefings b WHERE b.user_id = u.id),
+    (SELECT COUNT(*) FROM messages m JOIN conversations c ON c.id = m.conversation_id WHERE c.user_id = u.id),
+    (SELECT COUNT(*) FROM conversations c WHERE c.user_id = u.id AND c.status = 'active')
+FROM users u
+ON CONFLICT (user_id) DO UPDATE SET
+    total_briefings = EXCLUDED.total_briefings,
+    total_messages = EXCLUDED.total_messages,
+    active_conversations = EXCLUDED.active_conversations,
+    updated_at = CURRENT_TIMESTAMP;
+
+-- ============================================
+-- Read path
+-- ============================================
+
+-- Weekly briefings is a bounded range scan on idx_briefings_user_created
+-- (the feed rule caps briefings at a few per day).
+CREATE OR REPLACE FUNCTION get_user_usage_stats(p_user_id UUID, p_week_start TIMESTAMPTZ)
+RETURNS TABLE (
+    total_briefings BIGINT,
+    weekly_briefings BIGINT,
+    active_conversations BIGINT,
+    total_messages BIGINT
+) AS $$
+    SELECT
+        COALESCE(c.total_briefings, 0),
+        (SELECT COUNT(*) FROM briefings b WHERE b.user_id = p_user_id AND b.created_at >= p_week_start),
+        COALESCE(c.active_conversations, 0),
+        COALESCE(c.total_messages, 0)
+    FROM (SELECT 1) AS one
+    LEFT JOIN user_usage_counters c ON c.user_id = p_user_id;
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+-- Stats are served by the backend for the authenticated user; not callable by clients directly
+REVOKE EXECUTE ON FUNCTION get_user_usage_stats(UUID, TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_user_usage_stats(UUID, TIMESTAMPTZ) TO service_role;
+REVOKE EXECUTE ON FUNCTION bump_user_usage(UUID, BIGINT, BIGINT, BIGINT) FROM PUBLIC, anon, authenticated;
+
+COMMENT ON TABLE user_usage_counters IS '按用户维护的使用统计计数（触发器增量更新）';
+COMMENT ON FUNCTION get_user_usage_stats IS '一次返回个人中心的全部使用统计';
@@ -0,0 +1,30 @@
+-- Migration: shared_report_artifacts
+-- Description: Briefing report artifacts are shared, not owned by one recipient
+-- Report artifacts are content-addressed and referenced by every recipient's briefing (and
+-- reused across runs that produce the same report). Owning them by one arbitrary recipient meant
+-- deleting that user cascaded the report away for everyone, and RLS hid it from the others.
+-- Shared artifacts now have user_id NULL (written by the backend only) and are readable by any
+-- user whose briefing references them.
+
+ALTER TABLE artifacts ALTER COLUMN user_id DROP NOT NULL;
+-- Shared reports are produced by scheduled jobs, outside any conversation
+ALTER TABLE artifacts ALTER COLUMN conversation_id DROP NOT NULL;
+
+-- Detach existing shared report artifacts from the recipient that happened to own them
+UPDATE artifacts
+SET user_id = NULL
+WHERE type = 'report' AND metadata ? 'content_sha256';
+
+CREATE INDEX IF NOT EXISTS idx_briefings_report_artifact
+    ON briefings(report_artifact_id) WHERE report_artifact_id IS NOT NULL;
+
+DROP POLICY IF EXISTS "Users can read report artifacts of own briefings" ON artifacts;
+CREATE POLICY "Users can read report artifacts of own briefings" ON artifacts
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM briefings b
+            WHERE b.report_artifact_id = artifacts.id AND b.user_id = auth.uid()
+        )
+    );
+
+COMMENT ON COLUMN artifacts.user_id IS '所属用户；NULL 表示多个简报共享的报告（仅后端写入）';
@@ -0,0 +1,21 @@
+-- Migration: add_message_status
+-- Description: Track message generation status and last update time
+-- Assistant replies are inserted as placeholders (status 'streaming', empty content) and filled in
+-- place when generation finishes, fails or is cancelled. The context cache revalidates cached
+-- messages on updated_at and skips rows that are still streaming.
+
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'completed';
+
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- Existing rows: treat creation as the last update
+UPDATE messages SET updated_at = created_at;
+
+DROP TRIGGER IF EXISTS update_messages_updated_at ON messages;
+CREATE TRIGGER update_messages_updated_at BEFORE UPDATE ON messages
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+COMMENT ON COLUMN messages.status IS '消息状态：streaming（生成中）/ completed / failed / cancelled';
+COMMENT ON COLUMN messages.updated_at IS '最后更新时间（上下文缓存据此校验原地更新的消息）';